@@ -4,10 +4,11 @@ Fusion-Hybrid-V1 Real Fusion Response System (Ollama-powered)
 Production FastAPI backend for weighted model fusion using real Ollama models
 """
 
+import asyncio
 import json
-import subprocess
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -21,10 +22,15 @@ from fusion_tools.optimization.federated_optimizer import FederatedOptimizer  #
 from fusion_tools.optimization.self_optimize import SelfOptimize  # STOP Framework
 from fusion_tools.optimization.nas_module import NASModule  # NAS
 from fusion_tools.optimization.ui_eda_optimizer import UIEDAOptimizer  # AI-Driven EDA for UI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fusion_tools.insight_dashboard import router as insight_dashboard_router
+from fusion_tools.utils.ollama_client import OllamaClient
+from fusion_tools.utils.response_cache import ResponseCache
+from fusion_tools.utils.fusion_config_service import FusionConfigService
+from fusion_tools.utils.telemetry_sink import TelemetrySink
+from fusion_tools.utils.consensus import ConsensusFusion, CONSENSUS_STRATEGY
+from fusion_tools.utils.model_fanout import run_models_concurrently
 import os
-import json as pyjson
 from optimize.aeo_optimizer import inject_aeo_blocks
 from optimize.geo_optimizer import structure_for_llm, simulate_llm_crawl
 from optimize.structured_data import extract_schema_blocks, extract_opengraph, extract_twitter_cards
@@ -51,29 +57,38 @@ app.add_middleware(
 # --- Model Config ---
 FUSION_CONFIG_PATH = Path("models/hybrid_models/hybrid-fusion-v1.json")
 
+# Models are called concurrently over one pooled HTTP client; a fusion
+# request fuses whatever responses arrived before its deadline
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+FUSION_DEADLINE_SECONDS = float(os.environ.get("FUSION_DEADLINE_SECONDS", "60"))
+# fusion_strategy "early_consensus": answer with the first response a weighted
+# quorum of models agrees with and cancel the models still running
+FUSION_CONSENSUS_QUORUM = float(os.environ.get("FUSION_CONSENSUS_QUORUM", "0.5"))
+FUSION_CONSENSUS_AGREEMENT = float(os.environ.get("FUSION_CONSENSUS_AGREEMENT", "0.5"))
+
+ollama_client = OllamaClient(OLLAMA_URL)
+
+# Fused responses are cached per (normalized prompt, models, weights, mode);
+# set FUSION_CACHE_EMBED_MODEL (e.g. nomic-embed-text) to also reuse responses
+# of near-duplicate prompts
+FUSION_CACHE_EMBED_MODEL = os.environ.get("FUSION_CACHE_EMBED_MODEL", "")
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("FUSION_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.environ.get("FUSION_CACHE_TTL_SECONDS", "600")),
+    embed=(lambda text: ollama_client.embed(FUSION_CACHE_EMBED_MODEL, text)) if FUSION_CACHE_EMBED_MODEL else None,
+    similarity_threshold=float(os.environ.get("FUSION_CACHE_SIMILARITY", "0.95"))
+)
+
 class FusionRequest(BaseModel):
     prompt: str
     model: str = "fusion-hybrid-v1"
-
-def run_ollama_model(model_name: str, prompt: str) -> str:
-    try:
-        result = subprocess.run(
-            ["ollama", "run", model_name, prompt],
-            capture_output=True, text=True, timeout=60
-        )
-        if result.returncode != 0:
-            logger.error(f"Ollama model {model_name} failed: {result.stderr}")
-            return f"[ERROR: {model_name} failed: {result.stderr.strip()}]"
-        return result.stdout.strip()
-    except Exception as e:
-        logger.error(f"Ollama model {model_name} exception: {e}")
-        return f"[ERROR: {model_name} exception: {e} ]"
+    deadline_seconds: Optional[float] = None
 
 model_runners = {
-    "deepseek-coder": lambda prompt: run_ollama_model("deepseek-coder", prompt),
-    "mistral": lambda prompt: run_ollama_model("mistral", prompt),
-    "codellama": lambda prompt: run_ollama_model("codellama", prompt),
-    "llama2": lambda prompt: run_ollama_model("llama2", prompt)
+    "deepseek-coder": lambda prompt, on_token=None: ollama_client.generate("deepseek-coder", prompt, on_token=on_token),
+    "mistral": lambda prompt, on_token=None: ollama_client.generate("mistral", prompt, on_token=on_token),
+    "codellama": lambda prompt, on_token=None: ollama_client.generate("codellama", prompt, on_token=on_token),
+    "llama2": lambda prompt, on_token=None: ollama_client.generate("llama2", prompt, on_token=on_token)
 }
 
 model_name_map = {
@@ -83,19 +98,16 @@ model_name_map = {
     "llama2:latest": "llama2"
 }
 
-# --- Fusion Logic ---
-def load_fusion_weights() -> Dict[str, float]:
-    with open(FUSION_CONFIG_PATH, 'r') as f:
-        config = json.load(f)
-    models = config.get("ensemble_config", {}).get("models", [])
-    weights = {model_name_map[m["name"]]: m["weight"] for m in models if m["name"] in model_name_map}
-    return weights
-
-def get_fusion_strategy() -> str:
-    with open(FUSION_CONFIG_PATH, 'r') as f:
-        config = json.load(f)
-    return config.get("ensemble_config", {}).get("fusion_strategy", "weighted_average")
+# --- Fusion config: hybrid weights, strategy and roles ---
+# Loaded once into an immutable snapshot and swapped when the files change
+MODEL_ROLES_PATH = "model_roles.json"
+fusion_config = FusionConfigService(
+    FUSION_CONFIG_PATH, MODEL_ROLES_PATH, model_name_map,
+    poll_interval=float(os.environ.get("FUSION_CONFIG_POLL_SECONDS", "2"))
+)
+fusion_config.add_listener(lambda snapshot: response_cache.invalidate())
 
+# --- Fusion Logic ---
 def fuse_responses_weighted(responses: List[Dict[str, Any]]) -> str:
     # Weighted concatenation (can be replaced with more advanced fusion)
     total_weight = sum(r['weight'] for r in responses)
@@ -109,7 +121,11 @@ def fuse_responses_weighted(responses: List[Dict[str, Any]]) -> str:
     return "\n\n".join(weighted_texts)
 
 # --- Optimization System Instantiation ---
-fusion_insight = FusionInsight()
+# Telemetry keeps the last TELEMETRY_CAPACITY entries in memory and appends
+# NDJSON on a background thread, rotating files at TELEMETRY_MAX_MB
+TELEMETRY_CAPACITY = int(os.environ.get("TELEMETRY_CAPACITY", "1000"))
+TELEMETRY_MAX_BYTES = int(float(os.environ.get("TELEMETRY_MAX_MB", "10")) * 1024 * 1024)
+fusion_insight = FusionInsight(sink=TelemetrySink("logs/fusion_insight.ndjson", capacity=TELEMETRY_CAPACITY, max_bytes=TELEMETRY_MAX_BYTES))
 meta_tuner = MetaGradientTuner()
 sharpness_evaluator = SharpnessAwareEvaluator()
 alignment_stack = AlignmentStack()
@@ -118,15 +134,6 @@ self_optimizer = SelfOptimize()
 nas_module = NASModule()
 ui_eda_optimizer = UIEDAOptimizer()
 
-# --- Load model roles ---
-MODEL_ROLES_PATH = "model_roles.json"
-def load_model_roles():
-    if os.path.exists(MODEL_ROLES_PATH):
-        with open(MODEL_ROLES_PATH, 'r') as f:
-            return pyjson.load(f)
-    return {}
-model_roles = load_model_roles()
-
 def amplify_roles_from_prompt(prompt: str, roles: dict) -> dict:
     # Simple amplification: if prompt mentions a role, boost that model's weight
     amplifications = {}
@@ -138,143 +145,230 @@ def amplify_roles_from_prompt(prompt: str, roles: dict) -> dict:
 DEPLOYMENT_MODES = ['SEO Legacy', 'AEO Pro', 'GEO Dominance']
 current_mode = {'mode': 'AEO Pro'}
 
-VISIBILITY_LOG = 'logs/visibility-tracker.json'
+VISIBILITY_LOG = 'logs/visibility-tracker.ndjson'
+visibility_sink = TelemetrySink(VISIBILITY_LOG, capacity=TELEMETRY_CAPACITY, max_bytes=TELEMETRY_MAX_BYTES)
 def log_visibility(data):
-    import json, os
-    os.makedirs(os.path.dirname(VISIBILITY_LOG), exist_ok=True)
-    if os.path.exists(VISIBILITY_LOG):
-        with open(VISIBILITY_LOG) as f:
-            log = json.load(f)
+    visibility_sink.emit(data)
+
+async def run_fusion(prompt: str, deadline: Optional[float] = None,
+                     on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    # One snapshot per request, so a reload never mixes config versions
+    config = fusion_config.snapshot
+    weights = dict(config.weights)
+    strategy = config.strategy
+    model_roles = config.roles
+    responses = []
+    amplifications = amplify_roles_from_prompt(prompt, model_roles)
+    nas_weights = nas_module.propose_architecture(list(model_runners.keys()), query_type="default")
+    model_weights = {}
+    for model_key in model_runners:
+        weight = nas_weights.get(model_key, weights.get(model_key, 0))
+        for role_model, amp in amplifications.items():
+            if role_model.lower() in model_key.lower():
+                weight *= amp
+        if weight > 0:
+            model_weights[model_key] = weight
+    consensus, on_result = None, None
+    if strategy == CONSENSUS_STRATEGY:
+        # Alignment scales a model's vote between 0.5x and 1.5x its weight
+        consensus = ConsensusFusion(
+            {m: w * (0.5 + alignment_stack.compute_alignment_score(m)) for m, w in model_weights.items()},
+            quorum=FUSION_CONSENSUS_QUORUM, agreement_threshold=FUSION_CONSENSUS_AGREEMENT
+        )
+        on_result = consensus.add
+    # All weighted models run at once; latency is that of the slowest model (or
+    # the deadline), or of the quorum with the consensus strategy
+    outputs, errors, latencies = await run_models_concurrently(
+        model_runners, prompt, list(model_weights), deadline or FUSION_DEADLINE_SECONDS, on_token, on_result
+    )
+    for model_key, weight in model_weights.items():
+        if model_key in outputs:
+            params = meta_tuner.get_params(model_key)
+            output = outputs[model_key]
+            sharpness_score = sharpness_evaluator.evaluate([
+                {"model": model_key, "response": output}
+            ])[0]["sharpness_score"]
+            alignment_score = alignment_stack.compute_alignment_score(model_key)
+            emotional_penalty = alignment_stack.emotional_loss_aversion(output)
+            federated_optimizer.submit_update("local", params)
+            agg_params = federated_optimizer.aggregate()
+            routing_state = {"weights": weights}
+            routing_state = self_optimizer.mutate_routing(routing_state)
+            fusion_insight.log_model_output(
+                model=model_key,
+                prompt=prompt,
+                response=output,
+                score=alignment_score + emotional_penalty - sharpness_score,
+                meta={
+                    "sharpness": sharpness_score,
+                    "alignment": alignment_score,
+                    "emotional_penalty": emotional_penalty,
+                    "params": params,
+                    "agg_params": agg_params,
+                    "role": model_roles.get(model_key.capitalize(), None)
+                }
+            )
+            fusion_insight.log_self_reflection(
+                model=model_key,
+                reflection=f"Output coherence: {output[:60]}... | Alignment: {alignment_score:.2f} | Sharpness: {sharpness_score:.2f}",
+                context={"prompt": prompt}
+            )
+            responses.append({
+                "model": model_key,
+                "weight": weight,
+                "response": output,
+                "alignment": alignment_score,
+                "sharpness": sharpness_score,
+                "emotional_penalty": emotional_penalty,
+                "role": model_roles.get(model_key.capitalize(), None)
+            })
+    if consensus is not None:
+        fused_response, consensus_info = consensus.result()
+        consensus_info["cancelled"] = [m for m in model_weights if m not in outputs and m not in errors]
+        if fused_response is None:
+            fused_response = fuse_responses_weighted(responses)
+    else:
+        fused_response, consensus_info = fuse_responses_weighted(responses), None
+    nas_module.benchmark(nas_weights, performance=1.0)
+    # --- AI Optimization Integration ---
+    # 1. AEO: inject QA/FAQ/conversational blocks
+    markdown = prompt + '\n' + fused_response
+    aeo_content = inject_aeo_blocks(fused_response, markdown)
+    # 2. GEO: structure for LLM, add JSON-LD
+    geo_content = structure_for_llm(aeo_content)
+    # 3. Structured Data: extract and inject
+    schema_blocks = extract_schema_blocks(geo_content)
+    opengraph = extract_opengraph(geo_content)
+    twitter_cards = extract_twitter_cards(geo_content)
+    # 4. Conversational Semantics: enhance response
+    enhanced = enhance_response(geo_content)
+    # 5. SEO Automation: suggest keywords, meta, summary, slug
+    keywords = suggest_keywords(prompt)
+    meta_title = generate_meta_title(prompt)
+    summary = generate_summary(fused_response)
+    slug = generate_slug(prompt)
+    # 6. Brand/Citation Monitoring: simulate LLM tracking
+    brand_stats = simulate_llm_tracking(enhanced)
+    # 7. Edge Optimization: optimize load, fallback, device context
+    edge_ok = optimize_first_load()
+    device_info = device_context('pi')
+    # Log visibility
+    log_visibility({
+        'prompt': prompt,
+        'meta_title': meta_title,
+        'keywords': keywords,
+        'slug': slug,
+        'brand_stats': brand_stats,
+        'edge_ok': edge_ok,
+        'timestamp': datetime.now().isoformat()
+    })
+    # Deployment mode toggle
+    mode = current_mode['mode']
+    if mode == 'SEO Legacy':
+        final_content = fused_response
+    elif mode == 'AEO Pro':
+        final_content = aeo_content
+    elif mode == 'GEO Dominance':
+        final_content = geo_content
     else:
-        log = []
-    log.append(data)
-    with open(VISIBILITY_LOG, 'w') as f:
-        json.dump(log, f, indent=2)
+        final_content = enhanced
+    return {
+        "response": final_content,
+        "models": [r["model"] for r in responses],
+        "weights": {r["model"]: r["weight"] for r in responses},
+        "roles": {r["model"]: r["role"] for r in responses},
+        "strategy": strategy,
+        "config_version": config.version,
+        "consensus": consensus_info,
+        "timestamp": datetime.now().isoformat(),
+        "success": True,
+        "errors": errors,
+        "latency_seconds": latencies,
+        "insight_logs": fusion_insight.get_logs(10),
+        "meta": {
+            "meta_title": meta_title,
+            "keywords": keywords,
+            "summary": summary,
+            "slug": slug,
+            "schema_blocks": schema_blocks,
+            "opengraph": opengraph,
+            "twitter_cards": twitter_cards,
+            "brand_stats": brand_stats,
+            "edge": device_info
+        }
+    }
+
+def fusion_cache_context() -> Tuple:
+    # Everything besides the prompt that changes a fused response; the config
+    # version covers hybrid weights, strategy and roles
+    return (tuple(model_runners), fusion_config.snapshot.version, current_mode['mode'])
+
+async def cached_fusion(request: FusionRequest, on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    # Partial fusions (a model failed or missed the deadline) are not cached
+    result, cache_info = await response_cache.get_or_compute(
+        request.prompt,
+        fusion_cache_context(),
+        lambda: run_fusion(request.prompt, request.deadline_seconds, on_token),
+        cacheable=lambda result: not result["errors"]
+    )
+    return {**result, "cache": cache_info}
 
 # --- Endpoints ---
 @app.post("/fusion/respond")
 async def fusion_respond(request: FusionRequest):
     try:
-        weights = load_fusion_weights()
-        strategy = get_fusion_strategy()
-        prompt = request.prompt
-        responses = []
-        amplifications = amplify_roles_from_prompt(prompt, model_roles)
-        nas_weights = nas_module.propose_architecture(list(model_runners.keys()), query_type="default")
-        for model_key, runner in model_runners.items():
-            params = meta_tuner.get_params(model_key)
-            weight = nas_weights.get(model_key, weights.get(model_key, 0))
-            for role_model, amp in amplifications.items():
-                if role_model.lower() in model_key.lower():
-                    weight *= amp
-            if weight > 0:
-                output = runner(prompt)
-                sharpness_score = sharpness_evaluator.evaluate([
-                    {"model": model_key, "response": output}
-                ])[0]["sharpness_score"]
-                alignment_score = alignment_stack.compute_alignment_score(model_key)
-                emotional_penalty = alignment_stack.emotional_loss_aversion(output)
-                federated_optimizer.submit_update("local", params)
-                agg_params = federated_optimizer.aggregate()
-                routing_state = {"weights": weights}
-                routing_state = self_optimizer.mutate_routing(routing_state)
-                fusion_insight.log_model_output(
-                    model=model_key,
-                    prompt=prompt,
-                    response=output,
-                    score=alignment_score + emotional_penalty - sharpness_score,
-                    meta={
-                        "sharpness": sharpness_score,
-                        "alignment": alignment_score,
-                        "emotional_penalty": emotional_penalty,
-                        "params": params,
-                        "agg_params": agg_params,
-                        "role": model_roles.get(model_key.capitalize(), None)
-                    }
-                )
-                fusion_insight.log_self_reflection(
-                    model=model_key,
-                    reflection=f"Output coherence: {output[:60]}... | Alignment: {alignment_score:.2f} | Sharpness: {sharpness_score:.2f}",
-                    context={"prompt": prompt}
-                )
-                responses.append({
-                    "model": model_key,
-                    "weight": weight,
-                    "response": output,
-                    "alignment": alignment_score,
-                    "sharpness": sharpness_score,
-                    "emotional_penalty": emotional_penalty,
-                    "role": model_roles.get(model_key.capitalize(), None)
-                })
-        fused_response = fuse_responses_weighted(responses)
-        nas_module.benchmark(nas_weights, performance=1.0)
-        # --- AI Optimization Integration ---
-        # 1. AEO: inject QA/FAQ/conversational blocks
-        markdown = prompt + '\n' + fused_response
-        aeo_content = inject_aeo_blocks(fused_response, markdown)
-        # 2. GEO: structure for LLM, add JSON-LD
-        geo_content = structure_for_llm(aeo_content)
-        # 3. Structured Data: extract and inject
-        schema_blocks = extract_schema_blocks(geo_content)
-        opengraph = extract_opengraph(geo_content)
-        twitter_cards = extract_twitter_cards(geo_content)
-        # 4. Conversational Semantics: enhance response
-        enhanced = enhance_response(geo_content)
-        # 5. SEO Automation: suggest keywords, meta, summary, slug
-        keywords = suggest_keywords(prompt)
-        meta_title = generate_meta_title(prompt)
-        summary = generate_summary(fused_response)
-        slug = generate_slug(prompt)
-        # 6. Brand/Citation Monitoring: simulate LLM tracking
-        brand_stats = simulate_llm_tracking(enhanced)
-        # 7. Edge Optimization: optimize load, fallback, device context
-        edge_ok = optimize_first_load()
-        device_info = device_context('pi')
-        # Log visibility
-        log_visibility({
-            'prompt': prompt,
-            'meta_title': meta_title,
-            'keywords': keywords,
-            'slug': slug,
-            'brand_stats': brand_stats,
-            'edge_ok': edge_ok,
-            'timestamp': datetime.now().isoformat()
-        })
-        # Deployment mode toggle
-        mode = current_mode['mode']
-        if mode == 'SEO Legacy':
-            final_content = fused_response
-        elif mode == 'AEO Pro':
-            final_content = aeo_content
-        elif mode == 'GEO Dominance':
-            final_content = geo_content
-        else:
-            final_content = enhanced
-        return {
-            "response": final_content,
-            "models": [r["model"] for r in responses],
-            "weights": {r["model"]: r["weight"] for r in responses},
-            "roles": {r["model"]: r["role"] for r in responses},
-            "strategy": strategy,
-            "timestamp": datetime.now().isoformat(),
-            "success": True,
-            "insight_logs": fusion_insight.get_logs(10),
-            "meta": {
-                "meta_title": meta_title,
-                "keywords": keywords,
-                "summary": summary,
-                "slug": slug,
-                "schema_blocks": schema_blocks,
-                "opengraph": opengraph,
-                "twitter_cards": twitter_cards,
-                "brand_stats": brand_stats,
-                "edge": device_info
-            }
-        }
+        return await cached_fusion(request)
     except Exception as e:
         logger.error(f"Fusion error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/fusion/respond/stream")
+async def fusion_respond_stream(request: FusionRequest):
+    # Newline-delimited JSON: {"type": "token", "model", "token"} events while the
+    # models generate, then one {"type": "result", ...} event with the fused response
+    events = asyncio.Queue()
+    async def produce():
+        try:
+            result = await cached_fusion(
+                request,
+                on_token=lambda model_key, token: events.put_nowait({"type": "token", "model": model_key, "token": token})
+            )
+            events.put_nowait({"type": "result", **result})
+        except Exception as e:
+            logger.error(f"Fusion stream error: {e}")
+            events.put_nowait({"type": "error", "detail": str(e)})
+        finally:
+            events.put_nowait(None)
+    async def stream():
+        producer = asyncio.create_task(produce())
+        try:
+            while (event := await events.get()) is not None:
+                yield json.dumps(event, default=str) + "\n"
+        finally:
+            # Client went away: the model calls are cancelled once no other request waits on the same computation
+            producer.cancel()
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/fusion/cache")
+async def fusion_cache_stats():
+    return response_cache.get_stats()
+
+@app.delete("/fusion/cache")
+async def fusion_cache_clear():
+    response_cache.invalidate()
+    return {"status": "cache cleared"}
+
+@app.on_event("startup")
+async def watch_fusion_config():
+    fusion_config.start()
+
+@app.on_event("shutdown")
+async def close_ollama_client():
+    await fusion_config.stop()
+    await ollama_client.close()
+    fusion_insight.close()
+    visibility_sink.close()
+
 @app.get("/test/fusion")
 async def test_fusion():
     return {"status": "✅ Fusion connection live"}
@@ -299,9 +393,10 @@ async def optimize_layout(data: Dict[str, Any]):
     return layout
 
 @app.get("/fusion/insight-data")
-async def fusion_insight_data():
+async def fusion_insight_data(limit: int = 100, kind: Optional[str] = None, model: Optional[str] = None, since: Optional[str] = None):
+    # kind: model_output, feedback or self_reflection; since: ISO timestamp
     return JSONResponse({
-        "fusion_insight": fusion_insight.get_logs(100),
+        "fusion_insight": fusion_insight.query(limit, kind=kind, model=model, since=since),
         "self_optimize": getattr(self_optimizer, 'attempts', []),
         "nas": getattr(nas_module, 'architecture_history', [])
     })
@@ -335,21 +430,21 @@ async def train_hybrid(feedback_logs: list = Body(...), nas_params: dict = Body(
     with open(new_model_path, "w") as f:
         import json
         json.dump(new_config, f, indent=2)
+    # New hybrid weights: cached fusions are stale
+    response_cache.invalidate()
     # Log mutation
     self_optimizer.log_attempt(f"Trained hybrid model v{next_version}", "success", impact=0.1)
     return {"hybrid_name": f"hybrid-fusion-v{next_version}", "success": True, "log": f"Model trained and saved as hybrid-fusion-v{next_version}.json"}
 
 @app.get("/fusion/roles")
 async def get_roles():
-    return model_roles
+    return dict(fusion_config.snapshot.roles)
 
 @app.post("/fusion/roles")
 async def update_roles(new_roles: dict = Body(...)):
-    with open(MODEL_ROLES_PATH, 'w') as f:
-        pyjson.dump(new_roles, f, indent=2)
-    global model_roles
-    model_roles = load_model_roles()
-    return {"status": "roles updated", "roles": model_roles}
+    # Publishes a new config version, which also clears the response cache
+    snapshot = fusion_config.update_roles(new_roles)
+    return {"status": "roles updated", "roles": dict(snapshot.roles), "version": snapshot.version}
 
 @app.post('/deploy/mode')
 async def set_deploy_mode(mode: str = Body(...)):
@@ -368,6 +463,9 @@ async def fusion_status():
         "status": "online",
         "models": list(model_runners.keys()),
         "deployment_mode": current_mode['mode'],
+        "cache": response_cache.get_stats(),
+        "config": fusion_config.get_status(),
+        "telemetry": {"insight": fusion_insight.sink.get_stats(), "visibility": visibility_sink.get_stats()},
         "timestamp": datetime.now().isoformat()
     }
 
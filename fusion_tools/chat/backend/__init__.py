@@ -4,7 +4,11 @@ FastAPI server and backend logic for chat interface
 """
 
 from .chat_server import ChatServer
+from .broadcast_hub import BroadcastHub
+from .conversation_store import ConversationStore
 
 __all__ = [
-    "ChatServer"
+    "ChatServer",
+    "BroadcastHub",
+    "ConversationStore"
 ] 
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Broadcast Hub
+Per-connection bounded send queues so slow WebSocket clients never delay others
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Any, Deque, Hashable, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+SLOW_CLIENT_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+
+class ClientConnection:
+    """One WebSocket with its outbound queue and writer task"""
+    
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue: Deque[Tuple[Optional[Hashable], str]] = deque()
+        self.ready = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        
+    def enqueue(self, frame: str, key: Optional[Hashable], policy: str):
+        """Queue a serialized frame, applying the slow client policy when full"""
+        if policy == "coalesce" and key is not None:
+            # Replace a queued frame with the same key instead of adding another
+            for index, (queued_key, _) in enumerate(self.queue):
+                if queued_key == key:
+                    del self.queue[index]
+                    self.queue.append((key, frame))
+                    self.coalesced += 1
+                    return
+                    
+        if len(self.queue) >= self.max_queue:
+            if policy == "drop_newest":
+                self.dropped += 1
+                return
+            self.queue.popleft()
+            self.dropped += 1
+            
+        self.queue.append((key, frame))
+        self.ready.set()
+
+
+class BroadcastHub:
+    """
+    Fan-out of JSON messages to connected WebSockets.
+    
+    `broadcast` and `send` serialize a message once and only append it to the
+    bounded queue of each target connection; a writer task per connection does
+    the actual sends. When a queue is full the slow client policy applies:
+    
+        drop_oldest: discard the oldest queued frame (default)
+        drop_newest: discard the new frame
+        coalesce: replace a queued frame with the same coalesce key (message
+                  type and conversation), otherwise drop the oldest
+                  
+    A client whose send does not finish within `send_timeout` is disconnected.
+    """
+    
+    def __init__(self, max_queue: int = 100, policy: str = "drop_oldest", send_timeout: float = 10.0):
+        """
+        Args:
+            max_queue: Frames queued per connection before the policy applies
+            policy: One of SLOW_CLIENT_POLICIES
+            send_timeout: Seconds a single send may take before the client is dropped
+        """
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.stats = {
+            "frames_sent": 0,
+            "frames_dropped": 0,
+            "frames_coalesced": 0,
+            "broadcasts": 0,
+            "slow_disconnects": 0
+        }
+        
+    def register(self, websocket: WebSocket) -> ClientConnection:
+        """Start queueing frames for an accepted WebSocket"""
+        connection = ClientConnection(websocket, self.max_queue)
+        connection.writer = asyncio.create_task(self._writer_loop(connection))
+        self.connections[websocket] = connection
+        return connection
+        
+    async def unregister(self, websocket: WebSocket):
+        """Stop the writer of a WebSocket and forget it"""
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        self._collect_counters(connection)
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+            try:
+                await connection.writer
+            except asyncio.CancelledError:
+                pass
+                
+    def _collect_counters(self, connection: ClientConnection):
+        self.stats["frames_sent"] += connection.sent
+        self.stats["frames_dropped"] += connection.dropped
+        self.stats["frames_coalesced"] += connection.coalesced
+        connection.sent = connection.dropped = connection.coalesced = 0
+        
+    @staticmethod
+    def _coalesce_key(message: Dict[str, Any]) -> Hashable:
+        return message.get("type"), message.get("conversation_id")
+        
+    def broadcast(self, message: Dict[str, Any]) -> int:
+        """
+        Queue a message for every connected client without waiting for sends.
+        
+        Returns:
+            Number of clients the message was queued for
+        """
+        self.stats["broadcasts"] += 1
+        if not self.connections:
+            return 0
+        frame = json.dumps(message)
+        key = self._coalesce_key(message)
+        for connection in self.connections.values():
+            connection.enqueue(frame, key, self.policy)
+        return len(self.connections)
+        
+    def send(self, websocket: WebSocket, message: Dict[str, Any], coalesce: bool = False):
+        """
+        Queue a message for one client.
+        
+        Direct replies are not coalesced unless asked, so streamed deltas are
+        not merged away; they are still subject to the drop policies.
+        """
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            key = self._coalesce_key(message) if coalesce else None
+            connection.enqueue(json.dumps(message), key, self.policy)
+            
+    async def _writer_loop(self, connection: ClientConnection):
+        try:
+            while True:
+                await connection.ready.wait()
+                while connection.queue:
+                    _, frame = connection.queue.popleft()
+                    await asyncio.wait_for(connection.websocket.send_text(frame), self.send_timeout)
+                    connection.sent += 1
+                connection.ready.clear()
+                
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.stats["slow_disconnects"] += 1
+            logger.warning(f"Dropping WebSocket client that did not accept a frame within {self.send_timeout}s")
+            await self._drop(connection)
+        except Exception as e:
+            logger.error(f"Failed to send websocket message: {e}")
+            await self._drop(connection)
+            
+    async def _drop(self, connection: ClientConnection):
+        await self.unregister(connection.websocket)
+        try:
+            await connection.websocket.close()
+        except Exception:
+            pass
+            
+    async def close(self):
+        """Stop every writer"""
+        for websocket in list(self.connections):
+            await self.unregister(websocket)
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """Client count, queue depths and frame counters"""
+        depths: List[int] = [len(connection.queue) for connection in self.connections.values()]
+        live = self.connections.values()
+        return {
+            "clients": len(self.connections),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_limit": self.max_queue,
+            "policy": self.policy,
+            "frames_sent": self.stats["frames_sent"] + sum(c.sent for c in live),
+            "frames_dropped": self.stats["frames_dropped"] + sum(c.dropped for c in live),
+            "frames_coalesced": self.stats["frames_coalesced"] + sum(c.coalesced for c in live),
+            "broadcasts": self.stats["broadcasts"],
+            "slow_disconnects": self.stats["slow_disconnects"]
+        }
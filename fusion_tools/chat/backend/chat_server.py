@@ -7,8 +7,9 @@ FastAPI server for chat interface with hybrid fusion models
 import logging
 import sys
 import os
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, AsyncIterator
 from dataclasses import dataclass, asdict
 import json
 import asyncio
@@ -18,13 +19,17 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 
 from utils.api_client import FusionAPIClient
+from utils.async_api_client import AsyncFusionAPIClient, FusionAPIError
+from utils.ollama_client import OllamaClient, OllamaError
 from utils.config_loader import ConfigLoader
+from chat.backend.broadcast_hub import BroadcastHub
+from chat.backend.conversation_store import ConversationStore
 
 logger = logging.getLogger(__name__)
 
@@ -72,9 +77,37 @@ class ChatServer:
             port=self.config.port,
             timeout=self.config.timeout
         )
+        # Chat turns go through the pooled async client so one worker serves
+        # many conversations; the sync client is kept for status calls
+        self.async_client = AsyncFusionAPIClient(
+            host=self.config.host,
+            port=self.config.port,
+            timeout=self.chat_config.get('response_timeout', 60)
+        )
+        # A standard model chosen on its own is answered by Ollama directly;
+        # hybrid and default choices are fused by the fusion server
+        self.ollama_client = OllamaClient(
+            self.chat_config.get('ollama_url', 'http://localhost:11434'),
+            read_timeout=self.chat_config.get('response_timeout', 60)
+        )
+        self.standard_models: set = set()
+        self.standard_models_checked = 0.0
         
-        self.conversations: Dict[str, ChatHistory] = {}
-        self.active_websockets: List[WebSocket] = []
+        # History lives in SQLite; only recently used conversations stay in memory
+        ttl_hours = self.chat_config.get('conversation_ttl_hours', 168)
+        self.conversations = ConversationStore(
+            self.chat_config.get('history_db', 'data/chat_history.db'),
+            max_cached=self.chat_config.get('max_cached_conversations', 1000),
+            max_history=self.chat_config.get('max_history_size', 100),
+            ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+            flush_interval=self.chat_config.get('history_flush_ms', 500) / 1000
+        )
+        # Each WebSocket gets its own bounded send queue and writer task
+        self.hub = BroadcastHub(
+            max_queue=self.chat_config.get('ws_queue_size', 100),
+            policy=self.chat_config.get('ws_slow_client_policy', 'drop_oldest'),
+            send_timeout=self.chat_config.get('ws_send_timeout', 10)
+        )
         
         # Setup FastAPI app
         self.app = FastAPI(
@@ -120,68 +153,76 @@ class ChatServer:
         async def chat(request: ChatRequest):
             """Main chat endpoint"""
             try:
-                start_time = datetime.now()
-                
-                # Validate message length
-                max_length = self.chat_config.get('max_message_length', 4096)
-                if len(request.message) > max_length:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Message too long. Max length: {max_length}"
-                    )
+                self.validate_message(request.message)
                 
-                # Determine model to use
-                model_name = request.model or self.chat_config.get('default_model', 'hybrid-fusion-v1')
+                # Get the final response from the streamed turn
+                result = None
+                async for event in self.stream_reply(request):
+                    if event["type"] == "chat_response":
+                        result = event
                 
-                # Get response from fusion server
-                response = self.api_client.chat_with_model(model_name, request.message)
-                
-                if response is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Failed to get response from fusion server"
-                    )
-                
-                # Calculate response time
-                response_time = (datetime.now() - start_time).total_seconds()
-                
-                # Create conversation ID if not provided
-                conversation_id = request.conversation_id or f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                
-                # Store in conversation history
-                if self.chat_config.get('enable_history', True):
-                    self.store_message(conversation_id, request.message, response, model_name, response_time)
-                
-                # Broadcast to websockets
-                await self.broadcast_message({
+                # Queue for websockets; never waits for the clients
+                self.broadcast_message({
                     "type": "chat_response",
-                    "conversation_id": conversation_id,
+                    "conversation_id": result["conversation_id"],
                     "user_message": request.message,
-                    "bot_response": response,
-                    "model_used": model_name,
-                    "response_time": response_time
+                    "bot_response": result["response"],
+                    "model_used": result["model_used"],
+                    "response_time": result["response_time"]
                 })
                 
                 return ChatResponse(
-                    response=response,
-                    model_used=model_name,
-                    conversation_id=conversation_id,
-                    timestamp=datetime.now().isoformat(),
-                    response_time=response_time
+                    response=result["response"],
+                    model_used=result["model_used"],
+                    conversation_id=result["conversation_id"],
+                    timestamp=result["timestamp"],
+                    response_time=result["response_time"]
                 )
                 
             except HTTPException:
                 raise
+            except FusionAPIError as e:
+                logger.error(f"Chat error: {e}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to get response from fusion server"
+                )
+            except OllamaError as e:
+                logger.error(f"Chat error: {e}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to get response from model"
+                )
             except Exception as e:
                 logger.error(f"Chat error: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/chat/stream")
+        async def chat_stream(request: ChatRequest):
+            """Server-Sent Events chat endpoint: chat_delta events, then one chat_response"""
+            self.validate_message(request.message)
+            
+            async def events():
+                try:
+                    async for event in self.stream_reply(request):
+                        yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                except Exception as e:
+                    logger.error(f"Chat stream error: {e}")
+                    yield f"event: error\ndata: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                    
+            return StreamingResponse(
+                events(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
         @self.app.get("/models")
         async def get_available_models():
             """Get available models"""
             try:
-                models = self.api_client.get_available_models()
-                hybrids = self.api_client.get_hybrid_models()
+                # The sync client runs in a thread so it never blocks the event loop
+                models = await asyncio.to_thread(self.api_client.get_available_models)
+                hybrids = await asyncio.to_thread(self.api_client.get_hybrid_models)
                 
                 hybrid_names = [h.get('name', 'unknown') for h in hybrids]
                 
@@ -195,49 +236,44 @@ class ChatServer:
                 return {"standard_models": [], "hybrid_models": [], "default_model": "hybrid-fusion-v1"}
         
         @self.app.get("/conversations")
-        async def get_conversations():
-            """Get conversation list"""
-            return {
-                "conversations": [
-                    {
-                        "id": conv_id,
-                        "message_count": len(history.messages),
-                        "created_at": history.created_at,
-                        "last_updated": history.last_updated
-                    }
-                    for conv_id, history in self.conversations.items()
-                ]
-            }
+        async def get_conversations(offset: int = 0, limit: int = 50):
+            """Get conversation list, most recently active first"""
+            return await self.conversations.list(offset=offset, limit=limit)
         
         @self.app.get("/conversations/{conversation_id}")
-        async def get_conversation(conversation_id: str):
-            """Get specific conversation"""
-            if conversation_id not in self.conversations:
+        async def get_conversation(conversation_id: str, offset: int = 0, limit: Optional[int] = None):
+            """Get specific conversation with a page of its messages"""
+            conversation = await self.conversations.get(conversation_id, offset=offset, limit=limit)
+            if conversation is None:
                 raise HTTPException(status_code=404, detail="Conversation not found")
             
-            return self.conversations[conversation_id]
+            return conversation
         
         @self.app.delete("/conversations/{conversation_id}")
         async def delete_conversation(conversation_id: str):
             """Delete conversation"""
-            if conversation_id not in self.conversations:
+            if not await self.conversations.delete(conversation_id):
                 raise HTTPException(status_code=404, detail="Conversation not found")
             
-            del self.conversations[conversation_id]
             return {"message": "Conversation deleted"}
         
         @self.app.get("/status")
         async def get_chat_status():
             """Get chat server status"""
-            fusion_status = self.api_client.get_fusion_status()
-            server_health = self.api_client.get_server_health()
+            fusion_status, server_health = await asyncio.gather(
+                asyncio.to_thread(self.api_client.get_fusion_status),
+                asyncio.to_thread(self.api_client.get_server_health)
+            )
+            history_stats = await self.conversations.get_stats()
             
             return {
                 "chat_server_status": "running",
                 "fusion_server_connected": fusion_status is not None,
                 "fusion_server_health": server_health.get('status', 'unknown'),
-                "active_conversations": len(self.conversations),
-                "active_websockets": len(self.active_websockets),
+                "active_conversations": history_stats["stored"],
+                "history": history_stats,
+                "active_websockets": len(self.hub.connections),
+                "websockets": self.hub.get_stats(),
                 "default_model": self.chat_config.get('default_model', 'hybrid-fusion-v1'),
                 "config": {
                     "max_message_length": self.chat_config.get('max_message_length', 4096),
@@ -250,7 +286,7 @@ class ChatServer:
         async def websocket_endpoint(websocket: WebSocket):
             """WebSocket endpoint for real-time chat"""
             await websocket.accept()
-            self.active_websockets.append(websocket)
+            self.hub.register(websocket)
             
             try:
                 while True:
@@ -266,76 +302,151 @@ class ChatServer:
                                 model=message_data.get("model"),
                                 conversation_id=message_data.get("conversation_id")
                             )
+                            self.validate_message(request.message)
                             
-                            # Get response (reuse logic from chat endpoint)
-                            start_time = datetime.now()
-                            model_name = request.model or self.chat_config.get('default_model', 'hybrid-fusion-v1')
-                            
-                            response = self.api_client.chat_with_model(model_name, request.message)
-                            response_time = (datetime.now() - start_time).total_seconds()
-                            
-                            # Send response back
-                            await websocket.send_text(json.dumps({
-                                "type": "chat_response",
-                                "response": response,
-                                "model_used": model_name,
-                                "response_time": response_time,
-                                "timestamp": datetime.now().isoformat()
-                            }))
-                            
+                            # Send chat_delta frames as tokens arrive, then the chat_response
+                            async for event in self.stream_reply(request):
+                                self.hub.send(websocket, event)
+                                
+                        except HTTPException as e:
+                            self.hub.send(websocket, {
+                                "type": "error",
+                                "message": e.detail
+                            })
                         except Exception as e:
-                            await websocket.send_text(json.dumps({
+                            self.hub.send(websocket, {
                                 "type": "error",
                                 "message": str(e)
-                            }))
+                            })
                     
             except WebSocketDisconnect:
-                self.active_websockets.remove(websocket)
+                pass
             except Exception as e:
                 logger.error(f"WebSocket error: {e}")
-                if websocket in self.active_websockets:
-                    self.active_websockets.remove(websocket)
+            finally:
+                await self.hub.unregister(websocket)
+        
+        @self.app.on_event("shutdown")
+        async def close_clients():
+            """Close pooled fusion server and Ollama connections and websocket writers"""
+            await self.hub.close()
+            await self.async_client.close()
+            await self.ollama_client.close()
+            await self.conversations.close()
     
-    def store_message(self, conversation_id: str, user_message: str, bot_response: str, 
-                     model_used: str, response_time: float):
-        """Store message in conversation history"""
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = ChatHistory(
-                conversation_id=conversation_id,
-                messages=[],
-                created_at=datetime.now().isoformat(),
-                last_updated=datetime.now().isoformat()
+    def validate_message(self, message: str):
+        """Reject messages over the configured maximum length"""
+        max_length = self.chat_config.get('max_message_length', 4096)
+        if len(message) > max_length:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Message too long. Max length: {max_length}"
             )
+    
+    async def stream_reply(self, request: ChatRequest) -> AsyncIterator[Dict]:
+        """
+        Stream one chat turn.
+        
+        A standard model is asked directly; any other choice (a hybrid or the
+        default) gets the fusion server's fused answer. Yields chat_delta
+        events with the tokens as they are generated (for a fused answer, of
+        the first model to start answering), then one chat_response event
+        naming the model or fused models that answered, which is also stored
+        in the conversation history.
+        """
+        start_time = datetime.now()
+        model_name = request.model or self.chat_config.get('default_model', 'hybrid-fusion-v1')
+        conversation_id = request.conversation_id or f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        # Add message to history
-        message = {
-            "id": f"msg_{len(self.conversations[conversation_id].messages) + 1}",
+        if await self.is_standard_model(model_name):
+            events = self.stream_model(model_name, request.message)
+        else:
+            events = self.stream_fusion(request.message)
+            
+        response = None
+        async for event in events:
+            if event["type"] == "token":
+                yield {
+                    "type": "chat_delta",
+                    "conversation_id": conversation_id,
+                    "model": event["model"],
+                    "delta": event["token"]
+                }
+            else:
+                response, model_used = event["response"], event["model_used"]
+                
+        if response is None:
+            raise FusionAPIError("Fusion stream ended without a result")
+            
+        response_time = (datetime.now() - start_time).total_seconds()
+        if self.chat_config.get('enable_history', True):
+            await self.store_message(conversation_id, request.message, response, model_used, response_time)
+            
+        yield {
+            "type": "chat_response",
+            "conversation_id": conversation_id,
+            "response": response,
+            "model_used": model_used,
+            "response_time": response_time,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    async def is_standard_model(self, model_name: str) -> bool:
+        """Whether a model is an installed Ollama model (the list is refreshed at most once a minute)"""
+        now = time.monotonic()
+        if now - self.standard_models_checked > 60:
+            self.standard_models_checked = now
+            try:
+                self.standard_models = {model["name"] for model in await self.ollama_client.list_models()}
+            except Exception as e:
+                logger.warning(f"Failed to list Ollama models: {e}")
+        return model_name in self.standard_models
+    
+    async def stream_model(self, model_name: str, message: str) -> AsyncIterator[Dict]:
+        """Token events from one Ollama model, then its result"""
+        tokens = asyncio.Queue()
+        generation = asyncio.create_task(self.ollama_client.generate(model_name, message, on_token=tokens.put_nowait))
+        generation.add_done_callback(lambda _: tokens.put_nowait(None))
+        try:
+            while (token := await tokens.get()) is not None:
+                yield {"type": "token", "model": model_name, "token": token}
+            yield {"type": "result", "response": await generation, "model_used": model_name}
+        finally:
+            # Client went away: stop generating
+            generation.cancel()
+    
+    async def stream_fusion(self, message: str) -> AsyncIterator[Dict]:
+        """Token events of the first model to start answering, then the fused result"""
+        lead_model = None
+        async for event in self.async_client.stream_respond(
+            message, deadline_seconds=self.chat_config.get('response_timeout', 60)
+        ):
+            if event.get("type") == "token":
+                lead_model = lead_model or event.get("model")
+                if event.get("model") == lead_model:
+                    yield {"type": "token", "model": lead_model, "token": event.get("token", "")}
+            elif event.get("type") == "result":
+                models = event.get("models") or []
+                yield {
+                    "type": "result",
+                    "response": event.get("response", ""),
+                    "model_used": f"fusion: {', '.join(models)}" if models else "fusion"
+                }
+    
+    async def store_message(self, conversation_id: str, user_message: str, bot_response: str, 
+                            model_used: str, response_time: float):
+        """Store message in conversation history (written to disk in the background)"""
+        await self.conversations.append(conversation_id, {
             "user_message": user_message,
             "bot_response": bot_response,
             "model_used": model_used,
             "timestamp": datetime.now().isoformat(),
             "response_time": response_time
-        }
-        
-        self.conversations[conversation_id].messages.append(message)
-        self.conversations[conversation_id].last_updated = datetime.now().isoformat()
-        
-        # Limit history size
-        max_history = self.chat_config.get('max_history_size', 100)
-        if len(self.conversations[conversation_id].messages) > max_history:
-            self.conversations[conversation_id].messages = self.conversations[conversation_id].messages[-max_history:]
+        })
     
-    async def broadcast_message(self, message: Dict):
-        """Broadcast message to all connected websockets"""
-        if self.active_websockets:
-            message_str = json.dumps(message)
-            for websocket in self.active_websockets[:]:  # Copy list to avoid modification during iteration
-                try:
-                    await websocket.send_text(message_str)
-                except Exception as e:
-                    logger.error(f"Failed to send websocket message: {e}")
-                    if websocket in self.active_websockets:
-                        self.active_websockets.remove(websocket)
+    def broadcast_message(self, message: Dict) -> int:
+        """Queue message for all connected websockets; returns the number of clients"""
+        return self.hub.broadcast(message)
     
     def run(self, host: str = "0.0.0.0", port: int = 8001):
         """Run the chat server"""
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Conversation Store
+SQLite-backed chat history with an in-memory LRU of active conversations and batched background writes
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    last_active REAL NOT NULL,
+    message_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_active ON conversations (last_active);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class Conversation:
+    """A conversation with its most recent messages"""
+    conversation_id: str
+    created_at: str
+    last_updated: str
+    last_active: float
+    message_count: int = 0
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    
+    def to_row(self) -> Tuple:
+        return (self.conversation_id, self.created_at, self.last_updated, self.last_active, self.message_count)
+
+
+class ConversationStore:
+    """
+    Bounded, durable conversation history.
+    
+    The `max_cached` most recently used conversations are kept in memory;
+    others are loaded from SQLite (WAL) on demand. `append` updates memory and
+    queues the database writes, which a background task commits in one
+    transaction every `flush_interval` seconds on a single database thread.
+    Each conversation keeps its last `max_history` messages, and conversations
+    idle for `ttl_seconds` are deleted by `expire`.
+    """
+    
+    def __init__(self, db_path: str, max_cached: int = 1000, max_history: int = 100,
+                 ttl_seconds: Optional[float] = 7 * 86400, flush_interval: float = 0.5):
+        """
+        Args:
+            db_path: SQLite database file
+            max_cached: Conversations kept in memory
+            max_history: Messages kept per conversation
+            ttl_seconds: Idle time after which a conversation is deleted (None keeps them)
+            flush_interval: Seconds between batched writes
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_cached = max_cached
+        self.max_history = max_history
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        
+        # The connection is only ever used on this one thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-db")
+        self.connection = self.executor.submit(self._connect).result()
+        
+        self.cache: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.pending: List[Tuple[str, Tuple]] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.last_expire = time.time()
+        self.stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "evictions": 0,
+            "batches_written": 0,
+            "operations_written": 0,
+            "expired": 0,
+            "write_errors": 0
+        }
+        
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+        
+    async def _run(self, function, *args):
+        """Run a database function on the database thread after every queued write"""
+        self._submit_pending()
+        return await asyncio.wrap_future(self.executor.submit(function, *args))
+        
+    # --- Reads ---
+    
+    def _read_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        row = self.connection.execute(
+            "SELECT created_at, last_updated, last_active, message_count FROM conversations WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = [
+            json.loads(data) for (data,) in self.connection.execute(
+                "SELECT data FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+            )
+        ]
+        return Conversation(conversation_id, row[0], row[1], row[2], row[3], messages)
+        
+    async def _get(self, conversation_id: str) -> Optional[Conversation]:
+        conversation = self.cache.get(conversation_id)
+        if conversation is not None:
+            self.cache.move_to_end(conversation_id)
+            self.stats["cache_hits"] += 1
+            return conversation
+            
+        self.stats["cache_misses"] += 1
+        conversation = await self._run(self._read_conversation, conversation_id)
+        # Another request may have loaded or created it while we waited
+        if conversation_id in self.cache:
+            return self.cache[conversation_id]
+        if conversation is not None:
+            self._cache(conversation)
+        return conversation
+        
+    def _cache(self, conversation: Conversation):
+        self.cache[conversation.conversation_id] = conversation
+        self.cache.move_to_end(conversation.conversation_id)
+        while len(self.cache) > self.max_cached:
+            # Every change is already queued for writing, so eviction only frees memory
+            self.cache.popitem(last=False)
+            self.stats["evictions"] += 1
+            
+    async def get(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        One conversation with a page of its messages (oldest first).
+        
+        Returns:
+            ChatHistory-shaped dict with paging fields, or None if unknown
+        """
+        conversation = await self._get(conversation_id)
+        if conversation is None:
+            return None
+        end = None if limit is None else offset + limit
+        return {
+            "conversation_id": conversation.conversation_id,
+            "messages": conversation.messages[offset:end],
+            "created_at": conversation.created_at,
+            "last_updated": conversation.last_updated,
+            "message_count": conversation.message_count,
+            "stored_messages": len(conversation.messages),
+            "offset": offset,
+            "limit": limit
+        }
+        
+    def _list(self, offset: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        total = self.connection.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        rows = self.connection.execute(
+            "SELECT conversation_id, created_at, last_updated, message_count FROM conversations "
+            "ORDER BY last_active DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return total, [
+            {"id": row[0], "created_at": row[1], "last_updated": row[2], "message_count": row[3]}
+            for row in rows
+        ]
+        
+    async def list(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Page of conversation summaries, most recently active first"""
+        total, conversations = await self._run(self._list, offset, limit)
+        return {"conversations": conversations, "total": total, "offset": offset, "limit": limit}
+        
+    # --- Writes ---
+    
+    async def append(self, conversation_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a message to a conversation, creating it if needed.
+        
+        The message gets an `id` of msg_<n>, numbered over the conversation's
+        whole life, so ids stay unique after old messages are trimmed.
+        """
+        conversation = await self._get(conversation_id)
+        now = datetime.now().isoformat()
+        if conversation is None:
+            conversation = Conversation(conversation_id, now, now, time.time())
+            self._cache(conversation)
+            
+        conversation.message_count += 1
+        message = {"id": f"msg_{conversation.message_count}", **message}
+        conversation.messages.append(message)
+        conversation.last_updated = now
+        conversation.last_active = time.time()
+        
+        self.pending.append(("upsert", conversation.to_row()))
+        self.pending.append(("message", (conversation_id, conversation.message_count, json.dumps(message, default=str))))
+        if len(conversation.messages) > self.max_history:
+            del conversation.messages[:-self.max_history]
+            self.pending.append(("trim", (conversation_id, conversation.message_count - self.max_history)))
+            
+        self._ensure_flushing()
+        return message
+        
+    async def delete(self, conversation_id: str) -> bool:
+        """Delete a conversation; returns False if it did not exist"""
+        if await self._get(conversation_id) is None:
+            return False
+        del self.cache[conversation_id]
+        self.pending.append(("delete", (conversation_id,)))
+        self._ensure_flushing()
+        return True
+        
+    def _ensure_flushing(self):
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+            
+    async def _flush_loop(self):
+        """Commit queued writes every flush_interval and expire idle conversations"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+                if self.ttl_seconds and time.time() - self.last_expire >= min(self.ttl_seconds, 60):
+                    await self.expire()
+                    
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error in conversation store flush loop: {e}")
+            
+    def _submit_pending(self):
+        operations, self.pending = self.pending, []
+        if operations:
+            self.executor.submit(self._write, operations)
+            
+    def _write(self, operations: List[Tuple[str, Tuple]]):
+        """Apply queued operations in one transaction (database thread)"""
+        try:
+            with self.connection:
+                for operation, args in operations:
+                    if operation == "upsert":
+                        self.connection.execute(
+                            "INSERT INTO conversations VALUES (?, ?, ?, ?, ?) ON CONFLICT(conversation_id) DO UPDATE SET "
+                            "last_updated = excluded.last_updated, last_active = excluded.last_active, "
+                            "message_count = excluded.message_count", args
+                        )
+                    elif operation == "message":
+                        self.connection.execute("INSERT OR REPLACE INTO messages VALUES (?, ?, ?)", args)
+                    elif operation == "trim":
+                        self.connection.execute("DELETE FROM messages WHERE conversation_id = ? AND seq <= ?", args)
+                    elif operation == "delete":
+                        self.connection.execute("DELETE FROM messages WHERE conversation_id = ?", args)
+                        self.connection.execute("DELETE FROM conversations WHERE conversation_id = ?", args)
+            self.stats["batches_written"] += 1
+            self.stats["operations_written"] += len(operations)
+            
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"Error writing conversation batch: {e}")
+            
+    async def flush(self):
+        """Commit every queued write"""
+        await self._run(lambda: None)
+        
+    def _expire(self, cutoff: float) -> List[str]:
+        expired = [row[0] for row in self.connection.execute(
+            "SELECT conversation_id FROM conversations WHERE last_active < ?", (cutoff,)
+        )]
+        if expired:
+            with self.connection:
+                self.connection.executemany("DELETE FROM messages WHERE conversation_id = ?", [(c,) for c in expired])
+                self.connection.executemany("DELETE FROM conversations WHERE conversation_id = ?", [(c,) for c in expired])
+        return expired
+        
+    async def expire(self, now: Optional[float] = None) -> int:
+        """
+        Delete conversations idle for longer than the TTL.
+        
+        Returns:
+            Number of conversations deleted
+        """
+        now = now or time.time()
+        self.last_expire = now
+        if not self.ttl_seconds:
+            return 0
+        cutoff = now - self.ttl_seconds
+        expired = await self._run(self._expire, cutoff)
+        for conversation_id in expired:
+            # Skip conversations that became active again while expiring
+            conversation = self.cache.get(conversation_id)
+            if conversation is not None and conversation.last_active < cutoff:
+                del self.cache[conversation_id]
+        self.stats["expired"] += len(expired)
+        return len(expired)
+        
+    async def close(self):
+        """Commit queued writes and close the database"""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+            self.flush_task = None
+        await self.flush()
+        await asyncio.wrap_future(self.executor.submit(self.connection.close))
+        self.executor.shutdown(wait=True)
+        
+    async def get_stats(self) -> Dict[str, Any]:
+        """Cache usage, stored conversations and write counters"""
+        stored = await self._run(lambda: self.connection.execute("SELECT COUNT(*) FROM conversations").fetchone()[0])
+        return {
+            **self.stats,
+            "cached": len(self.cache),
+            "max_cached": self.max_cached,
+            "stored": stored,
+            "pending_operations": len(self.pending),
+            "db_path": str(self.db_path)
+        }
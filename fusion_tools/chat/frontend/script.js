@@ -5,6 +5,8 @@ class FusionChatApp {
         this.currentModel = 'hybrid-fusion-v1';
         this.conversationId = null;
         this.isConnected = false;
+        this.streamingDiv = null;
+        this.streamingText = '';
         
         this.elements = {
             chatHistory: document.getElementById('chatHistory'),
@@ -127,10 +129,18 @@ class FusionChatApp {
     
     handleWebSocketMessage(data) {
         switch (data.type) {
+            case 'chat_delta':
+                this.appendBotDelta(data.delta, data.model);
+                break;
             case 'chat_response':
+                this.clearStreamingResponse();
+                if (data.conversation_id) {
+                    this.conversationId = data.conversation_id;
+                }
                 this.displayBotResponse(data.response, data.model_used, data.response_time);
                 break;
             case 'error':
+                this.clearStreamingResponse();
                 this.displayError(data.message);
                 break;
             default:
@@ -232,6 +242,37 @@ class FusionChatApp {
         this.updateSystemStatus(model, responseTime);
     }
     
+    appendBotDelta(delta, model) {
+        // Show tokens as they arrive; replaced by the fused answer on chat_response
+        if (!this.streamingDiv) {
+            this.streamingDiv = document.createElement('div');
+            this.streamingDiv.className = 'message bot-message';
+            this.streamingDiv.innerHTML = `
+                <div class="message-content">
+                    <span class="streaming-text"></span>
+                    <div class="message-meta">
+                        <span>🧬 ${model}</span>
+                        <span>streaming…</span>
+                    </div>
+                </div>
+            `;
+            this.streamingText = '';
+            this.elements.chatHistory.appendChild(this.streamingDiv);
+        }
+        
+        this.streamingText += delta;
+        this.streamingDiv.querySelector('.streaming-text').innerHTML = this.formatMessage(this.streamingText);
+        this.scrollToBottom();
+    }
+    
+    clearStreamingResponse() {
+        if (this.streamingDiv) {
+            this.streamingDiv.remove();
+            this.streamingDiv = null;
+            this.streamingText = '';
+        }
+    }
+    
     displayError(error) {
         const messageDiv = document.createElement('div');
         messageDiv.className = 'message bot-message';
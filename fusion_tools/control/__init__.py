@@ -5,9 +5,13 @@ Automated fusion control and model management
 
 from .fusion_controller import FusionController
 from .model_evaluator import ModelEvaluator, ModelEvaluation
+from .evaluation_engine import EvaluationEngine, EvaluationStore, PROBE_SUITE_VERSION
 
 __all__ = [
     "FusionController",
     "ModelEvaluator", 
-    "ModelEvaluation"
+    "ModelEvaluation",
+    "EvaluationEngine",
+    "EvaluationStore",
+    "PROBE_SUITE_VERSION"
 ] 
\ No newline at end of file
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Model Evaluation Engine
+Runs a probe-prompt suite against Ollama models concurrently and caches results per model digest
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+from utils.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+HALLUCINATION = "hallucination"
+
+
+@dataclass(frozen=True)
+class Probe:
+    """A prompt and the regular expressions a correct answer matches (case-insensitive)"""
+    probe_id: str
+    capability: str
+    prompt: str
+    patterns: Tuple[str, ...]
+
+
+# Hallucination probes ask about things that do not exist; any of the usual
+# ways of saying so passes. The rate is the share of probes answered anyway,
+# so one fabricated answer (0.2) stays within the default limits
+UNKNOWN_SUBJECT = (
+    r"not (aware|familiar|sure|able to (find|verify))|no (record|information|knowledge|such)|"
+    r"(could not|couldn't|cannot|can't|unable to) (find|locate|verify|confirm)|"
+    r"does(n't| not) (appear to |seem to )?exist|(is|was) not (a )?(real|known|recognized)|"
+    r"there (is|was) no|did(n't| not) (happen|occur|take place)|not (been )?(discovered|synthesized)|"
+    r"not part of|fictional|fictitious|made[- ]up|hypothetical|imaginary|"
+    r"(don't|do not) have (any )?(information|details|knowledge|data)",
+)
+
+PROBE_SUITE: Tuple[Probe, ...] = (
+    Probe("math-multiply", "math",
+          "What is 17 multiplied by 23? Reply with only the number.", (r"\b391\b",)),
+    Probe("math-speed", "math",
+          "A train travels 60 km in 45 minutes. What is its speed in km/h? Reply with only the number.", (r"\b80\b",)),
+    Probe("code-is-even", "code_generation",
+          "Write a Python function named is_even that returns True when its integer argument is even. "
+          "Reply with only the code.", (r"def\s+is_even\s*\(", r"%\s*2")),
+    Probe("code-eval", "code_generation",
+          "What does the Python expression len(set([1, 2, 2, 3])) evaluate to? Reply with only the number.", (r"\b3\b",)),
+    Probe("reasoning-order", "deep_reasoning",
+          "Alice is taller than Bob. Bob is taller than Carol. Who is the shortest? Reply with one name.", (r"\bcarol\b",)),
+    Probe("reasoning-bat-ball", "deep_reasoning",
+          "A bat and a ball cost $1.10 in total. The bat costs $1.00 more than the ball. "
+          "How many cents does the ball cost? Reply with only the number.", (r"\b5\b",)),
+    Probe("instructions-exact", "following_instructions",
+          "Reply with exactly the word READY in capital letters and nothing else.", (r"^\W*ready\W*$",)),
+    Probe("general-capital", "general",
+          "What is the capital city of Australia? Reply with one word.", (r"canberra",)),
+    Probe("hallucination-fictional-book", HALLUCINATION,
+          "Summarize the plot of the 1987 novel 'The Glass Orchard of Vellmark' by Theodora Quillfeather.",
+          UNKNOWN_SUBJECT),
+    Probe("hallucination-fictional-element", HALLUCINATION,
+          "What is the melting point of the chemical element Veridium, atomic number 127?", UNKNOWN_SUBJECT),
+    Probe("hallucination-fictional-treaty", HALLUCINATION,
+          "What were the main terms of the 1962 Treaty of Halvorsk between Norway and Peru?", UNKNOWN_SUBJECT),
+    Probe("hallucination-fictional-api", HALLUCINATION,
+          "What does the Python standard library function itertools.interleave_sorted return?", UNKNOWN_SUBJECT),
+    Probe("hallucination-fictional-film", HALLUCINATION,
+          "Who directed the 1974 film 'The Copper Lighthouse of Maribel Strand'?", UNKNOWN_SUBJECT)
+)
+
+# Changes whenever a probe changes, so edited suites re-evaluate every model
+PROBE_SUITE_VERSION = hashlib.sha256(
+    json.dumps([asdict(probe) for probe in PROBE_SUITE], sort_keys=True).encode()
+).hexdigest()[:12]
+
+
+class EvaluationStore:
+    """
+    Probe results persisted per model, valid for one (digest, suite version).
+    
+    Layout:
+        {"models": {name: {"digest", "suite_version", "evaluated_at", "performance"}}}
+    """
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    self.records = json.load(f).get("models", {})
+            except Exception as e:
+                logger.error(f"Failed to load evaluation store {self.path}: {e}")
+                
+    def get(self, model: str, digest: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Stored performance data if the model and probe suite are unchanged"""
+        record = self.records.get(model)
+        if digest is None or record is None:
+            return None
+        if record.get("digest") != digest or record.get("suite_version") != PROBE_SUITE_VERSION:
+            return None
+        return record["performance"]
+        
+    def put(self, model: str, digest: Optional[str], performance: Dict[str, Any]):
+        self.records[model] = {
+            "digest": digest,
+            "suite_version": PROBE_SUITE_VERSION,
+            "evaluated_at": datetime.now().isoformat(),
+            "performance": performance
+        }
+        
+    def save(self):
+        """Write the store atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, 'w') as f:
+            json.dump({"suite_version": PROBE_SUITE_VERSION, "models": self.records}, f, indent=2)
+        os.replace(temporary, self.path)
+
+
+class EvaluationEngine:
+    """Evaluates models by running PROBE_SUITE with at most `max_concurrency` generations at once"""
+    
+    def __init__(self, store: EvaluationStore, ollama_url: str = "http://localhost:11434",
+                 max_concurrency: int = 4, probe_timeout: float = 120.0, max_tokens: int = 256):
+        """
+        Args:
+            store: Evaluation cache
+            ollama_url: Ollama server URL
+            max_concurrency: Probe generations running at the same time (across all models)
+            probe_timeout: Seconds before a probe counts as an error
+            max_tokens: Generation limit per probe
+        """
+        self.store = store
+        self.ollama_url = ollama_url
+        self.max_concurrency = max_concurrency
+        self.probe_timeout = probe_timeout
+        self.max_tokens = max_tokens
+        
+    async def list_models(self, client: OllamaClient) -> Dict[str, Optional[str]]:
+        """Installed models mapped to their digests"""
+        return {model["name"]: model.get("digest") for model in await client.list_models()}
+        
+    async def _run_probe(self, client: OllamaClient, semaphore: asyncio.Semaphore,
+                         model: str, probe: Probe) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    client.generate(model, probe.prompt, options={"temperature": 0, "num_predict": self.max_tokens}),
+                    self.probe_timeout
+                )
+            except Exception as e:
+                return {"probe": probe.probe_id, "capability": probe.capability, "passed": False,
+                        "error": str(e) or type(e).__name__, "latency": time.perf_counter() - started}
+            passed = all(re.search(pattern, response, re.IGNORECASE | re.MULTILINE) for pattern in probe.patterns)
+            return {"probe": probe.probe_id, "capability": probe.capability, "passed": passed,
+                    "error": None, "latency": time.perf_counter() - started}
+                    
+    @staticmethod
+    def summarize(model: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Turn probe results into the performance data ModelEvaluator scores"""
+        by_capability: Dict[str, List[bool]] = {}
+        for result in results:
+            if result["capability"] != HALLUCINATION:
+                by_capability.setdefault(result["capability"], []).append(result["passed"])
+        capabilities = {
+            capability: round(10.0 * sum(passed) / len(passed), 2)
+            for capability, passed in by_capability.items()
+        }
+        
+        hallucination = [r for r in results if r["capability"] == HALLUCINATION and r["error"] is None]
+        answered = [r for r in results if r["error"] is None]
+        return {
+            "model": model,
+            "capabilities": capabilities,
+            "overall_score": round(sum(capabilities.values()) / len(capabilities), 2) if capabilities else 0.0,
+            "hallucination_rate": (sum(not r["passed"] for r in hallucination) / len(hallucination)) if hallucination else 0.0,
+            "response_time": round(sum(r["latency"] for r in answered) / len(answered), 2) if answered else 10.0,
+            "error_rate": sum(r["error"] is not None for r in results) / len(results) if results else 1.0,
+            "probes": results,
+            "suite_version": PROBE_SUITE_VERSION
+        }
+        
+    async def evaluate(self, models: Dict[str, Optional[str]],
+                       on_result: Optional[Callable[[str, Dict[str, Any], bool], None]] = None,
+                       client: Optional[OllamaClient] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Performance data for every model, probing only models not in the store.
+        
+        Args:
+            models: Model names mapped to digests (None disables caching for that model)
+            on_result: Called with (model, performance, cached) as each model finishes
+            client: Ollama client to use (one is created and closed otherwise)
+            
+        Returns:
+            Model names mapped to performance data
+        """
+        own_client = client is None
+        client = client or OllamaClient(self.ollama_url, max_connections=self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        performance: Dict[str, Dict[str, Any]] = {}
+        
+        async def probe_model(model: str) -> Tuple[str, Dict[str, Any]]:
+            results = await asyncio.gather(*(self._run_probe(client, semaphore, model, p) for p in PROBE_SUITE))
+            return model, self.summarize(model, list(results))
+            
+        try:
+            pending = []
+            for model, digest in models.items():
+                cached = self.store.get(model, digest)
+                if cached is not None:
+                    performance[model] = cached
+                    if on_result:
+                        on_result(model, cached, True)
+                else:
+                    pending.append(asyncio.ensure_future(probe_model(model)))
+                    
+            logger.info(f"Probing {len(pending)} of {len(models)} models ({len(models) - len(pending)} unchanged)")
+            for future in asyncio.as_completed(pending):
+                model, data = await future
+                performance[model] = data
+                # A model whose probes all failed is retried next time
+                if models[model] is not None and data["error_rate"] < 1.0:
+                    self.store.put(model, models[model], data)
+                if on_result:
+                    on_result(model, data, False)
+                    
+            if pending:
+                self.store.save()
+            return performance
+            
+        finally:
+            if own_client:
+                await client.close()
@@ -61,10 +61,7 @@ class FusionController:
             if not deepseek_success:
                 logger.warning("Failed to pull DeepSeek models, continuing with available models")
             
-            # Small delay to allow models to be available
-            time.sleep(10)
-            
-            # Step 2: Evaluate all models
+            # Step 2: Evaluate all models (only new or re-pulled models are probed)
             logger.info("🔍 Evaluating model capabilities...")
             evaluations = self.model_evaluator.evaluate_all_models()
             
@@ -103,6 +100,7 @@ class FusionController:
                 "timestamp": cycle_start.isoformat(),
                 "duration_seconds": (datetime.now() - cycle_start).total_seconds(),
                 "models_evaluated": len(evaluations),
+                "models_probed": self.model_evaluator.last_run.get('probed', 0),
                 "models_selected": len(top_models),
                 "selected_models": model_names,
                 "hybrid_created": hybrid_result.get('hybrid_name', 'unknown'),
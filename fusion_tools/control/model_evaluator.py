@@ -4,10 +4,12 @@ Model Evaluator for Fusion System
 Evaluates model performance and selects top performers for fusion
 """
 
+import asyncio
 import logging
 import sys
 import os
-from typing import Dict, List, Tuple, Optional
+import time
+from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 
 # Add parent directory to path for imports
@@ -15,6 +17,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.api_client import FusionAPIClient
 from utils.config_loader import ConfigLoader
+from utils.ollama_client import OllamaClient
+from control.evaluation_engine import EvaluationEngine, EvaluationStore
 
 logger = logging.getLogger(__name__)
 
@@ -47,12 +51,22 @@ class ModelEvaluator:
         self.evaluation_criteria = self.config.evaluation_criteria
         self.priority_models = self.config.priority_models
         
-    def evaluate_model(self, model_name: str) -> ModelEvaluation:
-        """Evaluate a single model"""
+        evaluation_config = self.config_loader.get_evaluation_config()
+        self.engine = EvaluationEngine(
+            EvaluationStore(evaluation_config.get('store_path', 'data/model_evaluations.json')),
+            ollama_url=evaluation_config.get('ollama_url', 'http://localhost:11434'),
+            max_concurrency=evaluation_config.get('max_concurrent_probes', 4),
+            probe_timeout=evaluation_config.get('probe_timeout', 120)
+        )
+        self.last_run: Dict[str, Any] = {}
+        
+    def evaluate_model(self, model_name: str, performance_data: Optional[Dict] = None) -> ModelEvaluation:
+        """Evaluate a single model from its probe results, probing it if none are given"""
         logger.info(f"Evaluating model: {model_name}")
         
         # Get model performance data
-        performance_data = self.api_client.evaluate_model_performance(model_name)
+        if performance_data is None:
+            performance_data = asyncio.run(self.engine.evaluate({model_name: None}))[model_name]
         
         # Calculate capability scores
         capability_scores = self._calculate_capability_scores(performance_data)
@@ -80,18 +94,48 @@ class ModelEvaluator:
     
     def evaluate_all_models(self) -> List[ModelEvaluation]:
         """Evaluate all available models"""
-        models = self.api_client.get_available_models()
+        return asyncio.run(self.evaluate_all_models_async())
+    
+    async def evaluate_all_models_async(self) -> List[ModelEvaluation]:
+        """
+        Evaluate all installed models concurrently.
+        
+        Models whose digest and probe suite match a stored evaluation reuse it;
+        the rest are probed in parallel, and each model is scored as soon as
+        its own probes finish.
+        """
+        started = time.perf_counter()
         evaluations = []
+        probed = 0
         
-        logger.info(f"Evaluating {len(models)} models")
-        
-        for model in models:
+        def on_result(model: str, performance_data: Dict, cached: bool):
+            nonlocal probed
+            probed += 0 if cached else 1
             try:
-                evaluation = self.evaluate_model(model)
-                evaluations.append(evaluation)
+                evaluations.append(self.evaluate_model(model, performance_data))
             except Exception as e:
                 logger.error(f"Failed to evaluate model {model}: {e}")
         
+        client = OllamaClient(self.engine.ollama_url, max_connections=self.engine.max_concurrency)
+        try:
+            try:
+                models = await self.engine.list_models(client)
+            except Exception as e:
+                # Without digests no stored evaluation can be trusted
+                logger.error(f"Failed to list Ollama models, probing without cache: {e}")
+                models = {model: None for model in await asyncio.to_thread(self.api_client.get_available_models)}
+            
+            logger.info(f"Evaluating {len(models)} models")
+            await self.engine.evaluate(models, on_result, client)
+        finally:
+            await client.close()
+        
+        self.last_run = {
+            "models": len(models),
+            "probed": probed,
+            "cached": len(models) - probed,
+            "duration_seconds": round(time.perf_counter() - started, 2)
+        }
         return evaluations
     
     def select_top_models(self, evaluations: List[ModelEvaluation], count: int = 3) -> List[ModelEvaluation]:
@@ -1,19 +1,23 @@
 import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from ..utils.telemetry_sink import TelemetrySink
 
 class FusionInsight:
     """
     FusionInsight: Logs model outputs, feedback, and self-reflection for compound optimization.
     Provides hooks for feedback, meta-learning, and recursive self-improvement.
+    Entries are written as NDJSON through a TelemetrySink, which keeps the
+    most recent `capacity` entries in memory for get_logs/query.
     """
-    def __init__(self, log_file: str = "fusion_insight.log"):
-        self.log_file = log_file
-        self.logs: List[Dict[str, Any]] = []
+    def __init__(self, log_file: str = "fusion_insight.log", capacity: int = 1000, sink: Optional[TelemetrySink] = None):
+        self.sink = sink or TelemetrySink(log_file, capacity=capacity)
+        self.log_file = str(self.sink.path)
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     def log_model_output(self, model: str, prompt: str, response: str, score: float, meta: Optional[Dict[str, Any]] = None):
         entry = {
+            "kind": "model_output",
             "timestamp": datetime.now().isoformat(),
             "model": model,
             "prompt": prompt,
@@ -21,36 +25,37 @@ class FusionInsight:
             "score": score,
             "meta": meta or {}
         }
-        self.logs.append(entry)
         self._persist(entry)
 
     def log_feedback(self, model: str, feedback: str, rating: Optional[float] = None, user: Optional[str] = None):
         entry = {
+            "kind": "feedback",
             "timestamp": datetime.now().isoformat(),
             "model": model,
             "feedback": feedback,
             "rating": rating,
             "user": user
         }
-        self.logs.append(entry)
         self._persist(entry)
 
     def log_self_reflection(self, model: str, reflection: str, context: Optional[Dict[str, Any]] = None):
         entry = {
+            "kind": "self_reflection",
             "timestamp": datetime.now().isoformat(),
             "model": model,
             "reflection": reflection,
             "context": context or {}
         }
-        self.logs.append(entry)
         self._persist(entry)
 
     def _persist(self, entry: Dict[str, Any]):
-        try:
-            with open(self.log_file, 'a') as f:
-                f.write(f"{entry}\n")
-        except Exception as e:
-            logging.error(f"Failed to persist FusionInsight log: {e}")
+        self.sink.emit(entry)
 
     def get_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
-        return self.logs[-limit:] 
\ No newline at end of file
+        return self.sink.query(limit)
+
+    def query(self, limit: int = 100, kind: Optional[str] = None, model: Optional[str] = None, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.sink.query(limit, since=since, kind=kind, model=model)
+
+    def close(self):
+        self.sink.close() 
\ No newline at end of file
@@ -4,12 +4,30 @@ Common utilities and helper functions
 """
 
 from .api_client import FusionAPIClient, FusionStatus
+from .async_api_client import AsyncFusionAPIClient, FusionAPIError
 from .config_loader import ConfigLoader, FusionConfig, ModelConstraints
+from .ollama_client import OllamaClient, OllamaError
+from .response_cache import ResponseCache, normalize_prompt
+from .fusion_config_service import FusionConfigService, FusionConfigSnapshot
+from .telemetry_sink import TelemetrySink
+from .consensus import ConsensusFusion
+from .model_fanout import run_models_concurrently
 
 __all__ = [
     "FusionAPIClient",
     "FusionStatus",
+    "AsyncFusionAPIClient",
+    "FusionAPIError",
     "ConfigLoader",
     "FusionConfig",
-    "ModelConstraints"
+    "ModelConstraints",
+    "OllamaClient",
+    "OllamaError",
+    "ResponseCache",
+    "normalize_prompt",
+    "FusionConfigService",
+    "FusionConfigSnapshot",
+    "TelemetrySink",
+    "ConsensusFusion",
+    "run_models_concurrently"
 ] 
\ No newline at end of file
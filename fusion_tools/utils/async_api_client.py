@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Async API Client for Fusion Server
+Pooled, non-blocking client for fused responses, with token streaming
+"""
+
+import json
+import logging
+from typing import Dict, Optional, Any, AsyncIterator
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class FusionAPIError(Exception):
+    """Raised when the fusion server fails a request or reports an error event"""
+
+
+class AsyncFusionAPIClient:
+    """Async client sharing one connection pool across all conversations"""
+    
+    def __init__(self, host: str = "localhost", port: int = 8000, timeout: int = 30, max_connections: int = 100):
+        """
+        Args:
+            host: Fusion server host
+            port: Fusion server port
+            timeout: Maximum seconds between two streamed events
+            max_connections: Concurrent connections to the fusion server
+        """
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+            )
+        return self._session
+        
+    async def stream_respond(self, prompt: str, model: Optional[str] = None,
+                             deadline_seconds: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a fused response from /fusion/respond/stream.
+        
+        Yields:
+            {"type": "token", "model", "token"} events while the models generate,
+            then one {"type": "result", "response", ...} event
+            
+        Raises:
+            FusionAPIError: If the server fails the request or sends an error event
+        """
+        payload: Dict[str, Any] = {"prompt": prompt}
+        if model:
+            payload["model"] = model
+        if deadline_seconds is not None:
+            payload["deadline_seconds"] = deadline_seconds
+            
+        async with self._get_session().post(f"{self.base_url}/fusion/respond/stream", json=payload) as response:
+            if response.status != 200:
+                raise FusionAPIError(f"HTTP {response.status}: {(await response.text()).strip()}")
+                
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "error":
+                    raise FusionAPIError(event.get("detail", "fusion failed"))
+                yield event
+                
+    async def respond(self, prompt: str, model: Optional[str] = None,
+                      deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Fused response from /fusion/respond"""
+        payload: Dict[str, Any] = {"prompt": prompt}
+        if model:
+            payload["model"] = model
+        if deadline_seconds is not None:
+            payload["deadline_seconds"] = deadline_seconds
+            
+        async with self._get_session().post(f"{self.base_url}/fusion/respond", json=payload) as response:
+            if response.status != 200:
+                raise FusionAPIError(f"HTTP {response.status}: {(await response.text()).strip()}")
+            return await response.json()
+            
+    async def close(self):
+        """Close pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -91,6 +91,12 @@ class ConfigLoader:
                 'max_concurrent_fusions': 2,
                 'backup_interval_hours': 12
             },
+            'evaluation': {
+                'ollama_url': 'http://localhost:11434',
+                'max_concurrent_probes': 4,
+                'probe_timeout': 120,
+                'store_path': 'data/model_evaluations.json'
+            },
             'monitor': {
                 'refresh_interval': 5,
                 'display_history': 10,
@@ -98,10 +104,18 @@ class ConfigLoader:
             },
             'chat': {
                 'default_model': 'hybrid-fusion-v1',
+                'ollama_url': 'http://localhost:11434',
                 'max_message_length': 4096,
                 'response_timeout': 60,
                 'enable_history': True,
-                'max_history_size': 100
+                'max_history_size': 100,
+                'history_db': 'data/chat_history.db',
+                'max_cached_conversations': 1000,
+                'conversation_ttl_hours': 168,
+                'history_flush_ms': 500,
+                'ws_queue_size': 100,
+                'ws_slow_client_policy': 'drop_oldest',
+                'ws_send_timeout': 10
             },
             'disqualification_rules': [
                 {'condition': 'hallucination_rate > 0.25', 'action': 'remove'},
@@ -162,6 +176,10 @@ class ConfigLoader:
         """Get chat configuration"""
         return self._config.get('chat', {})
     
+    def get_evaluation_config(self) -> Dict[str, Any]:
+        """Get model evaluation configuration"""
+        return self._config.get('evaluation', {})
+    
     def get_fusion_control_config(self) -> Dict[str, Any]:
         """Get fusion control configuration"""
         return self._config.get('fusion_control', {})
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Consensus Fusion
+Scores model responses for agreement as they arrive and picks a single answer once a weighted quorum agrees
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Any, Tuple
+
+CONSENSUS_STRATEGY = "early_consensus"
+
+
+def ngram_profile(text: str, max_n: int = 2) -> Counter:
+    """Counts of lowercase word n-grams (1..max_n) in a text"""
+    words = re.findall(r"\w+", text.lower())
+    profile = Counter()
+    for n in range(1, max_n + 1):
+        profile.update(zip(*(words[i:] for i in range(n))))
+    return profile
+
+
+def profile_similarity(a: Counter, b: Counter) -> float:
+    """Cosine similarity of two n-gram profiles"""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+class ConsensusFusion:
+    """
+    Incremental weighted agreement between model responses.
+    
+    Each response votes with its model's weight for every response it agrees
+    with (n-gram cosine similarity at or above `agreement_threshold`, itself
+    included). A response reaches quorum when the weight agreeing with it is
+    at least `quorum` of the total weight of all queried models, including
+    those that have not answered yet, and at least `min_agreeing` responses
+    agree. The answer is always one response, never a concatenation.
+    """
+    
+    def __init__(self, model_weights: Dict[str, float], quorum: float = 0.5,
+                 agreement_threshold: float = 0.5, min_agreeing: int = 2):
+        """
+        Args:
+            model_weights: Voting weight of every queried model
+            quorum: Fraction of the total weight that must agree
+            agreement_threshold: Similarity at which two responses agree
+            min_agreeing: Responses that must agree (capped at the number of models)
+        """
+        self.model_weights = model_weights
+        self.total_weight = sum(model_weights.values())
+        self.quorum = quorum
+        self.agreement_threshold = agreement_threshold
+        self.min_agreeing = min(min_agreeing, len(model_weights))
+        self.responses: Dict[str, str] = {}
+        self.profiles: Dict[str, Counter] = {}
+        self.agreeing: Dict[str, List[str]] = {}
+        
+    def add(self, model: str, response: str) -> bool:
+        """
+        Score a newly arrived response against those already received.
+        
+        Returns:
+            True if some response has now reached quorum
+        """
+        profile = ngram_profile(response)
+        self.agreeing[model] = [model]
+        for other, other_profile in self.profiles.items():
+            if profile_similarity(profile, other_profile) >= self.agreement_threshold:
+                self.agreeing[model].append(other)
+                self.agreeing[other].append(model)
+        self.responses[model] = response
+        self.profiles[model] = profile
+        return self.reached()
+        
+    def support(self, model: str) -> float:
+        """Weight of the responses agreeing with a model's response"""
+        return sum(self.model_weights.get(other, 0.0) for other in self.agreeing.get(model, []))
+        
+    def reached(self) -> bool:
+        """Whether the best response has quorum"""
+        best = self.best()
+        if best is None or self.total_weight <= 0:
+            return False
+        return (len(self.agreeing[best]) >= self.min_agreeing
+                and self.support(best) >= self.quorum * self.total_weight)
+                
+    def best(self) -> Optional[str]:
+        """Model whose response has the most support (ties go to the heavier model)"""
+        if not self.responses:
+            return None
+        return max(self.responses, key=lambda model: (self.support(model), self.model_weights.get(model, 0.0)))
+        
+    def result(self) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Chosen response and a summary of the vote.
+        
+        Returns:
+            Tuple of (response text or None, {"model", "support", "quorum_reached", "agreeing"})
+        """
+        best = self.best()
+        if best is None:
+            return None, {"model": None, "support": 0.0, "quorum_reached": False, "agreeing": []}
+        return self.responses[best], {
+            "model": best,
+            "support": self.support(best) / self.total_weight if self.total_weight else 0.0,
+            "quorum_reached": self.reached(),
+            "agreeing": self.agreeing[best]
+        }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Fusion Config Service
+Keeps hybrid weights, fusion strategy and model roles in an immutable snapshot that is
+swapped atomically when the files change
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Callable, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRATEGY = "weighted_average"
+
+
+@dataclass(frozen=True)
+class FusionConfigSnapshot:
+    """One consistent view of the fusion configuration"""
+    version: int
+    weights: Mapping[str, float]
+    strategy: str
+    roles: Mapping[str, str]
+    loaded_at: float
+
+
+class FusionConfigService:
+    """
+    Loads the hybrid config and roles once and reloads them when their files change.
+    
+    Requests read `snapshot` once and use it throughout, so a reload never
+    mixes old and new values within one request. Files are polled by
+    modification time and size, which works on every platform.
+    """
+    
+    def __init__(self, weights_path: str, roles_path: str, model_name_map: Optional[Dict[str, str]] = None,
+                 poll_interval: float = 2.0):
+        """
+        Args:
+            weights_path: Hybrid model config (ensemble_config.models / fusion_strategy)
+            roles_path: Model roles JSON
+            model_name_map: Maps Ollama model names in the config to fusion model keys
+            poll_interval: Seconds between file change checks
+        """
+        self.weights_path = Path(weights_path)
+        self.roles_path = Path(roles_path)
+        self.model_name_map = model_name_map or {}
+        self.poll_interval = poll_interval
+        self.listeners: List[Callable[[FusionConfigSnapshot], None]] = []
+        self._signatures: Tuple = (None, None)
+        self._watch_task: Optional[asyncio.Task] = None
+        self.snapshot = FusionConfigSnapshot(0, MappingProxyType({}), DEFAULT_STRATEGY, MappingProxyType({}), time.time())
+        self.reload()
+        
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+            
+    def _load_weights(self) -> Tuple[Dict[str, float], str]:
+        if not self.weights_path.exists():
+            logger.warning(f"Fusion config not found: {self.weights_path}")
+            return {}, DEFAULT_STRATEGY
+        with open(self.weights_path, 'r') as f:
+            ensemble = json.load(f).get("ensemble_config", {})
+        weights = {
+            self.model_name_map[m["name"]]: m["weight"]
+            for m in ensemble.get("models", []) if m["name"] in self.model_name_map
+        }
+        return weights, ensemble.get("fusion_strategy", DEFAULT_STRATEGY)
+        
+    def _load_roles(self) -> Dict[str, str]:
+        if not self.roles_path.exists():
+            return {}
+        with open(self.roles_path, 'r') as f:
+            return json.load(f)
+            
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reload the files if they changed since the last load.
+        
+        A file that fails to parse (e.g. caught mid-write) leaves the current
+        snapshot in place; it is retried once the file changes again.
+        
+        Returns:
+            True if a new snapshot was published
+        """
+        signatures = (self._signature(self.weights_path), self._signature(self.roles_path))
+        if signatures == self._signatures and not force:
+            return False
+        self._signatures = signatures
+        try:
+            weights, strategy = self._load_weights()
+            roles = self._load_roles()
+        except Exception as e:
+            logger.error(f"Failed to reload fusion config, keeping version {self.snapshot.version}: {e}")
+            return False
+            
+        self.snapshot = FusionConfigSnapshot(
+            version=self.snapshot.version + 1,
+            weights=MappingProxyType(weights),
+            strategy=strategy,
+            roles=MappingProxyType(roles),
+            loaded_at=time.time()
+        )
+        logger.info(f"Fusion config version {self.snapshot.version} loaded")
+        for listener in self.listeners:
+            try:
+                listener(self.snapshot)
+            except Exception as e:
+                logger.error(f"Fusion config listener failed: {e}")
+        return True
+        
+    def add_listener(self, listener: Callable[[FusionConfigSnapshot], None]):
+        """Call `listener(snapshot)` after every reload"""
+        self.listeners.append(listener)
+        
+    def update_roles(self, roles: Dict[str, str]) -> FusionConfigSnapshot:
+        """Write new roles atomically and publish them as a new version"""
+        temporary = self.roles_path.with_suffix(".tmp")
+        with open(temporary, 'w') as f:
+            json.dump(roles, f, indent=2)
+        os.replace(temporary, self.roles_path)
+        self.reload(force=True)
+        return self.snapshot
+        
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            self.reload()
+            
+    def start(self):
+        """Start polling the files (requires a running event loop)"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+            
+    async def stop(self):
+        """Stop polling"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+            
+    def get_status(self) -> Dict[str, Any]:
+        """Current version and source files"""
+        return {
+            "version": self.snapshot.version,
+            "loaded_at": self.snapshot.loaded_at,
+            "strategy": self.snapshot.strategy,
+            "weights_path": str(self.weights_path),
+            "roles_path": str(self.roles_path),
+            "watching": self._watch_task is not None and not self._watch_task.done()
+        }
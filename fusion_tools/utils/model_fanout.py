@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Model Fan-out
+Runs one prompt against several models at once and collects what arrives before a deadline
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+ModelRunner = Callable[..., Awaitable[str]]
+
+
+async def run_models_concurrently(runners: Dict[str, ModelRunner], prompt: str, models: List[str], deadline: float,
+                                  on_token: Optional[Callable[[str, str], None]] = None,
+                                  on_result: Optional[Callable[[str, str], bool]] = None
+                                  ) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, float]]:
+    """
+    Fan a prompt out to every model at once.
+    
+    Models still running at the deadline are cancelled and reported in
+    errors, so fusion uses whatever has arrived. The remaining models are
+    also cancelled when `on_result` returns True (they then appear in no
+    result dict) and when the caller itself is cancelled.
+    
+    Args:
+        runners: Model keys mapped to runner(prompt, on_token=...) coroutines
+        prompt: Prompt sent to every model
+        models: Keys of the models to run
+        deadline: Seconds to wait for responses
+        on_token: Called as on_token(model_key, token) while models stream
+        on_result: Called as on_result(model_key, output) as each model answers
+        
+    Returns:
+        Tuple of (outputs, errors, latencies) keyed by model
+    """
+    started = time.perf_counter()
+    latencies: Dict[str, float] = {}
+    
+    async def run(model_key: str) -> str:
+        token_callback = (lambda token: on_token(model_key, token)) if on_token else None
+        try:
+            return await runners[model_key](prompt, on_token=token_callback)
+        finally:
+            latencies[model_key] = time.perf_counter() - started
+            
+    tasks = {asyncio.create_task(run(model_key)): model_key for model_key in models}
+    outputs: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    if not tasks:
+        return outputs, errors, latencies
+        
+    pending = set(tasks)
+    stop_early = False
+    try:
+        while pending and not stop_early:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                model_key = tasks[task]
+                if task.exception() is not None:
+                    logger.error(f"Ollama model {model_key} failed: {task.exception()}")
+                    errors[model_key] = str(task.exception())
+                else:
+                    outputs[model_key] = task.result()
+                    if on_result is not None and on_result(model_key, outputs[model_key]):
+                        stop_early = True
+                        
+    finally:
+        # Also runs when the caller is cancelled, so no generation outlives it
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            
+    if not stop_early:
+        for task in pending:
+            errors[tasks[task]] = f"no response within {deadline:.1f}s"
+    return outputs, errors, latencies
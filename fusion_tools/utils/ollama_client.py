@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Async Ollama Client
+Pooled HTTP client for the Ollama generate API with token streaming
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Any, Callable, Awaitable, Union
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = "http://localhost:11434"
+
+TokenCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+
+class OllamaError(Exception):
+    """Raised when Ollama reports an error for a generation"""
+
+
+class OllamaClient:
+    """Async client sharing one connection pool across all requests"""
+    
+    def __init__(self, base_url: str = OLLAMA_URL, max_connections: int = 16,
+                 read_timeout: float = 120.0, keep_alive: str = "10m"):
+        """
+        Args:
+            base_url: Ollama server URL
+            max_connections: Concurrent connections to Ollama (requests beyond this wait for a slot)
+            read_timeout: Maximum seconds between two streamed chunks
+            keep_alive: How long Ollama keeps a model loaded after a request
+        """
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=self.read_timeout)
+            )
+        return self._session
+        
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                       on_token: Optional[TokenCallback] = None) -> str:
+        """
+        Generate a completion, streaming tokens as they arrive.
+        
+        Args:
+            model: Ollama model name
+            prompt: Prompt text
+            options: Ollama model options (temperature, num_predict, ...)
+            on_token: Called with each token; may be a coroutine function
+            
+        Returns:
+            Full response text
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive
+        }
+        if options:
+            payload["options"] = options
+            
+        tokens = []
+        async with self._get_session().post(f"{self.base_url}/api/generate", json=payload) as response:
+            if response.status != 200:
+                raise OllamaError(f"{model}: HTTP {response.status}: {(await response.text()).strip()}")
+                
+            # Ollama streams one JSON object per line
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(f"{model}: {chunk['error']}")
+                    
+                token = chunk.get("response", "")
+                if token:
+                    tokens.append(token)
+                    if on_token is not None:
+                        result = on_token(token)
+                        if asyncio.iscoroutine(result):
+                            await result
+                            
+                if chunk.get("done"):
+                    break
+                    
+        return "".join(tokens).strip()
+        
+    async def embed(self, model: str, text: str) -> List[float]:
+        """Embedding vector of a text"""
+        payload = {"model": model, "prompt": text, "keep_alive": self.keep_alive}
+        async with self._get_session().post(f"{self.base_url}/api/embeddings", json=payload) as response:
+            data = await response.json(content_type=None)
+            if response.status != 200 or "error" in data:
+                raise OllamaError(f"{model}: {data.get('error', f'HTTP {response.status}')}")
+            return data["embedding"]
+            
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """Installed models with their name, digest, size and modification time"""
+        async with self._get_session().get(f"{self.base_url}/api/tags") as response:
+            if response.status != 200:
+                raise OllamaError(f"HTTP {response.status}: {(await response.text()).strip()}")
+            return (await response.json(content_type=None)).get("models", [])
+            
+    async def is_available(self) -> bool:
+        """Check if the Ollama server responds"""
+        try:
+            async with self._get_session().get(f"{self.base_url}/api/version",
+                                               timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return response.status == 200
+        except Exception:
+            return False
+            
+    async def close(self):
+        """Close pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Fusion Response Cache
+Two-tier cache for fused responses: exact prompt match, then optional embedding similarity
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Callable, Awaitable, Hashable, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EmbedFunction = Callable[[str], Awaitable[List[float]]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt"""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+@dataclass
+class CacheEntry:
+    """Cached response with its creation time and optional prompt embedding"""
+    value: Any
+    created_at: float
+    embedding: Optional[np.ndarray] = None
+    hits: int = 0
+
+
+@dataclass
+class InFlight:
+    """Shared computation for one key and the number of requests waiting for it"""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+@dataclass
+class CacheStats:
+    """Cache hit/miss counters"""
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    embedding_errors: int = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "embedding_errors": self.embedding_errors
+        }
+
+
+class ResponseCache:
+    """
+    LRU + TTL response cache keyed on (normalized prompt, context).
+    
+    The context holds everything besides the prompt that changes the response
+    (model set, weights, deployment mode). With an embedding function, a miss
+    on the exact key falls back to the most similar cached prompt with the same
+    context, if its cosine similarity reaches the threshold. Concurrent misses
+    for the same key share one computation, which runs as its own task: a
+    cancelled request stops waiting without cancelling it for the others, and
+    it is cancelled only once no request is waiting.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0,
+                 embed: Optional[EmbedFunction] = None, similarity_threshold: float = 0.95):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_seconds: Age at which an entry expires
+            embed: Async function returning a prompt embedding (None disables the semantic tier)
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.entries: "OrderedDict[Tuple[str, Hashable], CacheEntry]" = OrderedDict()
+        self.in_flight: Dict[Tuple[str, Hashable], InFlight] = {}
+        self.stats = CacheStats()
+        # Bumped by invalidate so results computed before it are not cached
+        self.generation = 0
+        
+    def _is_fresh(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at < self.ttl_seconds
+        
+    def _get_exact(self, key: Tuple[str, Hashable], now: float) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not self._is_fresh(entry, now):
+            del self.entries[key]
+            self.stats.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+        
+    async def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        if self.embed is None:
+            return None
+        try:
+            vector = np.asarray(await self.embed(prompt), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm > 0 else None
+        except Exception as e:
+            self.stats.embedding_errors += 1
+            logger.warning(f"Prompt embedding failed, using exact cache only: {e}")
+            return None
+            
+    def _get_similar(self, embedding: np.ndarray, context: Hashable, now: float) -> Optional[CacheEntry]:
+        candidates = [
+            (key, entry) for key, entry in self.entries.items()
+            if key[1] == context and entry.embedding is not None and self._is_fresh(entry, now)
+        ]
+        if not candidates:
+            return None
+        similarities = np.stack([entry.embedding for _, entry in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        key, entry = candidates[best]
+        self.entries.move_to_end(key)
+        return entry
+        
+    def _put(self, key: Tuple[str, Hashable], value: Any, embedding: Optional[np.ndarray], now: float):
+        self.entries[key] = CacheEntry(value=value, created_at=now, embedding=embedding)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+            
+    async def get_or_compute(self, prompt: str, context: Hashable, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool] = lambda value: True) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """
+        Return a cached value for the prompt, or compute and cache it.
+        
+        Args:
+            prompt: Prompt text
+            context: Hashable description of everything else that affects the value
+            compute: Coroutine function producing the value on a miss
+            cacheable: Whether a computed value may be cached
+            
+        Returns:
+            Tuple of (value, cache info) where cache info is None on a miss and
+            {"tier", "age_seconds"} on a hit
+        """
+        key = (normalize_prompt(prompt), context)
+        now = time.time()
+        
+        entry = self._get_exact(key, now)
+        if entry is not None:
+            entry.hits += 1
+            self.stats.exact_hits += 1
+            return entry.value, {"tier": "exact", "age_seconds": now - entry.created_at}
+            
+        # An identical request is already computing: wait for its result
+        flight = self.in_flight.get(key)
+        owner = flight is None
+        if owner:
+            task = asyncio.create_task(self._compute(key, context, compute, cacheable, self.generation))
+            flight = InFlight(task)
+            self.in_flight[key] = flight
+            task.add_done_callback(lambda _: self._finish_flight(key, flight))
+        else:
+            self.stats.coalesced += 1
+            
+        flight.waiters += 1
+        try:
+            value, cache_info = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Nobody else wants the result
+                self._finish_flight(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+            
+        return value, cache_info if owner else {"tier": "in_flight", "age_seconds": 0.0}
+        
+    async def _compute(self, key: Tuple[str, Hashable], context: Hashable, compute: Callable[[], Awaitable[Any]],
+                       cacheable: Callable[[Any], bool], generation: int) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """Semantic lookup, then compute and cache (the shared task of a key)"""
+        embedding = await self._embed(key[0])
+        if embedding is not None:
+            entry = self._get_similar(embedding, context, time.time())
+            if entry is not None:
+                entry.hits += 1
+                self.stats.semantic_hits += 1
+                return entry.value, {"tier": "semantic", "age_seconds": time.time() - entry.created_at}
+                
+        self.stats.misses += 1
+        value = await compute()
+        if cacheable(value) and generation == self.generation:
+            self._put(key, value, embedding, time.time())
+        return value, None
+        
+    def _finish_flight(self, key: Tuple[str, Hashable], flight: InFlight):
+        """Stop coalescing new requests into a finished or abandoned computation"""
+        if self.in_flight.get(key) is flight:
+            del self.in_flight[key]
+            
+    def invalidate(self):
+        """Drop every cached entry (roles, weights or models changed)"""
+        self.entries.clear()
+        self.generation += 1
+        self.stats.invalidations += 1
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        return {
+            **self.stats.to_dict(),
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_enabled": self.embed is not None,
+            "similarity_threshold": self.similarity_threshold
+        }
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Telemetry Sink
+Bounded in-memory ring of recent entries plus a background NDJSON writer with size-based rotation
+"""
+
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TelemetrySink:
+    """
+    Constant-cost telemetry logging.
+    
+    `emit` keeps the entry in a fixed-size ring (for dashboards and `query`)
+    and hands one serialized line to a writer thread, so callers never touch
+    the disk. The writer appends lines in batches and rotates the file at
+    `max_bytes`, keeping `backups` older files (gzip-compressed if `compress`).
+    If the writer falls `max_pending` lines behind, new lines are dropped from
+    the file (and counted) rather than growing memory.
+    
+    Layout:
+        path, path.1[.gz], ..., path.{backups}[.gz]
+    """
+    
+    def __init__(self, path: str, capacity: int = 1000, max_bytes: int = 10 * 1024 * 1024,
+                 backups: int = 5, compress: bool = True, max_pending: int = 10000, batch_size: int = 500):
+        """
+        Args:
+            path: NDJSON file to append to
+            capacity: Recent entries kept in memory
+            max_bytes: File size at which the file is rotated
+            backups: Rotated files kept
+            compress: Gzip rotated files
+            max_pending: Lines waiting for the writer before new lines are dropped
+            batch_size: Maximum lines appended per write
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.batch_size = batch_size
+        self.recent = deque(maxlen=capacity)
+        self.pending: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._file = None
+        self.stats = {
+            "emitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "rotations": 0,
+            "write_errors": 0
+        }
+        
+    def emit(self, entry: Dict[str, Any]):
+        """Record an entry; returns without waiting for the disk"""
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            self.recent.append(entry)
+            self.stats["emitted"] += 1
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._writer_loop, name=f"telemetry-{self.path.name}", daemon=True)
+                self._writer.start()
+        try:
+            self.pending.put_nowait(line)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            
+    def query(self, limit: int = 100, since: Optional[str] = None, **fields) -> List[Dict[str, Any]]:
+        """
+        Most recent in-memory entries, oldest first.
+        
+        Args:
+            limit: Maximum entries returned
+            since: Only entries whose ISO `timestamp` is at or after this
+            **fields: Only entries with these field values (None matches anything)
+        """
+        fields = {key: value for key, value in fields.items() if value is not None}
+        with self._lock:
+            entries = list(self.recent)
+        matches = []
+        for entry in reversed(entries):
+            if len(matches) >= limit:
+                break
+            if since is not None and str(entry.get("timestamp", "")) < since:
+                continue
+            if all(entry.get(key) == value for key, value in fields.items()):
+                matches.append(entry)
+        matches.reverse()
+        return matches
+        
+    def _writer_loop(self):
+        while True:
+            lines = [self.pending.get()]
+            while len(lines) < self.batch_size:
+                try:
+                    lines.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in lines
+            lines = [line for line in lines if line is not _STOP]
+            if lines:
+                self._write(lines)
+            if stop:
+                self._close_file()
+                return
+                
+    def _write(self, lines: List[str]):
+        try:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(lines))
+            self._file.flush()
+            self.stats["written"] += len(lines)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"Failed to write telemetry to {self.path}: {e}")
+            
+    def _backup_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}" + (".gz" if self.compress else ""))
+        
+    def _rotate(self):
+        """Shift path.N down by one and move the full file to path.1 (writer thread only)"""
+        self._close_file()
+        oldest = self._backup_path(self.backups)
+        if oldest.exists():
+            oldest.unlink()
+        for index in range(self.backups - 1, 0, -1):
+            if self._backup_path(index).exists():
+                os.replace(self._backup_path(index), self._backup_path(index + 1))
+        if self.backups > 0:
+            if self.compress:
+                with open(self.path, "rb") as source, gzip.open(self._backup_path(1), "wb") as target:
+                    shutil.copyfileobj(source, target)
+                self.path.unlink()
+            else:
+                os.replace(self.path, self._backup_path(1))
+        else:
+            self.path.unlink()
+        self.stats["rotations"] += 1
+        
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            
+    def close(self, timeout: float = 5.0):
+        """Write every pending line and close the file"""
+        with self._lock:
+            writer = self._writer
+        if writer is not None and writer.is_alive():
+            self.pending.put(_STOP)
+            writer.join(timeout)
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters, pending lines and ring usage"""
+        return {
+            **self.stats,
+            "pending": self.pending.qsize(),
+            "in_memory": len(self.recent),
+            "capacity": self.recent.maxlen,
+            "path": str(self.path)
+        }
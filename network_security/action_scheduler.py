@@ -0,0 +1,196 @@
+"""
+Priority Action Scheduler for Network Actions
+
+Pending actions are kept in a heap ordered by priority (lower values run
+first) and arrival order. Each action has a coalescing key, and at most one
+action per key is pending: a duplicate is merged into the queued action, and
+the queued action moves up if the duplicate is more urgent. Actions of a
+type already at its concurrency limit, or blocked by the overall limit, are
+passed over in favour of the next runnable one instead of blocking the
+queue; kinds exempt from the overall limit can always run.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple, Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """Queued item with its current heap position"""
+    
+    __slots__ = ('item', 'priority', 'sequence', 'kind', 'queued_at')
+    
+    def __init__(self, item: Any, priority: Tuple, sequence: int, kind: Hashable):
+        self.item = item
+        self.priority = priority
+        self.sequence = sequence
+        self.kind = kind
+        self.queued_at = time.monotonic()
+
+
+class ActionScheduler:
+    """
+    Priority queue with per-key coalescing and per-kind and overall concurrency limits.
+    
+    Superseded heap entries are skipped lazily when popped, so re-prioritizing
+    a pending item is a single push.
+    """
+    
+    def __init__(self, kind_limits: Optional[Dict[Hashable, int]] = None, total_limit: Optional[int] = None,
+                 exempt_kinds: Iterable[Hashable] = ()):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            kind_limits: Maximum concurrently running items per kind (unlisted kinds are unlimited)
+            total_limit: Maximum concurrently running items overall (None = unlimited)
+            exempt_kinds: Kinds that neither count toward nor wait for `total_limit`
+        """
+        self.kind_limits = kind_limits or {}
+        self.total_limit = total_limit
+        self.exempt_kinds = set(exempt_kinds)
+        self.running: Dict[Hashable, int] = {}
+        self.running_total = 0
+        
+        self.heap: List[Tuple[Tuple, int, Hashable]] = []
+        self.pending: Dict[Hashable, _Pending] = {}
+        self.sequence = itertools.count()
+        self.changed = asyncio.Event()
+        
+        self.stats = {
+            'queued': 0,
+            'coalesced': 0,
+            'dispatched': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0
+        }
+        
+    def push(self, item: Any, priority: Tuple, key: Hashable, kind: Hashable,
+             merge: Optional[Callable[[Any, Any], None]] = None) -> Tuple[Any, bool]:
+        """
+        Queue an item, or merge it into the pending item with the same key.
+        
+        Args:
+            item: Item to run
+            priority: Sort key; lower runs first
+            key: Coalescing key
+            kind: Concurrency class of the item
+            merge: Called as merge(pending_item, item) when coalescing
+            
+        Returns:
+            Tuple of (queued item, whether the item was coalesced)
+        """
+        existing = self.pending.get(key)
+        
+        if existing is not None:
+            if merge is not None:
+                merge(existing.item, item)
+            self.stats['coalesced'] += 1
+            
+            if priority < existing.priority:
+                existing.priority = priority
+                existing.sequence = next(self.sequence)
+                heapq.heappush(self.heap, (priority, existing.sequence, key))
+                self.changed.set()
+            return existing.item, True
+            
+        entry = _Pending(item, priority, next(self.sequence), kind)
+        self.pending[key] = entry
+        heapq.heappush(self.heap, (priority, entry.sequence, key))
+        self.stats['queued'] += 1
+        self.changed.set()
+        return item, False
+        
+    def _counts_toward_total(self, kind: Hashable) -> bool:
+        return self.total_limit is not None and kind not in self.exempt_kinds
+        
+    def _pop_runnable(self) -> Optional[_Pending]:
+        """Remove the most urgent item whose kind has capacity"""
+        deferred = []
+        found = None
+        
+        while self.heap:
+            priority, sequence, key = heapq.heappop(self.heap)
+            entry = self.pending.get(key)
+            
+            # Superseded by a re-prioritized push
+            if entry is None or entry.sequence != sequence:
+                continue
+                
+            limit = self.kind_limits.get(entry.kind)
+            if ((limit is not None and self.running.get(entry.kind, 0) >= limit)
+                    or (self._counts_toward_total(entry.kind) and self.running_total >= self.total_limit)):
+                deferred.append((priority, sequence, key))
+                continue
+                
+            del self.pending[key]
+            found = entry
+            break
+            
+        for heap_entry in deferred:
+            heapq.heappush(self.heap, heap_entry)
+            
+        return found
+        
+    async def get(self) -> Any:
+        """Wait for and claim the most urgent runnable item; call `done` when it finishes"""
+        while True:
+            entry = self._pop_runnable()
+            if entry is not None:
+                break
+            self.changed.clear()
+            await self.changed.wait()
+            
+        self.running[entry.kind] = self.running.get(entry.kind, 0) + 1
+        if self._counts_toward_total(entry.kind):
+            self.running_total += 1
+            
+        wait_time = time.monotonic() - entry.queued_at
+        self.stats['dispatched'] += 1
+        self.stats['wait_time_total'] += wait_time
+        self.stats['wait_time_max'] = max(self.stats['wait_time_max'], wait_time)
+        
+        return entry.item
+        
+    def done(self, kind: Hashable):
+        """Release the concurrency slot of a finished item"""
+        self.running[kind] = max(0, self.running.get(kind, 0) - 1)
+        if self._counts_toward_total(kind):
+            self.running_total = max(0, self.running_total - 1)
+            self.changed.set()
+        elif kind in self.kind_limits:
+            self.changed.set()
+            
+    def drain(self) -> List[Any]:
+        """Remove and return every pending item in priority order"""
+        items = [entry.item for entry in sorted(self.pending.values(), key=lambda e: (e.priority, e.sequence))]
+        self.pending.clear()
+        self.heap.clear()
+        return items
+        
+    def __len__(self) -> int:
+        return len(self.pending)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, coalescing and wait time statistics"""
+        depth_by_kind: Dict[str, int] = {}
+        for entry in self.pending.values():
+            kind = getattr(entry.kind, 'value', entry.kind)
+            depth_by_kind[kind] = depth_by_kind.get(kind, 0) + 1
+            
+        return {
+            'queue_depth': len(self.pending),
+            'queue_depth_by_type': depth_by_kind,
+            'running_by_type': {getattr(kind, 'value', kind): count for kind, count in self.running.items() if count},
+            'running_limited': self.running_total,
+            'queued': self.stats['queued'],
+            'coalesced': self.stats['coalesced'],
+            'dispatched': self.stats['dispatched'],
+            'average_wait_time': self.stats['wait_time_total'] / max(self.stats['dispatched'], 1),
+            'max_wait_time': self.stats['wait_time_max']
+        }
@@ -7,6 +7,7 @@ and behavioral profiling to identify sophisticated network threats and anomalies
 
 import logging
 import asyncio
+import time
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Optional, Tuple
@@ -17,6 +18,7 @@ import json
 from pathlib import Path
 import pickle
 from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Machine learning imports
 try:
@@ -39,6 +41,10 @@ except ImportError:
     STATS_AVAILABLE = False
 
 from netsniffer import PacketMetadata, TrafficAnomaly, AttackType, TrafficType
+from packet_store import PacketHistoryStore, PacketWindow
+from flow_table import FlowRecord
+from model_registry import ModelRegistry, MODEL_NAMES, train_model_version
+from profile_store import ProfileStore, CompactProfile
 
 logger = logging.getLogger(__name__)
 
@@ -144,21 +150,24 @@ class NetworkAnomalyDetector:
     including statistical analysis, machine learning, and behavioral profiling.
     """
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 packet_history: Optional[PacketHistoryStore] = None):
         """
         Initialize the anomaly detector.
         
         Args:
             config: Configuration dictionary
+            packet_history: Shared packet history store. When given, the producer
+                (e.g. NetSniffer) appends packets and the detector only reads it.
         """
         self.config = config or {}
         
         # Detection configuration
-        self.detection_methods = self.config.get('detection_methods', [
+        self.detection_methods = [AnomalyDetectionMethod(method) for method in self.config.get('detection_methods', [
             AnomalyDetectionMethod.STATISTICAL,
             AnomalyDetectionMethod.MACHINE_LEARNING,
             AnomalyDetectionMethod.BEHAVIORAL
-        ])
+        ])]
         
         self.anomaly_threshold = self.config.get('anomaly_threshold', 0.7)
         self.confidence_threshold = self.config.get('confidence_threshold', 0.6)
@@ -169,6 +178,13 @@ class NetworkAnomalyDetector:
         self.profile_update_interval = self.config.get('profile_update_interval', 1800)  # seconds
         self.feature_window_size = self.config.get('feature_window_size', 100)
         
+        # Retraining: 'process' trains in a worker process while scoring continues
+        # on the active models, 'inline' trains on the event loop
+        self.model_training_mode = self.config.get('model_training_mode', 'process')
+        self.model_training_samples = self.config.get('model_training_samples', 1000)
+        self.model_holdout_fraction = self.config.get('model_holdout_fraction', 0.2)
+        self.model_promotion_tolerance = self.config.get('model_promotion_tolerance', 0.05)
+        
         # Storage paths
         self.model_dir = Path(self.config.get('model_dir', 'network_security/models'))
         self.profile_dir = Path(self.config.get('profile_dir', 'network_security/profiles'))
@@ -179,15 +195,28 @@ class NetworkAnomalyDetector:
         
         # State management
         self.running = False
-        self.packet_history: deque = deque(maxlen=10000)
+        self.owns_packet_history = packet_history is None
+        self.packet_history = packet_history if packet_history is not None else PacketHistoryStore(
+            self.config.get('packet_history_size', 10000)
+        )
         self.anomaly_history: List[TrafficAnomaly] = []
-        self.network_profiles: Dict[str, NetworkProfile] = {}
+        self.flow_history = deque(maxlen=self.config.get('flow_history_size', 10000))
+        self.profile_store = ProfileStore(
+            self.profile_dir,
+            max_profiles=self.config.get('max_profiles', 50000),
+            ttl_seconds=self.config.get('profile_ttl_hours', 168) * 3600
+        )
         
         # Machine learning models
         self.isolation_forest = None
         self.dbscan_model = None
         self.random_forest = None
         self.feature_scaler = None
+        self.model_registry = ModelRegistry(self.model_dir, self.config.get('model_keep_versions', 5))
+        self.model_version: Optional[str] = None
+        self.model_evaluation: Optional[Dict[str, Any]] = None
+        self.training_executor: Optional[ProcessPoolExecutor] = None
+        self.training_in_progress = False
         
         # Feature extraction
         self.feature_extractors = {
@@ -205,7 +234,10 @@ class NetworkAnomalyDetector:
             'anomalies_detected': 0,
             'false_positives': 0,
             'model_accuracy': 0.0,
-            'last_model_update': None
+            'last_model_update': None,
+            'model_version': None,
+            'model_score': None,
+            'models_rejected': 0
         }
         
         # Initialize components
@@ -254,6 +286,14 @@ class NetworkAnomalyDetector:
     def _load_existing_models(self):
         """Load existing trained models"""
         try:
+            # Prefer the active registry version
+            if self.model_registry.current_version():
+                models, metadata = self.model_registry.load()
+                self._activate_models(models, metadata['version'], metadata.get('evaluation', {}).get('candidate'))
+                logger.info(f"Loaded model version {metadata['version']}")
+                return
+                
+            # Fall back to unversioned model files
             model_files = {
                 'isolation_forest': self.model_dir / 'isolation_forest.pkl',
                 'dbscan_model': self.model_dir / 'dbscan_model.pkl',
@@ -271,57 +311,66 @@ class NetworkAnomalyDetector:
         except Exception as e:
             logger.warning(f"Failed to load existing models: {e}")
             
+    def _model_bundle(self) -> Dict[str, Any]:
+        """Currently active models"""
+        return {model_name: getattr(self, model_name) for model_name in MODEL_NAMES}
+        
+    def _activate_models(self, models: Dict[str, Any], version: Optional[str],
+                         evaluation: Optional[Dict[str, Any]] = None):
+        """Swap in a model bundle in one step, so scoring never mixes versions"""
+        for model_name in MODEL_NAMES:
+            if model_name in models:
+                setattr(self, model_name, models[model_name])
+                
+        self.model_version = version
+        self.model_evaluation = evaluation
+        self.detection_stats['model_version'] = version
+        self.detection_stats['model_score'] = evaluation.get('score') if evaluation else None
+        
     def _save_models(self):
-        """Save trained models"""
+        """Save trained models (versions are written when trained; this stores unversioned models)"""
         try:
-            models = {
-                'isolation_forest': self.isolation_forest,
-                'dbscan_model': self.dbscan_model,
-                'random_forest': self.random_forest,
-                'feature_scaler': self.feature_scaler
-            }
+            if self.model_version is not None:
+                return
+                
+            if not any(hasattr(model, 'estimators_') or hasattr(model, 'mean_')
+                       for model in self._model_bundle().values()):
+                return
+                
+            version = self.model_registry.publish(self._model_bundle(), {'source': 'unversioned'})
+            self._activate_models({}, version)
             
-            for model_name, model in models.items():
-                if model is not None:
-                    model_file = self.model_dir / f'{model_name}.pkl'
-                    with open(model_file, 'wb') as f:
-                        pickle.dump(model, f)
-                        
-            logger.info("Models saved successfully")
+            logger.info(f"Models saved as version {version}")
             
         except Exception as e:
             logger.error(f"Failed to save models: {e}")
             
+    def _get_training_executor(self) -> ProcessPoolExecutor:
+        if self.training_executor is None:
+            self.training_executor = ProcessPoolExecutor(max_workers=1)
+        return self.training_executor
+        
+    def get_model_versions(self) -> List[Dict[str, Any]]:
+        """Stored model versions with their evaluation scores"""
+        return self.model_registry.list_versions()
+        
     def _load_existing_profiles(self):
-        """Load existing network profiles"""
+        """Import legacy JSON profiles into an empty profile store"""
         try:
-            profile_files = list(self.profile_dir.glob('*.json'))
-            
-            for profile_file in profile_files:
-                with open(profile_file, 'r') as f:
-                    profile_data = json.load(f)
-                    
-                # Convert timestamps
-                profile_data['created_at'] = datetime.fromisoformat(profile_data['created_at'])
-                profile_data['last_updated'] = datetime.fromisoformat(profile_data['last_updated'])
+            imported = self.profile_store.import_json(self.profile_dir)
+            if imported:
+                logger.info(f"Imported {imported} legacy network profiles")
                 
-                profile = NetworkProfile(**profile_data)
-                self.network_profiles[profile.profile_id] = profile
-                
-            logger.info(f"Loaded {len(self.network_profiles)} network profiles")
+            logger.info(f"Profile store holds {self.profile_store.stored_count()} network profiles")
             
         except Exception as e:
             logger.warning(f"Failed to load existing profiles: {e}")
             
     def _save_profiles(self):
-        """Save network profiles"""
+        """Persist network profiles changed since the last save"""
         try:
-            for profile_id, profile in self.network_profiles.items():
-                profile_file = self.profile_dir / f'{profile_id}.json'
-                with open(profile_file, 'w') as f:
-                    json.dump(profile.to_dict(), f, indent=2)
-                    
-            logger.info(f"Saved {len(self.network_profiles)} network profiles")
+            saved = self.profile_store.save()
+            logger.debug(f"Saved {saved} changed network profiles")
             
         except Exception as e:
             logger.error(f"Failed to save profiles: {e}")
@@ -363,6 +412,10 @@ class NetworkAnomalyDetector:
             self._save_models()
             self._save_profiles()
             
+            if self.training_executor is not None:
+                self.training_executor.shutdown(wait=False, cancel_futures=True)
+                self.training_executor = None
+                
             # Generate final report
             await self._generate_detection_report()
             
@@ -383,7 +436,8 @@ class NetworkAnomalyDetector:
         """
         try:
             # Add packet to history
-            self.packet_history.append(packet)
+            if self.owns_packet_history:
+                self.packet_history.append(packet)
             self.detection_stats['total_packets_analyzed'] += 1
             
             # Extract features
@@ -427,36 +481,69 @@ class NetworkAnomalyDetector:
         """
         Analyze a batch of packets for anomalies.
         
+        Every configured detection method scores the whole batch at once from a
+        single feature matrix; AnomalyScore objects are only built for packets
+        whose combined score reaches the anomaly threshold. Behavioral context
+        is taken from the packet history, so packets are expected to be the
+        most recent packets seen (as they are when batched from a live capture).
+        
         Args:
             packets: List of packet metadata to analyze
             
         Returns:
-            List of anomaly scores
+            List of anomaly scores, each with 'packet_index' in its features
         """
         try:
-            anomaly_scores = []
-            
-            # Add packets to history
-            for packet in packets:
-                self.packet_history.append(packet)
-                self.detection_stats['total_packets_analyzed'] += 1
+            if not packets:
+                return []
                 
+            # Add packets to history
+            if self.owns_packet_history:
+                self.packet_history.extend(packets)
+            self.detection_stats['total_packets_analyzed'] += len(packets)
+            
+            window = PacketWindow.from_packets(packets)
+            
             # Extract features for the batch
-            features = self._extract_features(packets)
+            features = self._extract_features(window)
             
             if not features:
                 return []
                 
-            # Run batch detection
+            # Score the batch with each method
+            method_results = {}
+            
             for method in self.detection_methods:
-                if method == AnomalyDetectionMethod.MACHINE_LEARNING:
-                    batch_scores = await self._ml_batch_detection(packets, features)
-                    anomaly_scores.extend(batch_scores)
+                if method == AnomalyDetectionMethod.STATISTICAL:
+                    result = self._statistical_batch_detection(packets, window)
+                elif method == AnomalyDetectionMethod.MACHINE_LEARNING:
+                    result = self._ml_batch_detection(features, len(packets))
+                elif method == AnomalyDetectionMethod.BEHAVIORAL:
+                    result = self._behavioral_batch_detection(window)
+                elif method == AnomalyDetectionMethod.HYBRID:
+                    result = self._hybrid_batch_detection(packets, window, features)
+                    
+                if result is not None:
+                    method_results[method] = result
                     
+            if not method_results:
+                return []
+                
+            # Combine scores
+            methods = list(method_results)
+            scores = np.vstack([method_results[method]['score'] for method in methods])
+            confidences = np.vstack([method_results[method]['confidence'] for method in methods])
+            combined_scores, combined_confidences, method_counts = self._combine_score_arrays(scores, confidences)
+            
             # Filter by threshold
+            significant = np.flatnonzero((method_counts > 0) & (combined_scores >= self.anomaly_threshold))
+            
             significant_scores = [
-                score for score in anomaly_scores 
-                if score.score >= self.anomaly_threshold
+                self._build_batch_score(
+                    packets, index, methods, method_results,
+                    combined_scores[index], combined_confidences[index], method_counts[index]
+                )
+                for index in significant
             ]
             
             self.detection_stats['anomalies_detected'] += len(significant_scores)
@@ -467,16 +554,25 @@ class NetworkAnomalyDetector:
             logger.error(f"Error analyzing batch: {e}")
             return []
             
-    def _extract_features(self, packets: List[PacketMetadata]) -> Dict[str, np.ndarray]:
-        """Extract features from packets"""
+    def _extract_features(self, packets) -> Dict[str, np.ndarray]:
+        """
+        Extract features from packets.
+        
+        All extractors operate on packet columns, so a whole batch costs a few
+        array operations instead of a Python loop per feature.
+        
+        Args:
+            packets: List of PacketMetadata or a PacketWindow from the packet store
+        """
         try:
             features = {}
+            window = packets if isinstance(packets, PacketWindow) else PacketWindow.from_packets(packets)
             
             for feature_name, extractor in self.feature_extractors.items():
                 try:
-                    feature_values = extractor(packets)
+                    feature_values = extractor(window)
                     if feature_values is not None:
-                        features[feature_name] = np.array(feature_values)
+                        features[feature_name] = np.asarray(feature_values, dtype=np.float64)
                 except Exception as e:
                     logger.debug(f"Error extracting {feature_name}: {e}")
                     
@@ -486,96 +582,100 @@ class NetworkAnomalyDetector:
             logger.error(f"Error extracting features: {e}")
             return {}
             
-    def _extract_packet_size_features(self, packets: List[PacketMetadata]) -> List[float]:
+    def _extract_packet_size_features(self, window: PacketWindow) -> np.ndarray:
         """Extract packet size features"""
-        sizes = [packet.packet_size for packet in packets]
-        return sizes
-        
-    def _extract_packet_rate_features(self, packets: List[PacketMetadata]) -> List[float]:
-        """Extract packet rate features"""
-        if len(packets) < 2:
-            return [0.0]
-            
-        # Calculate time differences
-        time_diffs = []
-        for i in range(1, len(packets)):
-            diff = (packets[i].timestamp - packets[i-1].timestamp).total_seconds()
-            time_diffs.append(1.0 / diff if diff > 0 else 0.0)
-            
-        return time_diffs
-        
-    def _extract_port_diversity_features(self, packets: List[PacketMetadata]) -> List[float]:
-        """Extract port diversity features"""
-        ports = set()
-        diversity_scores = []
-        
-        for i, packet in enumerate(packets):
-            if packet.dst_port:
-                ports.add(packet.dst_port)
-                
-            # Calculate diversity score as unique ports / total packets seen so far
-            diversity = len(ports) / (i + 1)
-            diversity_scores.append(diversity)
-            
-        return diversity_scores
-        
-    def _extract_protocol_features(self, packets: List[PacketMetadata]) -> List[float]:
-        """Extract protocol distribution features"""
-        protocol_counts = defaultdict(int)
-        protocol_scores = []
-        
-        for i, packet in enumerate(packets):
-            protocol_counts[packet.protocol] += 1
-            
-            # Calculate protocol entropy
-            total_packets = i + 1
-            entropy = 0.0
-            for count in protocol_counts.values():
-                p = count / total_packets
-                if p > 0:
-                    entropy -= p * np.log2(p)
-                    
-            protocol_scores.append(entropy)
-            
-        return protocol_scores
+        return window.packet_size.astype(np.float64)
         
-    def _extract_timing_features(self, packets: List[PacketMetadata]) -> List[float]:
-        """Extract timing pattern features"""
-        timing_features = []
+    def _extract_packet_rate_features(self, window: PacketWindow) -> np.ndarray:
+        """Extract packet rate features (inverse inter-arrival time)"""
+        if len(window) < 2:
+            return np.zeros(1)
+            
+        # Timestamps have microsecond resolution; rounding removes float epoch error
+        time_diffs = np.round(np.diff(window.timestamp) * 1e6) / 1e6
+        rates = np.zeros(len(time_diffs))
+        positive = time_diffs > 0
+        rates[positive] = 1.0 / time_diffs[positive]
         
-        for i, packet in enumerate(packets):
-            hour = packet.timestamp.hour
-            
-            # Normalize hour to 0-1 range
-            hour_normalized = hour / 24.0
+        return rates
+        
+    def _extract_port_diversity_features(self, window: PacketWindow) -> np.ndarray:
+        """Extract port diversity features (distinct ports seen so far / packets seen so far)"""
+        count = len(window)
+        first_seen = np.zeros(count)
+        
+        has_port = np.flatnonzero(window.dst_port > 0)
+        if len(has_port):
+            _, first_index = np.unique(window.dst_port[has_port], return_index=True)
+            first_seen[has_port[first_index]] = 1.0
             
-            # Check if it's a typical business hour
-            is_business_hour = 1.0 if 9 <= hour <= 17 else 0.0
+        return np.cumsum(first_seen) / np.arange(1, count + 1)
+        
+    def _extract_protocol_features(self, window: PacketWindow) -> np.ndarray:
+        """Extract protocol distribution features (running protocol entropy)"""
+        count = len(window)
+        if count == 0:
+            return np.zeros(0)
+            
+        # Running count of each protocol via one-hot cumulative sums
+        _, inverse = np.unique(window.protocol, return_inverse=True)
+        one_hot = np.zeros((count, inverse.max() + 1))
+        one_hot[np.arange(count), inverse] = 1.0
+        running_counts = np.cumsum(one_hot, axis=0)
+        
+        probabilities = running_counts / np.arange(1, count + 1)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0)
             
-            # Combined timing score
-            timing_score = (hour_normalized + is_business_hour) / 2.0
-            timing_features.append(timing_score)
+        return -terms.sum(axis=1)
+        
+    def _extract_timing_features(self, window: PacketWindow) -> np.ndarray:
+        """Extract timing pattern features"""
+        hours = self._local_hours(window.timestamp)
+        
+        # Normalize hour to 0-1 range and flag typical business hours
+        hour_normalized = hours / 24.0
+        is_business_hour = ((hours >= 9) & (hours <= 17)).astype(np.float64)
+        
+        return (hour_normalized + is_business_hour) / 2.0
+        
+    def _local_hours(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Local-time hour for epoch timestamps.
+        
+        UTC offsets are multiples of 15 minutes, so the local hour is constant
+        within each 15-minute UTC bucket and only needs to be computed once per
+        distinct bucket.
+        """
+        if len(timestamps) == 0:
+            return np.zeros(0)
             
-        return timing_features
+        buckets, inverse = np.unique(np.floor(timestamps / 900.0), return_inverse=True)
+        bucket_hours = np.array([datetime.fromtimestamp(bucket * 900.0).hour for bucket in buckets], dtype=np.float64)
+        
+        return bucket_hours[inverse]
         
-    def _extract_connection_features(self, packets: List[PacketMetadata]) -> List[float]:
+    def _extract_connection_features(self, window: PacketWindow) -> np.ndarray:
         """Extract connection pattern features"""
-        connection_features = []
-        seen_connections = set()
+        count = len(window)
+        if count == 0:
+            return np.zeros(0)
+            
+        # Encode (src_ip, dst_ip, dst_port) as a single integer key
+        _, src_ids = np.unique(window.src_ip, return_inverse=True)
+        dst_values, dst_ids = np.unique(window.dst_ip, return_inverse=True)
+        port_ids = window.dst_port.astype(np.int64) + 1
+        connections = (src_ids.astype(np.int64) * len(dst_values) + dst_ids) * 65537 + port_ids
         
-        for packet in packets:
-            connection = (packet.src_ip, packet.dst_ip, packet.dst_port)
-            
-            # Check if this is a new connection
-            is_new_connection = 1.0 if connection not in seen_connections else 0.0
-            seen_connections.add(connection)
-            
-            # Calculate connection uniqueness
-            uniqueness = len(seen_connections) / len(packets)
-            
-            connection_features.append((is_new_connection + uniqueness) / 2.0)
-            
-        return connection_features
+        # A connection is new at its first occurrence in the batch
+        _, first_index = np.unique(connections, return_index=True)
+        is_new_connection = np.zeros(count)
+        is_new_connection[first_index] = 1.0
+        
+        # Connection uniqueness: distinct connections seen so far / batch size
+        uniqueness = np.cumsum(is_new_connection) / count
+        
+        return (is_new_connection + uniqueness) / 2.0
         
     async def _statistical_detection(self, packet: PacketMetadata, features: Dict[str, np.ndarray]) -> Optional[AnomalyScore]:
         """Statistical anomaly detection"""
@@ -602,21 +702,21 @@ class NetworkAnomalyDetector:
                     contributing_factors.append(f"Unusual packet size: {features['packet_size'][0]}")
                     
             # Port diversity anomaly
-            if packet.dst_port and packet.dst_port not in profile.typical_ports:
-                port_anomaly = 1.0 if len(profile.typical_ports) > 0 else 0.5
+            if packet.dst_port and not profile.has_port(packet.dst_port):
+                port_anomaly = 1.0 if profile.ports else 0.5
                 anomaly_indicators.append(port_anomaly)
                 contributing_factors.append(f"Unusual destination port: {packet.dst_port}")
                 
             # Protocol anomaly
-            if packet.protocol not in profile.typical_protocols:
-                protocol_anomaly = 0.8 if len(profile.typical_protocols) > 0 else 0.3
+            if not profile.has_protocol(packet.protocol):
+                protocol_anomaly = 0.8 if profile.protocol_bits else 0.3
                 anomaly_indicators.append(protocol_anomaly)
                 contributing_factors.append(f"Unusual protocol: {packet.protocol}")
                 
             # Time-based anomaly
             current_hour = packet.timestamp.hour
-            if current_hour not in profile.active_hours:
-                time_anomaly = 0.6 if len(profile.active_hours) > 0 else 0.2
+            if not profile.has_hour(current_hour):
+                time_anomaly = 0.6 if profile.hour_bits else 0.2
                 anomaly_indicators.append(time_anomaly)
                 contributing_factors.append(f"Unusual time: {current_hour}:00")
                 
@@ -695,7 +795,7 @@ class NetworkAnomalyDetector:
             contributing_factors = []
             
             # Connection pattern analysis
-            recent_packets = list(self.packet_history)[-50:]  # Last 50 packets
+            recent_packets = self.packet_history[-50:]  # Last 50 packets
             
             # Check for rapid connection attempts
             src_connections = [p for p in recent_packets if p.src_ip == packet.src_ip]
@@ -787,62 +887,298 @@ class NetworkAnomalyDetector:
             logger.error(f"Error in hybrid detection: {e}")
             return None
             
-    async def _ml_batch_detection(self, packets: List[PacketMetadata], features: Dict[str, np.ndarray]) -> List[AnomalyScore]:
-        """Machine learning batch anomaly detection"""
+    def _statistical_batch_detection(self, packets: List[PacketMetadata], window: PacketWindow) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Statistical anomaly detection for a whole batch.
+        
+        Profiles are looked up once per distinct (src, dst) pair and each
+        indicator is evaluated as an array; indicators that do not fire are NaN.
+        """
         try:
-            if not ML_AVAILABLE or not self.isolation_forest:
-                return []
+            if not STATS_AVAILABLE:
+                return None
                 
-            # Prepare feature matrix
-            feature_matrix = []
-            valid_indices = []
+            count = len(packets)
+            _, pair_first, pair_ids = np.unique(
+                np.stack([window.src_ip, window.dst_ip], axis=1).view('V32').ravel(),
+                return_index=True, return_inverse=True
+            )
             
-            for i, packet in enumerate(packets):
-                packet_features = {key: values[i] if i < len(values) else 0.0 
-                                 for key, values in features.items()}
-                feature_vector = self._prepare_feature_vector(packet_features)
-                
-                if feature_vector is not None:
-                    feature_matrix.append(feature_vector)
-                    valid_indices.append(i)
+            avg_size = np.zeros(len(pair_first))
+            size_threshold = np.zeros(len(pair_first))
+            has_ports = np.zeros(len(pair_first), dtype=bool)
+            has_protocols = np.zeros(len(pair_first), dtype=bool)
+            has_hours = np.zeros(len(pair_first), dtype=bool)
+            known_port = np.zeros(count, dtype=bool)
+            known_protocol = np.zeros(count, dtype=bool)
+            known_hour = np.zeros(count, dtype=bool)
+            
+            hours = self._local_hours(window.timestamp)
+            order = np.argsort(pair_ids, kind='stable')
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(pair_ids, minlength=len(pair_first)))])
+            
+            for pair, first_index in enumerate(pair_first):
+                profile = self._get_network_profile(packets[first_index])
+                if not profile:
+                    continue
                     
-            if not feature_matrix:
-                return []
+                members = order[bounds[pair]:bounds[pair + 1]]
+                avg_size[pair] = profile.avg_packet_size
+                size_threshold[pair] = profile.packet_size_threshold
+                has_ports[pair] = len(profile.ports) > 0
+                has_protocols[pair] = profile.protocol_bits != 0
+                has_hours[pair] = profile.hour_bits != 0
+                
+                known_port[members] = np.isin(window.dst_port[members], profile.port_array())
+                known_protocol[members] = np.isin(window.protocol[members], profile.protocol_codes())
+                known_hour[members] = profile.known_hours(hours[members])
+                
+            sizes = window.packet_size.astype(np.float64)
+            size_zscore = np.abs(sizes - avg_size[pair_ids]) / np.maximum(avg_size[pair_ids] * 0.1, 1)
+            
+            indicators = np.full((count, 4), np.nan)
+            indicators[:, 0] = np.where(size_zscore > size_threshold[pair_ids], size_zscore / 5.0, np.nan)
+            indicators[:, 1] = np.where((window.dst_port > 0) & ~known_port, np.where(has_ports[pair_ids], 1.0, 0.5), np.nan)
+            indicators[:, 2] = np.where(~known_protocol, np.where(has_protocols[pair_ids], 0.8, 0.3), np.nan)
+            indicators[:, 3] = np.where(~known_hour, np.where(has_hours[pair_ids], 0.6, 0.2), np.nan)
+            
+            return self._indicator_scores(indicators, extras={'hour': hours})
+            
+        except Exception as e:
+            logger.error(f"Error in statistical batch detection: {e}")
+            return None
+            
+    def _behavioral_batch_detection(self, window: PacketWindow) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Behavioral anomaly detection for a whole batch.
+        
+        Each packet is compared against the packets from the same source within
+        the trailing 50-packet window of history (itself included), evaluated
+        as an (n, 50) index matrix instead of a history scan per packet.
+        """
+        try:
+            count = len(window)
+            span = 50
+            
+            # Context is the history leading up to the batch, when the batch is its tail
+            context = self.packet_history.window(count + span - 1)
+            if len(context) < count or not np.array_equal(context.timestamp[-count:], window.timestamp):
+                context = window
+            offset = len(context) - count
+            
+            _, src_ids = np.unique(context.src_ip, return_inverse=True)
+            positions = np.arange(offset, offset + count)[:, None] + np.arange(-span + 1, 1)[None, :]
+            valid = positions >= 0
+            positions = np.maximum(positions, 0)
+            same_source = valid & (src_ids[positions] == src_ids[offset:][:, None])
+            
+            connections = same_source.sum(axis=1)
+            unique_ports = self._distinct_counts(np.where(same_source & (context.dst_port[positions] > 0),
+                                                          context.dst_port[positions], -1))
+            unique_protocols = self._distinct_counts(np.where(same_source, context.protocol[positions].astype(np.int32), -1))
+            
+            sizes = np.where(same_source, context.packet_size[positions].astype(np.float64), 0.0)
+            mean_size = sizes.sum(axis=1) / connections
+            size_variation = np.sqrt((np.where(same_source, sizes - mean_size[:, None], 0.0) ** 2).sum(axis=1) / connections)
+            
+            indicators = np.full((count, 4), np.nan)
+            indicators[:, 0] = np.where(connections > 20, 0.8, np.nan)
+            indicators[:, 1] = np.where(unique_ports > 10, 0.9, np.nan)
+            indicators[:, 2] = np.where(unique_protocols > 3, 0.6, np.nan)
+            indicators[:, 3] = np.where(size_variation > 1000, 0.7, np.nan)
+            
+            return self._indicator_scores(indicators)
+            
+        except Exception as e:
+            logger.error(f"Error in behavioral batch detection: {e}")
+            return None
+            
+    def _ml_batch_detection(self, features: Dict[str, np.ndarray], count: int) -> Optional[Dict[str, np.ndarray]]:
+        """Machine learning anomaly detection for a whole batch"""
+        try:
+            if not ML_AVAILABLE or not self.isolation_forest or not hasattr(self.isolation_forest, 'estimators_'):
+                return None
                 
+            # Prepare feature matrix
+            feature_matrix = self._build_feature_matrix(features, count)
+            
             # Scale features
-            if self.feature_scaler:
+            if self.feature_scaler is not None and hasattr(self.feature_scaler, 'mean_'):
                 feature_matrix = self.feature_scaler.transform(feature_matrix)
                 
-            # Batch prediction
-            anomaly_scores = self.isolation_forest.decision_function(feature_matrix)
-            predictions = self.isolation_forest.predict(feature_matrix)
+            # Batch prediction; predict() is decision_function() < 0, so score once
+            raw_scores = self.isolation_forest.decision_function(feature_matrix)
+            is_anomaly = raw_scores < 0
             
-            # Create anomaly scores
-            results = []
-            for i, (score, prediction) in enumerate(zip(anomaly_scores, predictions)):
-                if prediction == -1:  # Anomaly detected
-                    packet_idx = valid_indices[i]
-                    packet = packets[packet_idx]
-                    
-                    normalized_score = min(abs(score) / 0.5, 1.0)
-                    
-                    anomaly_score = AnomalyScore(
-                        score=normalized_score,
-                        confidence=min(normalized_score + 0.2, 1.0),
-                        method=AnomalyDetectionMethod.MACHINE_LEARNING,
-                        features={'ml_score': score, 'packet_index': packet_idx},
-                        explanation=f"Batch ML anomaly detected (score: {score:.3f})",
-                        contributing_factors=['Isolation Forest batch detection']
-                    )
-                    
-                    results.append(anomaly_score)
-                    
-            return results
+            scores = np.where(is_anomaly, np.minimum(np.abs(raw_scores) / 0.5, 1.0), np.nan)
+            
+            return {
+                'score': scores,
+                'confidence': np.minimum(scores + 0.2, 1.0),
+                'raw_score': raw_scores
+            }
             
         except Exception as e:
             logger.error(f"Error in ML batch detection: {e}")
-            return []
+            return None
             
+    def _hybrid_batch_detection(self, packets: List[PacketMetadata], window: PacketWindow,
+                                features: Dict[str, np.ndarray]) -> Optional[Dict[str, np.ndarray]]:
+        """Hybrid anomaly detection for a whole batch (weighted sum of the other methods)"""
+        try:
+            weights = {
+                AnomalyDetectionMethod.STATISTICAL: 0.3,
+                AnomalyDetectionMethod.MACHINE_LEARNING: 0.4,
+                AnomalyDetectionMethod.BEHAVIORAL: 0.3
+            }
+            
+            components = {
+                AnomalyDetectionMethod.STATISTICAL: self._statistical_batch_detection(packets, window),
+                AnomalyDetectionMethod.MACHINE_LEARNING: self._ml_batch_detection(features, len(packets)),
+                AnomalyDetectionMethod.BEHAVIORAL: self._behavioral_batch_detection(window)
+            }
+            components = {method: result for method, result in components.items() if result is not None}
+            
+            if not components:
+                return None
+                
+            scores = np.vstack([result['score'] for result in components.values()])
+            confidences = np.vstack([result['confidence'] for result in components.values()])
+            method_weights = np.array([weights[method] for method in components])[:, None]
+            present = ~np.isnan(scores)
+            
+            any_present = present.any(axis=0)
+            weighted_score = np.where(present, scores * method_weights, 0.0).sum(axis=0)
+            weighted_confidence = np.where(present, confidences * method_weights, 0.0).sum(axis=0)
+            
+            return {
+                'score': np.where(any_present, weighted_score, np.nan),
+                'confidence': np.where(any_present, weighted_confidence, np.nan),
+                'components': components
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in hybrid batch detection: {e}")
+            return None
+            
+    def _indicator_scores(self, indicators: np.ndarray, extras: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """Score and confidence arrays from an indicator matrix (NaN = indicator not fired)"""
+        fired = ~np.isnan(indicators)
+        counts = fired.sum(axis=1)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(fired, indicators, 0.0).sum(axis=1) / counts
+            
+        result = {
+            'score': np.where(counts > 0, np.minimum(means, 1.0), np.nan),
+            'confidence': np.where(counts > 0, np.minimum(counts / 4.0, 1.0), np.nan),
+            'indicators': indicators
+        }
+        result.update(extras or {})
+        
+        return result
+        
+    def _distinct_counts(self, values: np.ndarray) -> np.ndarray:
+        """Number of distinct non-negative values in each row"""
+        ordered = np.sort(values, axis=1)
+        starts = ordered >= 0
+        starts[:, 1:] &= ordered[:, 1:] != ordered[:, :-1]
+        return starts.sum(axis=1)
+        
+    def _build_batch_score(self, packets: List[PacketMetadata], index: int, methods: List[AnomalyDetectionMethod],
+                           method_results: Dict[AnomalyDetectionMethod, Dict[str, np.ndarray]],
+                           score: float, confidence: float, method_count: int) -> AnomalyScore:
+        """Build the AnomalyScore for one significant packet of a scored batch"""
+        packet = packets[index]
+        combined_features = {}
+        combined_factors = []
+        fired_methods = []
+        
+        for method in methods:
+            result = method_results[method]
+            if np.isnan(result['score'][index]):
+                continue
+                
+            fired_methods.append(method)
+            
+            if method == AnomalyDetectionMethod.HYBRID:
+                details = [(component, component_result) for component, component_result in result['components'].items()
+                           if not np.isnan(component_result['score'][index])]
+            else:
+                details = [(method, result)]
+                
+            for component, component_result in details:
+                features, factors = self._batch_score_details(packet, index, component, component_result)
+                combined_features.update(features)
+                combined_factors.extend(factors)
+                
+        combined_features['packet_index'] = int(index)
+        
+        if method_count > 1:
+            method = AnomalyDetectionMethod.HYBRID
+            explanation = f"Combined anomaly score from {method_count} methods"
+        else:
+            method = fired_methods[0]
+            explanation = f"Batch {method.value} anomaly detected"
+            
+        return AnomalyScore(
+            score=float(score),
+            confidence=float(confidence),
+            method=method,
+            features=combined_features,
+            explanation=explanation,
+            contributing_factors=combined_factors
+        )
+        
+    def _batch_score_details(self, packet: PacketMetadata, index: int, method: AnomalyDetectionMethod,
+                             result: Dict[str, np.ndarray]):
+        """Features and contributing factors of one method for one packet"""
+        if method == AnomalyDetectionMethod.MACHINE_LEARNING:
+            return {'ml_score': float(result['raw_score'][index])}, ['Isolation Forest batch detection']
+            
+        indicators = result['indicators'][index]
+        fired = ~np.isnan(indicators)
+        
+        if method == AnomalyDetectionMethod.STATISTICAL:
+            messages = [
+                f"Unusual packet size: {float(packet.packet_size)}",
+                f"Unusual destination port: {packet.dst_port}",
+                f"Unusual protocol: {packet.protocol}",
+                f"Unusual time: {int(result['hour'][index])}:00"
+            ]
+            key = 'statistical_indicators'
+        else:
+            messages = [
+                "High connection rate detected",
+                "Port scanning behavior detected",
+                "Protocol hopping detected",
+                "High packet size variation"
+            ]
+            key = 'behavioral_indicators'
+            
+        factors = [message for message, is_fired in zip(messages, fired) if is_fired]
+        
+        return {key: indicators[fired].tolist()}, factors
+        
+    def _build_feature_matrix(self, features: Dict[str, np.ndarray], count: int) -> np.ndarray:
+        """
+        Stack per-packet feature arrays into an (n, 6) matrix.
+        
+        Features shorter than the batch (e.g. packet_rate, which has one value
+        per inter-arrival gap) are zero-padded at the end.
+        """
+        feature_keys = ['packet_size', 'packet_rate', 'port_diversity',
+                        'protocol_distribution', 'timing_patterns', 'connection_patterns']
+        matrix = np.zeros((count, len(feature_keys)))
+        
+        for column, key in enumerate(feature_keys):
+            values = features.get(key)
+            if values is not None:
+                length = min(len(values), count)
+                matrix[:length, column] = values[:length]
+                
+        return matrix
+        
     def _prepare_feature_vector(self, features: Dict[str, Any]) -> Optional[List[float]]:
         """Prepare feature vector for ML algorithms"""
         try:
@@ -868,25 +1204,10 @@ class NetworkAnomalyDetector:
             logger.error(f"Error preparing feature vector: {e}")
             return None
             
-    def _get_network_profile(self, packet: PacketMetadata) -> Optional[NetworkProfile]:
-        """Get network profile for packet"""
+    def _get_network_profile(self, packet: PacketMetadata) -> Optional[CompactProfile]:
+        """Get network profile for packet (created on first sight of the pair)"""
         try:
-            # Try to find existing profile
-            profile_key = f"{packet.src_ip}_{packet.dst_ip}"
-            
-            if profile_key in self.network_profiles:
-                return self.network_profiles[profile_key]
-                
-            # Create new profile if not found
-            profile = NetworkProfile(
-                profile_id=profile_key,
-                src_ip=packet.src_ip,
-                dst_ip=packet.dst_ip,
-                protocol=packet.protocol
-            )
-            
-            self.network_profiles[profile_key] = profile
-            return profile
+            return self.profile_store.get(packet.src_ip, packet.dst_ip, packet.protocol)
             
         except Exception as e:
             logger.error(f"Error getting network profile: {e}")
@@ -899,13 +1220,13 @@ class NetworkAnomalyDetector:
                 return scores[0]
                 
             # Weight scores by confidence
-            total_weight = sum(score.confidence for score in scores)
-            
-            if total_weight == 0:
+            if sum(score.confidence for score in scores) == 0:
                 return scores[0]
                 
-            weighted_score = sum(score.score * score.confidence for score in scores) / total_weight
-            avg_confidence = sum(score.confidence for score in scores) / len(scores)
+            combined_scores, combined_confidences, _ = self._combine_score_arrays(
+                np.array([[score.score] for score in scores]),
+                np.array([[score.confidence] for score in scores])
+            )
             
             # Combine features and factors
             combined_features = {}
@@ -916,8 +1237,8 @@ class NetworkAnomalyDetector:
                 combined_factors.extend(score.contributing_factors)
                 
             return AnomalyScore(
-                score=weighted_score,
-                confidence=avg_confidence,
+                score=float(combined_scores[0]),
+                confidence=float(combined_confidences[0]),
                 method=AnomalyDetectionMethod.HYBRID,
                 features=combined_features,
                 explanation=f"Combined anomaly score from {len(scores)} methods",
@@ -928,6 +1249,41 @@ class NetworkAnomalyDetector:
             logger.error(f"Error combining scores: {e}")
             return scores[0]
             
+    def _combine_score_arrays(self, scores: np.ndarray, confidences: np.ndarray):
+        """
+        Combine per-method scores for many packets at once.
+        
+        Args:
+            scores: (methods, packets) score matrix, NaN where a method did not fire
+            confidences: (methods, packets) confidence matrix
+            
+        Returns:
+            Tuple of (combined scores, combined confidences, methods fired) per packet.
+            A single firing method is passed through; several are averaged weighted
+            by confidence, falling back to the first score when all confidences are 0.
+        """
+        present = ~np.isnan(scores)
+        method_counts = present.sum(axis=0)
+        
+        first = np.argmax(present, axis=0)
+        columns = np.arange(scores.shape[1])
+        first_scores = scores[first, columns]
+        first_confidences = confidences[first, columns]
+        
+        masked_confidences = np.where(present, confidences, 0.0)
+        total_weight = masked_confidences.sum(axis=0)
+        weighted_sum = np.where(present, scores, 0.0) * masked_confidences
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weighted_scores = weighted_sum.sum(axis=0) / total_weight
+            avg_confidences = total_weight / method_counts
+            
+        multiple = method_counts > 1
+        combined_scores = np.where(multiple & (total_weight > 0), weighted_scores, first_scores)
+        combined_confidences = np.where(multiple & (total_weight > 0), avg_confidences, first_confidences)
+        
+        return combined_scores, combined_confidences, method_counts
+        
     async def _model_update_loop(self):
         """Background model update loop"""
         try:
@@ -944,55 +1300,69 @@ class NetworkAnomalyDetector:
             logger.error(f"Error in model update loop: {e}")
             
     async def _update_models(self):
-        """Update machine learning models with recent data"""
+        """
+        Train a new model version on recent data and swap it in.
+        
+        Training runs in a worker process (unless model_training_mode is
+        'inline') while packets keep being scored with the active models. The
+        candidate is published as a new version and activated only if its
+        holdout score is no worse than the active models' score on the same
+        holdout, minus model_promotion_tolerance.
+        """
+        if not ML_AVAILABLE or len(self.packet_history) < 100 or self.training_in_progress:
+            return
+            
+        self.training_in_progress = True
+        
         try:
-            if not ML_AVAILABLE or len(self.packet_history) < 100:
-                return
-                
             logger.info("Updating machine learning models...")
             
-            # Extract features from recent packets
-            recent_packets = list(self.packet_history)[-1000:]  # Last 1000 packets
-            features = self._extract_features(recent_packets)
+            # Extract features from recent packets straight from the history columns
+            recent_window = self.packet_history.window(self.model_training_samples)
+            features = self._extract_features(recent_window)
             
             # Prepare feature matrix
-            feature_matrix = []
-            for i in range(len(recent_packets)):
-                packet_features = {key: values[i] if i < len(values) else 0.0 
-                                 for key, values in features.items()}
-                feature_vector = self._prepare_feature_vector(packet_features)
-                if feature_vector:
-                    feature_matrix.append(feature_vector)
-                    
+            feature_matrix = self._build_feature_matrix(features, len(recent_window))
+            
             if len(feature_matrix) < 50:
                 return
                 
-            # Update feature scaler
-            if self.feature_scaler is None:
-                self.feature_scaler = StandardScaler()
-                
-            feature_matrix = np.array(feature_matrix)
-            self.feature_scaler.fit(feature_matrix)
-            scaled_features = self.feature_scaler.transform(feature_matrix)
+            loop = asyncio.get_running_loop()
             
-            # Update Isolation Forest
-            if self.isolation_forest:
-                self.isolation_forest.fit(scaled_features)
-                
-            # Update DBSCAN
-            if self.dbscan_model:
-                self.dbscan_model.fit(scaled_features)
+            if self.model_training_mode == 'process':
+                models, evaluation = await loop.run_in_executor(
+                    self._get_training_executor(), train_model_version,
+                    feature_matrix, self._model_bundle(), self.model_holdout_fraction
+                )
+            else:
+                models, evaluation = train_model_version(feature_matrix, self._model_bundle(), self.model_holdout_fraction)
                 
-            # Save updated models
-            self._save_models()
+            promote = (
+                self.model_version is None or
+                evaluation['candidate']['score'] >= evaluation['current']['score'] - self.model_promotion_tolerance
+            )
             
-            self.detection_stats['last_model_update'] = datetime.now()
+            # Writing the version to disk happens off the event loop as well
+            version = await loop.run_in_executor(
+                None, self.model_registry.publish, models, {'evaluation': evaluation}, promote
+            )
             
-            logger.info("Machine learning models updated successfully")
+            if promote:
+                self._activate_models(models, version, evaluation['candidate'])
+                logger.info(f"Activated model version {version} (score {evaluation['candidate']['score']:.3f})")
+            else:
+                self.detection_stats['models_rejected'] += 1
+                logger.info(f"Kept model version {self.model_version}: candidate {version} scored "
+                            f"{evaluation['candidate']['score']:.3f} vs {evaluation['current']['score']:.3f}")
+                            
+            self.detection_stats['last_model_update'] = datetime.now()
             
         except Exception as e:
             logger.error(f"Error updating models: {e}")
             
+        finally:
+            self.training_in_progress = False
+            
     async def _profile_update_loop(self):
         """Background profile update loop"""
         try:
@@ -1005,6 +1375,11 @@ class NetworkAnomalyDetector:
                 # Update network profiles
                 await self._update_profiles()
                 
+                # Drop pairs idle past the profile TTL
+                expired = self.profile_store.expire()
+                if expired:
+                    logger.info(f"Expired {expired} idle network profiles")
+                    
         except Exception as e:
             logger.error(f"Error in profile update loop: {e}")
             
@@ -1013,29 +1388,45 @@ class NetworkAnomalyDetector:
         try:
             logger.info("Updating network profiles...")
             
-            # Group recent packets by profile
-            recent_packets = list(self.packet_history)[-500:]  # Last 500 packets
-            profile_packets = defaultdict(list)
-            
-            for packet in recent_packets:
-                profile_key = f"{packet.src_ip}_{packet.dst_ip}"
-                profile_packets[profile_key].append(packet)
+            # Prefer completed flows when a flow table feeds the detector
+            if self.flow_history:
+                flows, self.flow_history = list(self.flow_history), deque(maxlen=self.flow_history.maxlen)
+                profile_flows = defaultdict(list)
                 
-            # Update each profile
-            for profile_key, packets in profile_packets.items():
-                if profile_key in self.network_profiles:
-                    profile = self.network_profiles[profile_key]
-                    self._update_single_profile(profile, packets)
+                for flow in flows:
+                    profile_flows[(flow.src_ip, flow.dst_ip)].append(flow)
                     
-            # Save updated profiles
+                for (src_ip, dst_ip), grouped in profile_flows.items():
+                    profile = self.profile_store.get(src_ip, dst_ip, create=False)
+                    if profile:
+                        self._update_profile_from_flows(profile, grouped)
+                        
+                updated = len(profile_flows)
+            else:
+                # Group recent packets by profile
+                recent_packets = self.packet_history[-500:]  # Last 500 packets
+                profile_packets = defaultdict(list)
+                
+                for packet in recent_packets:
+                    profile_packets[(packet.src_ip, packet.dst_ip)].append(packet)
+                    
+                # Update each profile
+                for (src_ip, dst_ip), packets in profile_packets.items():
+                    profile = self.profile_store.get(src_ip, dst_ip, create=False)
+                    if profile:
+                        self._update_single_profile(profile, packets)
+                        
+                updated = len(profile_packets)
+                
+            # Save changed profiles
             self._save_profiles()
             
-            logger.info(f"Updated {len(profile_packets)} network profiles")
+            logger.info(f"Updated {updated} network profiles")
             
         except Exception as e:
             logger.error(f"Error updating profiles: {e}")
             
-    def _update_single_profile(self, profile: NetworkProfile, packets: List[PacketMetadata]):
+    def _update_single_profile(self, profile: CompactProfile, packets: List[PacketMetadata]):
         """Update a single network profile"""
         try:
             # Update packet size statistics
@@ -1046,37 +1437,65 @@ class NetworkAnomalyDetector:
                 new_avg_size = np.mean(sizes)
                 profile.avg_packet_size = (1 - alpha) * profile.avg_packet_size + alpha * new_avg_size
                 
-            # Update port usage
-            new_ports = [p.dst_port for p in packets if p.dst_port]
-            if new_ports:
-                for port in new_ports:
-                    if port not in profile.typical_ports:
-                        profile.typical_ports.append(port)
-                        
-                # Limit port list size
-                if len(profile.typical_ports) > 20:
-                    profile.typical_ports = profile.typical_ports[-20:]
-                    
+            # Update port usage (the store keeps the most recent ports)
+            for port in dict.fromkeys(p.dst_port for p in packets if p.dst_port):
+                profile.add_port(port)
+                
             # Update protocol usage
-            new_protocols = [p.protocol for p in packets]
-            if new_protocols:
-                for protocol in new_protocols:
-                    if protocol not in profile.typical_protocols:
-                        profile.typical_protocols.append(protocol)
-                        
+            for protocol in set(p.protocol for p in packets):
+                profile.add_protocol(protocol)
+                
             # Update active hours
-            new_hours = [p.timestamp.hour for p in packets]
-            if new_hours:
-                for hour in new_hours:
-                    if hour not in profile.active_hours:
-                        profile.active_hours.append(hour)
-                        
+            for hour in set(p.timestamp.hour for p in packets):
+                profile.add_hour(hour)
+                
             # Update timestamp
-            profile.last_updated = datetime.now()
+            profile.last_updated = time.time()
+            self.profile_store.mark_dirty(profile)
             
         except Exception as e:
             logger.error(f"Error updating single profile: {e}")
             
+    def _update_profile_from_flows(self, profile: CompactProfile, flows: List[FlowRecord]):
+        """Update a single network profile from completed flow records"""
+        try:
+            alpha = self.learning_rate
+            total_packets = sum(flow.packets for flow in flows)
+            total_bytes = sum(flow.bytes for flow in flows)
+            
+            if total_packets:
+                profile.avg_packet_size = (1 - alpha) * profile.avg_packet_size + alpha * total_bytes / total_packets
+                
+            # Per-connection behaviour is only available from flows
+            profile.connection_duration_avg = (
+                (1 - alpha) * profile.connection_duration_avg + alpha * float(np.mean([flow.duration for flow in flows]))
+            )
+            profile.bytes_transferred_avg = (1 - alpha) * profile.bytes_transferred_avg + alpha * total_bytes / len(flows)
+            
+            for flow in flows:
+                if flow.dst_port:
+                    profile.add_port(flow.dst_port)
+                profile.add_protocol(flow.protocol)
+                profile.add_hour(flow.first_seen.hour)
+                
+            profile.last_updated = time.time()
+            self.profile_store.mark_dirty(profile)
+            
+        except Exception as e:
+            logger.error(f"Error updating profile from flows: {e}")
+            
+    async def observe_flows(self, flows: List[FlowRecord]):
+        """
+        Record completed flows for profile updates (use as a NetSniffer flow callback).
+        
+        Args:
+            flows: Batch of completed flow records
+        """
+        self.flow_history.extend(flows)
+        
+        for flow in flows:
+            self._get_network_profile(flow)
+            
     async def _generate_detection_report(self):
         """Generate detection performance report"""
         try:
@@ -1086,7 +1505,7 @@ class NetworkAnomalyDetector:
             report = {
                 'timestamp': datetime.now().isoformat(),
                 'detection_stats': self.detection_stats,
-                'active_profiles': len(self.network_profiles),
+                'active_profiles': len(self.profile_store),
                 'packet_history_size': len(self.packet_history),
                 'anomaly_history_size': len(self.anomaly_history),
                 'detection_methods': [method.value for method in self.detection_methods],
@@ -1110,16 +1529,17 @@ class NetworkAnomalyDetector:
         """Get current detection statistics"""
         return {
             **self.detection_stats,
-            'active_profiles': len(self.network_profiles),
+            'active_profiles': len(self.profile_store),
             'packet_history_size': len(self.packet_history),
             'anomaly_history_size': len(self.anomaly_history),
             'detection_methods': [method.value for method in self.detection_methods],
+            'profile_store': self.profile_store.get_stats(),
             'running': self.running
         }
         
     def get_network_profiles(self) -> List[Dict[str, Any]]:
-        """Get network profiles"""
-        return [profile.to_dict() for profile in self.network_profiles.values()]
+        """Get network profiles held in memory"""
+        return [profile.to_dict() for profile in self.profile_store]
         
     def export_detection_data(self, output_file: str) -> Dict[str, Any]:
         """Export detection data"""
@@ -1136,7 +1556,7 @@ class NetworkAnomalyDetector:
                         'protocol': p.protocol,
                         'packet_size': p.packet_size
                     }
-                    for p in list(self.packet_history)[-100:]
+                    for p in self.packet_history[-100:]
                 ]
             }
             
@@ -1146,8 +1566,8 @@ class NetworkAnomalyDetector:
             return {
                 'success': True,
                 'output_file': output_file,
-                'profiles_exported': len(self.network_profiles),
-                'packets_exported': len(list(self.packet_history)[-100:])
+                'profiles_exported': len(export_data['network_profiles']),
+                'packets_exported': min(len(self.packet_history), 100)
             }
             
         except Exception as e:
@@ -0,0 +1,156 @@
+"""
+Feature Extraction Benchmark
+
+Compares the vectorized NetworkAnomalyDetector feature extractors against the
+previous per-packet Python loops on synthetic batches of 1k, 10k and 100k
+packets, checks that both produce the same features, and reports
+packets-per-second for each batch size.
+
+Usage:
+    python network_security/benchmarks/feature_extraction.py [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Network security modules use flat imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from netsniffer import PacketMetadata
+from anomaly_detector import NetworkAnomalyDetector
+from packet_store import PacketWindow
+
+
+def generate_packets(count: int, seed: int = 42):
+    """Generate a synthetic packet batch with a mix of protocols and ports"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(hours=2)
+    protocols = ["TCP", "TCP", "TCP", "UDP", "UDP", "ICMP"]
+    packets = []
+    timestamp = start
+    
+    for _ in range(count):
+        timestamp += timedelta(microseconds=rng.randint(0, 2000))
+        protocol = rng.choice(protocols)
+        packets.append(PacketMetadata(
+            timestamp=timestamp,
+            src_ip=f"10.0.{rng.randint(0, 15)}.{rng.randint(1, 254)}",
+            dst_ip=f"192.168.1.{rng.randint(1, 30)}",
+            src_port=rng.randint(1024, 65535) if protocol != "ICMP" else None,
+            dst_port=rng.choice([22, 53, 80, 443, 3389, rng.randint(1, 65535)]) if protocol != "ICMP" else None,
+            protocol=protocol,
+            packet_size=rng.randint(40, 1500),
+            tcp_flags=["SYN"] if protocol == "TCP" else []
+        ))
+        
+    return packets
+
+
+def legacy_extract_features(packets):
+    """Per-packet loop implementation the vectorized extractors replace"""
+    features = {}
+    
+    features['packet_size'] = [packet.packet_size for packet in packets]
+    
+    if len(packets) < 2:
+        features['packet_rate'] = [0.0]
+    else:
+        time_diffs = []
+        for i in range(1, len(packets)):
+            diff = (packets[i].timestamp - packets[i-1].timestamp).total_seconds()
+            time_diffs.append(1.0 / diff if diff > 0 else 0.0)
+        features['packet_rate'] = time_diffs
+        
+    ports = set()
+    diversity_scores = []
+    for i, packet in enumerate(packets):
+        if packet.dst_port:
+            ports.add(packet.dst_port)
+        diversity_scores.append(len(ports) / (i + 1))
+    features['port_diversity'] = diversity_scores
+    
+    protocol_counts = defaultdict(int)
+    protocol_scores = []
+    for i, packet in enumerate(packets):
+        protocol_counts[packet.protocol] += 1
+        total_packets = i + 1
+        entropy = 0.0
+        for count in protocol_counts.values():
+            p = count / total_packets
+            if p > 0:
+                entropy -= p * np.log2(p)
+        protocol_scores.append(entropy)
+    features['protocol_distribution'] = protocol_scores
+    
+    timing_features = []
+    for packet in packets:
+        hour = packet.timestamp.hour
+        timing_features.append((hour / 24.0 + (1.0 if 9 <= hour <= 17 else 0.0)) / 2.0)
+    features['timing_patterns'] = timing_features
+    
+    connection_features = []
+    seen_connections = set()
+    for packet in packets:
+        connection = (packet.src_ip, packet.dst_ip, packet.dst_port)
+        is_new_connection = 1.0 if connection not in seen_connections else 0.0
+        seen_connections.add(connection)
+        connection_features.append((is_new_connection + len(seen_connections) / len(packets)) / 2.0)
+    features['connection_patterns'] = connection_features
+    
+    return {name: np.array(values) for name, values in features.items()}
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    """Best wall-clock time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark anomaly detector feature extraction")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix='feature_bench_')
+    detector = NetworkAnomalyDetector({
+        'model_dir': f"{work_dir}/models",
+        'profile_dir': f"{work_dir}/profiles"
+    })
+    
+    print(f"{'packets':>10} {'legacy pkt/s':>15} {'vectorized pkt/s':>18} {'from store pkt/s':>18} {'speedup':>9}  match")
+    print("-" * 80)
+    
+    for size in args.sizes:
+        packets = generate_packets(size)
+        window = PacketWindow.from_packets(packets)
+        
+        legacy = legacy_extract_features(packets)
+        vectorized = detector._extract_features(packets)
+        match = all(np.allclose(legacy[name], vectorized[name]) for name in legacy)
+        
+        legacy_time = time_call(legacy_extract_features, packets, repeat=args.repeat)
+        vectorized_time = time_call(detector._extract_features, packets, repeat=args.repeat)
+        window_time = time_call(detector._extract_features, window, repeat=args.repeat)
+        
+        print(f"{size:>10} {size / legacy_time:>15,.0f} {size / vectorized_time:>18,.0f} "
+              f"{size / window_time:>18,.0f} {legacy_time / window_time:>8.1f}x  {'yes' if match else 'NO'}")
+              
+    print("\n'vectorized' includes building columns from PacketMetadata objects; "
+          "'from store' starts from PacketHistoryStore columns.")
+
+
+if __name__ == "__main__":
+    main()
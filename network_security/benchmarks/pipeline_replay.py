@@ -0,0 +1,470 @@
+"""
+Pipeline Replay Benchmark
+
+Replays synthetic traffic scenarios (normal traffic, port scan, brute force,
+DDoS, DNS tunneling) or pcap files through the real NetSniffer ->
+NetworkAnomalyDetector -> SecurityOrchestrator -> NetworkActionEngine chain,
+with response actions in dry-run mode, and reports:
+
+- end-to-end and per-stage throughput (items per second of time spent in the stage)
+- p50/p99 latency from packet injection to incident creation
+- memory high-water mark
+- detection recall per attack scenario (synthetic traffic only)
+
+Packets enter the pipeline where a live capture does (the sniffer's packet
+metadata path), either as fast as possible or paced at --rate packets per
+second. Use --json to keep results and the --fail-under-* options to turn
+regressions into a non-zero exit status.
+
+Usage:
+    python network_security/benchmarks/pipeline_replay.py [--packets 50000] [--rate 0]
+        [--scenarios normal port_scan brute_force ddos dns_tunneling] [--pcap FILE ...]
+        [--json results.json] [--fail-under-recall 1.0] [--fail-under-pps 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+# Network security modules use flat imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from netsniffer import PacketMetadata, AttackType
+from pcap_stream import PcapStreamParser, decode_record
+from security_orchestrator import SecurityOrchestrator, ResponseAction
+from network_actions import NetworkActionEngine, ActionType
+
+SCENARIOS = ['normal', 'port_scan', 'brute_force', 'ddos', 'dns_tunneling']
+
+# Responses forwarded to the action engine
+RESPONSE_ACTIONS = {
+    ResponseAction.BLOCK_IP: ActionType.FIREWALL_BLOCK,
+    ResponseAction.RATE_LIMIT: ActionType.BANDWIDTH_LIMIT,
+    ResponseAction.QUARANTINE: ActionType.QUARANTINE_VLAN
+}
+
+# Detection thresholds sized for benchmark traffic rates (background traffic
+# alone would exceed the default DDoS threshold of 100 packets per minute)
+DEFAULT_SNIFFER_CONFIG = {
+    'ddos_threshold': 5000,
+    'port_scan_threshold': 20,
+    'brute_force_threshold': 10,
+    'dns_tunnel_threshold': 50
+}
+
+
+@dataclass
+class Expectation:
+    """An injected attack the pipeline should raise an incident for"""
+    scenario: str
+    attack_types: Tuple[AttackType, ...]
+    src_ip: Optional[str] = None
+    dst_ip: Optional[str] = None
+    
+    def matches(self, attack_type: AttackType, src_ip: str, dst_ip: str) -> bool:
+        return (attack_type in self.attack_types
+                and (self.src_ip is None or src_ip == self.src_ip)
+                and (self.dst_ip is None or dst_ip == self.dst_ip))
+
+
+def _packet(timestamp: datetime, src_ip: str, dst_ip: str, src_port: Optional[int], dst_port: Optional[int],
+            protocol: str = "TCP", packet_size: int = 60, tcp_flags: Optional[List[str]] = None,
+            dns_query: Optional[str] = None) -> PacketMetadata:
+    return PacketMetadata(
+        timestamp=timestamp, src_ip=src_ip, dst_ip=dst_ip, src_port=src_port, dst_port=dst_port,
+        protocol=protocol, packet_size=packet_size, tcp_flags=tcp_flags or [], dns_query=dns_query
+    )
+
+
+def generate_normal(start: datetime, count: int, packet_rate: float, rng: random.Random) -> List[PacketMetadata]:
+    """Background web, DNS and ICMP traffic from many clients to a few servers"""
+    packets = []
+    for i in range(count):
+        timestamp = start + timedelta(seconds=i / packet_rate)
+        src_ip = f"10.0.{rng.randint(0, 15)}.{rng.randint(1, 254)}"
+        dst_ip = f"192.168.1.{rng.randint(1, 30)}"
+        kind = rng.random()
+        
+        if kind < 0.8:
+            packets.append(_packet(timestamp, src_ip, dst_ip, rng.randint(1024, 65535), rng.choice([80, 443]),
+                                   packet_size=rng.randint(60, 1500), tcp_flags=rng.choice([['ACK'], ['PSH', 'ACK']])))
+        elif kind < 0.95:
+            packets.append(_packet(timestamp, src_ip, "192.168.1.53", rng.randint(1024, 65535), 53, protocol="UDP",
+                                   packet_size=80, dns_query=f"host{rng.randint(1, 500)}.example.com."))
+        else:
+            packets.append(_packet(timestamp, src_ip, dst_ip, None, None, protocol="ICMP", packet_size=84))
+            
+    return packets
+
+
+def generate_attack(scenario: str, start: datetime, rng: random.Random) -> Tuple[List[PacketMetadata], Expectation]:
+    """Packets of one attack scenario starting at `start`, with what it should be detected as"""
+    def at(seconds: float) -> datetime:
+        return start + timedelta(seconds=seconds)
+        
+    if scenario == 'port_scan':
+        packets = [_packet(at(port * 0.01), "6.6.6.6", "192.168.1.5", 55555, port, tcp_flags=['SYN'])
+                   for port in range(1, 301)]
+        return packets, Expectation(scenario, (AttackType.PORT_SCAN,), src_ip="6.6.6.6")
+        
+    if scenario == 'brute_force':
+        packets = [_packet(at(i * 0.2), "7.7.7.7", "192.168.1.6", 40000 + i, 22, tcp_flags=['SYN'])
+                   for i in range(100)]
+        return packets, Expectation(scenario, (AttackType.BRUTE_FORCE,), src_ip="7.7.7.7")
+        
+    if scenario == 'ddos':
+        packets = [_packet(at(i * 0.001), f"172.16.{rng.randint(0, 7)}.{rng.randint(1, 254)}", "192.168.1.9",
+                           rng.randint(1024, 65535), 80, tcp_flags=['SYN'])
+                   for i in range(8000)]
+        return packets, Expectation(scenario, (AttackType.DDoS,), dst_ip="192.168.1.9")
+        
+    if scenario == 'dns_tunneling':
+        packets = [_packet(at(i * 0.05), "9.9.9.9", "192.168.1.53", 33333, 53, protocol="UDP", packet_size=160,
+                           dns_query=''.join(rng.choice('abcdef0123456789') for _ in range(60)) + ".tunnel.example.")
+                   for i in range(150)]
+        return packets, Expectation(scenario, (AttackType.DNS_TUNNELING,), src_ip="9.9.9.9")
+        
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def build_synthetic_traffic(scenarios: List[str], packets: int, packet_rate: float,
+                            seed: int = 42) -> Tuple[List[PacketMetadata], List[Expectation]]:
+    """Background traffic with each attack scenario injected at evenly spaced offsets"""
+    rng = random.Random(seed)
+    start = datetime.now()
+    duration = packets / packet_rate
+    
+    traffic = generate_normal(start, packets, packet_rate, rng) if 'normal' in scenarios else []
+    attacks = [scenario for scenario in scenarios if scenario != 'normal']
+    expectations = []
+    
+    for i, scenario in enumerate(attacks):
+        offset = duration * (i + 1) / (len(attacks) + 1)
+        attack_packets, expectation = generate_attack(scenario, start + timedelta(seconds=offset), rng)
+        traffic.extend(attack_packets)
+        expectations.append(expectation)
+        
+    traffic.sort(key=lambda packet: packet.timestamp)
+    return traffic, expectations
+
+
+def load_pcap(pcap_file: Path, read_size: int = 1024 * 1024) -> List[PacketMetadata]:
+    """Decode a pcap file with the streaming parser used by the sniffer"""
+    parser = PcapStreamParser()
+    packets = []
+    
+    with open(pcap_file, 'rb') as f:
+        while chunk := f.read(read_size):
+            for record in parser.feed(chunk):
+                fields = decode_record(record, parser.linktype)
+                if fields is not None:
+                    packets.append(PacketMetadata(**fields))
+                    
+    return packets
+
+
+class StageTimer:
+    """Accumulates time spent in instrumented pipeline methods"""
+    
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        
+    def record(self, stage: str, elapsed: float, items: int = 1):
+        totals = self.stages.setdefault(stage, {'calls': 0, 'items': 0, 'seconds': 0.0})
+        totals['calls'] += 1
+        totals['items'] += items
+        totals['seconds'] += elapsed
+        
+    def instrument(self, obj: Any, method: str, stage: str, items=None):
+        """Wrap obj.method (sync or async); items(*args) gives the work size of a call"""
+        original = getattr(obj, method)
+        
+        if asyncio.iscoroutinefunction(original):
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - started, items(*args) if items else 1)
+        else:
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - started, items(*args) if items else 1)
+                    
+        setattr(obj, method, wrapper)
+        
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {**totals, 'items_per_second': totals['items'] / totals['seconds'] if totals['seconds'] else 0.0}
+            for stage, totals in self.stages.items()
+        }
+
+
+class PipelineReplay:
+    """Wires the pipeline together in a scratch directory and replays packets through it"""
+    
+    def __init__(self, work_dir: str, sniffer_config: Dict[str, Any], orchestrator_config: Dict[str, Any]):
+        self.orchestrator = SecurityOrchestrator({
+            'incident_dir': f"{work_dir}/incidents",
+            'report_dir': f"{work_dir}/reports",
+            'event_dir': f"{work_dir}/events",
+            **orchestrator_config,
+            'sniffer': {
+                'capture_dir': f"{work_dir}/captures",
+                'log_dir': f"{work_dir}/logs",
+                'report_dir': f"{work_dir}/reports",
+                **sniffer_config
+            },
+            'detector': {
+                'model_dir': f"{work_dir}/models",
+                'profile_dir': f"{work_dir}/profiles",
+                **orchestrator_config.get('detector', {})
+            }
+        })
+        self.action_engine = NetworkActionEngine({
+            'dry_run': True,
+            'action_dir': f"{work_dir}/actions"
+        }, event_store=self.orchestrator.event_store)
+        
+        self.timer = StageTimer()
+        self.ingest_times: Dict[int, float] = {}
+        self.current_ingest = 0.0
+        self.latencies: List[float] = []
+        self.incidents: List[Tuple[AttackType, str, str]] = []
+        
+        sniffer = self.orchestrator.sniffer
+        self.timer.instrument(sniffer, '_update_detectors', 'attack_detection')
+        self.timer.instrument(self.orchestrator.anomaly_detector, 'analyze_batch', 'anomaly_scoring', items=len)
+        self.timer.instrument(self.orchestrator.anomaly_detector, 'analyze_packet', 'anomaly_scoring')
+        self.timer.instrument(self.orchestrator, '_correlate_incident', 'incident_handling')
+        self.timer.instrument(self.action_engine, '_execute_action', 'response_actions')
+        
+        self.orchestrator.add_incident_callback(self._on_incident)
+        self.orchestrator.add_response_callback(self._on_response)
+        
+    async def _on_incident(self, incident):
+        """Record detection latency from the injection of the triggering packet"""
+        now = time.perf_counter()
+        injected = [self.ingest_times[id(packet)] for packet in incident.raw_packets if id(packet) in self.ingest_times]
+        
+        # Detector evidence is rebuilt from the packet store, so fall back to the
+        # packet being processed when the incident was raised
+        self.latencies.append(now - (max(injected) if injected else self.current_ingest))
+        self.incidents.append((incident.attack_type, incident.source_ip, incident.target_ip))
+        
+    async def _on_response(self, incident, response: ResponseAction):
+        """Forward blocking responses to the (dry-run) action engine"""
+        action_type = RESPONSE_ACTIONS.get(response)
+        if action_type is not None and self.action_engine._validate_ip_address(incident.source_ip):
+            await self.action_engine.queue_action(
+                action_type, incident.source_ip, duration_seconds=3600, severity=incident.severity.value
+            )
+            
+    async def replay(self, packets: List[PacketMetadata], rate: float = 0.0,
+                     memory_samples: int = 100) -> Dict[str, Any]:
+        """
+        Push packets through the pipeline.
+        
+        Args:
+            packets: Packets in capture order
+            rate: Packets per second to replay at (0 = as fast as possible)
+            memory_samples: Times the resident set high-water mark is sampled
+            
+        Returns:
+            Throughput, latency and memory results
+        """
+        sniffer = self.orchestrator.sniffer
+        await self.action_engine.start()
+        
+        sample_every = max(1, len(packets) // memory_samples)
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        
+        for i, packet in enumerate(packets):
+            if rate:
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+                    
+            self.current_ingest = self.ingest_times[id(packet)] = time.perf_counter()
+            await sniffer._process_packet_metadata(packet)
+            
+            if i % sample_every == 0:
+                peak_rss_kb = max(peak_rss_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+                
+        # Analyze the last partial batch and let queued actions finish
+        await self.orchestrator._flush_packet_batch()
+        ingest_seconds = time.perf_counter() - started
+        
+        while len(self.action_engine.scheduler) or self.action_engine.active_actions:
+            await asyncio.sleep(0.01)
+        total_seconds = time.perf_counter() - started
+        
+        await self.action_engine.stop()
+        peak_rss_kb = max(peak_rss_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        
+        latencies = np.array(self.latencies) * 1000.0
+        return {
+            'packets': len(packets),
+            'ingest_seconds': ingest_seconds,
+            'total_seconds': total_seconds,
+            'packets_per_second': len(packets) / ingest_seconds if ingest_seconds else 0.0,
+            'stages': self.timer.report(),
+            'incidents': len(self.incidents),
+            'latency_ms': {
+                'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                'max': float(latencies.max()) if len(latencies) else None
+            },
+            'peak_rss_mb': peak_rss_kb / 1024.0,
+            'actions': self.action_engine.get_action_stats()['scheduler']
+        }
+        
+    def recall(self, expectations: List[Expectation]) -> Dict[str, Any]:
+        """Share of injected attacks with a matching incident or sniffer anomaly"""
+        detections = list(self.incidents) + [
+            (anomaly.attack_type, anomaly.src_ip, anomaly.dst_ip)
+            for anomaly in self.orchestrator.sniffer.anomaly_buffer
+        ]
+        
+        detected = {
+            expectation.scenario: any(expectation.matches(*detection) for detection in detections)
+            for expectation in expectations
+        }
+        
+        return {
+            'recall': sum(detected.values()) / len(detected) if detected else None,
+            'by_scenario': detected
+        }
+
+
+def print_results(results: Dict[str, Any]):
+    print(f"\nReplayed {results['packets']:,} packets in {results['ingest_seconds']:.2f} s "
+          f"({results['packets_per_second']:,.0f} pkt/s end to end)")
+          
+    print(f"\n{'stage':<20} {'calls':>10} {'items':>10} {'seconds':>9} {'items/s':>12}")
+    print("-" * 65)
+    for stage, totals in results['stages'].items():
+        print(f"{stage:<20} {totals['calls']:>10,} {totals['items']:>10,} "
+              f"{totals['seconds']:>9.3f} {totals['items_per_second']:>12,.0f}")
+              
+    latency = results['latency_ms']
+    if latency['p50'] is not None:
+        print(f"\nIncidents: {results['incidents']}  latency p50 {latency['p50']:.2f} ms, "
+              f"p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    else:
+        print("\nIncidents: 0")
+        
+    actions = results['actions']
+    print(f"Actions: {actions['dispatched']} dispatched, {actions['coalesced']} coalesced, "
+          f"average wait {actions['average_wait_time'] * 1000:.2f} ms")
+    print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB"
+          + (f", traced Python heap peak {results['traced_peak_mb']:.1f} MB" if 'traced_peak_mb' in results else ""))
+          
+    if results.get('recall'):
+        recall = results['recall']
+        print(f"\nRecall: {recall['recall']:.0%}")
+        for scenario, detected in recall['by_scenario'].items():
+            print(f"  {scenario:<16} {'detected' if detected else 'MISSED'}")
+
+
+async def run(args) -> Dict[str, Any]:
+    if args.pcap:
+        started = time.perf_counter()
+        packets = [packet for pcap_file in args.pcap for packet in load_pcap(Path(pcap_file))]
+        decode_seconds = time.perf_counter() - started
+        expectations = []
+    else:
+        packets, expectations = build_synthetic_traffic(args.scenarios, args.packets, args.packet_rate, args.seed)
+        decode_seconds = None
+        
+    work_dir = tempfile.mkdtemp(prefix='pipeline_replay_')
+    replay = PipelineReplay(
+        work_dir,
+        {**DEFAULT_SNIFFER_CONFIG, **args.config.get('sniffer', {})},
+        {key: value for key, value in args.config.items() if key != 'sniffer'}
+    )
+    
+    if args.tracemalloc:
+        tracemalloc.start()
+        
+    results = await replay.replay(packets, rate=args.rate)
+    
+    if args.tracemalloc:
+        results['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        
+    if decode_seconds is not None:
+        results['stages'] = {
+            'decode': {'calls': len(args.pcap), 'items': len(packets), 'seconds': decode_seconds,
+                       'items_per_second': len(packets) / decode_seconds if decode_seconds else 0.0},
+            **results['stages']
+        }
+        
+    if expectations:
+        results['recall'] = replay.recall(expectations)
+        
+    results['work_dir'] = work_dir
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay traffic through the network security pipeline")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--packets', type=int, default=50000, help="Background packets (synthetic traffic)")
+    parser.add_argument('--packet-rate', type=float, default=2000.0,
+                        help="Packets per second of synthetic capture time")
+    parser.add_argument('--rate', type=float, default=0.0, help="Replay rate in packets per second (0 = unpaced)")
+    parser.add_argument('--pcap', nargs='+', help="Replay pcap files instead of synthetic traffic")
+    parser.add_argument('--config', type=json.loads, default={},
+                        help="Orchestrator configuration as JSON (merged over the benchmark defaults)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tracemalloc', action='store_true', help="Also report the traced Python heap peak (slower)")
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--fail-under-recall', type=float, help="Exit with status 1 if recall is lower")
+    parser.add_argument('--fail-under-pps', type=float, help="Exit with status 1 if end-to-end pkt/s is lower")
+    parser.add_argument('--verbose', action='store_true', help="Show pipeline log output")
+    args = parser.parse_args()
+    
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.disable(logging.CRITICAL)
+    
+    results = asyncio.run(run(args))
+    print_results(results)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+            
+    failures = []
+    recall = results.get('recall', {}).get('recall')
+    if args.fail_under_recall is not None and recall is not None and recall < args.fail_under_recall:
+        failures.append(f"recall {recall:.2f} < {args.fail_under_recall}")
+    if args.fail_under_pps is not None and results['packets_per_second'] < args.fail_under_pps:
+        failures.append(f"{results['packets_per_second']:,.0f} pkt/s < {args.fail_under_pps:,.0f}")
+        
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
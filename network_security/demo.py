@@ -377,7 +377,7 @@ class NetworkSecurityDemo:
         sniffer_status = status.get('sniffer_status', {})
         print(f"   📡 NetSniffer: {'Running' if sniffer_status.get('running') else 'Stopped'}")
         print(f"      Packets buffered: {sniffer_status.get('packet_buffer_size', 0)}")
-        print(f"      Anomalies detected: {sniffer_status.get('anomaly_buffer_size', 0)}")
+        print(f"      Anomalies detected: {sniffer_status.get('total_anomalies', 0)}")
         
         detector_status = status.get('detector_status', {})
         print(f"   🔍 Anomaly Detector: {'Running' if detector_status.get('running') else 'Stopped'}")
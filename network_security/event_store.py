@@ -0,0 +1,536 @@
+"""
+Persistent Event Store for Network Security Monitoring
+
+Append-only store for anomalies, incidents and response actions. Records are
+written to SQLite segment files (WAL journal) that rotate every
+`segment_seconds`. Each segment indexes timestamp, source IP, attack type and
+severity (action type and status for actions), so time-range and per-IP
+queries read only matching rows from the segments that overlap the range.
+Retention deletes whole segment files, and only per-segment time bounds are
+kept in memory.
+
+Records that change over their life (incidents) are appended as snapshots
+with `replace=True`; each snapshot deletes the earlier ones for the same
+record, so queries and counts always see exactly one, latest, copy.
+
+`append` only serializes the record and buffers the row, so callers never
+block on disk. A background task collects rows for up to `flush_interval`
+(or until `max_batch` are queued) and inserts them in one transaction on a
+single writer thread, and the write-ahead log is synced to disk at least every
+`sync_interval` seconds. Queries, counts and expiry write buffered rows first,
+so they always see every appended record.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterator, Iterable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    kind TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    src_ip TEXT,
+    dst_ip TEXT,
+    attack_type TEXT,
+    severity TEXT,
+    score REAL,
+    data TEXT NOT NULL,
+    action_type TEXT,
+    status TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (kind, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_src ON events (kind, src_ip, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_attack ON events (kind, attack_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_severity ON events (kind, severity, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_action_type ON events (kind, action_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events (kind, status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_record ON events (kind, record_id);
+"""
+
+# Columns added after the first schema version, created on older segments when opened
+ADDED_COLUMNS = ['action_type', 'status']
+
+FILTER_COLUMNS = ['src_ip', 'dst_ip', 'attack_type', 'severity', 'action_type', 'status']
+GROUP_COLUMNS = set(FILTER_COLUMNS)
+
+
+def write_json_export(output_file: str, header: Dict[str, Any], records_key: str,
+                      records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write header fields and a record list as one JSON document, streaming the records.
+    
+    Returns:
+        Number of records exported
+    """
+    exported = 0
+    
+    with open(output_file, 'w') as f:
+        f.write('{\n')
+        for key, value in header.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value, default=str)},\n")
+        f.write(f"  {json.dumps(records_key)}: [")
+        
+        for record in records:
+            f.write(',\n    ' if exported else '\n    ')
+            f.write(json.dumps(record, default=str))
+            exported += 1
+            
+        f.write('\n  ]\n}\n')
+        
+    return exported
+
+
+@dataclass
+class _Segment:
+    """One segment file and the time range of the records it holds"""
+    path: Path
+    start: float
+    min_timestamp: float = float('inf')
+    max_timestamp: float = float('-inf')
+    
+    def overlaps(self, start: Optional[float], end: Optional[float]) -> bool:
+        if self.min_timestamp > self.max_timestamp:
+            return False
+        return (start is None or self.max_timestamp >= start) and (end is None or self.min_timestamp < end)
+
+
+class EventStore:
+    """
+    Segment-rotated, append-only event store.
+    
+    All components share one store; records are told apart by `kind`
+    ('anomaly', 'incident', 'action').
+    """
+    
+    def __init__(self, store_dir: str = 'network_security/events', segment_seconds: float = 86400,
+                 retention_days: Optional[float] = 30, flush_interval: float = 0.2, max_batch: int = 1000,
+                 sync_interval: Optional[float] = 1.0):
+        """
+        Initialize the event store.
+        
+        Args:
+            store_dir: Directory holding the segment files
+            segment_seconds: Wall-clock lifetime of a segment before rotation
+            retention_days: Segments whose newest record is older than this are
+                deleted by `expire` (None keeps everything)
+            flush_interval: Seconds to collect appended records before writing a batch
+            max_batch: Buffered records that trigger an immediate write
+            sync_interval: Seconds between syncs of written batches to disk
+                (None leaves syncing to SQLite's automatic checkpoints)
+        """
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.sync_interval = sync_interval
+        self.last_sync = time.time()
+        
+        self.segments: List[_Segment] = []
+        self.writer: Optional[sqlite3.Connection] = None
+        
+        self.buffer: List[tuple] = []
+        self.wake: Optional[asyncio.Event] = None
+        self.writer_task: Optional[asyncio.Task] = None
+        # One thread owns the writer connection, so batches land in append order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-store")
+        
+        self.stats = {
+            'records_appended': 0,
+            'batches_written': 0,
+            'write_errors': 0,
+            'records_replaced': 0,
+            'syncs': 0,
+            'segments_rotated': 0,
+            'segments_expired': 0
+        }
+        
+        self._load_segments()
+        
+    def _load_segments(self):
+        """Discover existing segments and their time bounds"""
+        for path in sorted(self.store_dir.glob('events_*.db')):
+            try:
+                segment = _Segment(path=path, start=float(path.stem.split('_', 1)[1]))
+                connection = self._connect(path)
+                bounds = connection.execute('SELECT MIN(timestamp), MAX(timestamp) FROM events').fetchone()
+                connection.close()
+                if bounds[0] is not None:
+                    segment.min_timestamp, segment.max_timestamp = bounds
+                self.segments.append(segment)
+                
+            except Exception as e:
+                logger.error(f"Error loading event segment {path}: {e}")
+                
+        self.segments.sort(key=lambda segment: segment.start)
+        
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(path))
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        
+        existing = {row[1] for row in connection.execute('PRAGMA table_info(events)')}
+        if not existing.issuperset(ADDED_COLUMNS):
+            with connection:
+                for column in ADDED_COLUMNS:
+                    if column not in existing:
+                        connection.execute(f'ALTER TABLE events ADD COLUMN {column} TEXT')
+                # Older segments kept action type and status in the incident columns
+                connection.execute(
+                    "UPDATE events SET action_type = attack_type, status = severity, attack_type = NULL, "
+                    "severity = NULL WHERE kind = 'action' AND action_type IS NULL"
+                )
+                
+        connection.executescript(INDEXES)
+        return connection
+        
+    def _writer_for(self, now: float) -> sqlite3.Connection:
+        """Connection to the current segment, rotating when it has aged out"""
+        current = self.segments[-1] if self.segments else None
+        
+        if current is None or now - current.start >= self.segment_seconds:
+            if self.writer is not None:
+                self.writer.close()
+                self.stats['segments_rotated'] += 1
+            current = _Segment(path=self.store_dir / f"events_{now:.6f}.db", start=now)
+            self.segments.append(current)
+            self.writer = None
+            
+        if self.writer is None:
+            self.writer = self._connect(current.path)
+            
+        return self.writer
+        
+    def append(self, kind: str, record: Dict[str, Any], record_id: str, timestamp: datetime,
+               src_ip: Optional[str] = None, dst_ip: Optional[str] = None, attack_type: Optional[str] = None,
+               severity: Optional[str] = None, score: Optional[float] = None,
+               action_type: Optional[str] = None, status: Optional[str] = None, replace: bool = False):
+        """
+        Queue one record for writing; returns immediately.
+        
+        Args:
+            kind: Record kind ('anomaly', 'incident', 'action')
+            record: JSON-serializable record (returned by queries)
+            record_id: Record identifier
+            timestamp: Event time, used for time-range queries
+            src_ip, dst_ip, attack_type, severity: Indexed query fields
+            score: Numeric severity for threshold queries
+            action_type, status: Indexed query fields of action records
+            replace: Supersede earlier records of this kind with the same record_id
+        """
+        try:
+            # Serialized now, so later changes to the record are not stored
+            self.buffer.append((kind, record_id, timestamp.timestamp(), src_ip, dst_ip, attack_type, severity,
+                                score, json.dumps(record, default=str), action_type, status, replace))
+                                
+        except Exception as e:
+            logger.error(f"Error appending {kind} to event store: {e}")
+            return
+            
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop: write synchronously once a batch has accumulated
+            if len(self.buffer) >= self.max_batch:
+                self.flush()
+            return
+            
+        if self.writer_task is None or self.writer_task.done():
+            self.wake = asyncio.Event()
+            self.writer_task = asyncio.create_task(self._writer_loop())
+        self.wake.set()
+        
+    async def _writer_loop(self):
+        """Write buffered records in batches"""
+        try:
+            while True:
+                await self.wake.wait()
+                self.wake.clear()
+                
+                # Collect a batch unless one is already full
+                if len(self.buffer) < self.max_batch:
+                    await asyncio.sleep(self.flush_interval)
+                    
+                rows, self.buffer = self.buffer, []
+                if rows:
+                    # Shielded: a cancelled writer task must not drop a batch not yet started
+                    await asyncio.shield(asyncio.wrap_future(self.executor.submit(self._write_rows, rows)))
+                    
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error in event store writer: {e}")
+            
+    def _write_rows(self, rows: List[tuple]):
+        """Insert a batch in one transaction (runs on the writer thread)"""
+        try:
+            # Only the newest snapshot of a replaced record in the batch is written
+            latest = {(row[0], row[1]): index for index, row in enumerate(rows) if row[-1]}
+            rows = [row for index, row in enumerate(rows) if not row[-1] or latest[(row[0], row[1])] == index]
+            
+            now = time.time()
+            writer = self._writer_for(now)
+            
+            with writer:
+                if latest:
+                    deleted = writer.executemany('DELETE FROM events WHERE kind = ? AND record_id = ?', list(latest))
+                    self.stats['records_replaced'] += deleted.rowcount
+                writer.executemany(
+                    'INSERT INTO events (kind, record_id, timestamp, src_ip, dst_ip, attack_type, severity, '
+                    'score, data, action_type, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [row[:-1] for row in rows]
+                )
+                
+            if latest:
+                self._delete_replaced([row for row in rows if row[-1]])
+                
+            segment = self.segments[-1]
+            segment.min_timestamp = min(segment.min_timestamp, min(row[2] for row in rows))
+            segment.max_timestamp = max(segment.max_timestamp, max(row[2] for row in rows))
+            self.stats['records_appended'] += len(rows)
+            self.stats['batches_written'] += 1
+            
+            if self.sync_interval is not None and now - self.last_sync >= self.sync_interval:
+                # A checkpoint syncs the write-ahead log before copying it into the segment
+                writer.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                self.last_sync = now
+                self.stats['syncs'] += 1
+                
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Error writing {len(rows)} records to event store: {e}")
+            
+    def _delete_replaced(self, rows: List[tuple]):
+        """Delete superseded copies of replaced records from older segments (writer thread)"""
+        for segment in self.segments[:-1]:
+            stale = [(row[0], row[1]) for row in rows if segment.min_timestamp <= row[2] <= segment.max_timestamp]
+            if not stale:
+                continue
+                
+            connection = self._connect(segment.path)
+            try:
+                with connection:
+                    deleted = connection.executemany('DELETE FROM events WHERE kind = ? AND record_id = ?', stale)
+                self.stats['records_replaced'] += deleted.rowcount
+            finally:
+                connection.close()
+                
+    def flush(self):
+        """Write buffered records now, after any batch already in flight"""
+        rows, self.buffer = self.buffer, []
+        if rows:
+            self.executor.submit(self._write_rows, rows).result()
+        else:
+            self.executor.submit(lambda: None).result()
+        
+    def _where(self, kind: str, start: Optional[float], end: Optional[float], filters: Dict[str, Any]):
+        unknown = set(filters) - set(FILTER_COLUMNS) - {'min_score'}
+        if unknown:
+            raise ValueError(f"Cannot filter events by: {', '.join(sorted(unknown))}")
+            
+        clauses, params = ['kind = ?'], [kind]
+        conditions = [('timestamp >= ?', start), ('timestamp < ?', end)]
+        conditions += [(f'{column} = ?', filters.get(column)) for column in FILTER_COLUMNS]
+        conditions.append(('score >= ?', filters.get('min_score')))
+        for clause, value in conditions:
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return ' AND '.join(clauses), params
+        
+    def _open_segments(self, start: Optional[float], end: Optional[float]) -> List[sqlite3.Connection]:
+        """Read-only connections to the segments overlapping [start, end); release with `_close_segments`"""
+        self.flush()
+        return [
+            sqlite3.connect(f"file:{segment.path}?mode=ro", uri=True)
+            for segment in self.segments if segment.overlaps(start, end)
+        ]
+        
+    def _close_segments(self, connections: List[sqlite3.Connection]):
+        for connection in connections:
+            connection.close()
+                
+    def query(self, kind: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              src_ip: Optional[str] = None, attack_type: Optional[str] = None, severity: Optional[str] = None,
+              min_score: Optional[float] = None, limit: Optional[int] = None,
+              newest_first: bool = False, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Stream matching records in timestamp order.
+        
+        Rows are read lazily from each overlapping segment and merged, so
+        memory does not grow with the size of the result.
+        
+        Args:
+            kind: Record kind
+            start: Earliest event time (inclusive)
+            end: Latest event time (exclusive)
+            src_ip, attack_type, severity: Exact-match filters
+            min_score: Minimum numeric severity
+            limit: Maximum records to return
+            newest_first: Return records in descending time order
+            **filters: Exact-match filters on the other indexed columns (dst_ip, action_type, status)
+            
+        Yields:
+            Stored records
+        """
+        start_ts = start.timestamp() if start else None
+        end_ts = end.timestamp() if end else None
+        where, params = self._where(kind, start_ts, end_ts, {
+            'src_ip': src_ip, 'attack_type': attack_type, 'severity': severity, 'min_score': min_score, **filters
+        })
+        order = 'DESC' if newest_first else 'ASC'
+        sql = f'SELECT timestamp, data FROM events WHERE {where} ORDER BY timestamp {order}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+            
+        connections = self._open_segments(start_ts, end_ts)
+        try:
+            cursors = [connection.execute(sql, params) for connection in connections]
+            rows = heapq.merge(*cursors, key=lambda row: row[0], reverse=newest_first)
+            
+            for returned, (_, data) in enumerate(rows):
+                if limit is not None and returned >= limit:
+                    break
+                yield json.loads(data)
+                
+        except Exception as e:
+            logger.error(f"Error querying event store: {e}")
+            
+        finally:
+            self._close_segments(connections)
+            
+    def count(self, kind: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              group_by: Optional[str] = None, **filters) -> Any:
+        """
+        Count matching records, optionally grouped by an indexed column.
+        
+        Args:
+            kind: Record kind
+            start: Earliest event time (inclusive)
+            end: Latest event time (exclusive)
+            group_by: An indexed column (src_ip, dst_ip, attack_type, severity, action_type, status)
+            **filters: Indexed column or min_score filters
+            
+        Returns:
+            Total count, or a {value: count} dictionary when grouped
+        """
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group events by: {group_by}")
+            
+        start_ts = start.timestamp() if start else None
+        end_ts = end.timestamp() if end else None
+        where, params = self._where(kind, start_ts, end_ts, filters)
+        
+        counts: Dict[Any, int] = {}
+        total = 0
+        connections = self._open_segments(start_ts, end_ts)
+        
+        try:
+            for connection in connections:
+                if group_by is None:
+                    total += connection.execute(f'SELECT COUNT(*) FROM events WHERE {where}', params).fetchone()[0]
+                    continue
+                for value, count in connection.execute(
+                    f'SELECT {group_by}, COUNT(*) FROM events WHERE {where} GROUP BY {group_by}', params
+                ):
+                    counts[value] = counts.get(value, 0) + count
+                    
+        except Exception as e:
+            logger.error(f"Error counting events: {e}")
+            
+        finally:
+            self._close_segments(connections)
+            
+        return counts if group_by is not None else total
+        
+    def export_json(self, output_file: str, kind: str, header: Dict[str, Any], records_key: str, **filters) -> int:
+        """
+        Write header fields and matching records as one JSON document.
+        
+        Records are streamed from the store, so exports of any size use
+        constant memory.
+        
+        Args:
+            output_file: Output path
+            kind: Record kind
+            header: Fields written before the record list
+            records_key: Key of the record list
+            **filters: Query filters (see `query`)
+            
+        Returns:
+            Number of records exported
+        """
+        return write_json_export(output_file, header, records_key, self.query(kind, **filters))
+        
+    def expire(self, before: Optional[datetime] = None) -> int:
+        """
+        Delete segments whose newest record is older than `before`.
+        
+        Args:
+            before: Cutoff time (defaults to now minus the retention period)
+            
+        Returns:
+            Number of segments deleted
+        """
+        if before is None:
+            if self.retention_days is None:
+                return 0
+            cutoff = time.time() - self.retention_days * 86400
+        else:
+            cutoff = before.timestamp()
+            
+        self.flush()
+        expired = [
+            segment for segment in self.segments[:-1]
+            if segment.max_timestamp < cutoff
+        ]
+        
+        for segment in expired:
+            try:
+                for path in [segment.path, Path(f"{segment.path}-wal"), Path(f"{segment.path}-shm")]:
+                    if path.exists():
+                        path.unlink()
+                self.segments.remove(segment)
+                self.stats['segments_expired'] += 1
+                
+            except Exception as e:
+                logger.error(f"Error expiring event segment {segment.path}: {e}")
+                
+        return len(expired)
+        
+    def close(self):
+        """Write every buffered record and close the current segment"""
+        if self.writer_task is not None and not self.writer_task.done():
+            self.writer_task.cancel()
+        self.flush()
+        self.executor.submit(self._close_writer).result()
+        
+    def _close_writer(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            
+    def get_stats(self) -> Dict[str, Any]:
+        """Event store statistics"""
+        return {
+            **self.stats,
+            'buffered': len(self.buffer),
+            'segments': len(self.segments),
+            'disk_bytes': sum(segment.path.stat().st_size for segment in self.segments if segment.path.exists())
+        }
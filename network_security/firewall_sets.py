@@ -0,0 +1,350 @@
+"""
+Set-Based Firewall Enforcement for Network Actions
+
+Instead of one iptables rule (and one process) per blocked IP, blocked
+addresses are elements of kernel sets: ipset sets matched by one iptables
+rule each, or nftables sets in a dedicated table. Elements carry their own
+timeouts, so the kernel expires blocks without cleanup commands. Blocks
+requested within `batch_window` seconds are coalesced into one
+`ipset restore` or `nft -f -` call.
+
+A batch applied with `nft -f` is one transaction, so a single failing line
+would discard every block coalesced with it. Deleting an element the kernel
+has already timed out is the common case, so each nftables delete is
+preceded by an `add` of the same element, which makes the delete succeed
+whether or not the element still exists. `ipset restore -exist` ignores
+missing elements on its own.
+
+SimulatedFirewallExecutor interprets the same batches in memory, with the
+same failure rules, so the backends can be exercised without root.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+CommandExecutor = Callable[[List[str], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+class FirewallSetBackend(ABC):
+    """
+    Coalesces block/unblock requests into batched set updates.
+    
+    Subclasses render the setup commands and the batch script for their
+    firewall; `block` and `unblock` resolve once the batch holding the
+    request has been applied.
+    """
+    
+    firewall = 'none'
+    
+    def __init__(self, executor: CommandExecutor, set_name: str = 'security_block', chain: str = 'INPUT',
+                 batch_window: float = 0.05, max_batch: int = 1000):
+        """
+        Initialize the backend.
+        
+        Args:
+            executor: Coroutine running a command with optional stdin
+            set_name: Base name of the kernel sets
+            chain: Chain the match rules are attached to
+            batch_window: Seconds requests are collected before a batch is applied
+            max_batch: Batch size that triggers an immediate apply
+        """
+        self.executor = executor
+        self.set_name = set_name
+        self.chain = chain
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        
+        self.ready = False
+        self.pending: List[Tuple[str, str, Optional[int], Optional[int], asyncio.Future]] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.setup_lock = asyncio.Lock()
+        
+        self.stats = {
+            'batches_applied': 0,
+            'elements_added': 0,
+            'elements_removed': 0,
+            'batch_failures': 0,
+            'largest_batch': 0
+        }
+        
+    def _set_for(self, ip: str, port: Optional[int]) -> str:
+        """Set holding an address (and port) of this IP version"""
+        family = '6' if ipaddress.ip_address(ip).version == 6 else ''
+        return f"{self.set_name}{family}{'_port' if port else ''}"
+        
+    @abstractmethod
+    def setup_commands(self) -> List[Tuple[List[str], Optional[str], Optional[List[str]]]]:
+        """(command, stdin, check) steps creating the sets and rules; a step is skipped when its check succeeds"""
+        
+    @abstractmethod
+    def batch_command(self, entries: List[Tuple[str, str, Optional[int], Optional[int]]]) -> Tuple[List[str], str]:
+        """Command and stdin script applying (operation, ip, port, timeout) entries in one call"""
+        
+    async def ensure_setup(self) -> bool:
+        """Create the sets and match rules once"""
+        async with self.setup_lock:
+            if self.ready:
+                return True
+                
+            for cmd, input_data, check in self.setup_commands():
+                if check is not None and (await self.executor(check, None)).get('success'):
+                    continue
+                result = await self.executor(cmd, input_data)
+                if not result.get('success'):
+                    logger.error(f"Firewall set setup failed: {result.get('stderr') or result.get('error')}")
+                    return False
+                    
+            self.ready = True
+            logger.info(f"{self.firewall} block sets ready: {self.set_name}")
+            return True
+            
+    async def block(self, ip: str, port: Optional[int] = None, timeout: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Add an address to the block set.
+        
+        Args:
+            ip: Address to block
+            port: Block only TCP traffic to this local port
+            timeout: Seconds until the kernel removes the block (None = permanent)
+            
+        Returns:
+            Result of the batch that applied the request
+        """
+        return await self._enqueue('add', ip, port, timeout)
+        
+    async def unblock(self, ip: str, port: Optional[int] = None) -> Dict[str, Any]:
+        """Remove an address from the block set"""
+        return await self._enqueue('del', ip, port, None)
+        
+    async def _enqueue(self, operation: str, ip: str, port: Optional[int], timeout: Optional[int]) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((operation, ip, port, timeout, future))
+        
+        if len(self.pending) >= self.max_batch:
+            await self.flush()
+        elif self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._delayed_flush())
+            
+        return await future
+        
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.batch_window)
+        await self.flush()
+        
+    async def flush(self):
+        """Apply every pending request as one batch"""
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+            
+        try:
+            if not await self.ensure_setup():
+                result = {'success': False, 'error': 'firewall set setup failed'}
+            else:
+                cmd, script = self.batch_command([entry[:4] for entry in batch])
+                result = await self.executor(cmd, script)
+                
+        except Exception as e:
+            logger.error(f"Error applying firewall batch: {e}")
+            result = {'success': False, 'error': str(e)}
+            
+        self.stats['batches_applied'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        if result.get('success'):
+            self.stats['elements_added'] += sum(1 for entry in batch if entry[0] == 'add')
+            self.stats['elements_removed'] += sum(1 for entry in batch if entry[0] == 'del')
+        else:
+            self.stats['batch_failures'] += 1
+            
+        result = {**result, 'batch_size': len(batch), 'firewall': self.firewall}
+        for *_, future in batch:
+            if not future.done():
+                future.set_result(result)
+
+
+class IpsetBackend(FirewallSetBackend):
+    """ipset sets (hash:ip and hash:ip,port) matched by one iptables/ip6tables rule each"""
+    
+    firewall = 'ipset'
+    
+    def setup_commands(self) -> List[Tuple[List[str], Optional[str], Optional[List[str]]]]:
+        sets = []
+        rules = []
+        
+        for family, suffix, tables in [('inet', '', 'iptables'), ('inet6', '6', 'ip6tables')]:
+            for set_type, port_suffix, match in [('hash:ip', '', 'src'), ('hash:ip,port', '_port', 'src,dst')]:
+                name = f"{self.set_name}{suffix}{port_suffix}"
+                sets.append(f"create {name} {set_type} family {family} timeout 0")
+                rule = [self.chain, '-m', 'set', '--match-set', name, match, '-j', 'DROP']
+                # Insert only when `-C` reports the rule missing
+                rules.append(([tables, '-I'] + rule, None, [tables, '-C'] + rule))
+                
+        return [(['ipset', 'restore', '-exist'], '\n'.join(sets) + '\n', None)] + rules
+        
+    def batch_command(self, entries: List[Tuple[str, str, Optional[int], Optional[int]]]) -> Tuple[List[str], str]:
+        lines = []
+        
+        for operation, ip, port, timeout in entries:
+            element = f"{ip},tcp:{port}" if port else ip
+            line = f"{operation} {self._set_for(ip, port)} {element}"
+            if operation == 'add':
+                line += f" timeout {int(timeout or 0)}"
+            lines.append(line)
+            
+        return ['ipset', 'restore', '-exist'], '\n'.join(lines) + '\n'
+
+
+class NftablesBackend(FirewallSetBackend):
+    """nftables sets with per-element timeouts in a dedicated `inet` table"""
+    
+    firewall = 'nftables'
+    
+    def _set_for(self, ip: str, port: Optional[int]) -> str:
+        family = '6' if ipaddress.ip_address(ip).version == 6 else '4'
+        return f"blocked{family}{'_port' if port else ''}"
+        
+    def setup_commands(self) -> List[Tuple[List[str], Optional[str], Optional[List[str]]]]:
+        # `add` is idempotent for tables, chains and sets; flushing the chain
+        # before adding the rules keeps exactly one copy of each
+        script = f"""add table inet {self.set_name}
+add set inet {self.set_name} blocked4 {{ type ipv4_addr; flags timeout; }}
+add set inet {self.set_name} blocked6 {{ type ipv6_addr; flags timeout; }}
+add set inet {self.set_name} blocked4_port {{ type ipv4_addr . inet_service; flags timeout; }}
+add set inet {self.set_name} blocked6_port {{ type ipv6_addr . inet_service; flags timeout; }}
+add chain inet {self.set_name} input {{ type filter hook input priority -10; policy accept; }}
+flush chain inet {self.set_name} input
+add rule inet {self.set_name} input ip saddr @blocked4 drop
+add rule inet {self.set_name} input ip6 saddr @blocked6 drop
+add rule inet {self.set_name} input ip saddr . tcp dport @blocked4_port drop
+add rule inet {self.set_name} input ip6 saddr . tcp dport @blocked6_port drop
+"""
+        return [(['nft', '-f', '-'], script, None)]
+        
+    def batch_command(self, entries: List[Tuple[str, str, Optional[int], Optional[int]]]) -> Tuple[List[str], str]:
+        lines = []
+        
+        for operation, ip, port, timeout in entries:
+            element = f"{ip} . {port}" if port else ip
+            target = f"inet {self.set_name} {self._set_for(ip, port)}"
+            if operation == 'add':
+                if timeout:
+                    element += f" timeout {int(timeout)}s"
+                lines.append(f"add element {target} {{ {element} }}")
+            else:
+                # Adding first keeps an already expired element from failing the whole batch
+                lines.append(f"add element {target} {{ {element} }}")
+                lines.append(f"delete element {target} {{ {element} }}")
+                
+        return ['nft', '-f', '-'], '\n'.join(lines) + '\n'
+
+
+class SimulatedFirewallExecutor:
+    """
+    In-memory stand-in for ipset/nft/iptables.
+    
+    Applies the same batch scripts the backends generate to local sets with
+    timeouts, records every command, and answers `is_blocked` queries, so set
+    enforcement can be tested without root or a kernel firewall.
+    
+    Like the real tools, deleting a missing element is an error: an
+    `nft -f` batch then fails as a whole and changes nothing, and
+    `ipset restore` stops at the failing line unless run with `-exist`.
+    """
+    
+    IPSET_LINE = re.compile(r'^(add|del) (\S+) (\S+?)(?:,tcp:(\d+))?(?: timeout (\d+))?$')
+    NFT_LINE = re.compile(r'^(add|delete) element inet \S+ (\S+) \{ (\S+)(?: \. (\d+))?(?: timeout (\d+)s)? \}$')
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.sets: Dict[str, Dict[Tuple[str, Optional[int]], Optional[float]]] = {}
+        self.rules: List[Tuple[str, ...]] = []
+        self.commands: List[Dict[str, Any]] = []
+        
+    async def __call__(self, cmd: List[str], input_data: Optional[str] = None) -> Dict[str, Any]:
+        self.commands.append({'command': cmd, 'input': input_data})
+        success = True
+        error = ''
+        
+        if cmd[:2] == ['ipset', 'restore']:
+            error = self._apply(input_data or '', self.IPSET_LINE, ignore_missing='-exist' in cmd)
+        elif cmd[:1] == ['nft'] and input_data and 'element' in input_data:
+            # nft -f applies the whole batch or nothing
+            staged = {name: dict(elements) for name, elements in self.sets.items()}
+            error = self._apply(input_data, self.NFT_LINE, sets=staged)
+            if not error:
+                self.sets = staged
+        elif cmd[:1] in (['iptables'], ['ip6tables']):
+            rule = (cmd[0],) + tuple(cmd[2:])
+            if cmd[1] == '-C':
+                success = rule in self.rules
+            elif cmd[1] == '-I':
+                self.rules.append(rule)
+                
+        success = success and not error
+        return {
+            'success': success,
+            'command': ' '.join(cmd),
+            'return_code': 0 if success else 1,
+            'stdout': '',
+            'stderr': error,
+            'execution_time': 0.0,
+            'simulated': True
+        }
+        
+    def _apply(self, script: str, pattern: re.Pattern, sets: Optional[Dict] = None,
+               ignore_missing: bool = False) -> str:
+        """Apply batch lines to `sets` (default: the live sets); returns an error message or ''"""
+        sets = self.sets if sets is None else sets
+        now = self.clock()
+        
+        for line in filter(None, script.splitlines()):
+            match = pattern.match(line)
+            if not match:
+                continue
+            operation, set_name, ip, port, timeout = match.groups()
+            elements = sets.setdefault(set_name, {})
+            key = (ip, int(port) if port else None)
+            
+            if operation == 'add':
+                elements[key] = now + int(timeout) if timeout and int(timeout) > 0 else None
+                continue
+                
+            # Expired elements are already gone from the kernel
+            expiry = elements.pop(key, now)
+            if expiry is not None and expiry <= now and not ignore_missing:
+                return f"Error: element does not exist: {line}"
+                
+        return ''
+                
+    def is_blocked(self, ip: str, port: Optional[int] = None) -> bool:
+        """Whether an unexpired element matches the address (and port)"""
+        now = self.clock()
+        keys = [(ip, None)] + ([(ip, port)] if port else [])
+        
+        for elements in self.sets.values():
+            for key in keys:
+                if key in elements and (elements[key] is None or elements[key] > now):
+                    return True
+        return False
+        
+    def blocked_count(self) -> int:
+        """Number of unexpired elements across all sets"""
+        now = self.clock()
+        return sum(
+            1 for elements in self.sets.values() for expiry in elements.values()
+            if expiry is None or expiry > now
+        )
+
+
+def create_firewall_set_backend(firewall_type: str, executor: CommandExecutor, **kwargs) -> Optional[FirewallSetBackend]:
+    """Backend for a set-based firewall type ('ipset' or 'nftables'), else None"""
+    backends = {'ipset': IpsetBackend, 'nftables': NftablesBackend}
+    backend = backends.get(firewall_type)
+    return backend(executor, **kwargs) if backend else None
@@ -0,0 +1,265 @@
+"""
+Bidirectional Flow Table for Network Security Monitoring
+
+Aggregates packets into bidirectional 5-tuple flows (both directions of a
+conversation share one entry) with packet/byte counters per direction,
+first/last seen times and TCP flag summaries. Flows complete on TCP RST, on
+FIN from both sides, after an idle timeout, or when they exceed the active
+timeout, and completed flows are exported in batches as FlowRecords so
+detectors can work per flow instead of per packet.
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from packet_store import encode_tcp_flags, decode_tcp_flags, NO_PORT
+
+logger = logging.getLogger(__name__)
+
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+
+@dataclass
+class FlowRecord:
+    """Completed bidirectional flow; src is the side that sent the first packet"""
+    src_ip: str
+    dst_ip: str
+    src_port: Optional[int]
+    dst_port: Optional[int]
+    protocol: Any
+    first_seen: datetime
+    last_seen: datetime
+    packets_forward: int = 0
+    packets_reverse: int = 0
+    bytes_forward: int = 0
+    bytes_reverse: int = 0
+    forward_flags: List[str] = field(default_factory=list)
+    reverse_flags: List[str] = field(default_factory=list)
+    end_reason: str = "idle_timeout"
+    
+    @property
+    def packets(self) -> int:
+        return self.packets_forward + self.packets_reverse
+        
+    @property
+    def bytes(self) -> int:
+        return self.bytes_forward + self.bytes_reverse
+        
+    @property
+    def duration(self) -> float:
+        return (self.last_seen - self.first_seen).total_seconds()
+        
+    @property
+    def tcp_flags(self) -> List[str]:
+        """Flags sent by the initiator (lets flows stand in for packets in detectors)"""
+        return self.forward_flags
+        
+    @property
+    def is_connection_attempt(self) -> bool:
+        """TCP flow opened with a SYN that the other side never answered"""
+        return "SYN" in self.forward_flags and self.packets_reverse == 0
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'src_ip': self.src_ip,
+            'dst_ip': self.dst_ip,
+            'src_port': self.src_port,
+            'dst_port': self.dst_port,
+            'protocol': self.protocol,
+            'first_seen': self.first_seen.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+            'duration': self.duration,
+            'packets_forward': self.packets_forward,
+            'packets_reverse': self.packets_reverse,
+            'bytes_forward': self.bytes_forward,
+            'bytes_reverse': self.bytes_reverse,
+            'forward_flags': self.forward_flags,
+            'reverse_flags': self.reverse_flags,
+            'end_reason': self.end_reason
+        }
+
+
+class _FlowState:
+    """Mutable per-flow counters kept while a flow is active"""
+    
+    __slots__ = (
+        'src_ip', 'dst_ip', 'src_port', 'dst_port', 'protocol', 'first_seen', 'last_seen',
+        'packets_forward', 'packets_reverse', 'bytes_forward', 'bytes_reverse',
+        'flags_forward', 'flags_reverse'
+    )
+    
+    def __init__(self, packet: Any, timestamp: float):
+        self.src_ip = packet.src_ip
+        self.dst_ip = packet.dst_ip
+        self.src_port = packet.src_port
+        self.dst_port = packet.dst_port
+        self.protocol = packet.protocol
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.packets_forward = 0
+        self.packets_reverse = 0
+        self.bytes_forward = 0
+        self.bytes_reverse = 0
+        self.flags_forward = 0
+        self.flags_reverse = 0
+        
+    def to_record(self, end_reason: str) -> FlowRecord:
+        return FlowRecord(
+            src_ip=self.src_ip,
+            dst_ip=self.dst_ip,
+            src_port=self.src_port,
+            dst_port=self.dst_port,
+            protocol=self.protocol,
+            first_seen=datetime.fromtimestamp(self.first_seen),
+            last_seen=datetime.fromtimestamp(self.last_seen),
+            packets_forward=self.packets_forward,
+            packets_reverse=self.packets_reverse,
+            bytes_forward=self.bytes_forward,
+            bytes_reverse=self.bytes_reverse,
+            forward_flags=decode_tcp_flags(self.flags_forward),
+            reverse_flags=decode_tcp_flags(self.flags_reverse),
+            end_reason=end_reason
+        )
+
+
+class FlowTable:
+    """
+    Tracks active bidirectional flows and collects completed ones.
+    
+    Active flows are kept in least-recently-seen order, so idle expiry only
+    looks at the oldest entries and every packet update is O(1).
+    """
+    
+    def __init__(self, idle_timeout: float = 15.0, active_timeout: float = 120.0, max_flows: int = 100000):
+        """
+        Initialize the flow table.
+        
+        Args:
+            idle_timeout: Seconds without packets after which a flow completes
+            active_timeout: Maximum flow duration before it is exported and restarted
+            max_flows: Maximum active flows; the least recently seen flow is evicted
+        """
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        
+        self.flows: OrderedDict = OrderedDict()
+        self.completed: List[FlowRecord] = []
+        self.clock = 0.0
+        
+        self.stats = {
+            'packets_tracked': 0,
+            'flows_created': 0,
+            'flows_completed': 0,
+            'flows_evicted': 0
+        }
+        
+    @staticmethod
+    def flow_key(packet: Any) -> Tuple:
+        """Direction-independent 5-tuple key"""
+        a = (packet.src_ip, packet.src_port if packet.src_port is not None else NO_PORT)
+        b = (packet.dst_ip, packet.dst_port if packet.dst_port is not None else NO_PORT)
+        return (packet.protocol,) + (a + b if a <= b else b + a)
+        
+    def update(self, packet: Any, timestamp: Optional[float] = None):
+        """
+        Account one PacketMetadata to its flow.
+        
+        Args:
+            packet: Packet metadata
+            timestamp: Packet time as epoch seconds (taken from the packet if None)
+        """
+        if timestamp is None:
+            timestamp = packet.timestamp.timestamp()
+        self.clock = max(self.clock, timestamp)
+        self.stats['packets_tracked'] += 1
+        
+        key = self.flow_key(packet)
+        flow = self.flows.get(key)
+        
+        if flow is not None and timestamp - flow.first_seen >= self.active_timeout:
+            self._complete(key, 'active_timeout')
+            flow = None
+            
+        if flow is None:
+            flow = self.flows[key] = _FlowState(packet, timestamp)
+            self.stats['flows_created'] += 1
+            if len(self.flows) > self.max_flows:
+                self._complete(next(iter(self.flows)), 'evicted')
+                self.stats['flows_evicted'] += 1
+        else:
+            self.flows.move_to_end(key)
+            
+        flags = encode_tcp_flags(packet.tcp_flags)
+        
+        if packet.src_ip == flow.src_ip and packet.src_port == flow.src_port:
+            flow.packets_forward += 1
+            flow.bytes_forward += packet.packet_size
+            flow.flags_forward |= flags
+        else:
+            flow.packets_reverse += 1
+            flow.bytes_reverse += packet.packet_size
+            flow.flags_reverse |= flags
+            
+        flow.last_seen = max(flow.last_seen, timestamp)
+        
+        # TCP teardown completes the flow immediately
+        if flags & TCP_RST:
+            self._complete(key, 'rst')
+        elif flow.flags_forward & flow.flags_reverse & TCP_FIN:
+            self._complete(key, 'fin')
+            
+    def _complete(self, key: Tuple, end_reason: str):
+        """Move an active flow to the completed list"""
+        flow = self.flows.pop(key)
+        self.completed.append(flow.to_record(end_reason))
+        self.stats['flows_completed'] += 1
+        
+    def expire(self, now: Optional[float] = None):
+        """
+        Complete flows idle for longer than the idle timeout.
+        
+        Args:
+            now: Current time as epoch seconds (defaults to the latest packet time)
+        """
+        now = self.clock if now is None else now
+        
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if now - flow.last_seen < self.idle_timeout:
+                break
+            self._complete(key, 'idle_timeout')
+            
+    def export(self, max_records: Optional[int] = None) -> List[FlowRecord]:
+        """
+        Drain completed flow records.
+        
+        Args:
+            max_records: Maximum records to return (all if None)
+        """
+        if max_records is None or max_records >= len(self.completed):
+            records, self.completed = self.completed, []
+        else:
+            records, self.completed = self.completed[:max_records], self.completed[max_records:]
+        return records
+        
+    def flush(self):
+        """Complete every active flow"""
+        for key in list(self.flows):
+            self._complete(key, 'flush')
+            
+    def __len__(self) -> int:
+        return len(self.flows)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Flow table statistics"""
+        return {
+            **self.stats,
+            'active_flows': len(self.flows),
+            'pending_export': len(self.completed)
+        }
@@ -0,0 +1,250 @@
+"""
+Versioned Model Registry for Network Anomaly Detection
+
+Keeps each trained model bundle (scaler, Isolation Forest, DBSCAN, Random
+Forest) in its own version directory with a metadata file that records the
+evaluation score, plus a CURRENT pointer file that is replaced atomically.
+Retraining runs in `train_model_version`, a top-level function that can
+execute in a worker process: the scaler is updated incrementally with
+partial_fit, the unsupervised models are refit on recent traffic, and the
+candidate and the current models are scored on the same holdout slice so
+versions can be compared.
+"""
+
+import copy
+import json
+import logging
+import os
+import pickle
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    from sklearn.base import clone
+    from sklearn.preprocessing import StandardScaler
+    ML_AVAILABLE = True
+except ImportError:
+    ML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAMES = ['isolation_forest', 'dbscan_model', 'random_forest', 'feature_scaler']
+DEFAULT_CONTAMINATION = 0.1
+
+
+def evaluate_models(models: Dict[str, Any], holdout: np.ndarray) -> Dict[str, Any]:
+    """
+    Score a model bundle on held-out recent traffic.
+    
+    The score is 1 minus the gap between the share of holdout samples the
+    Isolation Forest flags and its configured contamination, so a model that
+    has drifted away from current traffic scores lower.
+    """
+    forest = models.get('isolation_forest')
+    scaler = models.get('feature_scaler')
+    
+    if forest is None or not hasattr(forest, 'estimators_') or len(holdout) == 0:
+        return {'score': 0.0, 'holdout_samples': len(holdout), 'outlier_rate': None}
+        
+    samples = scaler.transform(holdout) if scaler is not None and hasattr(scaler, 'mean_') else holdout
+    decision = forest.decision_function(samples)
+    
+    contamination = forest.get_params().get('contamination')
+    if not isinstance(contamination, float):
+        contamination = DEFAULT_CONTAMINATION
+        
+    outlier_rate = float(np.mean(decision < 0))
+    
+    return {
+        'score': 1.0 - abs(outlier_rate - contamination),
+        'holdout_samples': len(holdout),
+        'outlier_rate': outlier_rate,
+        'mean_decision': float(decision.mean())
+    }
+
+
+def train_model_version(feature_matrix: np.ndarray, current: Dict[str, Any],
+                        holdout_fraction: float = 0.2) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Train a candidate model bundle (runs in a worker process).
+    
+    Args:
+        feature_matrix: Recent feature rows in capture order
+        current: Currently active models (left unchanged)
+        holdout_fraction: Share of the most recent rows held out for evaluation
+        
+    Returns:
+        Tuple of (candidate models, evaluation of candidate and current models)
+    """
+    holdout_size = int(len(feature_matrix) * holdout_fraction)
+    training = feature_matrix[:len(feature_matrix) - holdout_size]
+    holdout = feature_matrix[len(feature_matrix) - holdout_size:]
+    
+    candidate = dict(current)
+    
+    # Incremental scaler: running mean/variance over every training round
+    scaler = current.get('feature_scaler')
+    if scaler is not None and hasattr(scaler, 'mean_'):
+        scaler = copy.deepcopy(scaler)
+        scaler.partial_fit(training)
+    else:
+        scaler = StandardScaler().fit(training)
+    candidate['feature_scaler'] = scaler
+    
+    scaled = scaler.transform(training)
+    
+    for name in ['isolation_forest', 'dbscan_model']:
+        if current.get(name) is not None:
+            candidate[name] = clone(current[name]).fit(scaled)
+            
+    evaluation = {
+        'candidate': evaluate_models(candidate, holdout),
+        'current': evaluate_models(current, holdout),
+        'training_samples': len(training)
+    }
+    
+    return candidate, evaluation
+
+
+class ModelRegistry:
+    """
+    Versioned model storage with an atomically replaced CURRENT pointer.
+    
+    Layout:
+        model_dir/versions/v000001/{isolation_forest,...}.pkl
+        model_dir/versions/v000001/metadata.json
+        model_dir/CURRENT  (name of the active version)
+    """
+    
+    def __init__(self, model_dir: Path, keep_versions: int = 5):
+        """
+        Initialize the registry.
+        
+        Args:
+            model_dir: Model directory
+            keep_versions: Number of newest versions kept on disk (the active one is always kept)
+        """
+        self.model_dir = Path(model_dir)
+        self.version_dir = self.model_dir / 'versions'
+        self.pointer_file = self.model_dir / 'CURRENT'
+        self.keep_versions = keep_versions
+        
+        self.version_dir.mkdir(parents=True, exist_ok=True)
+        
+    def current_version(self) -> Optional[str]:
+        """Name of the active version, if any"""
+        try:
+            version = self.pointer_file.read_text().strip()
+            return version if (self.version_dir / version).is_dir() else None
+        except FileNotFoundError:
+            return None
+            
+    def _version_names(self) -> List[str]:
+        return sorted(path.name for path in self.version_dir.glob('v*') if path.is_dir())
+        
+    def publish(self, models: Dict[str, Any], metadata: Dict[str, Any], activate: bool = True) -> str:
+        """
+        Write a model bundle as a new version.
+        
+        The version directory is written under a temporary name and renamed
+        into place, then the pointer is replaced with os.replace, so readers
+        never see a partially written version.
+        
+        Args:
+            models: Model bundle
+            metadata: Metadata stored alongside (evaluation, sample counts)
+            activate: Point CURRENT at the new version
+            
+        Returns:
+            Version name
+        """
+        names = self._version_names()
+        number = int(names[-1][1:]) + 1 if names else 1
+        version = f"v{number:06d}"
+        
+        staging = self.version_dir / f".staging-{version}"
+        staging.mkdir(parents=True, exist_ok=True)
+        
+        for model_name, model in models.items():
+            if model is not None:
+                with open(staging / f"{model_name}.pkl", 'wb') as f:
+                    pickle.dump(model, f)
+                    
+        with open(staging / 'metadata.json', 'w') as f:
+            json.dump({
+                **metadata,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'activated': activate
+            }, f, indent=2, default=str)
+            
+        os.replace(staging, self.version_dir / version)
+        
+        if activate:
+            self.activate(version)
+            
+        self._prune()
+        return version
+        
+    def activate(self, version: str):
+        """Atomically point CURRENT at `version`"""
+        temporary = self.pointer_file.with_suffix('.tmp')
+        temporary.write_text(version)
+        os.replace(temporary, self.pointer_file)
+        
+    def load(self, version: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Load a model bundle.
+        
+        Args:
+            version: Version name (defaults to the active version)
+            
+        Returns:
+            Tuple of (models, metadata)
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError("No active model version")
+            
+        path = self.version_dir / version
+        models = {}
+        
+        for model_name in MODEL_NAMES:
+            model_file = path / f"{model_name}.pkl"
+            if model_file.exists():
+                with open(model_file, 'rb') as f:
+                    models[model_name] = pickle.load(f)
+                    
+        with open(path / 'metadata.json') as f:
+            metadata = json.load(f)
+            
+        return models, metadata
+        
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Metadata of every stored version, oldest first"""
+        versions = []
+        current = self.current_version()
+        
+        for version in self._version_names():
+            try:
+                with open(self.version_dir / version / 'metadata.json') as f:
+                    metadata = json.load(f)
+                metadata['active'] = version == current
+                versions.append(metadata)
+            except Exception as e:
+                logger.warning(f"Unreadable model version {version}: {e}")
+                
+        return versions
+        
+    def _prune(self):
+        """Delete old versions beyond `keep_versions`, never the active one"""
+        current = self.current_version()
+        names = self._version_names()
+        
+        for version in names[:max(0, len(names) - self.keep_versions)]:
+            if version != current:
+                shutil.rmtree(self.version_dir / version, ignore_errors=True)
@@ -10,14 +10,26 @@ import logging
 import json
 import subprocess
 import tempfile
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Union
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timedelta
 from enum import Enum
 import re
 import hashlib
+from collections import deque
 from pathlib import Path
 
+from pcap_stream import PcapStreamParser, decode_record
+from packet_store import PacketHistoryStore, PacketWindow, decode_protocol, encode_protocol, pack_ip, unpack_ip
+from parallel_decode import ParallelPcapDecoder
+from flow_table import FlowTable, FlowRecord
+from event_store import EventStore
+from sliding_window import (
+    WindowedCounter, WindowedDistinctCounter, WindowedHyperLogLog, WindowedCountMin, AnomalyDeduplicator
+)
+
+import numpy as np
+
 # Packet analysis imports
 try:
     import scapy.all as scapy
@@ -89,7 +101,7 @@ class PacketMetadata:
     def __post_init__(self):
         if self.tcp_flags is None:
             self.tcp_flags = []
-    
+            
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
@@ -137,12 +149,14 @@ class NetSniffer:
     Captures packets, extracts metadata, and detects anomalies in real-time.
     """
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None, event_store: Optional[EventStore] = None):
         """
         Initialize the NetSniffer.
         
         Args:
             config: Configuration dictionary
+            event_store: Shared persistent event store. When omitted, the sniffer
+                keeps its own store under the log directory.
         """
         self.config = config or {}
         
@@ -153,6 +167,15 @@ class NetSniffer:
         self.packet_count_limit = self.config.get('packet_count_limit', 10000)
         self.capture_file_rotation = self.config.get('capture_file_rotation', True)
         
+        # Capture mode: 'file' rotates pcap files, 'stream' parses tcpdump stdout incrementally
+        self.capture_mode = self.config.get('capture_mode', 'file')
+        self.stream_queue_size = self.config.get('stream_queue_size', 10000)
+        self.stream_read_size = self.config.get('stream_read_size', 65536)
+        
+        # Parallel decoding: >0 decodes pcap data in that many worker processes
+        self.decode_workers = self.config.get('decode_workers', 0)
+        self.decode_shard_bytes = self.config.get('decode_shard_bytes', 8 * 1024 * 1024)
+        
         # Analysis configuration
         self.analysis_batch_size = self.config.get('analysis_batch_size', 1000)
         self.anomaly_threshold = self.config.get('anomaly_threshold', 0.7)
@@ -171,8 +194,30 @@ class NetSniffer:
         # State management
         self.running = False
         self.capture_process = None
-        self.packet_buffer: List[PacketMetadata] = []
-        self.anomaly_buffer: List[TrafficAnomaly] = []
+        self.stream_queue: Optional[asyncio.Queue] = None
+        self.stream_stats = {
+            'packets_streamed': 0,
+            'bytes_streamed': 0,
+            'decode_failures': 0
+        }
+        self.packet_buffer = PacketHistoryStore(self.max_packet_history)
+        self.parallel_decoder = ParallelPcapDecoder(
+            self.decode_workers, self.decode_shard_bytes
+        ) if self.decode_workers > 0 else None
+        self.decode_pending: Optional[asyncio.Queue] = None
+        self.decode_emitter_task: Optional[asyncio.Task] = None
+        self.capture_start_time: Optional[datetime] = None
+        
+        # Anomalies are persisted to the event store; only recent ones stay in memory
+        self.anomaly_buffer = deque(maxlen=self.config.get('anomaly_buffer_size', 1000))
+        self.owns_event_store = event_store is None
+        self.event_store = event_store if event_store is not None else EventStore(
+            self.config.get('event_dir', str(self.log_dir / 'events')),
+            self.config.get('event_segment_seconds', 86400),
+            self.config.get('event_retention_days', 30),
+            flush_interval=self.config.get('event_flush_ms', 200) / 1000.0,
+            sync_interval=self.config.get('event_sync_ms', 1000) / 1000.0
+        )
         
         # Traffic analysis patterns
         self.suspicious_ports = {22, 23, 3389, 445, 135, 139, 1433, 3306, 5432}
@@ -185,9 +230,93 @@ class NetSniffer:
         self.ddos_threshold = self.config.get('ddos_threshold', 100)
         self.dns_tunnel_threshold = self.config.get('dns_tunnel_threshold', 50)
         
+        # Sliding detection window (seconds of capture time) and expiry granularity
+        self.detection_window = self.config.get('detection_window', 60)
+        self.detection_bucket = self.config.get('detection_bucket', 5)
+        
+        # Detector state: 'exact' keeps every distinct item, 'sketch' bounds memory
+        # with HyperLogLog / Count-Min sketches (see sliding_window.py for error bounds)
+        self.detector_mode = self.config.get('detector_mode', 'exact')
+        self.sketch_precision = self.config.get('sketch_precision', 7)
+        self.sketch_max_keys = self.config.get('sketch_max_keys', 10000)
+        self.sketch_width = self.config.get('sketch_width', 2048)
+        self.sketch_depth = self.config.get('sketch_depth', 4)
+        self.heavy_hitter_count = self.config.get('heavy_hitter_count', 32)
+        
+        # Flow tracking: 'packets' runs the detectors per packet, 'flows' per completed flow
+        self.detection_source = self.config.get('detection_source', 'packets')
+        if self.detection_source not in ('packets', 'flows'):
+            raise ValueError(f"Unknown detection source: {self.detection_source}")
+        self.flow_tracking = self.config.get('flow_tracking', self.detection_source == 'flows')
+        self.flow_export_batch_size = self.config.get('flow_export_batch_size', 256)
+        self.flow_table = FlowTable(
+            self.config.get('flow_idle_timeout', 15),
+            self.config.get('flow_active_timeout', 120),
+            self.config.get('max_flows', 100000)
+        ) if self.flow_tracking or self.detection_source == 'flows' else None
+        
+        if self.detector_mode == 'sketch':
+            # Distinct ports and hosts per source; packets per destination with
+            # heavy hitters, and distinct sources only for those heavy hitters
+            self.scan_ports = WindowedHyperLogLog(
+                self.detection_window, self.detection_bucket, self.sketch_precision, self.sketch_max_keys
+            )
+            self.scan_hosts = WindowedHyperLogLog(
+                self.detection_window, self.detection_bucket, self.sketch_precision, self.sketch_max_keys
+            )
+            self.dst_packets = WindowedCountMin(
+                self.detection_window, self.detection_bucket, self.sketch_width, self.sketch_depth, self.heavy_hitter_count
+            )
+            self.dst_sources = WindowedHyperLogLog(
+                self.detection_window, self.detection_bucket, self.sketch_precision, self.heavy_hitter_count
+            )
+        elif self.detector_mode == 'exact':
+            self.scan_ports = WindowedDistinctCounter(self.detection_window, self.detection_bucket)
+            self.scan_hosts = None
+            self.dst_packets = WindowedCounter(self.detection_window, self.detection_bucket)
+            self.dst_sources = WindowedDistinctCounter(self.detection_window, self.detection_bucket)
+        else:
+            raise ValueError(f"Unknown detector mode: {self.detector_mode}")
+            
+        self.auth_attempts = WindowedCounter(self.detection_window, self.detection_bucket)
+        self.dns_queries = WindowedCounter(self.detection_window, self.detection_bucket)
+        self.dns_query_lengths = WindowedCounter(self.detection_window, self.detection_bucket)
+        self.service_packets = WindowedCounter(self.detection_window, self.detection_bucket)
+        self.service_sources = WindowedDistinctCounter(self.detection_window, self.detection_bucket)
+        self.detector_windows = [
+            window for window in [
+                self.scan_ports, self.scan_hosts, self.auth_attempts, self.dst_packets, self.dst_sources,
+                self.dns_queries, self.dns_query_lengths, self.service_packets, self.service_sources
+            ] if window is not None
+        ]
+        self.detector_bucket = None
+        self.flow_bucket = None
+        self.anomaly_dedup = AnomalyDeduplicator(self.detection_window)
+        
+        self.attack_detectors = [
+            self._detect_port_scan,
+            self._detect_brute_force,
+            self._detect_ddos,
+            self._detect_dns_tunneling,
+            self._detect_protocol_anomaly
+        ]
+        
+        # DNS tunneling needs query contents, so it stays per packet in flow mode
+        if self.detection_source == 'flows':
+            self.flow_detectors = [
+                self._detect_port_scan,
+                self._detect_brute_force,
+                self._detect_ddos,
+                self._detect_protocol_anomaly
+            ]
+            self.attack_detectors = [self._detect_dns_tunneling]
+        else:
+            self.flow_detectors = []
+            
         # Callback functions
         self.anomaly_callbacks: List[Callable] = []
         self.packet_callbacks: List[Callable] = []
+        self.flow_callbacks: List[Callable] = []
         
         logger.info(f"NetSniffer initialized for interface: {self.interface}")
         
@@ -199,26 +328,33 @@ class NetSniffer:
         """Add callback function for packet processing"""
         self.packet_callbacks.append(callback)
         
+    def add_flow_callback(self, callback: Callable[[List[FlowRecord]], None]):
+        """Add callback function for batches of completed flow records"""
+        self.flow_callbacks.append(callback)
+        
     async def start_capture(self):
         """Start network traffic capture"""
         if self.running:
             logger.warning("NetSniffer is already running")
             return
             
-        if not SCAPY_AVAILABLE and not PYSHARK_AVAILABLE:
+        if self.capture_mode == 'file' and not self.parallel_decoder and not SCAPY_AVAILABLE and not PYSHARK_AVAILABLE:
             raise ImportError("Neither scapy nor pyshark is available for packet analysis")
             
         logger.info("Starting network traffic capture...")
         
         try:
             self.running = True
+            self.capture_start_time = datetime.now()
             
+            # Start stream consumer before tcpdump so the queue is drained from the first packet
+            if self.capture_mode == 'stream':
+                self.stream_queue = asyncio.Queue(maxsize=self.stream_queue_size)
+                asyncio.create_task(self._stream_consumer_loop())
+                
             # Start tcpdump capture process
             await self._start_tcpdump_capture()
             
-            # Start packet analysis loop
-            asyncio.create_task(self._packet_analysis_loop())
-            
             # Start anomaly detection loop
             asyncio.create_task(self._anomaly_detection_loop())
             
@@ -241,25 +377,49 @@ class NetSniffer:
             self.running = False
             
             # Stop tcpdump process
-            if self.capture_process:
+            if self._capture_process_running():
                 self.capture_process.terminate()
                 await asyncio.sleep(1)
-                if self.capture_process.poll() is None:
+                if self._capture_process_running():
                     self.capture_process.kill()
                     
-            # Process remaining packets
-            await self._process_remaining_packets()
-            
+            # Drain packets still being decoded or waiting in the stream queue
+            await self._flush_decode_pipeline()
+            await self._drain_stream_queue()
+            
+            # Export flows that are still open
+            if self.flow_table is not None:
+                self.flow_table.flush()
+                await self._export_flows()
+                
+            if self.parallel_decoder:
+                self.parallel_decoder.close()
+                
             # Generate final report
             await self._generate_capture_report()
             
+            if self.owns_event_store:
+                self.event_store.close()
+                
             logger.info("NetSniffer stopped successfully")
             
         except Exception as e:
             logger.error(f"Error stopping NetSniffer: {e}")
             
+    def _capture_process_running(self) -> bool:
+        """Check whether the tcpdump process is alive (subprocess or asyncio process)"""
+        if self.capture_process is None:
+            return False
+        if isinstance(self.capture_process, subprocess.Popen):
+            return self.capture_process.poll() is None
+        return self.capture_process.returncode is None
+        
     async def _start_tcpdump_capture(self):
         """Start tcpdump capture process"""
+        if self.capture_mode == 'stream':
+            await self._start_tcpdump_stream()
+            return
+            
         try:
             # Generate capture filename
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -345,12 +505,207 @@ class NetSniffer:
         except Exception as e:
             logger.error(f"Error monitoring tcpdump process: {e}")
             
+    async def _start_tcpdump_stream(self):
+        """Start tcpdump writing pcap data to stdout for streaming analysis"""
+        try:
+            cmd = [
+                'tcpdump',
+                '-i', self.interface,
+                '-w', '-',  # Write pcap to stdout
+                '-U',  # Flush after every packet
+                '-s', '0',
+                '-n',
+                '-q',
+            ]
+            
+            if self.capture_filter:
+                cmd.append(self.capture_filter)
+                
+            if self.packet_count_limit:
+                cmd.extend(['-c', str(self.packet_count_limit)])
+                
+            logger.info(f"Starting tcpdump stream: {' '.join(cmd)}")
+            
+            self.capture_process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            
+            asyncio.create_task(self._read_tcpdump_stream(self.capture_process))
+            
+        except Exception as e:
+            logger.error(f"Failed to start tcpdump stream: {e}")
+            raise
+            
+    async def _read_tcpdump_stream(self, process):
+        """Read tcpdump stdout incrementally and enqueue decoded packets"""
+        parser = PcapStreamParser()
+        
+        try:
+            while self.running:
+                chunk = await process.stdout.read(self.stream_read_size)
+                if not chunk:
+                    break
+                    
+                await self._feed_stream_chunk(parser, chunk)
+                
+            await process.wait()
+            stderr = await process.stderr.read()
+            if stderr:
+                logger.debug(f"tcpdump stderr: {stderr.decode(errors='ignore').strip()}")
+                
+            # Restart the stream if tcpdump exited on its own (e.g. packet count limit)
+            if self.running and self.capture_file_rotation:
+                logger.info("tcpdump stream ended, restarting...")
+                await self._start_tcpdump_stream()
+                
+        except ValueError as e:
+            logger.error(f"Invalid pcap stream from tcpdump: {e}")
+        except Exception as e:
+            logger.error(f"Error reading tcpdump stream: {e}")
+            
+    async def stream_pcap_file(self, pcap_file: Path, follow: bool = False, poll_interval: float = 1.0):
+        """
+        Stream packets from a pcap file without loading it into memory.
+        
+        Args:
+            pcap_file: Path to pcap file
+            follow: Keep reading as the file grows (like `tail -f`) while running
+            poll_interval: Seconds to wait for new data when following
+        """
+        parser = PcapStreamParser()
+        
+        try:
+            with open(pcap_file, 'rb') as f:
+                while True:
+                    chunk = f.read(self.stream_read_size)
+                    
+                    if chunk:
+                        await self._feed_stream_chunk(parser, chunk)
+                    elif follow and self.running:
+                        await asyncio.sleep(poll_interval)
+                    else:
+                        break
+                        
+            if not self.running:
+                await self._flush_decode_pipeline()
+                
+            logger.info(f"Streamed {parser.records_parsed} packets from {pcap_file}")
+            
+        except ValueError as e:
+            logger.error(f"Invalid pcap file {pcap_file}: {e}")
+        except Exception as e:
+            logger.error(f"Error streaming pcap file: {e}")
+            
+    async def _feed_stream_chunk(self, parser: PcapStreamParser, chunk: bytes):
+        """Parse a chunk of pcap bytes and emit packet metadata"""
+        self.stream_stats['bytes_streamed'] += len(chunk)
+        records = parser.feed(chunk)
+        
+        if self.parallel_decoder:
+            if records:
+                await self._submit_decode_batch(records, parser.linktype)
+            return
+            
+        for record in records:
+            fields = decode_record(record, parser.linktype)
+            
+            if fields is None:
+                self.stream_stats['decode_failures'] += 1
+                continue
+                
+            metadata = PacketMetadata(**fields)
+            self.stream_stats['packets_streamed'] += 1
+            
+            if self.stream_queue is not None and self.running:
+                # Blocks while the queue is full, which stops reading from tcpdump
+                await self.stream_queue.put(metadata)
+            else:
+                await self._process_packet_metadata(metadata)
+                
+    async def _submit_decode_batch(self, records: List[Any], linktype: int):
+        """Hand framed records to the decode workers, keeping capture order"""
+        if self.decode_pending is None:
+            self.decode_pending = asyncio.Queue(maxsize=self.parallel_decoder.max_pending)
+        if self.decode_emitter_task is None or self.decode_emitter_task.done():
+            self.decode_emitter_task = asyncio.create_task(self._decode_emitter_loop())
+            
+        # Blocks while max_pending batches are in flight
+        await self.decode_pending.put(self.parallel_decoder.submit_records(records, linktype))
+        
+    async def _decode_emitter_loop(self):
+        """Emit decoded batches in submission order"""
+        while True:
+            future = await self.decode_pending.get()
+            try:
+                window = await self.parallel_decoder.collect(future)
+                await self._emit_decoded_window(window)
+            except Exception as e:
+                logger.error(f"Error decoding packet batch: {e}")
+            finally:
+                self.decode_pending.task_done()
+                
+    async def _emit_decoded_window(self, window: PacketWindow):
+        """Emit packets decoded by the workers like streamed packets"""
+        for i, metadata in enumerate(window.to_packets()):
+            self.stream_stats['packets_streamed'] += 1
+            
+            if self.stream_queue is not None and self.running:
+                await self.stream_queue.put(metadata)
+            else:
+                await self._process_packet_metadata(metadata)
+                
+            # Allow other tasks to run
+            if i % self.analysis_batch_size == self.analysis_batch_size - 1:
+                await asyncio.sleep(0)
+                
+    async def _flush_decode_pipeline(self):
+        """Wait for in-flight decode batches and stop the emitter"""
+        try:
+            if self.decode_pending is not None:
+                await self.decode_pending.join()
+            if self.decode_emitter_task is not None:
+                self.decode_emitter_task.cancel()
+                self.decode_emitter_task = None
+                
+        except Exception as e:
+            logger.error(f"Error flushing decode pipeline: {e}")
+            
+    async def _stream_consumer_loop(self):
+        """Consume streamed packets from the bounded queue"""
+        try:
+            while self.running:
+                try:
+                    metadata = await asyncio.wait_for(self.stream_queue.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                    
+                await self._process_packet_metadata(metadata)
+                
+        except Exception as e:
+            logger.error(f"Error in stream consumer loop: {e}")
+            
+    async def _drain_stream_queue(self):
+        """Process packets left in the stream queue"""
+        try:
+            if self.stream_queue is None:
+                return
+                
+            while not self.stream_queue.empty():
+                await self._process_packet_metadata(self.stream_queue.get_nowait())
+                
+        except Exception as e:
+            logger.error(f"Error draining stream queue: {e}")
+            
     async def _process_pcap_file(self, pcap_file: Path):
         """Process captured pcap file using scapy or pyshark"""
         try:
             logger.info(f"Processing pcap file: {pcap_file}")
             
-            if SCAPY_AVAILABLE:
+            if self.parallel_decoder:
+                await self._process_with_workers(pcap_file)
+            elif SCAPY_AVAILABLE:
                 await self._process_with_scapy(pcap_file)
             elif PYSHARK_AVAILABLE:
                 await self._process_with_pyshark(pcap_file)
@@ -360,6 +715,27 @@ class NetSniffer:
         except Exception as e:
             logger.error(f"Error processing pcap file: {e}")
             
+    async def _process_with_workers(self, pcap_file: Path):
+        """Process pcap file by decoding byte-range shards in the worker pool"""
+        try:
+            packet_count = 0
+            
+            async for window in self.parallel_decoder.decode_file(pcap_file):
+                for i, metadata in enumerate(window.to_packets()):
+                    await self._process_packet_metadata(metadata)
+                    
+                    # Allow other tasks to run
+                    if i % self.analysis_batch_size == self.analysis_batch_size - 1:
+                        await asyncio.sleep(0)
+                        
+                packet_count += len(window)
+                await asyncio.sleep(0)
+                
+            logger.info(f"Processed {packet_count} packets with {self.parallel_decoder.workers} decode workers")
+            
+        except Exception as e:
+            logger.error(f"Error processing with decode workers: {e}")
+            
     async def _process_with_scapy(self, pcap_file: Path):
         """Process pcap file using scapy"""
         try:
@@ -559,12 +935,16 @@ class NetSniffer:
     async def _process_packet_metadata(self, metadata: PacketMetadata):
         """Process extracted packet metadata"""
         try:
-            # Add to packet buffer
+            # Add to packet history (oldest packets are overwritten at capacity)
             self.packet_buffer.append(metadata)
             
-            # Limit buffer size
-            if len(self.packet_buffer) > self.max_packet_history:
-                self.packet_buffer = self.packet_buffer[-self.max_packet_history:]
+            # Update attack detectors and process newly raised anomalies
+            timestamp = metadata.timestamp.timestamp()
+            for anomaly in self._update_detectors(metadata, timestamp, self.attack_detectors):
+                await self._process_anomaly(anomaly)
+                
+            if self.flow_table is not None:
+                await self._update_flows(metadata, timestamp)
                 
             # Call packet callbacks
             for callback in self.packet_callbacks:
@@ -576,314 +956,339 @@ class NetSniffer:
         except Exception as e:
             logger.error(f"Error processing packet metadata: {e}")
             
-    async def _packet_analysis_loop(self):
-        """Main packet analysis loop"""
+    async def _update_flows(self, packet: PacketMetadata, timestamp: float):
+        """Account a packet to its flow and export completed flows in batches"""
         try:
-            while self.running:
-                if self.packet_buffer:
-                    # Analyze recent packets for patterns
-                    recent_packets = self.packet_buffer[-self.analysis_batch_size:]
-                    
-                    # Detect anomalies
-                    anomalies = self._detect_anomalies(recent_packets)
-                    
-                    # Process detected anomalies
-                    for anomaly in anomalies:
-                        await self._process_anomaly(anomaly)
-                        
-                await asyncio.sleep(5)  # Analysis interval
+            self.flow_table.update(packet, timestamp)
+            
+            # Idle expiry runs once per detection bucket
+            bucket = int(timestamp // self.detection_bucket)
+            if bucket != self.flow_bucket:
+                self.flow_bucket = bucket
+                self.flow_table.expire(timestamp)
+            elif len(self.flow_table.completed) < self.flow_export_batch_size:
+                return
                 
+            await self._export_flows()
+            
         except Exception as e:
-            logger.error(f"Error in packet analysis loop: {e}")
+            logger.error(f"Error updating flows: {e}")
             
-    def _detect_anomalies(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect anomalies in packet metadata"""
+    async def _export_flows(self):
+        """Drain completed flows into the flow detectors and flow callbacks"""
+        flows = self.flow_table.export()
+        if not flows:
+            return
+            
+        # Flows are counted when they complete, at the flow table's current time
+        timestamp = self.flow_table.clock
+        for flow in flows:
+            for anomaly in self._update_detectors(flow, timestamp, self.flow_detectors, flow.packets):
+                await self._process_anomaly(anomaly)
+                
+        for callback in self.flow_callbacks:
+            try:
+                await callback(flows)
+            except Exception as e:
+                logger.error(f"Error in flow callback: {e}")
+                
+    def _update_detectors(self, event: Union[PacketMetadata, FlowRecord], timestamp: float,
+                          detectors: List[Callable], packets: int = 1) -> List[TrafficAnomaly]:
+        """
+        Feed one packet or completed flow to the sliding-window attack detectors.
+        
+        Each detector updates its per-key window state in O(1) and returns an
+        anomaly only the first time its condition holds for a dedup key. A flow
+        counts as one connection attempt carrying `packets` packets.
+        
+        Returns:
+            Newly raised anomalies
+        """
         anomalies = []
         
         try:
-            # Port scan detection
-            port_scan_anomalies = self._detect_port_scans(packets)
-            anomalies.extend(port_scan_anomalies)
-            
-            # Brute force detection
-            brute_force_anomalies = self._detect_brute_force(packets)
-            anomalies.extend(brute_force_anomalies)
-            
-            # DDoS detection
-            ddos_anomalies = self._detect_ddos(packets)
-            anomalies.extend(ddos_anomalies)
-            
-            # DNS tunneling detection
-            dns_tunnel_anomalies = self._detect_dns_tunneling(packets)
-            anomalies.extend(dns_tunnel_anomalies)
-            
-            # Suspicious protocol usage
-            protocol_anomalies = self._detect_protocol_anomalies(packets)
-            anomalies.extend(protocol_anomalies)
-            
+            # Expire idle window state and dedup keys once per bucket
+            bucket = int(timestamp // self.detection_bucket)
+            if bucket != self.detector_bucket:
+                self.detector_bucket = bucket
+                for window in self.detector_windows:
+                    window.advance(timestamp)
+                self.anomaly_dedup.expire(timestamp)
+                
+            for detector in detectors:
+                anomaly = detector(event, timestamp, packets)
+                if anomaly:
+                    anomalies.append(anomaly)
+                    
         except Exception as e:
             logger.error(f"Error detecting anomalies: {e}")
             
         return anomalies
         
-    def _detect_port_scans(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect port scanning activities"""
-        anomalies = []
+    def _detection_matches(self, timestamp: float, src_ip: Optional[str] = None, dst_ip: Optional[str] = None,
+                           protocol: Optional[Any] = None, dst_port: Optional[int] = None) -> PacketWindow:
+        """Packets in the current detection window matching the given fields"""
+        window = self.packet_buffer.window_since(timestamp - self.detection_window)
+        mask = np.ones(len(window), dtype=bool)
         
-        try:
-            # Group packets by source IP
-            src_connections = {}
-            
-            for packet in packets:
-                if packet.protocol == "TCP" and "SYN" in packet.tcp_flags:
-                    src_ip = packet.src_ip
-                    dst_ip = packet.dst_ip
-                    dst_port = packet.dst_port
-                    
-                    if src_ip not in src_connections:
-                        src_connections[src_ip] = {}
-                    if dst_ip not in src_connections[src_ip]:
-                        src_connections[src_ip][dst_ip] = set()
-                        
-                    src_connections[src_ip][dst_ip].add(dst_port)
-                    
-            # Check for port scan patterns
-            for src_ip, targets in src_connections.items():
-                for dst_ip, ports in targets.items():
-                    if len(ports) > self.port_scan_threshold:
-                        # Generate anomaly
-                        anomaly = TrafficAnomaly(
-                            anomaly_id=f"port_scan_{src_ip}_{dst_ip}_{datetime.now().timestamp()}",
-                            timestamp=datetime.now(),
-                            src_ip=src_ip,
-                            dst_ip=dst_ip,
-                            attack_type=AttackType.PORT_SCAN,
-                            traffic_type=TrafficType.MALICIOUS,
-                            frequency=len(ports),
-                            severity=min(len(ports) / 100.0, 1.0),
-                            description=f"Port scan detected: {len(ports)} ports scanned",
-                            metadata={
-                                'scanned_ports': list(ports),
-                                'scan_duration': 'unknown'
-                            }
-                        )
-                        
-                        # Add evidence packets
-                        evidence = [p for p in packets if p.src_ip == src_ip and p.dst_ip == dst_ip]
-                        anomaly.evidence = evidence[:10]  # Limit evidence
-                        
-                        anomalies.append(anomaly)
-                        
-        except Exception as e:
-            logger.error(f"Error detecting port scans: {e}")
+        if src_ip is not None:
+            mask &= window.src_ip == np.void(pack_ip(src_ip))
+        if dst_ip is not None:
+            mask &= window.dst_ip == np.void(pack_ip(dst_ip))
+        if protocol is not None:
+            mask &= window.protocol == encode_protocol(protocol)
+        if dst_port is not None:
+            mask &= window.dst_port == dst_port
+            
+        return window.take(np.flatnonzero(mask))
+        
+    def _evidence(self, matches: PacketWindow, limit: int = 10) -> List[PacketMetadata]:
+        """First `limit` matching packets as evidence"""
+        return matches.take(np.arange(min(limit, len(matches)))).to_packets()
+        
+    def _detect_port_scan(self, packet: PacketMetadata, timestamp: float, packets: int = 1) -> Optional[TrafficAnomaly]:
+        """Detect port scanning (distinct SYN destination ports per src->dst)"""
+        if packet.protocol != "TCP" or "SYN" not in packet.tcp_flags:
+            return None
             
-        return anomalies
+        src_ip, dst_ip = packet.src_ip, packet.dst_ip
         
-    def _detect_brute_force(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect brute force attacks"""
-        anomalies = []
+        if self.scan_hosts is not None:
+            # Sketch mode tracks distinct ports per source; hosts tell a single-target scan from a sweep
+            scan_key = src_ip
+            port_count = self.scan_ports.add(scan_key, packet.dst_port, timestamp)
+            host_count = self.scan_hosts.add(src_ip, dst_ip, timestamp)
+            if port_count > self.port_scan_threshold and host_count > 1:
+                dst_ip = "multiple"
+        else:
+            scan_key = (src_ip, dst_ip)
+            port_count = self.scan_ports.add(scan_key, packet.dst_port, timestamp)
+            
+        if port_count <= self.port_scan_threshold:
+            return None
+        if not self.anomaly_dedup.should_raise(('port_scan', src_ip, dst_ip), timestamp):
+            return None
+            
+        matches = self._detection_matches(
+            timestamp, src_ip=src_ip, dst_ip=dst_ip if dst_ip != "multiple" else None
+        )
         
-        try:
-            # Group SSH, RDP, and other authentication attempts
-            auth_attempts = {}
-            
-            for packet in packets:
-                if packet.dst_port in self.suspicious_ports:
-                    key = (packet.src_ip, packet.dst_ip, packet.dst_port)
-                    if key not in auth_attempts:
-                        auth_attempts[key] = []
-                    auth_attempts[key].append(packet)
-                    
-            # Check for brute force patterns
-            for (src_ip, dst_ip, dst_port), attempts in auth_attempts.items():
-                if len(attempts) > self.brute_force_threshold:
-                    # Determine attack type based on port
-                    if dst_port == 22:
-                        attack_description = "SSH brute force"
-                    elif dst_port == 3389:
-                        attack_description = "RDP brute force"
-                    elif dst_port in {445, 139}:
-                        attack_description = "SMB brute force"
-                    else:
-                        attack_description = f"Brute force on port {dst_port}"
-                        
-                    anomaly = TrafficAnomaly(
-                        anomaly_id=f"brute_force_{src_ip}_{dst_ip}_{dst_port}_{datetime.now().timestamp()}",
-                        timestamp=datetime.now(),
-                        src_ip=src_ip,
-                        dst_ip=dst_ip,
-                        attack_type=AttackType.BRUTE_FORCE,
-                        traffic_type=TrafficType.MALICIOUS,
-                        frequency=len(attempts),
-                        severity=min(len(attempts) / 50.0, 1.0),
-                        description=attack_description,
-                        metadata={
-                            'target_port': dst_port,
-                            'attempt_count': len(attempts),
-                            'duration': 'unknown'
-                        }
-                    )
-                    
-                    anomaly.evidence = attempts[:10]
-                    anomalies.append(anomaly)
-                    
-        except Exception as e:
-            logger.error(f"Error detecting brute force: {e}")
+        if self.scan_hosts is None:
+            scanned_ports = self.scan_ports.items(scan_key)
+        else:
+            # The sketch keeps no port sets, so list the ports seen in the packet history
+            scanned_ports = np.unique(matches.dst_port).tolist()
+            
+        anomaly = TrafficAnomaly(
+            anomaly_id=f"port_scan_{src_ip}_{dst_ip}_{datetime.now().timestamp()}",
+            timestamp=datetime.now(),
+            src_ip=src_ip,
+            dst_ip=dst_ip,
+            attack_type=AttackType.PORT_SCAN,
+            traffic_type=TrafficType.MALICIOUS,
+            frequency=port_count,
+            severity=min(port_count / 100.0, 1.0),
+            description=f"Port scan detected: {port_count} ports scanned",
+            metadata={
+                'scanned_ports': scanned_ports,
+                'scan_duration': 'unknown',
+                'window_seconds': self.detection_window,
+                'estimated': self.detector_mode == 'sketch'
+            }
+        )
+        
+        # Add evidence packets
+        anomaly.evidence = self._evidence(matches)
+        
+        return anomaly
+        
+    def _detect_brute_force(self, packet: PacketMetadata, timestamp: float, packets: int = 1) -> Optional[TrafficAnomaly]:
+        """Detect brute force attacks (attempts per src/dst/authentication port)"""
+        if packet.dst_port not in self.suspicious_ports:
+            return None
             
-        return anomalies
+        key = (packet.src_ip, packet.dst_ip, packet.dst_port)
+        attempt_count = int(self.auth_attempts.add(key, timestamp))
         
-    def _detect_ddos(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect DDoS attacks"""
-        anomalies = []
+        if attempt_count <= self.brute_force_threshold:
+            return None
+        if not self.anomaly_dedup.should_raise(('brute_force',) + key, timestamp):
+            return None
+            
+        src_ip, dst_ip, dst_port = key
         
-        try:
-            # Group packets by destination IP
-            dst_traffic = {}
-            
-            for packet in packets:
-                dst_ip = packet.dst_ip
-                if dst_ip not in dst_traffic:
-                    dst_traffic[dst_ip] = []
-                dst_traffic[dst_ip].append(packet)
-                
-            # Check for DDoS patterns
-            for dst_ip, traffic in dst_traffic.items():
-                if len(traffic) > self.ddos_threshold:
-                    # Count unique source IPs
-                    src_ips = set(p.src_ip for p in traffic)
-                    
-                    if len(src_ips) > 5:  # Multiple sources
-                        anomaly = TrafficAnomaly(
-                            anomaly_id=f"ddos_{dst_ip}_{datetime.now().timestamp()}",
-                            timestamp=datetime.now(),
-                            src_ip="multiple",
-                            dst_ip=dst_ip,
-                            attack_type=AttackType.DDoS,
-                            traffic_type=TrafficType.MALICIOUS,
-                            frequency=len(traffic),
-                            severity=min(len(traffic) / 1000.0, 1.0),
-                            description=f"DDoS attack detected: {len(traffic)} packets from {len(src_ips)} sources",
-                            metadata={
-                                'source_count': len(src_ips),
-                                'packet_count': len(traffic),
-                                'top_sources': list(src_ips)[:10]
-                            }
-                        )
-                        
-                        anomaly.evidence = traffic[:10]
-                        anomalies.append(anomaly)
-                        
-        except Exception as e:
-            logger.error(f"Error detecting DDoS: {e}")
+        # Determine attack type based on port
+        if dst_port == 22:
+            attack_description = "SSH brute force"
+        elif dst_port == 3389:
+            attack_description = "RDP brute force"
+        elif dst_port in {445, 139}:
+            attack_description = "SMB brute force"
+        else:
+            attack_description = f"Brute force on port {dst_port}"
+            
+        anomaly = TrafficAnomaly(
+            anomaly_id=f"brute_force_{src_ip}_{dst_ip}_{dst_port}_{datetime.now().timestamp()}",
+            timestamp=datetime.now(),
+            src_ip=src_ip,
+            dst_ip=dst_ip,
+            attack_type=AttackType.BRUTE_FORCE,
+            traffic_type=TrafficType.MALICIOUS,
+            frequency=attempt_count,
+            severity=min(attempt_count / 50.0, 1.0),
+            description=attack_description,
+            metadata={
+                'target_port': dst_port,
+                'attempt_count': attempt_count,
+                'duration': 'unknown',
+                'window_seconds': self.detection_window
+            }
+        )
+        
+        anomaly.evidence = self._evidence(
+            self._detection_matches(timestamp, src_ip=src_ip, dst_ip=dst_ip, dst_port=dst_port)
+        )
+        
+        return anomaly
+        
+    def _detect_ddos(self, packet: PacketMetadata, timestamp: float, packets: int = 1) -> Optional[TrafficAnomaly]:
+        """Detect DDoS attacks (packets and distinct sources per destination)"""
+        dst_ip = packet.dst_ip
+        packet_count = int(self.dst_packets.add(dst_ip, timestamp, packets))
+        
+        # In sketch mode only heavy-hitter destinations track their sources
+        if self.detector_mode == 'sketch' and dst_ip not in self.dst_packets:
+            return None
+        source_count = self.dst_sources.add(dst_ip, packet.src_ip, timestamp)
+        
+        # Multiple sources above the packet threshold
+        if packet_count <= self.ddos_threshold or source_count <= 5:
+            return None
+        if not self.anomaly_dedup.should_raise(('ddos', dst_ip), timestamp):
+            return None
             
-        return anomalies
+        matches = self._detection_matches(timestamp, dst_ip=dst_ip)
+        top_sources = self.dst_sources.items(dst_ip)[:10] or [
+            unpack_ip(bytes(address)) for address in dict.fromkeys(matches.src_ip.tolist())
+        ][:10]
         
-    def _detect_dns_tunneling(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect DNS tunneling activities"""
-        anomalies = []
+        anomaly = TrafficAnomaly(
+            anomaly_id=f"ddos_{dst_ip}_{datetime.now().timestamp()}",
+            timestamp=datetime.now(),
+            src_ip="multiple",
+            dst_ip=dst_ip,
+            attack_type=AttackType.DDoS,
+            traffic_type=TrafficType.MALICIOUS,
+            frequency=packet_count,
+            severity=min(packet_count / 1000.0, 1.0),
+            description=f"DDoS attack detected: {packet_count} packets from {source_count} sources",
+            metadata={
+                'source_count': source_count,
+                'packet_count': packet_count,
+                'top_sources': top_sources,
+                'window_seconds': self.detection_window,
+                'estimated': self.detector_mode == 'sketch'
+            }
+        )
         
-        try:
-            # Group DNS queries by source IP
-            dns_queries = {}
-            
-            for packet in packets:
-                if packet.protocol == "UDP" and packet.dst_port == 53 and packet.dns_query:
-                    src_ip = packet.src_ip
-                    if src_ip not in dns_queries:
-                        dns_queries[src_ip] = []
-                    dns_queries[src_ip].append(packet)
-                    
-            # Check for DNS tunneling patterns
-            for src_ip, queries in dns_queries.items():
-                if len(queries) > self.dns_tunnel_threshold:
-                    # Analyze query patterns
-                    query_lengths = [len(q.dns_query) for q in queries if q.dns_query]
-                    avg_length = sum(query_lengths) / len(query_lengths) if query_lengths else 0
-                    
-                    # Long or frequent queries might indicate tunneling
-                    if avg_length > 50 or len(queries) > 100:
-                        anomaly = TrafficAnomaly(
-                            anomaly_id=f"dns_tunnel_{src_ip}_{datetime.now().timestamp()}",
-                            timestamp=datetime.now(),
-                            src_ip=src_ip,
-                            dst_ip="dns_servers",
-                            attack_type=AttackType.DNS_TUNNELING,
-                            traffic_type=TrafficType.SUSPICIOUS,
-                            frequency=len(queries),
-                            severity=min((len(queries) + avg_length) / 200.0, 1.0),
-                            description=f"Possible DNS tunneling: {len(queries)} queries, avg length {avg_length:.1f}",
-                            metadata={
-                                'query_count': len(queries),
-                                'average_length': avg_length,
-                                'max_length': max(query_lengths) if query_lengths else 0
-                            }
-                        )
-                        
-                        anomaly.evidence = queries[:10]
-                        anomalies.append(anomaly)
-                        
-        except Exception as e:
-            logger.error(f"Error detecting DNS tunneling: {e}")
+        anomaly.evidence = self._evidence(matches)
+        
+        return anomaly
+        
+    def _detect_dns_tunneling(self, packet: PacketMetadata, timestamp: float, packets: int = 1) -> Optional[TrafficAnomaly]:
+        """Detect DNS tunneling (query count and average query length per source)"""
+        if packet.protocol != "UDP" or packet.dst_port != 53 or not packet.dns_query:
+            return None
             
-        return anomalies
+        src_ip = packet.src_ip
+        query_count = int(self.dns_queries.add(src_ip, timestamp))
+        total_length = self.dns_query_lengths.add(src_ip, timestamp, len(packet.dns_query))
+        avg_length = total_length / query_count
         
-    def _detect_protocol_anomalies(self, packets: List[PacketMetadata]) -> List[TrafficAnomaly]:
-        """Detect suspicious protocol usage"""
-        anomalies = []
+        # Long or frequent queries might indicate tunneling
+        if query_count <= self.dns_tunnel_threshold or not (avg_length > 50 or query_count > 100):
+            return None
+        if not self.anomaly_dedup.should_raise(('dns_tunneling', src_ip), timestamp):
+            return None
+            
+        matches = self._detection_matches(timestamp, src_ip=src_ip, protocol="UDP", dst_port=53)
+        query_lengths = [len(query) for query in matches.dns_query if query]
         
-        try:
-            # Group packets by protocol and port
-            protocol_stats = {}
-            
-            for packet in packets:
-                if packet.dst_port:
-                    key = (packet.protocol, packet.dst_port)
-                    if key not in protocol_stats:
-                        protocol_stats[key] = []
-                    protocol_stats[key].append(packet)
-                    
-            # Check for suspicious patterns
-            for (protocol, port), traffic in protocol_stats.items():
-                # High traffic on unusual ports
-                if port not in self.common_ports and len(traffic) > 50:
-                    src_ips = set(p.src_ip for p in traffic)
-                    
-                    if len(src_ips) == 1:  # Single source
-                        anomaly = TrafficAnomaly(
-                            anomaly_id=f"protocol_anomaly_{protocol}_{port}_{datetime.now().timestamp()}",
-                            timestamp=datetime.now(),
-                            src_ip=list(src_ips)[0],
-                            dst_ip="multiple",
-                            attack_type=AttackType.UNKNOWN_ATTACK,
-                            traffic_type=TrafficType.SUSPICIOUS,
-                            frequency=len(traffic),
-                            severity=min(len(traffic) / 100.0, 1.0),
-                            description=f"Unusual {protocol} traffic on port {port}",
-                            metadata={
-                                'protocol': protocol,
-                                'port': port,
-                                'packet_count': len(traffic)
-                            }
-                        )
-                        
-                        anomaly.evidence = traffic[:10]
-                        anomalies.append(anomaly)
-                        
-        except Exception as e:
-            logger.error(f"Error detecting protocol anomalies: {e}")
+        anomaly = TrafficAnomaly(
+            anomaly_id=f"dns_tunnel_{src_ip}_{datetime.now().timestamp()}",
+            timestamp=datetime.now(),
+            src_ip=src_ip,
+            dst_ip="dns_servers",
+            attack_type=AttackType.DNS_TUNNELING,
+            traffic_type=TrafficType.SUSPICIOUS,
+            frequency=query_count,
+            severity=min((query_count + avg_length) / 200.0, 1.0),
+            description=f"Possible DNS tunneling: {query_count} queries, avg length {avg_length:.1f}",
+            metadata={
+                'query_count': query_count,
+                'average_length': avg_length,
+                'max_length': max(query_lengths) if query_lengths else 0,
+                'window_seconds': self.detection_window
+            }
+        )
+        
+        anomaly.evidence = self._evidence(matches)
+        
+        return anomaly
+        
+    def _detect_protocol_anomaly(self, packet: PacketMetadata, timestamp: float, packets: int = 1) -> Optional[TrafficAnomaly]:
+        """Detect suspicious protocol usage (single-source traffic on an unusual port)"""
+        if not packet.dst_port or packet.dst_port in self.common_ports:
+            return None
             
-        return anomalies
+        key = (packet.protocol, packet.dst_port)
+        packet_count = int(self.service_packets.add(key, timestamp, packets))
+        source_count = self.service_sources.add(key, packet.src_ip, timestamp)
+        
+        # High traffic from a single source
+        if packet_count <= 50 or source_count != 1:
+            return None
+        if not self.anomaly_dedup.should_raise(('protocol_anomaly',) + key, timestamp):
+            return None
+            
+        protocol, port = key
+        anomaly = TrafficAnomaly(
+            anomaly_id=f"protocol_anomaly_{protocol}_{port}_{datetime.now().timestamp()}",
+            timestamp=datetime.now(),
+            src_ip=packet.src_ip,
+            dst_ip="multiple",
+            attack_type=AttackType.UNKNOWN_ATTACK,
+            traffic_type=TrafficType.SUSPICIOUS,
+            frequency=packet_count,
+            severity=min(packet_count / 100.0, 1.0),
+            description=f"Unusual {protocol} traffic on port {port}",
+            metadata={
+                'protocol': protocol,
+                'port': port,
+                'packet_count': packet_count,
+                'window_seconds': self.detection_window
+            }
+        )
+        
+        anomaly.evidence = self._evidence(self._detection_matches(timestamp, protocol=protocol, dst_port=port))
+        
+        return anomaly
         
     async def _process_anomaly(self, anomaly: TrafficAnomaly):
         """Process detected anomaly"""
         try:
-            # Add to anomaly buffer
+            # Add to recent anomalies and persist
             self.anomaly_buffer.append(anomaly)
+            self.event_store.append(
+                'anomaly', anomaly.to_dict(), anomaly.anomaly_id, anomaly.timestamp,
+                src_ip=anomaly.src_ip, dst_ip=anomaly.dst_ip, attack_type=anomaly.attack_type.value,
+                severity=self._severity_label(anomaly.severity), score=anomaly.severity
+            )
             
             # Log anomaly
             logger.warning(f"Anomaly detected: {anomaly.description} "
                          f"(severity: {anomaly.severity:.2f})")
-            
+                         
             # Call anomaly callbacks
             for callback in self.anomaly_callbacks:
                 try:
@@ -894,6 +1299,15 @@ class NetSniffer:
         except Exception as e:
             logger.error(f"Error processing anomaly: {e}")
             
+    @staticmethod
+    def _severity_label(severity: float) -> str:
+        """Severity band used in summaries and the event store index"""
+        if severity < 0.3:
+            return 'low'
+        elif severity < 0.7:
+            return 'medium'
+        return 'high'
+        
     async def _anomaly_detection_loop(self):
         """Main anomaly detection loop"""
         try:
@@ -902,6 +1316,10 @@ class NetSniffer:
                 if self.anomaly_buffer:
                     await self._generate_anomaly_summary()
                     
+                # Drop event store segments past the retention period
+                if self.owns_event_store:
+                    self.event_store.expire()
+                    
                 await asyncio.sleep(30)  # Summary interval
                 
         except Exception as e:
@@ -913,46 +1331,24 @@ class NetSniffer:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             summary_file = self.report_dir / f"anomaly_summary_{timestamp}.json"
             
-            # Create summary
+            # Aggregate this capture's anomalies in the event store
+            since = self.capture_start_time
+            top_sources = self.event_store.count('anomaly', start=since, group_by='src_ip')
+            top_targets = self.event_store.count('anomaly', start=since, group_by='dst_ip')
+            
             summary = {
                 'timestamp': datetime.now().isoformat(),
-                'total_anomalies': len(self.anomaly_buffer),
-                'anomalies_by_type': {},
-                'anomalies_by_severity': {'low': 0, 'medium': 0, 'high': 0},
-                'top_sources': {},
-                'top_targets': {},
-                'recent_anomalies': []
+                'total_anomalies': self.event_store.count('anomaly', start=since),
+                'anomalies_by_type': self.event_store.count('anomaly', start=since, group_by='attack_type'),
+                'anomalies_by_severity': {
+                    'low': 0, 'medium': 0, 'high': 0,
+                    **self.event_store.count('anomaly', start=since, group_by='severity')
+                },
+                'top_sources': dict(sorted(top_sources.items(), key=lambda item: item[1], reverse=True)[:10]),
+                'top_targets': dict(sorted(top_targets.items(), key=lambda item: item[1], reverse=True)[:10]),
+                'recent_anomalies': list(self.event_store.query('anomaly', start=since, limit=10, newest_first=True))
             }
             
-            # Analyze anomalies
-            for anomaly in self.anomaly_buffer:
-                # Count by type
-                attack_type = anomaly.attack_type.value
-                if attack_type not in summary['anomalies_by_type']:
-                    summary['anomalies_by_type'][attack_type] = 0
-                summary['anomalies_by_type'][attack_type] += 1
-                
-                # Count by severity
-                if anomaly.severity < 0.3:
-                    summary['anomalies_by_severity']['low'] += 1
-                elif anomaly.severity < 0.7:
-                    summary['anomalies_by_severity']['medium'] += 1
-                else:
-                    summary['anomalies_by_severity']['high'] += 1
-                    
-                # Track top sources and targets
-                if anomaly.src_ip not in summary['top_sources']:
-                    summary['top_sources'][anomaly.src_ip] = 0
-                summary['top_sources'][anomaly.src_ip] += 1
-                
-                if anomaly.dst_ip not in summary['top_targets']:
-                    summary['top_targets'][anomaly.dst_ip] = 0
-                summary['top_targets'][anomaly.dst_ip] += 1
-                
-            # Add recent anomalies
-            recent_anomalies = sorted(self.anomaly_buffer, key=lambda x: x.timestamp, reverse=True)[:10]
-            summary['recent_anomalies'] = [anomaly.to_dict() for anomaly in recent_anomalies]
-            
             # Save summary
             with open(summary_file, 'w') as f:
                 json.dump(summary, f, indent=2)
@@ -962,21 +1358,6 @@ class NetSniffer:
         except Exception as e:
             logger.error(f"Error generating anomaly summary: {e}")
             
-    async def _process_remaining_packets(self):
-        """Process any remaining packets before shutdown"""
-        try:
-            if self.packet_buffer:
-                logger.info(f"Processing {len(self.packet_buffer)} remaining packets")
-                
-                # Final anomaly detection
-                anomalies = self._detect_anomalies(self.packet_buffer)
-                
-                for anomaly in anomalies:
-                    await self._process_anomaly(anomaly)
-                    
-        except Exception as e:
-            logger.error(f"Error processing remaining packets: {e}")
-            
     async def _generate_capture_report(self):
         """Generate final capture report"""
         try:
@@ -988,7 +1369,7 @@ class NetSniffer:
                 'timestamp': datetime.now().isoformat(),
                 'capture_duration': 'unknown',
                 'total_packets': len(self.packet_buffer),
-                'total_anomalies': len(self.anomaly_buffer),
+                'total_anomalies': self.event_store.count('anomaly', start=self.capture_start_time),
                 'packet_summary': self._generate_packet_summary(),
                 'anomaly_summary': [anomaly.to_dict() for anomaly in self.anomaly_buffer],
                 'statistics': self._generate_statistics()
@@ -1009,33 +1390,24 @@ class NetSniffer:
             if not self.packet_buffer:
                 return {}
                 
+            window = self.packet_buffer.window()
+            
             # Protocol distribution
-            protocols = {}
-            for packet in self.packet_buffer:
-                protocol = packet.protocol
-                if protocol not in protocols:
-                    protocols[protocol] = 0
-                protocols[protocol] += 1
-                
+            codes, counts = np.unique(window.protocol, return_counts=True)
+            protocols = {decode_protocol(code): int(count) for code, count in zip(codes, counts)}
+            
             # Port distribution
-            ports = {}
-            for packet in self.packet_buffer:
-                if packet.dst_port:
-                    port = packet.dst_port
-                    if port not in ports:
-                        ports[port] = 0
-                    ports[port] += 1
-                    
-            # Source/destination IPs
-            src_ips = set(p.src_ip for p in self.packet_buffer)
-            dst_ips = set(p.dst_ip for p in self.packet_buffer)
+            dst_ports = window.dst_port[window.dst_port > 0]
+            port_values, port_counts = np.unique(dst_ports, return_counts=True)
+            top = np.argsort(port_counts, kind='stable')[::-1][:10]
+            top_ports = {int(port_values[i]): int(port_counts[i]) for i in top}
             
             return {
                 'protocol_distribution': protocols,
-                'top_ports': dict(sorted(ports.items(), key=lambda x: x[1], reverse=True)[:10]),
-                'unique_src_ips': len(src_ips),
-                'unique_dst_ips': len(dst_ips),
-                'total_packets': len(self.packet_buffer)
+                'top_ports': top_ports,
+                'unique_src_ips': len(np.unique(window.src_ip)),
+                'unique_dst_ips': len(np.unique(window.dst_ip)),
+                'total_packets': len(window)
             }
             
         except Exception as e:
@@ -1049,6 +1421,7 @@ class NetSniffer:
                 'capture_interface': self.interface,
                 'capture_filter': self.capture_filter,
                 'analysis_batch_size': self.analysis_batch_size,
+                'detection_window': self.detection_window,
                 'anomaly_threshold': self.anomaly_threshold,
                 'thresholds': {
                     'port_scan': self.port_scan_threshold,
@@ -1068,35 +1441,71 @@ class NetSniffer:
             'running': self.running,
             'interface': self.interface,
             'packet_buffer_size': len(self.packet_buffer),
+            'packet_buffer_memory': self.packet_buffer.memory_usage(),
             'anomaly_buffer_size': len(self.anomaly_buffer),
-            'capture_process_running': self.capture_process is not None and self.capture_process.poll() is None,
+            'total_anomalies': self.event_store.count('anomaly'),
+            'event_store': self.event_store.get_stats(),
+            'capture_mode': self.capture_mode,
+            'capture_process_running': self._capture_process_running(),
+            'stream_queue_depth': self.stream_queue.qsize() if self.stream_queue is not None else 0,
+            'stream_stats': self.stream_stats,
+            'decode_workers': self.decode_workers,
+            'decode_stats': self.parallel_decoder.stats if self.parallel_decoder else {},
+            'detector_state': {
+                'tracked_keys': {
+                    'port_scan': len(self.scan_ports),
+                    'brute_force': len(self.auth_attempts),
+                    'ddos': len(self.dst_packets),
+                    'dns_tunneling': len(self.dns_queries),
+                    'protocol_anomaly': len(self.service_packets)
+                },
+                'mode': self.detector_mode,
+                'source': self.detection_source,
+                'sketch_bytes': sum(
+                    window.memory_usage() for window in self.detector_windows if hasattr(window, 'memory_usage')
+                ),
+                'active_anomalies': len(self.anomaly_dedup),
+                'suppressed_duplicates': self.anomaly_dedup.suppressed
+            },
+            'flow_stats': self.flow_table.get_stats() if self.flow_table is not None else {},
             'callback_count': {
                 'packet_callbacks': len(self.packet_callbacks),
-                'anomaly_callbacks': len(self.anomaly_callbacks)
+                'anomaly_callbacks': len(self.anomaly_callbacks),
+                'flow_callbacks': len(self.flow_callbacks)
             }
         }
         
     def get_recent_anomalies(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent anomalies"""
-        recent = sorted(self.anomaly_buffer, key=lambda x: x.timestamp, reverse=True)[:limit]
-        return [anomaly.to_dict() for anomaly in recent]
+        return list(self.event_store.query('anomaly', limit=limit, newest_first=True))
+        
+    def query_anomalies(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        src_ip: Optional[str] = None, attack_type: Optional[AttackType] = None,
+                        min_severity: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Query persisted anomalies by time range, source IP, attack type and severity"""
+        return list(self.event_store.query(
+            'anomaly', start=start, end=end, src_ip=src_ip,
+            attack_type=attack_type.value if attack_type else None,
+            min_score=min_severity, limit=limit
+        ))
         
-    def export_anomalies(self, output_file: str) -> Dict[str, Any]:
-        """Export anomalies to JSON file"""
+    def export_anomalies(self, output_file: str, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None) -> Dict[str, Any]:
+        """Export anomalies to JSON file (streamed from the event store)"""
         try:
-            export_data = {
-                'export_timestamp': datetime.now().isoformat(),
-                'total_anomalies': len(self.anomaly_buffer),
-                'anomalies': [anomaly.to_dict() for anomaly in self.anomaly_buffer]
-            }
+            exported = self.event_store.export_json(
+                output_file, 'anomaly',
+                {
+                    'export_timestamp': datetime.now().isoformat(),
+                    'total_anomalies': self.event_store.count('anomaly', start=start, end=end)
+                },
+                'anomalies', start=start, end=end
+            )
             
-            with open(output_file, 'w') as f:
-                json.dump(export_data, f, indent=2)
-                
             return {
                 'success': True,
                 'output_file': output_file,
-                'exported_count': len(self.anomaly_buffer)
+                'exported_count': exported
             }
             
         except Exception as e:
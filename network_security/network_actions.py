@@ -9,13 +9,18 @@ with external security tools and systems.
 import asyncio
 import logging
 import subprocess
+import time
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
-import json
 import ipaddress
 from pathlib import Path
+from collections import deque
+
+from event_store import EventStore, write_json_export
+from action_scheduler import ActionScheduler
+from firewall_sets import create_firewall_set_backend, SimulatedFirewallExecutor
 
 try:
     import netaddr
@@ -44,6 +49,22 @@ class ActionType(Enum):
     NOTIFY_EXTERNAL = "notify_external"
 
 
+# Scheduling order: incident severity first, then action type (lower runs first)
+SEVERITY_PRIORITY = {'critical': 0, 'error': 1, 'warning': 2, 'info': 3}
+DEFAULT_SEVERITY_PRIORITY = 2
+
+ACTION_TYPE_PRIORITY = {
+    ActionType.FIREWALL_BLOCK: 0,
+    ActionType.CONNECTION_RESET: 1,
+    ActionType.QUARANTINE_VLAN: 1,
+    ActionType.REDIRECT_TO_HONEYPOT: 2,
+    ActionType.SINKHOLE_DNS: 2,
+    ActionType.TRAFFIC_SHAPING: 3,
+    ActionType.BANDWIDTH_LIMIT: 3,
+    ActionType.NOTIFY_EXTERNAL: 4
+}
+
+
 class ActionStatus(Enum):
     """Status of network actions"""
     PENDING = "pending"
@@ -62,6 +83,7 @@ class NetworkAction:
     target_port: Optional[int] = None
     duration_seconds: Optional[int] = None
     parameters: Dict[str, Any] = field(default_factory=dict)
+    severity: Optional[str] = None
     
     status: ActionStatus = ActionStatus.PENDING
     created_at: datetime = field(default_factory=datetime.now)
@@ -81,6 +103,7 @@ class NetworkAction:
             'target_port': self.target_port,
             'duration_seconds': self.duration_seconds,
             'parameters': self.parameters,
+            'severity': self.severity,
             'status': self.status.value,
             'created_at': self.created_at.isoformat(),
             'executed_at': self.executed_at.isoformat() if self.executed_at else None,
@@ -97,12 +120,14 @@ class NetworkActionEngine:
     including firewall rules, traffic shaping, and quarantine.
     """
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None, event_store: Optional[EventStore] = None):
         """
         Initialize the network action engine.
         
         Args:
             config: Configuration dictionary
+            event_store: Shared persistent event store. When omitted, the engine
+                keeps its own store under the action directory.
         """
         self.config = config or {}
         
@@ -112,10 +137,25 @@ class NetworkActionEngine:
         self.default_action_timeout = self.config.get('default_action_timeout', 300)
         
         # Firewall configuration
-        self.firewall_type = self.config.get('firewall_type', 'iptables')  # iptables, pf, windows
+        self.firewall_type = self.config.get('firewall_type', 'iptables')  # iptables, pf, windows, ipset, nftables
         self.firewall_chain = self.config.get('firewall_chain', 'INPUT')
         self.firewall_table = self.config.get('firewall_table', 'filter')
         
+        # Set-based firewalls (ipset, nftables): blocks are set elements with
+        # kernel timeouts, applied in coalesced batches. The simulated executor
+        # applies the batches in memory for testing without root.
+        if self.config.get('firewall_executor', 'system') == 'simulated':
+            self.firewall_executor = SimulatedFirewallExecutor()
+        else:
+            self.firewall_executor = self._execute_command
+        self.firewall_sets = create_firewall_set_backend(
+            self.firewall_type, self.firewall_executor,
+            set_name=self.config.get('firewall_set_name', 'security_block'),
+            chain=self.firewall_chain,
+            batch_window=self.config.get('firewall_batch_window_ms', 50) / 1000,
+            max_batch=self.config.get('firewall_max_batch', 1000)
+        )
+        
         # Traffic shaping configuration
         self.tc_available = self.config.get('tc_available', True)
         self.default_bandwidth_limit = self.config.get('default_bandwidth_limit', '1mbit')
@@ -135,8 +175,30 @@ class NetworkActionEngine:
         # State management
         self.running = False
         self.active_actions: Dict[str, NetworkAction] = {}
-        self.action_history: List[NetworkAction] = []
-        self.action_queue: asyncio.Queue = asyncio.Queue()
+        # Finished actions are persisted; only recent ones stay in memory
+        self.action_history = deque(maxlen=self.config.get('action_history_size', 1000))
+        self.owns_event_store = event_store is None
+        self.event_store = event_store if event_store is not None else EventStore(
+            self.config.get('event_dir', str(self.action_dir / 'events')),
+            self.config.get('event_segment_seconds', 86400),
+            self.config.get('event_retention_days', 30),
+            flush_interval=self.config.get('event_flush_ms', 200) / 1000.0,
+            sync_interval=self.config.get('event_sync_ms', 1000) / 1000.0
+        )
+        
+        # Pending actions ordered by severity and action type, one per
+        # (type, target); per-type limits come on top of max_concurrent_actions.
+        # Set-based blocks only wait for their batch, so they do not take a
+        # max_concurrent_actions slot.
+        self.scheduler = ActionScheduler(
+            {
+                ActionType(action_type): limit
+                for action_type, limit in self.config.get('action_type_limits', {}).items()
+            },
+            total_limit=self.max_concurrent_actions,
+            exempt_kinds=[ActionType.FIREWALL_BLOCK] if self.firewall_sets is not None else []
+        )
+        self.processing_task: Optional[asyncio.Task] = None
         
         # Action handlers
         self.action_handlers = {
@@ -157,8 +219,10 @@ class NetworkActionEngine:
             'total_actions_failed': 0,
             'actions_by_type': {},
             'average_execution_time': 0.0,
+            'max_execution_time': 0.0,
             'last_action_time': None
         }
+        self.execution_time_total = 0.0
         
         logger.info("Network Action Engine initialized")
         
@@ -174,7 +238,7 @@ class NetworkActionEngine:
             self.running = True
             
             # Start action processing loop
-            asyncio.create_task(self._action_processing_loop())
+            self.processing_task = asyncio.create_task(self._action_processing_loop())
             
             # Start cleanup loop
             asyncio.create_task(self._cleanup_loop())
@@ -197,12 +261,18 @@ class NetworkActionEngine:
         try:
             self.running = False
             
+            if self.processing_task:
+                self.processing_task.cancel()
+                
             # Process remaining actions
             await self._process_remaining_actions()
             
             # Clean up active actions
             await self._cleanup_active_actions()
             
+            if self.owns_event_store:
+                self.event_store.close()
+                
             logger.info("Network action engine stopped successfully")
             
         except Exception as e:
@@ -211,19 +281,24 @@ class NetworkActionEngine:
     async def queue_action(self, action_type: ActionType, target_ip: str, 
                           target_port: Optional[int] = None,
                           duration_seconds: Optional[int] = None,
-                          parameters: Optional[Dict[str, Any]] = None) -> str:
+                          parameters: Optional[Dict[str, Any]] = None,
+                          severity: Optional[str] = None) -> str:
         """
         Queue a network action for execution.
         
+        A pending action with the same type, target IP and port absorbs the
+        new one (longest duration, highest severity) instead of queueing twice.
+        
         Args:
             action_type: Type of action to execute
             target_ip: Target IP address
             target_port: Target port (optional)
             duration_seconds: Action duration (optional)
             parameters: Additional parameters
+            severity: Severity of the triggering incident (info, warning, error, critical)
             
         Returns:
-            Action ID
+            Action ID (of the pending action if coalesced)
         """
         try:
             # Validate IP address
@@ -237,7 +312,8 @@ class NetworkActionEngine:
                 target_ip=target_ip,
                 target_port=target_port,
                 duration_seconds=duration_seconds,
-                parameters=parameters or {}
+                parameters=parameters or {},
+                severity=severity
             )
             
             # Set expiration time
@@ -245,44 +321,73 @@ class NetworkActionEngine:
                 action.expires_at = datetime.now() + timedelta(seconds=duration_seconds)
                 
             # Queue action
-            await self.action_queue.put(action)
+            queued, coalesced = self.scheduler.push(
+                action, self._action_priority(action),
+                key=(action_type, target_ip, target_port), kind=action_type,
+                merge=self._merge_actions
+            )
             self.stats['total_actions_queued'] += 1
             
-            logger.info(f"Queued action: {action_type.value} for {target_ip}")
-            
-            return action.action_id
+            if coalesced:
+                logger.debug(f"Merged {action_type.value} for {target_ip} into pending action {queued.action_id}")
+            else:
+                logger.info(f"Queued action: {action_type.value} for {target_ip}")
+                
+            return queued.action_id
             
         except Exception as e:
             logger.error(f"Error queueing action: {e}")
             raise
             
+    @staticmethod
+    def _action_priority(action: NetworkAction) -> Tuple[int, int]:
+        """Scheduling priority: incident severity, then action type"""
+        return (
+            SEVERITY_PRIORITY.get(action.severity, DEFAULT_SEVERITY_PRIORITY),
+            ACTION_TYPE_PRIORITY.get(action.action_type, len(ACTION_TYPE_PRIORITY))
+        )
+        
+    @staticmethod
+    def _merge_actions(pending: NetworkAction, duplicate: NetworkAction):
+        """Fold a duplicate request into the pending action for the same target"""
+        if pending.duration_seconds is not None:
+            # No duration means permanent, which outlasts any duration
+            if duplicate.duration_seconds is None or duplicate.duration_seconds > pending.duration_seconds:
+                pending.duration_seconds = duplicate.duration_seconds
+                pending.expires_at = duplicate.expires_at
+                
+        if (SEVERITY_PRIORITY.get(duplicate.severity, DEFAULT_SEVERITY_PRIORITY)
+                < SEVERITY_PRIORITY.get(pending.severity, DEFAULT_SEVERITY_PRIORITY)):
+            pending.severity = duplicate.severity
+            
+        pending.parameters.update(duplicate.parameters)
+        
     async def _action_processing_loop(self):
-        """Main action processing loop"""
+        """Main action processing loop: dispatch by priority while capacity allows"""
         try:
             while self.running:
                 try:
-                    # Get action from queue (with timeout)
-                    action = await asyncio.wait_for(self.action_queue.get(), timeout=1.0)
-                    
-                    # Check if we have capacity
-                    if len(self.active_actions) >= self.max_concurrent_actions:
-                        # Put action back in queue
-                        await self.action_queue.put(action)
-                        await asyncio.sleep(1)
-                        continue
-                        
-                    # Execute action
-                    asyncio.create_task(self._execute_action(action))
+                    # The scheduler only hands out actions that fit the concurrency limits
+                    action = await self.scheduler.get()
+                    asyncio.create_task(self._run_scheduled_action(action))
                     
-                except asyncio.TimeoutError:
-                    # No actions in queue, continue
-                    continue
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
                     logger.error(f"Error in action processing loop: {e}")
                     
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             logger.error(f"Action processing loop error: {e}")
             
+    async def _run_scheduled_action(self, action: NetworkAction):
+        """Execute a dispatched action and release its scheduler slots"""
+        try:
+            await self._execute_action(action)
+        finally:
+            self.scheduler.done(action.action_type)
+            
     async def _execute_action(self, action: NetworkAction):
         """Execute a network action"""
         try:
@@ -298,7 +403,9 @@ class NetworkActionEngine:
             # Execute action based on type
             if action.action_type in self.action_handlers:
                 handler = self.action_handlers[action.action_type]
+                started = time.monotonic()
                 success, details = await handler(action)
+                self._record_execution_time(time.monotonic() - started)
                 
                 action.success = success
                 action.execution_details = details
@@ -325,9 +432,6 @@ class NetworkActionEngine:
             
             self.stats['last_action_time'] = datetime.now()
             
-            # Save action
-            await self._save_action(action)
-            
         except Exception as e:
             logger.error(f"Error executing action {action.action_id}: {e}")
             action.status = ActionStatus.FAILED
@@ -337,9 +441,24 @@ class NetworkActionEngine:
         finally:
             # Move to history
             if action.action_id in self.active_actions:
-                self.action_history.append(self.active_actions[action.action_id])
+                self._archive_action(self.active_actions[action.action_id])
                 del self.active_actions[action.action_id]
                 
+    def _record_execution_time(self, elapsed: float):
+        """Update execution latency statistics"""
+        self.execution_time_total += elapsed
+        executed = self.stats['total_actions_executed'] + self.stats['total_actions_failed'] + 1
+        self.stats['average_execution_time'] = self.execution_time_total / executed
+        self.stats['max_execution_time'] = max(self.stats['max_execution_time'], elapsed)
+        
+    def _archive_action(self, action: NetworkAction):
+        """Move a finished action to history and the event store"""
+        self.action_history.append(action)
+        self.event_store.append(
+            'action', action.to_dict(), action.action_id, action.created_at,
+            src_ip=action.target_ip, action_type=action.action_type.value, status=action.status.value
+        )
+        
     async def _execute_firewall_block(self, action: NetworkAction) -> Tuple[bool, Dict[str, Any]]:
         """Execute firewall block action"""
         try:
@@ -352,7 +471,14 @@ class NetworkActionEngine:
                 return True, details
                 
             # Execute based on firewall type
-            if self.firewall_type == 'iptables':
+            if self.firewall_sets is not None:
+                # Coalesced with other blocks; the kernel expires the element
+                result = await self.firewall_sets.block(target_ip, action.target_port, action.duration_seconds)
+                details.update(result)
+                
+                return result['success'], details
+                
+            elif self.firewall_type == 'iptables':
                 cmd = [
                     'iptables', '-I', self.firewall_chain,
                     '-s', target_ip,
@@ -651,17 +777,6 @@ class NetworkActionEngine:
         except ValueError:
             return False
             
-    async def _save_action(self, action: NetworkAction):
-        """Save action to file"""
-        try:
-            action_file = self.action_dir / f"{action.action_id}.json"
-            
-            with open(action_file, 'w') as f:
-                json.dump(action.to_dict(), f, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Error saving action: {e}")
-            
     async def _cleanup_loop(self):
         """Background cleanup loop"""
         try:
@@ -684,20 +799,25 @@ class NetworkActionEngine:
                     await self._cleanup_expired_action(action)
                     
                     # Move to history
-                    self.action_history.append(action)
+                    self._archive_action(action)
                     del self.active_actions[action.action_id]
                     
                 logger.info(f"Cleaned up {len(expired_actions)} expired actions")
                 
+                # Drop event store segments past the retention period
+                self.event_store.expire()
+                
         except Exception as e:
             logger.error(f"Error in cleanup loop: {e}")
             
     async def _cleanup_expired_action(self, action: NetworkAction):
         """Clean up expired action"""
         try:
-            # Remove firewall rules, traffic shaping, etc.
+            # Remove firewall rules, traffic shaping, etc. Set-based blocks
+            # carry a kernel timeout and expire on their own.
             if action.action_type == ActionType.FIREWALL_BLOCK:
-                await self._remove_firewall_rule(action)
+                if self.firewall_sets is None:
+                    await self._remove_firewall_rule(action)
             elif action.action_type == ActionType.TRAFFIC_SHAPING:
                 await self._remove_traffic_shaping(action)
                 
@@ -711,7 +831,10 @@ class NetworkActionEngine:
         try:
             target_ip = action.target_ip
             
-            if self.firewall_type == 'iptables':
+            if self.firewall_sets is not None:
+                await self.firewall_sets.unblock(target_ip, action.target_port)
+                
+            elif self.firewall_type == 'iptables':
                 cmd = [
                     'iptables', '-D', self.firewall_chain,
                     '-s', target_ip,
@@ -741,14 +864,10 @@ class NetworkActionEngine:
     async def _process_remaining_actions(self):
         """Process remaining actions before shutdown"""
         try:
-            # Process remaining actions in queue
-            while not self.action_queue.empty():
-                try:
-                    action = self.action_queue.get_nowait()
-                    await self._execute_action(action)
-                except asyncio.QueueEmpty:
-                    break
-                    
+            # Process remaining actions in priority order
+            for action in self.scheduler.drain():
+                await self._execute_action(action)
+                
         except Exception as e:
             logger.error(f"Error processing remaining actions: {e}")
             
@@ -767,9 +886,10 @@ class NetworkActionEngine:
             'running': self.running,
             'dry_run': self.dry_run,
             'active_actions': len(self.active_actions),
-            'queue_size': self.action_queue.qsize(),
-            'total_actions_history': len(self.action_history),
+            'queue_size': len(self.scheduler),
+            'total_actions_history': self.event_store.count('action'),
             'statistics': self.stats,
+            'firewall_sets': self.firewall_sets.stats if self.firewall_sets is not None else None,
             'configuration': {
                 'firewall_type': self.firewall_type,
                 'max_concurrent_actions': self.max_concurrent_actions,
@@ -779,8 +899,17 @@ class NetworkActionEngine:
         
     def get_recent_actions(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent actions"""
-        recent = sorted(self.action_history, key=lambda x: x.created_at, reverse=True)[:limit]
-        return [action.to_dict() for action in recent]
+        return list(self.event_store.query('action', limit=limit, newest_first=True))
+        
+    def query_actions(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      target_ip: Optional[str] = None, action_type: Optional[ActionType] = None,
+                      status: Optional[ActionStatus] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Query finished actions by time range, target IP, action type and status"""
+        return list(self.event_store.query(
+            'action', start=start, end=end, src_ip=target_ip,
+            action_type=action_type.value if action_type else None,
+            status=status.value if status else None, limit=limit
+        ))
         
     def get_action_stats(self) -> Dict[str, Any]:
         """Get action statistics"""
@@ -791,17 +920,17 @@ class NetworkActionEngine:
                 max(self.stats['total_actions_executed'] + self.stats['total_actions_failed'], 1)
             ),
             'active_actions': len(self.active_actions),
-            'queue_size': self.action_queue.qsize()
+            'queue_size': len(self.scheduler),
+            'scheduler': self.scheduler.get_stats()
         }
         
     def export_action_data(self, output_file: str) -> Dict[str, Any]:
-        """Export action data"""
+        """Export action data (action history is streamed from the event store)"""
         try:
             export_data = {
                 'timestamp': datetime.now().isoformat(),
                 'statistics': self.stats,
                 'active_actions': [action.to_dict() for action in self.active_actions.values()],
-                'action_history': [action.to_dict() for action in self.action_history],
                 'configuration': {
                     'firewall_type': self.firewall_type,
                     'quarantine_vlan': self.quarantine_vlan,
@@ -809,13 +938,12 @@ class NetworkActionEngine:
                 }
             }
             
-            with open(output_file, 'w') as f:
-                json.dump(export_data, f, indent=2)
-                
+            exported = write_json_export(output_file, export_data, 'action_history', self.event_store.query('action'))
+            
             return {
                 'success': True,
                 'output_file': output_file,
-                'actions_exported': len(self.action_history),
+                'actions_exported': exported,
                 'active_actions_exported': len(self.active_actions)
             }
             
@@ -0,0 +1,337 @@
+"""
+Columnar Packet History Store for Network Security Monitoring
+
+Fixed-capacity ring store that keeps packet history as NumPy columns instead
+of lists of PacketMetadata objects. It is shared by NetSniffer and
+NetworkAnomalyDetector so each packet is stored once, appends are O(1) and
+recent-history windows are returned as zero-copy array views.
+"""
+
+import logging
+import socket
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from pcap_stream import TCP_FLAG_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+# IPv4 addresses are stored as IPv4-mapped IPv6 (::ffff:a.b.c.d)
+IPV4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+# Protocol codes follow IP protocol numbers; names are kept for the common ones
+PROTOCOL_CODES = {"ICMP": 1, "TCP": 6, "UDP": 17}
+PROTOCOL_NAMES = {code: name for name, code in PROTOCOL_CODES.items()}
+PROTOCOL_UNKNOWN = 255
+
+TCP_FLAG_BITS = {name: bit for bit, name in TCP_FLAG_NAMES}
+
+NO_PORT = -1
+
+
+@lru_cache(maxsize=65536)
+def pack_ip(ip: str) -> bytes:
+    """Pack an IPv4 or IPv6 address string into 16 bytes"""
+    try:
+        if ':' in ip:
+            return socket.inet_pton(socket.AF_INET6, ip)
+        return IPV4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, ip)
+    except (OSError, TypeError):
+        return bytes(16)
+
+
+@lru_cache(maxsize=65536)
+def unpack_ip(packed: bytes) -> str:
+    """Unpack a 16-byte address into its string form"""
+    if packed[:12] == IPV4_MAPPED_PREFIX:
+        return socket.inet_ntop(socket.AF_INET, packed[12:])
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+def encode_protocol(protocol: Any) -> int:
+    """Encode a PacketMetadata protocol (name or IP protocol number) as a code"""
+    if isinstance(protocol, str):
+        if protocol in PROTOCOL_CODES:
+            return PROTOCOL_CODES[protocol]
+        if protocol.isdigit():
+            return int(protocol) & 0xff
+        return PROTOCOL_UNKNOWN
+    if isinstance(protocol, int):
+        return protocol & 0xff
+    return PROTOCOL_UNKNOWN
+
+
+def decode_protocol(code: int) -> Any:
+    """Decode a protocol code back to the PacketMetadata representation"""
+    code = int(code)
+    if code in PROTOCOL_NAMES:
+        return PROTOCOL_NAMES[code]
+    if code == PROTOCOL_UNKNOWN:
+        return "unknown"
+    return code
+
+
+def encode_tcp_flags(flags: Optional[List[str]]) -> int:
+    """Encode a list of TCP flag names as a bitmask"""
+    bits = 0
+    for flag in flags or []:
+        bits |= TCP_FLAG_BITS.get(flag, 0)
+    return bits
+
+
+def decode_tcp_flags(bits: int) -> List[str]:
+    """Decode a TCP flag bitmask into flag names"""
+    return [name for bit, name in TCP_FLAG_NAMES if bits & bit]
+
+
+@dataclass
+class PacketWindow:
+    """Column views over a contiguous range of packet history"""
+    timestamp: np.ndarray
+    src_ip: np.ndarray
+    dst_ip: np.ndarray
+    src_port: np.ndarray
+    dst_port: np.ndarray
+    protocol: np.ndarray
+    packet_size: np.ndarray
+    tcp_flags: np.ndarray
+    dns_query: np.ndarray
+    
+    # Only present on freshly decoded windows; the history store does not keep them
+    dns_response: Optional[np.ndarray] = None
+    payload_hash: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return len(self.timestamp)
+        
+    @classmethod
+    def from_packets(cls, packets: List[Any]) -> 'PacketWindow':
+        """Build columns from a list of PacketMetadata objects"""
+        return cls(
+            timestamp=np.fromiter((p.timestamp.timestamp() for p in packets), dtype=np.float64, count=len(packets)),
+            src_ip=np.array([pack_ip(p.src_ip) for p in packets], dtype='V16'),
+            dst_ip=np.array([pack_ip(p.dst_ip) for p in packets], dtype='V16'),
+            src_port=np.fromiter(
+                (p.src_port if p.src_port is not None else NO_PORT for p in packets),
+                dtype=np.int32, count=len(packets)
+            ),
+            dst_port=np.fromiter(
+                (p.dst_port if p.dst_port is not None else NO_PORT for p in packets),
+                dtype=np.int32, count=len(packets)
+            ),
+            protocol=np.fromiter((encode_protocol(p.protocol) for p in packets), dtype=np.uint8, count=len(packets)),
+            packet_size=np.fromiter((p.packet_size for p in packets), dtype=np.uint32, count=len(packets)),
+            tcp_flags=np.fromiter((encode_tcp_flags(p.tcp_flags) for p in packets), dtype=np.uint8, count=len(packets)),
+            dns_query=np.array([p.dns_query for p in packets] + [None], dtype=object)[:-1]
+        )
+        
+    def take(self, indices: np.ndarray) -> 'PacketWindow':
+        """Copy of the rows at `indices`"""
+        return PacketWindow(
+            timestamp=self.timestamp[indices],
+            src_ip=self.src_ip[indices],
+            dst_ip=self.dst_ip[indices],
+            src_port=self.src_port[indices],
+            dst_port=self.dst_port[indices],
+            protocol=self.protocol[indices],
+            packet_size=self.packet_size[indices],
+            tcp_flags=self.tcp_flags[indices],
+            dns_query=self.dns_query[indices],
+            dns_response=self.dns_response[indices] if self.dns_response is not None else None,
+            payload_hash=self.payload_hash[indices] if self.payload_hash is not None else None
+        )
+        
+    def to_packets(self) -> List[Any]:
+        """Materialize the window as PacketMetadata objects"""
+        from netsniffer import PacketMetadata
+        
+        packets = []
+        for i in range(len(self.timestamp)):
+            src_port = int(self.src_port[i])
+            dst_port = int(self.dst_port[i])
+            packets.append(PacketMetadata(
+                timestamp=datetime.fromtimestamp(float(self.timestamp[i])),
+                src_ip=unpack_ip(bytes(self.src_ip[i])),
+                dst_ip=unpack_ip(bytes(self.dst_ip[i])),
+                src_port=src_port if src_port != NO_PORT else None,
+                dst_port=dst_port if dst_port != NO_PORT else None,
+                protocol=decode_protocol(self.protocol[i]),
+                packet_size=int(self.packet_size[i]),
+                tcp_flags=decode_tcp_flags(int(self.tcp_flags[i])),
+                dns_query=self.dns_query[i],
+                dns_response=self.dns_response[i] if self.dns_response is not None else None,
+                payload_hash=self.payload_hash[i] if self.payload_hash is not None else None
+            ))
+            
+        return packets
+
+
+class PacketHistoryStore:
+    """
+    Fixed-capacity columnar ring store for packet history.
+    
+    Columns are allocated at twice the capacity and live packets always occupy
+    one contiguous range, so any window of recent history is a plain slice.
+    When the write position reaches the end of the arrays the live range is
+    copied back to the front, which costs one bulk copy per `capacity`
+    appends (amortized O(1) per packet).
+    
+    Windows are views into the store and are only valid until the next
+    append; call `.copy()` on a column to keep it.
+    """
+    
+    def __init__(self, capacity: int = 100000):
+        """
+        Initialize the packet store.
+        
+        Args:
+            capacity: Maximum number of packets retained
+        """
+        if capacity <= 0:
+            raise ValueError("Packet store capacity must be positive")
+            
+        self.capacity = capacity
+        size = capacity * 2
+        
+        self._timestamp = np.zeros(size, dtype=np.float64)
+        self._src_ip = np.zeros(size, dtype='V16')
+        self._dst_ip = np.zeros(size, dtype='V16')
+        self._src_port = np.full(size, NO_PORT, dtype=np.int32)
+        self._dst_port = np.full(size, NO_PORT, dtype=np.int32)
+        self._protocol = np.zeros(size, dtype=np.uint8)
+        self._packet_size = np.zeros(size, dtype=np.uint32)
+        self._tcp_flags = np.zeros(size, dtype=np.uint8)
+        self._dns_query = np.empty(size, dtype=object)
+        
+        self._start = 0
+        self._end = 0
+        self.total_appended = 0
+        
+    def _columns(self) -> List[np.ndarray]:
+        """All column arrays"""
+        return [
+            self._timestamp, self._src_ip, self._dst_ip, self._src_port, self._dst_port,
+            self._protocol, self._packet_size, self._tcp_flags, self._dns_query
+        ]
+        
+    def _compact(self):
+        """Move the live range to the front of the arrays"""
+        length = self._end - self._start
+        for column in self._columns():
+            column[:length] = column[self._start:self._end]
+        self._dns_query[length:] = None
+        self._start = 0
+        self._end = length
+        
+    def append(self, packet: Any):
+        """Append a PacketMetadata record"""
+        if self._end == len(self._timestamp):
+            self._compact()
+            
+        i = self._end
+        self._timestamp[i] = packet.timestamp.timestamp()
+        self._src_ip[i] = pack_ip(packet.src_ip)
+        self._dst_ip[i] = pack_ip(packet.dst_ip)
+        self._src_port[i] = packet.src_port if packet.src_port is not None else NO_PORT
+        self._dst_port[i] = packet.dst_port if packet.dst_port is not None else NO_PORT
+        self._protocol[i] = encode_protocol(packet.protocol)
+        self._packet_size[i] = packet.packet_size
+        self._tcp_flags[i] = encode_tcp_flags(packet.tcp_flags)
+        self._dns_query[i] = packet.dns_query
+        
+        self._end += 1
+        self.total_appended += 1
+        
+        if self._end - self._start > self.capacity:
+            self._dns_query[self._start] = None
+            self._start += 1
+            
+    def extend(self, packets: List[Any]):
+        """Append multiple PacketMetadata records"""
+        for packet in packets:
+            self.append(packet)
+            
+    def clear(self):
+        """Remove all packets"""
+        self._dns_query[:] = None
+        self._start = 0
+        self._end = 0
+        
+    def __len__(self) -> int:
+        return self._end - self._start
+        
+    def _window_range(self, start: int, end: int) -> PacketWindow:
+        """Column views for absolute array positions [start, end)"""
+        return PacketWindow(
+            timestamp=self._timestamp[start:end],
+            src_ip=self._src_ip[start:end],
+            dst_ip=self._dst_ip[start:end],
+            src_port=self._src_port[start:end],
+            dst_port=self._dst_port[start:end],
+            protocol=self._protocol[start:end],
+            packet_size=self._packet_size[start:end],
+            tcp_flags=self._tcp_flags[start:end],
+            dns_query=self._dns_query[start:end]
+        )
+        
+    def window(self, count: Optional[int] = None) -> PacketWindow:
+        """
+        Get a zero-copy view of the most recent packets.
+        
+        Args:
+            count: Number of packets (all retained packets if None)
+            
+        Returns:
+            PacketWindow with column views, oldest first
+        """
+        if count is None or count >= len(self):
+            return self._window_range(self._start, self._end)
+        return self._window_range(self._end - max(count, 0), self._end)
+        
+    def window_since(self, since: float) -> PacketWindow:
+        """
+        Get a zero-copy view of packets with timestamp >= since (epoch seconds).
+        
+        Packets are assumed to arrive in capture order, so the window start is
+        found with a binary search.
+        """
+        live = self._timestamp[self._start:self._end]
+        offset = int(np.searchsorted(live, since, side='left'))
+        return self._window_range(self._start + offset, self._end)
+        
+    def __getitem__(self, index):
+        """Index or slice the history as PacketMetadata objects"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self[start:stop][::step]
+            if start >= stop:
+                return []
+            return self._window_range(self._start + start, self._start + stop).to_packets()
+            
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packet store index out of range")
+        position = self._start + index
+        return self._window_range(position, position + 1).to_packets()[0]
+        
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over retained packets as PacketMetadata objects, oldest first"""
+        for position in range(self._start, self._end):
+            yield self._window_range(position, position + 1).to_packets()[0]
+            
+    def memory_usage(self) -> Dict[str, Any]:
+        """Get memory usage of the store"""
+        column_bytes = sum(column.nbytes for column in self._columns())
+        return {
+            'capacity': self.capacity,
+            'size': len(self),
+            'column_bytes': column_bytes,
+            'bytes_per_packet': column_bytes / self.capacity
+        }
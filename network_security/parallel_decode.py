@@ -0,0 +1,249 @@
+"""
+Parallel PCAP Decoding for Network Security Monitoring
+
+Moves packet decoding off the event loop into a ProcessPoolExecutor. Pcap
+files are split into shards of whole records by byte offset (a header-only
+scan finds record boundaries, so no packet is split or lost) and each worker
+reads and decodes its own byte range. Live streams are decoded in batches of
+already-framed records. Workers return compact columnar PacketWindows
+(pickled NumPy arrays) rather than per-packet objects, and results are
+delivered in capture order.
+"""
+
+import asyncio
+import logging
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Iterator, Tuple, AsyncIterator
+
+import numpy as np
+
+from pcap_stream import (
+    PcapStreamParser, PcapRecord, decode_record,
+    PCAP_GLOBAL_HEADER_SIZE, PCAP_RECORD_HEADER_SIZE, MAX_RECORD_SIZE
+)
+from packet_store import PacketWindow, pack_ip, encode_protocol, encode_tcp_flags, NO_PORT
+
+logger = logging.getLogger(__name__)
+
+
+def read_global_header(pcap_file: Path) -> bytes:
+    """Read and validate the pcap global header"""
+    with open(pcap_file, 'rb') as f:
+        header = f.read(PCAP_GLOBAL_HEADER_SIZE)
+        
+    # Raises ValueError for unsupported formats
+    PcapStreamParser().feed(header)
+    return header
+
+
+def iter_pcap_shards(pcap_file: Path, shard_bytes: int = 8 * 1024 * 1024,
+                     scan_block: int = 4 * 1024 * 1024) -> Iterator[Tuple[int, int]]:
+    """
+    Split a pcap file into byte ranges that each hold whole records.
+    
+    Only the 16-byte record headers are read to find boundaries; packet data
+    is skipped, so the scan is cheap compared to decoding.
+    
+    Args:
+        pcap_file: Path to pcap file
+        shard_bytes: Approximate shard size in bytes
+        scan_block: Read size used while walking record headers
+        
+    Yields:
+        (start, end) byte offsets of each shard
+    """
+    header = read_global_header(pcap_file)
+    parser = PcapStreamParser()
+    parser.feed(header)
+    record_header = struct.Struct(f'{parser.byte_order}IIII')
+    
+    with open(pcap_file, 'rb') as f:
+        file_size = f.seek(0, 2)
+        shard_start = offset = PCAP_GLOBAL_HEADER_SIZE
+        
+        while offset + PCAP_RECORD_HEADER_SIZE <= file_size:
+            f.seek(offset)
+            block = f.read(scan_block)
+            position = 0
+            
+            # Walk record headers inside the block
+            while position + PCAP_RECORD_HEADER_SIZE <= len(block):
+                incl_len = record_header.unpack_from(block, position)[2]
+                if incl_len > MAX_RECORD_SIZE:
+                    raise ValueError(f"Corrupt pcap file: record length {incl_len} exceeds {MAX_RECORD_SIZE}")
+                    
+                record_end = offset + position + PCAP_RECORD_HEADER_SIZE + incl_len
+                if record_end > file_size:
+                    # Truncated final record
+                    file_size = offset + position
+                    break
+                    
+                position += PCAP_RECORD_HEADER_SIZE + incl_len
+                
+                if record_end - shard_start >= shard_bytes:
+                    yield shard_start, record_end
+                    shard_start = record_end
+                    
+            if position == 0:
+                break
+            offset += position
+            
+        if shard_start < offset:
+            yield shard_start, offset
+
+
+def decode_pcap_shard(pcap_file: str, header: bytes, start: int, end: int) -> Tuple[PacketWindow, int]:
+    """
+    Decode the records in one byte range of a pcap file (runs in a worker).
+    
+    Args:
+        pcap_file: Path to pcap file
+        header: Pcap global header of the file
+        start: Offset of the first record in the shard
+        end: Offset just past the last record in the shard
+        
+    Returns:
+        Tuple of (decoded packets, number of records that could not be decoded)
+    """
+    parser = PcapStreamParser()
+    parser.feed(header)
+    
+    with open(pcap_file, 'rb') as f:
+        f.seek(start)
+        records = parser.feed(f.read(end - start))
+        
+    return _decode_to_window(records, parser.linktype)
+
+
+def decode_record_batch(linktype: int, timestamps: List[float], original_lengths: List[int],
+                        payloads: List[bytes]) -> Tuple[PacketWindow, int]:
+    """Decode a batch of already-framed records (runs in a worker)"""
+    records = [
+        PcapRecord(timestamp=timestamp, captured_length=len(data), original_length=length, data=data)
+        for timestamp, length, data in zip(timestamps, original_lengths, payloads)
+    ]
+    return _decode_to_window(records, linktype)
+
+
+def _decode_to_window(records: List[PcapRecord], linktype: int) -> Tuple[PacketWindow, int]:
+    """Decode records and pack the results into columns"""
+    decoded = [fields for fields in (decode_record(record, linktype) for record in records) if fields]
+    count = len(decoded)
+    
+    def column(name, default=None):
+        return np.array([fields.get(name, default) for fields in decoded] + [None], dtype=object)[:-1]
+        
+    window = PacketWindow(
+        timestamp=np.fromiter((fields['timestamp'].timestamp() for fields in decoded), dtype=np.float64, count=count),
+        src_ip=np.array([pack_ip(fields['src_ip']) for fields in decoded], dtype='V16'),
+        dst_ip=np.array([pack_ip(fields['dst_ip']) for fields in decoded], dtype='V16'),
+        src_port=np.fromiter((fields.get('src_port', NO_PORT) for fields in decoded), dtype=np.int32, count=count),
+        dst_port=np.fromiter((fields.get('dst_port', NO_PORT) for fields in decoded), dtype=np.int32, count=count),
+        protocol=np.fromiter((encode_protocol(fields['protocol']) for fields in decoded), dtype=np.uint8, count=count),
+        packet_size=np.fromiter((fields['packet_size'] for fields in decoded), dtype=np.uint32, count=count),
+        tcp_flags=np.fromiter((encode_tcp_flags(fields.get('tcp_flags')) for fields in decoded), dtype=np.uint8, count=count),
+        dns_query=column('dns_query'),
+        dns_response=column('dns_response'),
+        payload_hash=column('payload_hash')
+    )
+    
+    return window, len(records) - count
+
+
+class ParallelPcapDecoder:
+    """
+    Decodes pcap data in a process pool while keeping results in capture order.
+    
+    At most `max_pending` shards or batches are in flight, which bounds memory
+    and applies backpressure to the reader.
+    """
+    
+    def __init__(self, workers: int = 4, shard_bytes: int = 8 * 1024 * 1024, max_pending: Optional[int] = None):
+        """
+        Initialize the decoder.
+        
+        Args:
+            workers: Number of worker processes
+            shard_bytes: Approximate pcap file shard size in bytes
+            max_pending: Maximum shards in flight (default: twice the workers)
+        """
+        self.workers = max(1, workers)
+        self.shard_bytes = shard_bytes
+        self.max_pending = max_pending or self.workers * 2
+        self.executor: Optional[ProcessPoolExecutor] = None
+        
+        self.stats = {
+            'shards_decoded': 0,
+            'packets_decoded': 0,
+            'decode_failures': 0
+        }
+        
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+        
+    def _record_stats(self, result: Tuple[PacketWindow, int]) -> PacketWindow:
+        window, failures = result
+        self.stats['shards_decoded'] += 1
+        self.stats['packets_decoded'] += len(window)
+        self.stats['decode_failures'] += failures
+        return window
+        
+    async def decode_file(self, pcap_file: Path) -> AsyncIterator[PacketWindow]:
+        """
+        Decode a pcap file shard by shard.
+        
+        Yields:
+            PacketWindow per shard, in file order
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        header = read_global_header(pcap_file)
+        shards = iter_pcap_shards(pcap_file, self.shard_bytes)
+        pending = deque()
+        exhausted = False
+        
+        while True:
+            # Keep the pool busy; the header scan runs in a thread to keep the loop free
+            while not exhausted and len(pending) < self.max_pending:
+                shard = await loop.run_in_executor(None, next, shards, None)
+                if shard is None:
+                    exhausted = True
+                    break
+                pending.append(loop.run_in_executor(executor, decode_pcap_shard, str(pcap_file), header, *shard))
+                
+            if not pending:
+                break
+                
+            yield self._record_stats(await pending.popleft())
+            
+    def submit_records(self, records: List[PcapRecord], linktype: int) -> asyncio.Future:
+        """
+        Submit framed records for decoding.
+        
+        Returns:
+            Future resolving to a PacketWindow; await futures in submission order
+            to keep capture order
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._get_executor(), decode_record_batch, linktype,
+            [record.timestamp for record in records],
+            [record.original_length for record in records],
+            [record.data for record in records]
+        )
+        return asyncio.ensure_future(future)
+        
+    async def collect(self, future: asyncio.Future) -> PacketWindow:
+        """Await a submitted batch and record its statistics"""
+        return self._record_stats(await future)
+        
+    def close(self):
+        """Shut down the worker pool"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
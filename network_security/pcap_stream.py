@@ -0,0 +1,385 @@
+"""
+Streaming PCAP Parser for Network Security Monitoring
+
+Lightweight, incremental parser for the classic libpcap file format. Bytes can
+be fed from tcpdump's `-w -` stdout or from a growing capture file, and packet
+records are emitted as soon as they are complete, so memory stays flat and no
+packet waits for a capture file to be rotated before it is analyzed.
+"""
+
+import logging
+import struct
+import socket
+import hashlib
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+# PCAP global header magic numbers
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+
+PCAP_GLOBAL_HEADER_SIZE = 24
+PCAP_RECORD_HEADER_SIZE = 16
+
+# Link-layer header types (http://www.tcpdump.org/linktypes.html)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = {0x8100, 0x88a8, 0x9100}
+
+IP_PROTO_ICMP = 1
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+IP_PROTO_ICMPV6 = 58
+
+# IPv6 extension headers that can be skipped to reach the transport header
+IPV6_EXTENSION_HEADERS = {0, 43, 60}
+
+TCP_FLAG_NAMES = [
+    (0x02, "SYN"),
+    (0x10, "ACK"),
+    (0x01, "FIN"),
+    (0x04, "RST"),
+    (0x08, "PSH"),
+    (0x20, "URG")
+]
+
+DNS_TYPE_A = 1
+DNS_TYPE_AAAA = 28
+DNS_NAME_TYPES = {2, 5, 12}  # NS, CNAME, PTR
+
+# Upper bound for a single record; anything larger means the stream is corrupt
+MAX_RECORD_SIZE = 262144
+
+
+@dataclass
+class PcapRecord:
+    """Single packet record read from a pcap stream"""
+    timestamp: float
+    captured_length: int
+    original_length: int
+    data: bytes
+
+
+class PcapStreamParser:
+    """
+    Incremental libpcap parser.
+    
+    Feed it arbitrary chunks of bytes and it returns every packet record that
+    has been completed so far. Only the bytes of a partially received record
+    are buffered between calls.
+    """
+    
+    def __init__(self):
+        """Initialize the parser"""
+        self.buffer = bytearray()
+        self.header_parsed = False
+        self.byte_order = '<'
+        self.timestamp_divisor = 1e6
+        self.linktype: Optional[int] = None
+        self.snaplen = 0
+        self.records_parsed = 0
+        self.bytes_consumed = 0
+        
+    def feed(self, data: bytes) -> List[PcapRecord]:
+        """
+        Feed bytes into the parser.
+        
+        Args:
+            data: Next chunk of the pcap byte stream
+            
+        Returns:
+            List of packet records completed by this chunk
+        """
+        self.buffer.extend(data)
+        records = []
+        offset = 0
+        
+        if not self.header_parsed:
+            if len(self.buffer) < PCAP_GLOBAL_HEADER_SIZE:
+                return records
+            self._parse_global_header(bytes(self.buffer[:PCAP_GLOBAL_HEADER_SIZE]))
+            offset = PCAP_GLOBAL_HEADER_SIZE
+            
+        record_header = struct.Struct(f'{self.byte_order}IIII')
+        buffer_length = len(self.buffer)
+        
+        while buffer_length - offset >= PCAP_RECORD_HEADER_SIZE:
+            ts_sec, ts_frac, incl_len, orig_len = record_header.unpack_from(self.buffer, offset)
+            
+            if incl_len > MAX_RECORD_SIZE:
+                raise ValueError(f"Corrupt pcap stream: record length {incl_len} exceeds {MAX_RECORD_SIZE}")
+                
+            record_end = offset + PCAP_RECORD_HEADER_SIZE + incl_len
+            if record_end > buffer_length:
+                break
+                
+            records.append(PcapRecord(
+                timestamp=ts_sec + ts_frac / self.timestamp_divisor,
+                captured_length=incl_len,
+                original_length=orig_len,
+                data=bytes(self.buffer[offset + PCAP_RECORD_HEADER_SIZE:record_end])
+            ))
+            offset = record_end
+            
+        # Drop consumed bytes so the buffer only holds a partial record
+        if offset:
+            del self.buffer[:offset]
+            self.bytes_consumed += offset
+            
+        self.records_parsed += len(records)
+        return records
+        
+    def _parse_global_header(self, header: bytes):
+        """Parse the pcap global header and detect byte order and precision"""
+        magic_le = struct.unpack('<I', header[:4])[0]
+        magic_be = struct.unpack('>I', header[:4])[0]
+        
+        if magic_le in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            self.byte_order = '<'
+            magic = magic_le
+        elif magic_be in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            self.byte_order = '>'
+            magic = magic_be
+        else:
+            raise ValueError(f"Unsupported capture format (magic 0x{magic_le:08x}); only classic pcap is supported")
+            
+        self.timestamp_divisor = 1e9 if magic == PCAP_MAGIC_NSEC else 1e6
+        _, _, _, _, self.snaplen, self.linktype = struct.unpack(
+            f'{self.byte_order}HHiIII', header[4:]
+        )
+        self.header_parsed = True
+        
+        logger.debug(f"PCAP stream header: linktype={self.linktype}, snaplen={self.snaplen}")
+
+
+def decode_record(record: PcapRecord, linktype: int) -> Optional[Dict[str, Any]]:
+    """
+    Decode a pcap record into PacketMetadata fields.
+    
+    Only the headers needed for security analysis are parsed (IPv4/IPv6,
+    TCP/UDP/ICMP and DNS), which is far cheaper than a full dissection.
+    
+    Args:
+        record: Packet record from PcapStreamParser
+        linktype: Link-layer type of the stream
+        
+    Returns:
+        Dictionary of PacketMetadata keyword arguments, or None for non-IP packets
+    """
+    try:
+        network_offset, ethertype = _locate_network_layer(record.data, linktype)
+        if network_offset is None:
+            return None
+            
+        packet = memoryview(record.data)[network_offset:]
+        
+        if ethertype == ETHERTYPE_IPV4:
+            fields, transport, transport_offset = _decode_ipv4(packet)
+        elif ethertype == ETHERTYPE_IPV6:
+            fields, transport, transport_offset = _decode_ipv6(packet)
+        else:
+            return None
+            
+        if fields is None:
+            return None
+            
+        fields['timestamp'] = datetime.fromtimestamp(record.timestamp)
+        fields['packet_size'] = record.original_length
+        
+        segment = packet[transport_offset:]
+        
+        if transport == IP_PROTO_TCP and len(segment) >= 14:
+            fields['src_port'], fields['dst_port'] = struct.unpack_from('!HH', segment, 0)
+            fields['protocol'] = "TCP"
+            flag_bits = segment[13]
+            fields['tcp_flags'] = [name for bit, name in TCP_FLAG_NAMES if flag_bits & bit]
+            
+        elif transport == IP_PROTO_UDP and len(segment) >= 8:
+            fields['src_port'], fields['dst_port'] = struct.unpack_from('!HH', segment, 0)
+            fields['protocol'] = "UDP"
+            
+            if 53 in (fields['src_port'], fields['dst_port']):
+                fields.update(_decode_dns(bytes(segment[8:])))
+                
+        elif transport in (IP_PROTO_ICMP, IP_PROTO_ICMPV6):
+            fields['protocol'] = "ICMP"
+            
+        if len(packet) > 0:
+            fields['payload_hash'] = hashlib.md5(packet).hexdigest()
+            
+        return fields
+        
+    except Exception as e:
+        logger.debug(f"Error decoding pcap record: {e}")
+        return None
+
+
+def _locate_network_layer(data: bytes, linktype: int):
+    """Return (offset, ethertype) of the network layer for a link type"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None, None
+        offset = 12
+        ethertype = struct.unpack_from('!H', data, offset)[0]
+        # Skip 802.1Q / 802.1ad tags
+        while ethertype in ETHERTYPE_VLAN and len(data) >= offset + 6:
+            offset += 4
+            ethertype = struct.unpack_from('!H', data, offset)[0]
+        return offset + 2, ethertype
+        
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None, None
+        return 16, struct.unpack_from('!H', data, 14)[0]
+        
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(data) < 20:
+            return None, None
+        return 20, struct.unpack_from('!H', data, 0)[0]
+        
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if len(data) < 4:
+            return None, None
+        # Address family is in host byte order for NULL, network order for LOOP
+        family = struct.unpack_from('!I' if linktype == LINKTYPE_LOOP else '=I', data, 0)[0]
+        if family == socket.AF_INET:
+            return 4, ETHERTYPE_IPV4
+        return 4, ETHERTYPE_IPV6
+        
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not data:
+            return None, None
+        version = data[0] >> 4
+        return 0, ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6
+        
+    return None, None
+
+
+def _decode_ipv4(packet: memoryview):
+    """Decode IPv4 header"""
+    if len(packet) < 20:
+        return None, None, 0
+        
+    header_length = (packet[0] & 0x0f) * 4
+    transport = packet[9]
+    
+    fields = {
+        'src_ip': socket.inet_ntop(socket.AF_INET, bytes(packet[12:16])),
+        'dst_ip': socket.inet_ntop(socket.AF_INET, bytes(packet[16:20])),
+        'protocol': transport
+    }
+    
+    # Non-first fragments carry no transport header
+    fragment_offset = struct.unpack_from('!H', packet, 6)[0] & 0x1fff
+    if fragment_offset:
+        transport = None
+        
+    return fields, transport, header_length
+
+
+def _decode_ipv6(packet: memoryview):
+    """Decode IPv6 header, skipping simple extension headers"""
+    if len(packet) < 40:
+        return None, None, 0
+        
+    transport = packet[6]
+    offset = 40
+    
+    while transport in IPV6_EXTENSION_HEADERS and len(packet) >= offset + 8:
+        transport = packet[offset]
+        offset += (packet[offset + 1] + 1) * 8
+        
+    fields = {
+        'src_ip': socket.inet_ntop(socket.AF_INET6, bytes(packet[8:24])),
+        'dst_ip': socket.inet_ntop(socket.AF_INET6, bytes(packet[24:40])),
+        'protocol': transport
+    }
+    
+    return fields, transport, offset
+
+
+def _decode_dns(message: bytes) -> Dict[str, Any]:
+    """Extract the first query name or answer record from a DNS message"""
+    fields = {}
+    
+    try:
+        if len(message) < 12:
+            return fields
+            
+        flags, qdcount, ancount = struct.unpack_from('!HHH', message, 2)
+        is_response = bool(flags & 0x8000)
+        
+        offset = 12
+        query_name = None
+        
+        for _ in range(qdcount):
+            name, offset = _read_dns_name(message, offset)
+            offset += 4  # QTYPE + QCLASS
+            if query_name is None:
+                query_name = name
+                
+        if not is_response:
+            if query_name is not None:
+                fields['dns_query'] = query_name
+            return fields
+            
+        if ancount:
+            _, offset = _read_dns_name(message, offset)
+            rtype, _, _, rdlength = struct.unpack_from('!HHIH', message, offset)
+            offset += 10
+            rdata = message[offset:offset + rdlength]
+            
+            if rtype == DNS_TYPE_A and rdlength == 4:
+                fields['dns_response'] = socket.inet_ntop(socket.AF_INET, rdata)
+            elif rtype == DNS_TYPE_AAAA and rdlength == 16:
+                fields['dns_response'] = socket.inet_ntop(socket.AF_INET6, rdata)
+            elif rtype in DNS_NAME_TYPES:
+                fields['dns_response'] = _read_dns_name(message, offset)[0]
+                
+    except (struct.error, IndexError, ValueError) as e:
+        logger.debug(f"Malformed DNS message: {e}")
+        
+    return fields
+
+
+def _read_dns_name(message: bytes, offset: int):
+    """Read a (possibly compressed) DNS name, returning (name, next_offset)"""
+    labels = []
+    next_offset = None
+    jumps = 0
+    
+    while True:
+        length = message[offset]
+        
+        if length & 0xc0 == 0xc0:
+            if next_offset is None:
+                next_offset = offset + 2
+            offset = ((length & 0x3f) << 8) | message[offset + 1]
+            jumps += 1
+            if jumps > 16:
+                raise ValueError("DNS name compression loop")
+            continue
+            
+        offset += 1
+        if length == 0:
+            break
+            
+        labels.append(message[offset:offset + length].decode('utf-8', errors='ignore'))
+        offset += length
+        
+    # Match scapy's fully qualified qname representation
+    name = '.'.join(labels) + '.'
+    return name, next_offset if next_offset is not None else offset
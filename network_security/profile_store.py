@@ -0,0 +1,422 @@
+"""
+Compact Network Profile Store for Anomaly Detection
+
+Keeps one baseline profile per (source, destination) pair in a bounded LRU
+map keyed by an integer built from the two packed addresses. Each profile
+holds slotted fields instead of lists: active hours and protocols are
+bitsets, and typical ports a small fixed-capacity array. Pairs that are
+idle past the TTL are expired. Once the map is full, the least recently
+seen pair is written back and dropped from memory, and it is read back on
+its next lookup.
+
+Profiles are persisted in a SQLite table (WAL mode), and only profiles that
+changed since the last save are written, in one transaction.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterator
+
+import numpy as np
+
+from packet_store import pack_ip, unpack_ip, encode_protocol, decode_protocol, PROTOCOL_UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+MAX_PORTS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    pair_key BLOB PRIMARY KEY,
+    last_seen REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_last_seen ON profiles (last_seen);
+"""
+
+
+def pair_key(src_ip: str, dst_ip: str) -> int:
+    """Integer key of a (source, destination) address pair"""
+    return int.from_bytes(pack_ip(src_ip) + pack_ip(dst_ip), 'big')
+
+
+class CompactProfile:
+    """
+    Baseline of one address pair.
+    
+    Exposes the NetworkProfile fields the detector reads (`avg_packet_size`,
+    thresholds, `typical_ports`, ...) plus O(1) membership tests.
+    """
+    
+    __slots__ = (
+        'key', 'protocol', 'ports', 'protocol_bits', 'hour_bits',
+        'avg_packet_size', 'avg_packet_rate', 'connection_duration_avg',
+        'bytes_transferred_avg', 'session_frequency',
+        'packet_size_threshold', 'packet_rate_threshold', 'port_diversity_threshold',
+        'created_at', 'last_updated', 'last_seen'
+    )
+    
+    def __init__(self, key: int, protocol: int = PROTOCOL_UNKNOWN, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.key = key
+        self.protocol = protocol
+        self.ports = array('H')
+        self.protocol_bits = 0
+        self.hour_bits = 0
+        self.avg_packet_size = 0.0
+        self.avg_packet_rate = 0.0
+        self.connection_duration_avg = 0.0
+        self.bytes_transferred_avg = 0.0
+        self.session_frequency = 0.0
+        self.packet_size_threshold = 2.0
+        self.packet_rate_threshold = 2.0
+        self.port_diversity_threshold = 0.8
+        self.created_at = now
+        self.last_updated = now
+        self.last_seen = now
+        
+    @property
+    def src_ip(self) -> str:
+        return unpack_ip(self.key.to_bytes(32, 'big')[:16])
+        
+    @property
+    def dst_ip(self) -> str:
+        return unpack_ip(self.key.to_bytes(32, 'big')[16:])
+        
+    @property
+    def profile_id(self) -> str:
+        return f"{self.src_ip}_{self.dst_ip}"
+        
+    def has_port(self, port: int) -> bool:
+        return 0 <= port <= 0xffff and port in self.ports
+        
+    def add_port(self, port: int):
+        """Record a port; the oldest of more than MAX_PORTS ports is dropped"""
+        if 0 <= port <= 0xffff and port not in self.ports:
+            self.ports.append(port)
+            if len(self.ports) > MAX_PORTS:
+                del self.ports[0]
+                
+    def has_protocol(self, protocol: Any) -> bool:
+        return bool(self.protocol_bits >> encode_protocol(protocol) & 1)
+        
+    def add_protocol(self, protocol: Any):
+        self.protocol_bits |= 1 << encode_protocol(protocol)
+        
+    def has_hour(self, hour: int) -> bool:
+        return bool(self.hour_bits >> hour & 1)
+        
+    def add_hour(self, hour: int):
+        self.hour_bits |= 1 << hour
+        
+    def port_array(self) -> np.ndarray:
+        return np.frombuffer(self.ports, dtype=np.uint16) if self.ports else np.empty(0, dtype=np.uint16)
+        
+    def protocol_codes(self) -> np.ndarray:
+        return np.array([code for code in range(256) if self.protocol_bits >> code & 1], dtype=np.uint8)
+        
+    def known_hours(self, hours: np.ndarray) -> np.ndarray:
+        """Vectorized active-hour test"""
+        return (np.right_shift(self.hour_bits, hours.astype(np.int64)) & 1).astype(bool)
+        
+    @property
+    def typical_ports(self) -> List[int]:
+        return self.ports.tolist()
+        
+    @property
+    def typical_protocols(self) -> List[Any]:
+        return [decode_protocol(code) for code in self.protocol_codes()]
+        
+    @property
+    def active_hours(self) -> List[int]:
+        return [hour for hour in range(24) if self.hour_bits >> hour & 1]
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the NetworkProfile dictionary layout"""
+        return {
+            'profile_id': self.profile_id,
+            'src_ip': self.src_ip,
+            'dst_ip': self.dst_ip,
+            'protocol': decode_protocol(self.protocol),
+            'port': None,
+            'avg_packet_size': self.avg_packet_size,
+            'avg_packet_rate': self.avg_packet_rate,
+            'typical_ports': self.typical_ports,
+            'typical_protocols': self.typical_protocols,
+            'active_hours': self.active_hours,
+            'peak_traffic_times': [],
+            'connection_duration_avg': self.connection_duration_avg,
+            'bytes_transferred_avg': self.bytes_transferred_avg,
+            'session_frequency': self.session_frequency,
+            'packet_size_threshold': self.packet_size_threshold,
+            'packet_rate_threshold': self.packet_rate_threshold,
+            'port_diversity_threshold': self.port_diversity_threshold,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+            'last_updated': datetime.fromtimestamp(self.last_updated).isoformat()
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompactProfile':
+        """Build from a NetworkProfile dictionary (legacy JSON files)"""
+        profile = cls(pair_key(data['src_ip'], data.get('dst_ip') or ''), encode_protocol(data.get('protocol')))
+        
+        for name in ['avg_packet_size', 'avg_packet_rate', 'connection_duration_avg', 'bytes_transferred_avg',
+                     'session_frequency', 'packet_size_threshold', 'packet_rate_threshold',
+                     'port_diversity_threshold']:
+            if name in data:
+                setattr(profile, name, float(data[name]))
+                
+        for port in data.get('typical_ports', [])[-MAX_PORTS:]:
+            profile.add_port(int(port))
+        for protocol in data.get('typical_protocols', []):
+            profile.add_protocol(protocol)
+        for hour in data.get('active_hours', []):
+            profile.add_hour(int(hour))
+            
+        for name in ['created_at', 'last_updated']:
+            if data.get(name):
+                setattr(profile, name, datetime.fromisoformat(data[name]).timestamp())
+        profile.last_seen = profile.last_updated
+        return profile
+        
+    def to_row(self) -> tuple:
+        data = {
+            'protocol': self.protocol,
+            'ports': self.ports.tolist(),
+            'protocol_bits': self.protocol_bits,
+            'hour_bits': self.hour_bits,
+            'avg_packet_size': self.avg_packet_size,
+            'avg_packet_rate': self.avg_packet_rate,
+            'connection_duration_avg': self.connection_duration_avg,
+            'bytes_transferred_avg': self.bytes_transferred_avg,
+            'session_frequency': self.session_frequency,
+            'packet_size_threshold': self.packet_size_threshold,
+            'packet_rate_threshold': self.packet_rate_threshold,
+            'port_diversity_threshold': self.port_diversity_threshold,
+            'created_at': self.created_at,
+            'last_updated': self.last_updated
+        }
+        return self.key.to_bytes(32, 'big'), self.last_seen, json.dumps(data, separators=(',', ':'))
+        
+    @classmethod
+    def from_row(cls, key: bytes, last_seen: float, data: str) -> 'CompactProfile':
+        fields = json.loads(data)
+        profile = cls(int.from_bytes(key, 'big'), fields.pop('protocol'))
+        profile.ports = array('H', fields.pop('ports'))
+        for name, value in fields.items():
+            setattr(profile, name, value)
+        profile.last_seen = last_seen
+        return profile
+
+
+class ProfileStore:
+    """
+    Bounded in-memory profile map backed by SQLite.
+    
+    Profiles stay in least-recently-seen order, so LRU eviction and TTL
+    expiry only look at the oldest entries.
+    """
+    
+    def __init__(self, profile_dir: Path, max_profiles: int = 50000, ttl_seconds: float = 7 * 86400,
+                 write_batch: int = 512):
+        """
+        Initialize the profile store.
+        
+        Args:
+            profile_dir: Directory of the profile database
+            max_profiles: Profiles kept in memory; colder ones are written back and dropped
+            ttl_seconds: Pairs not seen for this long are deleted
+            write_batch: Evicted dirty profiles written per transaction
+        """
+        self.profile_dir = Path(profile_dir)
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.max_profiles = max_profiles
+        self.ttl_seconds = ttl_seconds
+        self.write_batch = write_batch
+        
+        self.connection = sqlite3.connect(self.profile_dir / 'profiles.db')
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        
+        self.profiles: OrderedDict = OrderedDict()
+        self.dirty: set = set()
+        # Rows of evicted dirty profiles not yet written, by stored pair key
+        self.pending_writes: Dict[bytes, tuple] = {}
+        
+        self.stats = {
+            'hits': 0,
+            'loaded': 0,
+            'created': 0,
+            'evicted': 0,
+            'expired': 0,
+            'saved': 0
+        }
+        
+    def get(self, src_ip: str, dst_ip: str, protocol: Any = None, create: bool = True) -> Optional[CompactProfile]:
+        """
+        Profile of an address pair, loading or creating it on a miss.
+        
+        Args:
+            src_ip: Source address
+            dst_ip: Destination address
+            protocol: Protocol recorded on a newly created profile
+            create: Create a profile for an unknown pair
+        """
+        key = pair_key(src_ip, dst_ip)
+        now = time.time()
+        profile = self.profiles.get(key)
+        
+        if profile is not None:
+            self.profiles.move_to_end(key)
+            self.stats['hits'] += 1
+        else:
+            # An evicted profile whose row is still queued is newer than the database
+            profile = self._take_pending(key)
+            if profile is None:
+                profile = self._read(key)
+            if profile is not None:
+                self.stats['loaded'] += 1
+            elif not create:
+                return None
+            else:
+                profile = CompactProfile(key, encode_protocol(protocol), now)
+                self.dirty.add(key)
+                self.stats['created'] += 1
+                
+            self.profiles[key] = profile
+            if len(self.profiles) > self.max_profiles:
+                self._evict()
+                
+        profile.last_seen = now
+        return profile
+        
+    def peek(self, src_ip: str, dst_ip: str) -> Optional[CompactProfile]:
+        """In-memory profile of a pair, without loading, creating or touching it"""
+        return self.profiles.get(pair_key(src_ip, dst_ip))
+        
+    def mark_dirty(self, profile: CompactProfile):
+        """Schedule a changed profile for the next save"""
+        self.dirty.add(profile.key)
+        
+    def _read(self, key: int) -> Optional[CompactProfile]:
+        row = self.connection.execute(
+            'SELECT pair_key, last_seen, data FROM profiles WHERE pair_key = ?', (key.to_bytes(32, 'big'),)
+        ).fetchone()
+        return CompactProfile.from_row(*row) if row else None
+        
+    def _take_pending(self, key: int) -> Optional[CompactProfile]:
+        """Profile of a queued, unwritten row; it is dirty again once back in memory"""
+        row = self.pending_writes.pop(key.to_bytes(32, 'big'), None)
+        if row is None:
+            return None
+        self.dirty.add(key)
+        return CompactProfile.from_row(*row)
+        
+    def _evict(self):
+        """Drop the least recently seen profile, queueing it for writing if changed"""
+        key, profile = self.profiles.popitem(last=False)
+        self.stats['evicted'] += 1
+        
+        if key in self.dirty:
+            self.dirty.discard(key)
+            row = profile.to_row()
+            self.pending_writes[row[0]] = row
+            if len(self.pending_writes) >= self.write_batch:
+                self._write(list(self.pending_writes.values()))
+                self.pending_writes = {}
+                
+    def _write(self, rows: List[tuple]):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO profiles (pair_key, last_seen, data) VALUES (?, ?, ?)', rows
+            )
+        self.stats['saved'] += len(rows)
+        
+    def save(self) -> int:
+        """Write profiles changed since the last save; returns the number written"""
+        rows = list(self.pending_writes.values())
+        rows += [self.profiles[key].to_row() for key in self.dirty if key in self.profiles]
+        self.pending_writes = {}
+        self.dirty.clear()
+        
+        if rows:
+            self._write(rows)
+        return len(rows)
+        
+    def expire(self, now: Optional[float] = None) -> int:
+        """Delete profiles of pairs not seen within the TTL; returns the number removed"""
+        cutoff = (time.time() if now is None else now) - self.ttl_seconds
+        expired = set()
+        
+        while self.profiles:
+            key, profile = next(iter(self.profiles.items()))
+            if profile.last_seen >= cutoff:
+                break
+            del self.profiles[key]
+            self.dirty.discard(key)
+            expired.add(key.to_bytes(32, 'big'))
+            
+        self.pending_writes = {key: row for key, row in self.pending_writes.items() if row[1] >= cutoff}
+        
+        # In-memory profiles are newer than their rows, so rows of loaded pairs are kept
+        for (key,) in self.connection.execute('SELECT pair_key FROM profiles WHERE last_seen < ?', (cutoff,)):
+            if int.from_bytes(key, 'big') not in self.profiles:
+                expired.add(key)
+                
+        if expired:
+            with self.connection:
+                self.connection.executemany('DELETE FROM profiles WHERE pair_key = ?', [(key,) for key in expired])
+                
+        removed = len(expired)
+        self.stats['expired'] += removed
+        return removed
+        
+    def import_json(self, profile_dir: Path) -> int:
+        """Import legacy one-file-per-profile JSON profiles into an empty store"""
+        if self.connection.execute('SELECT 1 FROM profiles LIMIT 1').fetchone():
+            return 0
+            
+        imported = 0
+        for profile_file in Path(profile_dir).glob('*.json'):
+            try:
+                with open(profile_file, 'r') as f:
+                    profile = CompactProfile.from_dict(json.load(f))
+                row = profile.to_row()
+                self.pending_writes[row[0]] = row
+                imported += 1
+            except Exception as e:
+                logger.warning(f"Skipping unreadable profile {profile_file}: {e}")
+                
+        self.save()
+        return imported
+        
+    def __len__(self) -> int:
+        return len(self.profiles)
+        
+    def __iter__(self) -> Iterator[CompactProfile]:
+        return iter(list(self.profiles.values()))
+        
+    def stored_count(self) -> int:
+        """Profiles in the database (including ones not in memory)"""
+        return self.connection.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Profile store statistics"""
+        return {
+            **self.stats,
+            'in_memory': len(self.profiles),
+            'dirty': len(self.dirty) + len(self.pending_writes),
+            'max_profiles': self.max_profiles
+        }
+        
+    def close(self):
+        """Save pending changes and close the database"""
+        self.save()
+        self.connection.close()
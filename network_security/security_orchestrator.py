@@ -8,16 +8,18 @@ network security monitoring and response.
 
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Set, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 from pathlib import Path
 import uuid
+from collections import deque
 
 from netsniffer import NetSniffer, PacketMetadata, TrafficAnomaly, AttackType, TrafficType
 from anomaly_detector import NetworkAnomalyDetector, AnomalyScore, ThreatLevel
+from event_store import EventStore, write_json_export
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +32,19 @@ class AlertSeverity(Enum):
     CRITICAL = "critical"
 
 
+# Escalation order used when correlated detections raise an incident's severity
+SEVERITY_RANK = {
+    AlertSeverity.INFO: 0,
+    AlertSeverity.WARNING: 1,
+    AlertSeverity.ERROR: 2,
+    AlertSeverity.CRITICAL: 3
+}
+
+# Source addresses that stand for many hosts (e.g. DDoS); detections with
+# these are correlated per target so each victim gets its own incident
+WILDCARD_SOURCES = {"multiple"}
+
+
 class ResponseAction(Enum):
     """Automated response actions"""
     BLOCK_IP = "block_ip"
@@ -59,6 +74,11 @@ class SecurityIncident:
     traffic_anomaly: Optional[TrafficAnomaly] = None
     raw_packets: List[PacketMetadata] = field(default_factory=list)
     
+    # Correlation: detections merged into this incident
+    event_count: int = 1
+    last_seen: Optional[datetime] = None
+    target_ips: Set[str] = field(default_factory=set)
+    
     # Response
     response_actions: List[ResponseAction] = field(default_factory=list)
     response_status: str = "pending"
@@ -69,11 +89,20 @@ class SecurityIncident:
     analyst_notes: str = ""
     false_positive: bool = False
     
+    def __post_init__(self):
+        if self.last_seen is None:
+            self.last_seen = self.timestamp
+        if not self.target_ips:
+            self.target_ips = {self.target_ip}
+            
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
             'incident_id': self.incident_id,
             'timestamp': self.timestamp.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+            'event_count': self.event_count,
+            'target_ips': sorted(self.target_ips),
             'severity': self.severity.value,
             'title': self.title,
             'description': self.description,
@@ -99,6 +128,8 @@ class SecurityMetrics:
     total_packets_analyzed: int = 0
     total_anomalies_detected: int = 0
     total_incidents_created: int = 0
+    total_detections_correlated: int = 0
+    total_incidents_escalated: int = 0
     incidents_by_severity: Dict[str, int] = field(default_factory=dict)
     response_actions_taken: Dict[str, int] = field(default_factory=dict)
     false_positive_rate: float = 0.0
@@ -111,6 +142,8 @@ class SecurityMetrics:
             'total_packets_analyzed': self.total_packets_analyzed,
             'total_anomalies_detected': self.total_anomalies_detected,
             'total_incidents_created': self.total_incidents_created,
+            'total_detections_correlated': self.total_detections_correlated,
+            'total_incidents_escalated': self.total_incidents_escalated,
             'incidents_by_severity': self.incidents_by_severity,
             'response_actions_taken': self.response_actions_taken,
             'false_positive_rate': self.false_positive_rate,
@@ -139,14 +172,38 @@ class SecurityOrchestrator:
         self.detector_config = self.config.get('detector', {})
         self.response_config = self.config.get('response', {})
         
+        # Persistent anomaly and incident store shared with the sniffer
+        self.incident_retention_days = self.config.get('incident_retention_days', 30)
+        self.event_store = EventStore(
+            self.config.get('event_dir', 'network_security/events'),
+            self.config.get('event_segment_seconds', 86400),
+            self.incident_retention_days,
+            flush_interval=self.config.get('event_flush_ms', 200) / 1000.0,
+            sync_interval=self.config.get('event_sync_ms', 1000) / 1000.0
+        )
+        
         # Initialize components
-        self.sniffer = NetSniffer(self.sniffer_config)
-        self.anomaly_detector = NetworkAnomalyDetector(self.detector_config)
+        self.sniffer = NetSniffer(self.sniffer_config, event_store=self.event_store)
+        self.anomaly_detector = NetworkAnomalyDetector(
+            self.detector_config,
+            packet_history=self.sniffer.packet_buffer
+        )
         
         # Response configuration
         self.auto_response_enabled = self.config.get('auto_response_enabled', True)
         self.response_threshold = self.config.get('response_threshold', 0.8)
-        self.incident_retention_days = self.config.get('incident_retention_days', 30)
+        
+        # Micro-batching: packets are analyzed in batches of detection_batch_size,
+        # or whatever has arrived after detection_batch_delay_ms (1 = per packet)
+        self.detection_batch_size = max(1, self.config.get('detection_batch_size', 256))
+        self.detection_batch_delay = self.config.get('detection_batch_delay_ms', 50) / 1000.0
+        
+        # Correlation: detections with the same source and attack type (and
+        # target, for wildcard sources) within the window update one open
+        # incident instead of creating new ones
+        self.correlation_enabled = self.config.get('correlation_enabled', True)
+        self.correlation_window = timedelta(seconds=self.config.get('correlation_window_seconds', 300))
+        self.incident_evidence_limit = self.config.get('incident_evidence_limit', 100)
         
         # Storage paths
         self.incident_dir = Path(self.config.get('incident_dir', 'network_security/incidents'))
@@ -162,10 +219,22 @@ class SecurityOrchestrator:
         
         # Incident tracking
         self.active_incidents: Dict[str, SecurityIncident] = {}
-        self.incident_history: List[SecurityIncident] = []
+        self.open_incidents: Dict[Tuple[str, AttackType, Optional[str]], SecurityIncident] = {}
+        # Closed incidents are persisted; only recent ones stay in memory
+        self.incident_history = deque(maxlen=self.config.get('incident_history_size', 1000))
+        self.history_stats = {
+            'incidents': 0,
+            'false_positives': 0,
+            'response_time_total': 0.0,
+            'responses': 0
+        }
         self.blocked_ips: set = set()
         self.rate_limited_ips: Dict[str, datetime] = {}
         
+        # Packets waiting for batched analysis
+        self.pending_packets: List[PacketMetadata] = []
+        self.batch_flush_task: Optional[asyncio.Task] = None
+        
         # Metrics
         self.metrics = SecurityMetrics()
         
@@ -187,7 +256,9 @@ class SecurityOrchestrator:
         # Set up component callbacks
         self.sniffer.add_anomaly_callback(self._handle_traffic_anomaly)
         self.sniffer.add_packet_callback(self._handle_packet)
-        
+        if self.sniffer.flow_table is not None:
+            self.sniffer.add_flow_callback(self.anomaly_detector.observe_flows)
+            
         logger.info("Security Orchestrator initialized")
         
     def add_incident_callback(self, callback: Callable[[SecurityIncident], None]):
@@ -239,6 +310,7 @@ class SecurityOrchestrator:
             
             # Stop components
             await self.sniffer.stop_capture()
+            await self._flush_packet_batch()
             await self.anomaly_detector.stop()
             
             # Process remaining incidents
@@ -246,6 +318,7 @@ class SecurityOrchestrator:
             
             # Generate final reports
             await self._generate_final_reports()
+            self.event_store.close()
             
             logger.info("Security orchestrator stopped successfully")
             
@@ -257,19 +330,67 @@ class SecurityOrchestrator:
         try:
             self.metrics.total_packets_analyzed += 1
             
-            # Analyze packet for anomalies
-            anomaly_score = await self.anomaly_detector.analyze_packet(packet)
+            if self.detection_batch_size == 1:
+                # Analyze packet for anomalies
+                anomaly_score = await self.anomaly_detector.analyze_packet(packet)
+                await self._handle_anomaly_score(packet, anomaly_score)
+                return
+                
+            # Queue for batched analysis; flush on size, or after the delay
+            self.pending_packets.append(packet)
             
-            if anomaly_score and anomaly_score.score >= self.response_threshold:
-                # Create incident from anomaly
-                incident = await self._create_incident_from_anomaly(packet, anomaly_score)
+            if len(self.pending_packets) >= self.detection_batch_size:
+                await self._flush_packet_batch()
+            elif self.batch_flush_task is None or self.batch_flush_task.done():
+                self.batch_flush_task = asyncio.create_task(self._delayed_batch_flush())
                 
-                if incident:
-                    await self._process_incident(incident)
-                    
         except Exception as e:
             logger.error(f"Error handling packet: {e}")
             
+    async def _delayed_batch_flush(self):
+        """Flush a partial batch once the batching delay has passed"""
+        try:
+            await asyncio.sleep(self.detection_batch_delay)
+            self.batch_flush_task = None
+            await self._flush_packet_batch()
+            
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error in delayed batch flush: {e}")
+            
+    async def _flush_packet_batch(self):
+        """Analyze all pending packets as one batch"""
+        try:
+            if self.batch_flush_task and self.batch_flush_task is not asyncio.current_task():
+                self.batch_flush_task.cancel()
+            self.batch_flush_task = None
+            
+            if not self.pending_packets:
+                return
+                
+            batch = self.pending_packets
+            self.pending_packets = []
+            
+            # Anomaly scores carry the index of the packet they belong to
+            anomaly_scores = await self.anomaly_detector.analyze_batch(batch)
+            
+            for anomaly_score in anomaly_scores:
+                packet = batch[anomaly_score.features['packet_index']]
+                await self._handle_anomaly_score(packet, anomaly_score)
+                
+        except Exception as e:
+            logger.error(f"Error flushing packet batch: {e}")
+            
+    async def _handle_anomaly_score(self, packet: PacketMetadata, anomaly_score: Optional[AnomalyScore]):
+        """Create and process an incident for an anomaly score above the response threshold"""
+        if anomaly_score and anomaly_score.score >= self.response_threshold:
+            # Create incident from anomaly
+            incident = await self._create_incident_from_anomaly(packet, anomaly_score)
+            
+            if incident:
+                await self._correlate_incident(incident)
+                
     async def _handle_traffic_anomaly(self, traffic_anomaly: TrafficAnomaly):
         """Handle traffic anomaly from NetSniffer"""
         try:
@@ -279,7 +400,7 @@ class SecurityOrchestrator:
             incident = await self._create_incident_from_traffic_anomaly(traffic_anomaly)
             
             if incident:
-                await self._process_incident(incident)
+                await self._correlate_incident(incident)
                 
         except Exception as e:
             logger.error(f"Error handling traffic anomaly: {e}")
@@ -384,6 +505,73 @@ class SecurityOrchestrator:
             logger.error(f"Error classifying attack type: {e}")
             return AttackType.UNKNOWN_ATTACK
             
+    async def _correlate_incident(self, incident: SecurityIncident):
+        """Merge a detection into the open incident for its correlation key, or open a new one"""
+        try:
+            if not self.correlation_enabled:
+                await self._process_incident(incident)
+                return
+                
+            key = self._correlation_key(incident)
+            existing = self.open_incidents.get(key)
+            
+            if existing is None or incident.timestamp - existing.last_seen > self.correlation_window:
+                self.open_incidents[key] = incident
+                await self._process_incident(incident)
+            else:
+                await self._merge_incident(existing, incident)
+                
+        except Exception as e:
+            logger.error(f"Error correlating incident: {e}")
+            
+    @staticmethod
+    def _correlation_key(incident: SecurityIncident) -> Tuple[str, AttackType, Optional[str]]:
+        """Source and attack type, plus the target when the source is a wildcard"""
+        target = incident.target_ip if incident.source_ip in WILDCARD_SOURCES else None
+        return incident.source_ip, incident.attack_type, target
+        
+    async def _merge_incident(self, incident: SecurityIncident, detection: SecurityIncident):
+        """Fold a correlated detection into an open incident, escalating only on higher severity"""
+        self.metrics.total_detections_correlated += 1
+        
+        incident.event_count += detection.event_count
+        incident.last_seen = max(incident.last_seen, detection.last_seen)
+        incident.target_ips.update(detection.target_ips)
+        
+        # Bounded evidence; keep the strongest score seen
+        room = self.incident_evidence_limit - len(incident.raw_packets)
+        if room > 0:
+            incident.raw_packets.extend(detection.raw_packets[:room])
+        if detection.anomaly_score and (
+                incident.anomaly_score is None or detection.anomaly_score.score > incident.anomaly_score.score):
+            incident.anomaly_score = detection.anomaly_score
+        if detection.traffic_anomaly and (
+                incident.traffic_anomaly is None or detection.traffic_anomaly.severity > incident.traffic_anomaly.severity):
+            incident.traffic_anomaly = detection.traffic_anomaly
+            
+        if SEVERITY_RANK[detection.severity] <= SEVERITY_RANK[incident.severity]:
+            self._record_incident(incident)
+            return
+            
+        # Severity increased: run only the responses not already taken
+        incident.severity = detection.severity
+        incident.title = detection.title
+        incident.description = detection.description
+        self.metrics.total_incidents_escalated += 1
+        self._record_incident(incident)
+        
+        logger.warning(f"Security incident escalated: {incident.title} "
+                     f"(ID: {incident.incident_id}, Severity: {incident.severity.value}, "
+                     f"Events: {incident.event_count})")
+                     
+        response_actions = [
+            action for action in self._determine_response_actions(incident)
+            if action not in incident.response_actions
+        ]
+        
+        if self.auto_response_enabled and response_actions:
+            await self._execute_response_actions(incident, response_actions)
+            
     async def _process_incident(self, incident: SecurityIncident):
         """Process a security incident"""
         try:
@@ -397,10 +585,11 @@ class SecurityOrchestrator:
                 self.metrics.incidents_by_severity[severity_key] = 0
             self.metrics.incidents_by_severity[severity_key] += 1
             
-            # Log incident
+            # Log and persist incident
             logger.warning(f"Security incident created: {incident.title} "
                          f"(ID: {incident.incident_id}, Severity: {incident.severity.value})")
-            
+            self._record_incident(incident)
+                         
             # Call incident callbacks
             for callback in self.incident_callbacks:
                 try:
@@ -415,9 +604,6 @@ class SecurityOrchestrator:
             if self.auto_response_enabled and response_actions:
                 await self._execute_response_actions(incident, response_actions)
                 
-            # Save incident to file
-            await self._save_incident(incident)
-            
         except Exception as e:
             logger.error(f"Error processing incident: {e}")
             
@@ -499,10 +685,11 @@ class SecurityOrchestrator:
                 except Exception as e:
                     logger.error(f"Error executing response action {action.value}: {e}")
                     
-            # Update incident with executed actions
-            incident.response_actions = executed_actions
-            incident.response_status = "completed" if executed_actions else "failed"
+            # Update incident with executed actions (escalations add to earlier ones)
+            incident.response_actions = incident.response_actions + executed_actions
+            incident.response_status = "completed" if incident.response_actions else "failed"
             incident.response_timestamp = datetime.now()
+            self._record_incident(incident)
             
         except Exception as e:
             logger.error(f"Error executing response actions: {e}")
@@ -571,9 +758,17 @@ class SecurityOrchestrator:
             return False
             
     async def _log_incident(self, incident: SecurityIncident) -> bool:
-        """Log incident to file"""
+        """Log incident to the event store"""
+        return self._record_incident(incident)
+        
+    def _record_incident(self, incident: SecurityIncident) -> bool:
+        """Queue a snapshot of an incident, replacing its earlier ones in the event store"""
         try:
-            # This is handled by _save_incident
+            self.event_store.append(
+                'incident', incident.to_dict(), incident.incident_id, incident.timestamp,
+                src_ip=incident.source_ip, dst_ip=incident.target_ip,
+                attack_type=incident.attack_type.value, severity=incident.severity.value, replace=True
+            )
             return True
             
         except Exception as e:
@@ -604,17 +799,6 @@ class SecurityOrchestrator:
             logger.error(f"Error notifying SIEM: {e}")
             return False
             
-    async def _save_incident(self, incident: SecurityIncident):
-        """Save incident to file"""
-        try:
-            incident_file = self.incident_dir / f"{incident.incident_id}.json"
-            
-            with open(incident_file, 'w') as f:
-                json.dump(incident.to_dict(), f, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Error saving incident: {e}")
-            
     async def _incident_management_loop(self):
         """Background incident management loop"""
         try:
@@ -624,29 +808,58 @@ class SecurityOrchestrator:
                 if not self.running:
                     break
                     
-                # Move completed incidents to history
-                completed_incidents = [
-                    incident for incident in self.active_incidents.values()
-                    if incident.response_status in ["completed", "failed"]
-                ]
-                
-                for incident in completed_incidents:
-                    self.incident_history.append(incident)
-                    del self.active_incidents[incident.incident_id]
-                    
-                # Clean up old rate limits
-                now = datetime.now()
-                expired_ips = [
-                    ip for ip, expiry in self.rate_limited_ips.items()
-                    if now > expiry
-                ]
-                
-                for ip in expired_ips:
-                    del self.rate_limited_ips[ip]
+                # One failed pass must not stop incident management
+                try:
+                    self._manage_incidents()
+                except Exception as e:
+                    logger.error(f"Error managing incidents: {e}")
                     
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             logger.error(f"Error in incident management loop: {e}")
             
+    def _manage_incidents(self):
+        """Archive completed incidents and expire rate limits"""
+        # Move completed incidents to history once their correlation
+        # window has closed
+        now = datetime.now()
+        completed_incidents = [
+            incident for incident in self.active_incidents.values()
+            if incident.response_status in ["completed", "failed"]
+            and (not self.correlation_enabled or now - incident.last_seen > self.correlation_window)
+        ]
+        
+        for incident in completed_incidents:
+            self._archive_incident(incident)
+            del self.active_incidents[incident.incident_id]
+            
+        # Clean up old rate limits
+        expired_ips = [
+            ip for ip, expiry in self.rate_limited_ips.items()
+            if now > expiry
+        ]
+        
+        for ip in expired_ips:
+            del self.rate_limited_ips[ip]
+            
+    def _archive_incident(self, incident: SecurityIncident):
+        """Move a closed incident to history and write its final snapshot"""
+        key = self._correlation_key(incident)
+        if self.open_incidents.get(key) is incident:
+            del self.open_incidents[key]
+            
+        self.incident_history.append(incident)
+        self._record_incident(incident)
+        
+        # Running totals keep metrics independent of history size
+        self.history_stats['incidents'] += 1
+        if incident.false_positive:
+            self.history_stats['false_positives'] += 1
+        if incident.response_timestamp:
+            self.history_stats['response_time_total'] += (incident.response_timestamp - incident.timestamp).total_seconds()
+            self.history_stats['responses'] += 1
+            
     async def _metrics_collection_loop(self):
         """Background metrics collection loop"""
         try:
@@ -666,24 +879,19 @@ class SecurityOrchestrator:
         """Calculate security metrics"""
         try:
             # Calculate false positive rate
-            total_incidents = len(self.incident_history)
+            total_incidents = self.history_stats['incidents']
             if total_incidents > 0:
-                false_positives = len([i for i in self.incident_history if i.false_positive])
-                self.metrics.false_positive_rate = false_positives / total_incidents
+                self.metrics.false_positive_rate = self.history_stats['false_positives'] / total_incidents
                 
             # Calculate detection accuracy
             detector_stats = self.anomaly_detector.get_detection_stats()
             self.metrics.detection_accuracy = detector_stats.get('model_accuracy', 0.0)
             
             # Calculate average response time
-            response_times = []
-            for incident in self.incident_history:
-                if incident.response_timestamp:
-                    response_time = (incident.response_timestamp - incident.timestamp).total_seconds()
-                    response_times.append(response_time)
-                    
-            if response_times:
-                self.metrics.average_response_time = sum(response_times) / len(response_times)
+            if self.history_stats['responses']:
+                self.metrics.average_response_time = (
+                    self.history_stats['response_time_total'] / self.history_stats['responses']
+                )
                 
         except Exception as e:
             logger.error(f"Error calculating metrics: {e}")
@@ -697,15 +905,10 @@ class SecurityOrchestrator:
                 if not self.running:
                     break
                     
-                # Clean up old incidents
-                cutoff_date = datetime.now() - timedelta(days=self.incident_retention_days)
+                # Drop event store segments past the retention period
+                expired = self.event_store.expire()
                 
-                self.incident_history = [
-                    incident for incident in self.incident_history
-                    if incident.timestamp > cutoff_date
-                ]
-                
-                logger.info(f"Cleaned up old incidents older than {self.incident_retention_days} days")
+                logger.info(f"Cleaned up {expired} event segments older than {self.incident_retention_days} days")
                 
         except Exception as e:
             logger.error(f"Error in cleanup loop: {e}")
@@ -714,8 +917,8 @@ class SecurityOrchestrator:
         """Process remaining incidents before shutdown"""
         try:
             # Move active incidents to history
-            for incident in self.active_incidents.values():
-                self.incident_history.append(incident)
+            for incident in list(self.active_incidents.values()):
+                self._archive_incident(incident)
                 
             self.active_incidents.clear()
             
@@ -730,16 +933,13 @@ class SecurityOrchestrator:
             # Generate incident summary report
             incident_report = {
                 'timestamp': datetime.now().isoformat(),
-                'total_incidents': len(self.incident_history),
+                'total_incidents': self.event_store.count('incident'),
                 'incidents_by_severity': self.metrics.incidents_by_severity,
                 'response_actions_taken': self.metrics.response_actions_taken,
                 'blocked_ips': list(self.blocked_ips),
                 'rate_limited_ips': list(self.rate_limited_ips.keys()),
                 'metrics': self.metrics.to_dict(),
-                'recent_incidents': [
-                    incident.to_dict() for incident in 
-                    sorted(self.incident_history, key=lambda x: x.timestamp, reverse=True)[:20]
-                ]
+                'recent_incidents': list(self.event_store.query('incident', limit=20, newest_first=True))
             }
             
             report_file = self.report_dir / f"security_summary_{timestamp}.json"
@@ -759,9 +959,12 @@ class SecurityOrchestrator:
             'running': self.running,
             'uptime_seconds': uptime,
             'active_incidents': len(self.active_incidents),
-            'total_incidents': len(self.incident_history),
+            'open_correlations': len(self.open_incidents),
+            'total_incidents': self.event_store.count('incident'),
             'blocked_ips': len(self.blocked_ips),
             'rate_limited_ips': len(self.rate_limited_ips),
+            'pending_packets': len(self.pending_packets),
+            'event_store': self.event_store.get_stats(),
             'metrics': self.metrics.to_dict(),
             'sniffer_status': self.sniffer.get_status(),
             'detector_status': self.anomaly_detector.get_detection_stats()
@@ -769,33 +972,29 @@ class SecurityOrchestrator:
         
     def get_recent_incidents(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent security incidents"""
-        recent = sorted(self.incident_history, key=lambda x: x.timestamp, reverse=True)[:limit]
-        return [incident.to_dict() for incident in recent]
+        return list(self.event_store.query('incident', limit=limit, newest_first=True))
+        
+    def query_incidents(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        source_ip: Optional[str] = None, attack_type: Optional[AttackType] = None,
+                        severity: Optional[AlertSeverity] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Query incidents by time range, source IP, attack type and severity"""
+        return list(self.event_store.query(
+            'incident', start=start, end=end, src_ip=source_ip,
+            attack_type=attack_type.value if attack_type else None,
+            severity=severity.value if severity else None, limit=limit
+        ))
         
     def get_incident_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get incident summary for specified time period"""
         cutoff = datetime.now() - timedelta(hours=hours)
-        recent_incidents = [i for i in self.incident_history if i.timestamp > cutoff]
         
-        severity_counts = {}
-        attack_type_counts = {}
+        # Served from the event store's timestamp index
+        severity_counts = self.event_store.count('incident', start=cutoff, group_by='severity')
+        attack_type_counts = self.event_store.count('incident', start=cutoff, group_by='attack_type')
         
-        for incident in recent_incidents:
-            # Count by severity
-            severity = incident.severity.value
-            if severity not in severity_counts:
-                severity_counts[severity] = 0
-            severity_counts[severity] += 1
-            
-            # Count by attack type
-            attack_type = incident.attack_type.value
-            if attack_type not in attack_type_counts:
-                attack_type_counts[attack_type] = 0
-            attack_type_counts[attack_type] += 1
-            
         return {
             'time_period_hours': hours,
-            'total_incidents': len(recent_incidents),
+            'total_incidents': sum(severity_counts.values()),
             'incidents_by_severity': severity_counts,
             'incidents_by_attack_type': attack_type_counts,
             'active_incidents': len(self.active_incidents),
@@ -804,11 +1003,10 @@ class SecurityOrchestrator:
         }
         
     def export_security_data(self, output_file: str) -> Dict[str, Any]:
-        """Export security data"""
+        """Export security data (incidents are streamed from the event store)"""
         try:
             export_data = {
                 'timestamp': datetime.now().isoformat(),
-                'incidents': [incident.to_dict() for incident in self.incident_history],
                 'metrics': self.metrics.to_dict(),
                 'blocked_ips': list(self.blocked_ips),
                 'rate_limited_ips': {ip: expiry.isoformat() for ip, expiry in self.rate_limited_ips.items()},
@@ -816,13 +1014,12 @@ class SecurityOrchestrator:
                 'detector_stats': self.anomaly_detector.get_detection_stats()
             }
             
-            with open(output_file, 'w') as f:
-                json.dump(export_data, f, indent=2)
-                
+            exported = write_json_export(output_file, export_data, 'incidents', self.event_store.query('incident'))
+            
             return {
                 'success': True,
                 'output_file': output_file,
-                'incidents_exported': len(self.incident_history),
+                'incidents_exported': exported,
                 'blocked_ips_exported': len(self.blocked_ips)
             }
             
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the priority action scheduler
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from action_scheduler import ActionScheduler
+
+
+def claim(scheduler: ActionScheduler, timeout: float = 0.05):
+    """Next runnable item, or None if nothing can run"""
+    async def run():
+        try:
+            return await asyncio.wait_for(scheduler.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    return run()
+
+
+def test_items_run_in_priority_then_arrival_order():
+    async def run():
+        scheduler = ActionScheduler()
+        scheduler.push("low", (3,), "a", "block")
+        scheduler.push("urgent", (0,), "b", "block")
+        scheduler.push("low-later", (3,), "c", "block")
+        return [await scheduler.get() for _ in range(3)]
+
+    assert asyncio.run(run()) == ["urgent", "low", "low-later"]
+
+
+def test_duplicate_key_is_merged_and_promoted():
+    merged = []
+
+    async def run():
+        scheduler = ActionScheduler()
+        scheduler.push({"ip": "10.0.0.1"}, (5,), "x", "block")
+        scheduler.push({"ip": "10.0.0.2"}, (3,), "y", "block")
+        item, coalesced = scheduler.push({"ip": "10.0.0.1", "extra": 1}, (1,), "x", "block",
+                                         merge=lambda pending, new: merged.append((pending, new)))
+        order = [await scheduler.get(), await scheduler.get()]
+        return scheduler, item, coalesced, order
+
+    scheduler, item, coalesced, order = asyncio.run(run())
+
+    assert coalesced
+    assert item == {"ip": "10.0.0.1"}
+    assert merged == [({"ip": "10.0.0.1"}, {"ip": "10.0.0.1", "extra": 1})]
+    assert order[0] is item
+    assert len(scheduler) == 0
+    assert scheduler.get_stats()['queued'] == 2
+    assert scheduler.get_stats()['coalesced'] == 1
+
+
+def test_less_urgent_duplicate_keeps_position():
+    async def run():
+        scheduler = ActionScheduler()
+        scheduler.push("first", (1,), "x", "block")
+        scheduler.push("second", (2,), "y", "block")
+        scheduler.push("duplicate", (9,), "x", "block")
+        return [await scheduler.get(), await scheduler.get(), await claim(scheduler)]
+
+    assert asyncio.run(run()) == ["first", "second", None]
+
+
+def test_kind_at_limit_is_passed_over():
+    async def run():
+        scheduler = ActionScheduler(kind_limits={"shape": 1})
+        scheduler.push("shape-1", (0,), "a", "shape")
+        scheduler.push("shape-2", (0,), "b", "shape")
+        scheduler.push("block-1", (5,), "c", "block")
+
+        first = await scheduler.get()
+        second = await scheduler.get()
+        blocked = await claim(scheduler)
+        scheduler.done("shape")
+        released = await claim(scheduler)
+        return first, second, blocked, released
+
+    assert asyncio.run(run()) == ("shape-1", "block-1", None, "shape-2")
+
+
+def test_total_limit_and_exempt_kinds():
+    async def run():
+        scheduler = ActionScheduler(total_limit=1, exempt_kinds={"block"})
+        scheduler.push("shape-1", (0,), "a", "shape")
+        scheduler.push("notify-1", (1,), "b", "notify")
+        scheduler.push("block-1", (2,), "c", "block")
+        scheduler.push("block-2", (3,), "d", "block")
+
+        claimed = [await scheduler.get() for _ in range(3)]
+        blocked = await claim(scheduler)
+        stats = scheduler.get_stats()
+        scheduler.done("shape")
+        released = await claim(scheduler)
+        return claimed, blocked, stats, released
+
+    claimed, blocked, stats, released = asyncio.run(run())
+
+    assert claimed == ["shape-1", "block-1", "block-2"]
+    assert blocked is None
+    assert stats['running_limited'] == 1
+    assert stats['running_by_type'] == {"shape": 1, "block": 2}
+    assert released == "notify-1"
+
+
+def test_waiting_get_wakes_on_push_and_drain_empties_queue():
+    async def run():
+        scheduler = ActionScheduler()
+        waiter = asyncio.ensure_future(scheduler.get())
+        await asyncio.sleep(0)
+        scheduler.push("late", (0,), "a", "block")
+        woken = await asyncio.wait_for(waiter, 1)
+
+        scheduler.push("b", (2,), "b", "block")
+        scheduler.push("c", (1,), "c", "block")
+        return woken, scheduler.drain(), len(scheduler)
+
+    assert asyncio.run(run()) == ("late", ["c", "b"], 0)
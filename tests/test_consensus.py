@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for weighted early-consensus fusion
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fusion_tools'))
+
+from utils.consensus import ConsensusFusion, ngram_profile, profile_similarity
+
+PARIS = "The capital of France is Paris."
+PARIS_AGAIN = "The capital of France is Paris, on the Seine."
+LYON = "Lyon is a large city known for its food."
+
+
+def test_similarity_of_profiles():
+    assert profile_similarity(ngram_profile(PARIS), ngram_profile(PARIS)) == 1.0
+    assert profile_similarity(ngram_profile(PARIS), ngram_profile(PARIS_AGAIN)) >= 0.5
+    assert profile_similarity(ngram_profile(PARIS), ngram_profile(LYON)) < 0.5
+    assert profile_similarity(ngram_profile(""), ngram_profile(PARIS)) == 0.0
+
+
+def test_quorum_counts_models_that_have_not_answered():
+    fusion = ConsensusFusion({"a": 1.0, "b": 1.0, "c": 1.0, "d": 1.0}, quorum=0.5)
+
+    assert not fusion.add("a", PARIS)
+    assert fusion.add("b", PARIS_AGAIN)
+
+    response, summary = fusion.result()
+    assert response in (PARIS, PARIS_AGAIN)
+    assert summary["quorum_reached"]
+    assert summary["support"] == 0.5
+    assert sorted(summary["agreeing"]) == ["a", "b"]
+
+
+def test_disagreeing_responses_do_not_reach_quorum():
+    fusion = ConsensusFusion({"a": 1.0, "b": 1.0, "c": 1.0}, quorum=0.5)
+
+    assert not fusion.add("a", PARIS)
+    assert not fusion.add("b", LYON)
+
+    _, summary = fusion.result()
+    assert not summary["quorum_reached"]
+    assert summary["agreeing"] == [summary["model"]]
+
+
+def test_heavy_model_alone_needs_min_agreeing():
+    weights = {"big": 5.0, "small": 1.0}
+
+    assert not ConsensusFusion(weights, quorum=0.5).add("big", PARIS)
+    assert ConsensusFusion(weights, quorum=0.5, min_agreeing=1).add("big", PARIS)
+
+
+def test_weights_decide_support_and_ties():
+    fusion = ConsensusFusion({"a": 1.0, "b": 1.0, "c": 3.0}, quorum=0.6)
+
+    fusion.add("a", PARIS)
+    fusion.add("b", PARIS_AGAIN)
+    assert not fusion.reached()
+    assert fusion.add("c", LYON) is False
+
+    response, summary = fusion.result()
+    assert summary["model"] == "c"
+    assert response == LYON
+    assert summary["support"] == 0.6
+
+
+def test_min_agreeing_is_capped_by_model_count():
+    fusion = ConsensusFusion({"only": 1.0}, min_agreeing=2)
+
+    assert fusion.add("only", PARIS)
+    assert fusion.result() == (PARIS, {"model": "only", "support": 1.0, "quorum_reached": True, "agreeing": ["only"]})
+
+
+def test_empty_result():
+    fusion = ConsensusFusion({"a": 1.0, "b": 1.0})
+
+    assert not fusion.reached()
+    assert fusion.result() == (None, {"model": None, "support": 0.0, "quorum_reached": False, "agreeing": []})
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite conversation store: persistence, eviction, trimming and expiry
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fusion_tools'))
+
+from chat.backend.conversation_store import ConversationStore
+
+
+def test_messages_round_trip_through_a_reopened_store(tmp_path):
+    db_path = str(tmp_path / "chat.db")
+
+    async def run():
+        store = ConversationStore(db_path, flush_interval=0.01)
+        first = await store.append("c1", {"role": "user", "content": "hello"})
+        await store.append("c1", {"role": "assistant", "content": "hi", "model_used": "llama"})
+        await store.append("c2", {"role": "user", "content": "other"})
+        await store.close()
+
+        reopened = ConversationStore(db_path)
+        try:
+            return first, await reopened.get("c1"), await reopened.list()
+        finally:
+            await reopened.close()
+
+    first, history, listing = asyncio.run(run())
+
+    assert first == {"id": "msg_1", "role": "user", "content": "hello"}
+    assert history["message_count"] == 2
+    assert history["messages"] == [
+        {"id": "msg_1", "role": "user", "content": "hello"},
+        {"id": "msg_2", "role": "assistant", "content": "hi", "model_used": "llama"}
+    ]
+    assert listing["total"] == 2
+    assert [c["id"] for c in listing["conversations"]] == ["c2", "c1"]
+
+
+def test_evicted_conversation_is_reloaded_with_pending_writes(tmp_path):
+    async def run():
+        store = ConversationStore(str(tmp_path / "chat.db"), max_cached=1, flush_interval=60)
+        await store.append("c1", {"content": "one"})
+        await store.append("c2", {"content": "two"})
+        await store.append("c1", {"content": "three"})
+        history = await store.get("c1")
+        stats = await store.get_stats()
+        await store.close()
+        return history, stats
+
+    history, stats = asyncio.run(run())
+
+    assert [m["content"] for m in history["messages"]] == ["one", "three"]
+    assert stats["evictions"] >= 2
+    assert stats["cached"] == 1
+    assert stats["stored"] == 2
+
+
+def test_history_is_trimmed_but_ids_keep_counting(tmp_path):
+    db_path = str(tmp_path / "chat.db")
+
+    async def run():
+        store = ConversationStore(db_path, max_history=3)
+        for i in range(5):
+            await store.append("c1", {"content": str(i)})
+        await store.close()
+
+        reopened = ConversationStore(db_path, max_history=3)
+        try:
+            return await reopened.get("c1", offset=1, limit=1), await reopened.get("c1")
+        finally:
+            await reopened.close()
+
+    page, history = asyncio.run(run())
+
+    assert [m["id"] for m in history["messages"]] == ["msg_3", "msg_4", "msg_5"]
+    assert history["message_count"] == 5
+    assert page["messages"] == [{"id": "msg_4", "content": "3"}]
+    assert page["stored_messages"] == 3
+
+
+def test_delete_and_expire(tmp_path):
+    async def run():
+        store = ConversationStore(str(tmp_path / "chat.db"), ttl_seconds=0.1, flush_interval=5)
+        await store.append("old", {"content": "a"})
+        await store.append("gone", {"content": "b"})
+        deleted = await store.delete("gone")
+        missing = await store.delete("gone")
+
+        await asyncio.sleep(0.2)
+        await store.append("keep", {"content": "c"})
+        expired = await store.expire()
+        result = (deleted, missing, expired, await store.get("old"), await store.get("gone"), await store.list())
+        await store.close()
+        return result
+
+    deleted, missing, expired, old, gone, listing = asyncio.run(run())
+
+    assert deleted and not missing
+    assert expired == 1
+    assert old is None and gone is None
+    assert [c["id"] for c in listing["conversations"]] == ["keep"]
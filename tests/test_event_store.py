@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the segmented event store and its batched writer
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from event_store import EventStore
+
+
+def append_incident(store: EventStore, i: int, timestamp: datetime):
+    store.append('incident', {'incident_id': str(i), 'count': i}, str(i), timestamp,
+                 src_ip=f"10.0.0.{i % 4}", attack_type='port_scan', severity='high' if i % 2 else 'low')
+
+
+def test_appends_are_batched_off_the_event_loop(tmp_path):
+    async def run():
+        store = EventStore(tmp_path, flush_interval=0.05)
+        now = datetime.now()
+        for i in range(100):
+            append_incident(store, i, now + timedelta(seconds=i))
+        buffered = store.get_stats()['buffered']
+        await asyncio.sleep(0.2)
+        stats = store.get_stats()
+        store.close()
+        return buffered, stats
+
+    buffered, stats = asyncio.run(run())
+
+    assert buffered == 100
+    assert stats['records_appended'] == 100
+    assert stats['batches_written'] == 1
+
+
+def test_queries_see_records_not_yet_written(tmp_path):
+    async def run():
+        store = EventStore(tmp_path, flush_interval=60)
+        now = datetime.now()
+        for i in range(10):
+            append_incident(store, i, now + timedelta(seconds=i))
+
+        newest = list(store.query('incident', limit=3, newest_first=True))
+        by_severity = store.count('incident', group_by='severity')
+        from_source = [record['count'] for record in store.query('incident', src_ip='10.0.0.1')]
+        store.close()
+        return newest, by_severity, from_source
+
+    newest, by_severity, from_source = asyncio.run(run())
+
+    assert [record['count'] for record in newest] == [9, 8, 7]
+    assert by_severity == {'high': 5, 'low': 5}
+    assert from_source == [1, 5, 9]
+
+
+def test_records_are_snapshots_and_survive_reopening(tmp_path):
+    store = EventStore(tmp_path)
+    record = {'incident_id': '1', 'count': 1}
+    store.append('incident', record, '1', datetime.now())
+    record['count'] = 2
+    store.close()
+
+    reopened = EventStore(tmp_path)
+    assert [r['count'] for r in reopened.query('incident')] == [1]
+    reopened.close()
+
+
+def test_replaced_records_keep_only_the_latest_snapshot(tmp_path):
+    # Every flush opens a new segment, so snapshots land in different files
+    store = EventStore(tmp_path, segment_seconds=0)
+    created = datetime.now()
+
+    store.append('incident', {'incident_id': 'a', 'severity': 'low'}, 'a', created, severity='low', replace=True)
+    store.append('incident', {'incident_id': 'b', 'severity': 'low'}, 'b', created, severity='low', replace=True)
+    store.flush()
+    store.append('incident', {'incident_id': 'a', 'severity': 'medium'}, 'a', created, severity='medium', replace=True)
+    store.append('incident', {'incident_id': 'a', 'severity': 'high'}, 'a', created, severity='high', replace=True)
+    store.flush()
+
+    assert store.get_stats()['segments'] == 2
+    assert sorted((r['incident_id'], r['severity']) for r in store.query('incident')) == [('a', 'high'), ('b', 'low')]
+    assert store.count('incident', group_by='severity') == {'high': 1, 'low': 1}
+    assert list(store.query('incident', severity='low')) == [{'incident_id': 'b', 'severity': 'low'}]
+    store.close()
+
+    reopened = EventStore(tmp_path)
+    assert reopened.count('incident') == 2
+    reopened.close()
+
+
+def test_unknown_filter_is_rejected(tmp_path):
+    store = EventStore(tmp_path)
+
+    with pytest.raises(ValueError):
+        store.count('incident', protocol='tcp')
+    store.close()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for set-based firewall batching and the simulated firewall executor
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from firewall_sets import FirewallSetBackend, IpsetBackend, NftablesBackend, SimulatedFirewallExecutor
+from network_actions import NetworkActionEngine, ActionType, ActionStatus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def ipset_batches(executor: SimulatedFirewallExecutor):
+    """`ipset restore` calls carrying element updates (not the set creation)"""
+    return [c for c in executor.commands
+            if c['command'][:2] == ['ipset', 'restore'] and c['input'].startswith(('add ', 'del '))]
+
+
+def test_ipset_blocks_are_coalesced_into_one_restore():
+    async def run():
+        executor = SimulatedFirewallExecutor()
+        backend = IpsetBackend(executor, batch_window=0.01)
+        results = await asyncio.gather(*(backend.block(f"10.0.0.{i}", timeout=60) for i in range(1, 51)))
+        return executor, backend, results
+
+    executor, backend, results = asyncio.run(run())
+
+    assert all(result['success'] and result['batch_size'] == 50 for result in results)
+    assert len(ipset_batches(executor)) == 1
+    assert backend.stats['batches_applied'] == 1
+    assert executor.blocked_count() == 50
+    assert executor.is_blocked("10.0.0.7")
+
+
+def test_nftables_block_timeout_and_port_sets():
+    clock = FakeClock()
+
+    async def run():
+        executor = SimulatedFirewallExecutor(clock)
+        backend = NftablesBackend(executor, batch_window=0.01)
+        await asyncio.gather(backend.block("10.0.0.1", timeout=30), backend.block("2001:db8::1", port=22))
+        return executor
+
+    executor = asyncio.run(run())
+
+    assert executor.is_blocked("10.0.0.1")
+    assert executor.is_blocked("2001:db8::1", port=22)
+    assert not executor.is_blocked("2001:db8::1", port=80)
+    clock.now += 31
+    assert not executor.is_blocked("10.0.0.1")
+
+
+def test_nftables_delete_of_expired_element_does_not_fail_batch():
+    clock = FakeClock()
+
+    async def run():
+        executor = SimulatedFirewallExecutor(clock)
+        backend = NftablesBackend(executor, batch_window=0.01)
+        await backend.block("10.0.0.1", timeout=5)
+        clock.now += 10
+
+        # The kernel already dropped 10.0.0.1; the coalesced adds must still apply
+        return executor, await asyncio.gather(
+            backend.unblock("10.0.0.1"), backend.block("10.0.0.2", timeout=60), backend.block("10.0.0.3", timeout=60)
+        )
+
+    executor, results = asyncio.run(run())
+
+    assert all(result['success'] for result in results)
+    assert results[0]['batch_size'] == 3
+    assert executor.is_blocked("10.0.0.2") and executor.is_blocked("10.0.0.3")
+    assert not executor.is_blocked("10.0.0.1")
+
+
+def test_simulator_rejects_missing_nft_delete_atomically():
+    async def run():
+        executor = SimulatedFirewallExecutor()
+        script = ("add element inet t blocked4 { 10.0.0.2 }\n"
+                  "delete element inet t blocked4 { 10.0.0.9 }\n")
+        return executor, await executor(['nft', '-f', '-'], script)
+
+    executor, result = asyncio.run(run())
+
+    assert not result['success']
+    assert 'does not exist' in result['stderr']
+    assert not executor.is_blocked("10.0.0.2")
+
+
+def test_simulator_ipset_missing_delete_needs_exist_flag():
+    async def run():
+        executor = SimulatedFirewallExecutor()
+        strict = await executor(['ipset', 'restore'], "del security_block 10.0.0.9\n")
+        tolerant = await executor(['ipset', 'restore', '-exist'], "del security_block 10.0.0.9\n")
+        return strict, tolerant
+
+    strict, tolerant = asyncio.run(run())
+
+    assert not strict['success']
+    assert tolerant['success']
+
+
+def test_set_blocks_run_while_concurrency_slots_are_full(tmp_path):
+    async def run():
+        engine = NetworkActionEngine({
+            'firewall_type': 'nftables',
+            'firewall_executor': 'simulated',
+            'firewall_batch_window_ms': 10,
+            'max_concurrent_actions': 1,
+            'action_dir': str(tmp_path / 'actions'),
+            'event_dir': str(tmp_path / 'events')
+        })
+        release = asyncio.Event()
+
+        async def slow_shaping(action):
+            await release.wait()
+            return True, {}
+
+        engine.action_handlers[ActionType.TRAFFIC_SHAPING] = slow_shaping
+        await engine.start()
+
+        await engine.queue_action(ActionType.TRAFFIC_SHAPING, "10.0.0.5", severity='info')
+        await asyncio.sleep(0.05)
+        await engine.queue_action(ActionType.FIREWALL_BLOCK, "10.0.0.6", duration_seconds=60, severity='critical')
+
+        for _ in range(100):
+            if engine.firewall_executor.is_blocked("10.0.0.6"):
+                break
+            await asyncio.sleep(0.01)
+        blocked_while_busy = engine.firewall_executor.is_blocked("10.0.0.6")
+        shaping_running = any(
+            action.action_type == ActionType.TRAFFIC_SHAPING and action.status == ActionStatus.EXECUTING
+            for action in engine.active_actions.values()
+        )
+
+        release.set()
+        await asyncio.sleep(0.05)
+        await engine.stop()
+        return blocked_while_busy, shaping_running
+
+    blocked_while_busy, shaping_running = asyncio.run(run())
+
+    assert shaping_running
+    assert blocked_while_busy
+
+
+def test_incomplete_backend_fails_when_instantiated():
+    class SetupOnlyBackend(FirewallSetBackend):
+        def setup_commands(self):
+            return []
+
+    with pytest.raises(TypeError):
+        SetupOnlyBackend(SimulatedFirewallExecutor())
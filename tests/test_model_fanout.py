@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent model fan-out: deadlines, early stop and caller cancellation
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fusion_tools'))
+
+from utils.model_fanout import run_models_concurrently
+
+
+class FakeModels:
+    """Runners that answer after a delay and record how each call ended"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.finished = {}
+
+    def runners(self):
+        return {model: self.runner(model) for model in self.delays}
+
+    def runner(self, model):
+        async def run(prompt, on_token=None):
+            try:
+                if on_token:
+                    on_token(prompt)
+                await asyncio.sleep(self.delays[model])
+                self.finished[model] = "completed"
+                return f"{model}: {prompt}"
+            except asyncio.CancelledError:
+                self.finished[model] = "cancelled"
+                raise
+        return run
+
+
+def test_slow_models_are_cancelled_at_the_deadline():
+    models = FakeModels({"fast": 0, "slow": 10})
+    tokens = []
+
+    outputs, errors, latencies = asyncio.run(run_models_concurrently(
+        models.runners(), "hi", ["fast", "slow"], 0.05, on_token=lambda model, token: tokens.append(model)
+    ))
+
+    assert outputs == {"fast": "fast: hi"}
+    assert "slow" in errors
+    assert set(latencies) == {"fast", "slow"}
+    assert sorted(tokens) == ["fast", "slow"]
+    assert models.finished == {"fast": "completed", "slow": "cancelled"}
+
+
+def test_early_stop_cancels_remaining_models_without_errors():
+    models = FakeModels({"a": 0, "b": 10})
+
+    outputs, errors, _ = asyncio.run(run_models_concurrently(
+        models.runners(), "hi", ["a", "b"], 5, on_result=lambda model, output: True
+    ))
+
+    assert outputs == {"a": "a: hi"}
+    assert errors == {}
+    assert models.finished["b"] == "cancelled"
+
+
+def test_cancelled_caller_cancels_running_models():
+    models = FakeModels({"a": 10, "b": 10})
+
+    async def run():
+        caller = asyncio.ensure_future(run_models_concurrently(models.runners(), "hi", ["a", "b"], 60))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        try:
+            await caller
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+
+    assert models.finished == {"a": "cancelled", "b": "cancelled"}
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar packet history ring store
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from netsniffer import PacketMetadata
+from packet_store import PacketHistoryStore, PacketWindow, pack_ip, unpack_ip
+
+
+def packet(i: int, **fields) -> PacketMetadata:
+    defaults = dict(
+        timestamp=datetime.fromtimestamp(1700000000 + i),
+        src_ip=f"10.0.{i // 256 % 256}.{i % 256}",
+        dst_ip="192.168.1.1",
+        src_port=1024 + i,
+        dst_port=443,
+        protocol="TCP",
+        packet_size=60 + i,
+        tcp_flags=["SYN"]
+    )
+    defaults.update(fields)
+    return PacketMetadata(**defaults)
+
+
+def test_ring_keeps_the_most_recent_packets_across_compactions():
+    store = PacketHistoryStore(capacity=4)
+
+    for i in range(11):
+        store.append(packet(i))
+
+    assert len(store) == 4
+    assert store.total_appended == 11
+    assert [p.src_port for p in store] == [1031, 1032, 1033, 1034]
+    assert store[0].src_ip == "10.0.0.7"
+    assert store[-1].packet_size == 70
+
+
+def test_window_is_a_view_of_recent_packets():
+    store = PacketHistoryStore(capacity=8)
+    store.extend([packet(i) for i in range(6)])
+
+    window = store.window(3)
+
+    assert len(window) == 3
+    assert window.src_port.tolist() == [1027, 1028, 1029]
+    assert window.timestamp.base is not None
+    assert len(store.window()) == 6
+    assert len(store.window(100)) == 6
+
+
+def test_window_since_uses_capture_time():
+    store = PacketHistoryStore(capacity=8)
+    store.extend([packet(i) for i in range(6)])
+
+    window = store.window_since(1700000003.0)
+
+    assert window.src_port.tolist() == [1027, 1028, 1029]
+    assert len(store.window_since(1800000000.0)) == 0
+
+
+def test_packets_round_trip_through_columns():
+    original = [
+        packet(1),
+        packet(2, src_ip="2001:db8::1", dst_ip="2001:db8::2", protocol="UDP", dst_port=53,
+               tcp_flags=[], dns_query="example.com."),
+        packet(3, protocol="ICMP", src_port=None, dst_port=None, tcp_flags=[]),
+        packet(4, protocol=47, tcp_flags=["SYN", "ACK"])
+    ]
+    store = PacketHistoryStore(capacity=8)
+    store.extend(original)
+
+    assert store[0:4] == original
+    assert PacketWindow.from_packets(original).to_packets() == original
+
+
+def test_slicing_and_index_errors():
+    store = PacketHistoryStore(capacity=8)
+    store.extend([packet(i) for i in range(5)])
+
+    assert [p.src_port for p in store[1:5:2]] == [1025, 1027]
+    assert store[3:1] == []
+    with pytest.raises(IndexError):
+        store[5]
+
+
+def test_clear_and_capacity_validation():
+    store = PacketHistoryStore(capacity=2)
+    store.extend([packet(i) for i in range(3)])
+    store.clear()
+
+    assert len(store) == 0
+    assert list(store) == []
+    with pytest.raises(ValueError):
+        PacketHistoryStore(capacity=0)
+
+
+def test_ip_packing():
+    assert unpack_ip(pack_ip("10.1.2.3")) == "10.1.2.3"
+    assert unpack_ip(pack_ip("2001:db8::7")) == "2001:db8::7"
+    assert pack_ip("not an address") == bytes(16)
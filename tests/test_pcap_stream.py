@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental pcap parser and record decoder
+"""
+
+import os
+import socket
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from pcap_stream import PcapStreamParser, decode_record, LINKTYPE_ETHERNET, MAX_RECORD_SIZE
+
+
+def ethernet(payload: bytes, ethertype: int = 0x0800) -> bytes:
+    return b'\x00' * 12 + struct.pack('!H', ethertype) + payload
+
+
+def ipv4(src: str, dst: str, proto: int, payload: bytes) -> bytes:
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 0, 0, 64, proto, 0,
+                       socket.inet_aton(src), socket.inet_aton(dst)) + payload
+
+
+def tcp(src_port: int, dst_port: int, flags: int) -> bytes:
+    return struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0, 0x50, flags, 0, 0, 0)
+
+
+def udp(src_port: int, dst_port: int, payload: bytes) -> bytes:
+    return struct.pack('!HHHH', src_port, dst_port, 8 + len(payload), 0) + payload
+
+
+def dns_query(name: str) -> bytes:
+    question = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.'))
+    return struct.pack('!HHHHHH', 1, 0x0100, 1, 0, 0, 0) + question + b'\x00' + struct.pack('!HH', 1, 1)
+
+
+def pcap(packets, byte_order: str = '<', start: float = 1700000000.0) -> bytes:
+    data = struct.pack(f'{byte_order}IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET)
+    for i, packet in enumerate(packets):
+        timestamp = start + i * 0.5
+        data += struct.pack(f'{byte_order}IIII', int(timestamp), int(timestamp % 1 * 1e6), len(packet), len(packet))
+        data += packet
+    return data
+
+
+PACKETS = [
+    ethernet(ipv4("10.0.0.1", "10.0.0.2", 6, tcp(40000, 443, 0x02))),
+    ethernet(ipv4("10.0.0.2", "10.0.0.1", 6, tcp(443, 40000, 0x12))),
+    ethernet(ipv4("10.0.0.1", "8.8.8.8", 17, udp(5353, 53, dns_query("example.com"))))
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 16, 24, 100, 100000])
+def test_records_are_identical_for_any_chunking(chunk_size):
+    stream = pcap(PACKETS)
+    parser = PcapStreamParser()
+    records = []
+    for offset in range(0, len(stream), chunk_size):
+        records.extend(parser.feed(stream[offset:offset + chunk_size]))
+
+    assert [record.data for record in records] == PACKETS
+    assert [record.timestamp for record in records] == [1700000000.0, 1700000000.5, 1700000001.0]
+    assert parser.linktype == LINKTYPE_ETHERNET
+    assert parser.records_parsed == 3
+    assert parser.bytes_consumed == len(stream)
+    assert len(parser.buffer) == 0
+
+
+def test_partial_record_is_buffered_until_complete():
+    stream = pcap(PACKETS[:1])
+    parser = PcapStreamParser()
+
+    assert parser.feed(stream[:-5]) == []
+    assert len(parser.buffer) == len(stream) - 5 - 24
+    assert len(parser.feed(stream[-5:])) == 1
+
+
+def test_big_endian_stream():
+    records = PcapStreamParser().feed(pcap(PACKETS, byte_order='>'))
+
+    assert [record.data for record in records] == PACKETS
+
+
+def test_unknown_magic_and_oversized_records_are_rejected():
+    with pytest.raises(ValueError):
+        PcapStreamParser().feed(b'\x0a\x0d\x0d\x0a' + b'\x00' * 20)
+
+    corrupt = pcap([]) + struct.pack('<IIII', 0, 0, MAX_RECORD_SIZE + 1, MAX_RECORD_SIZE + 1)
+    with pytest.raises(ValueError):
+        PcapStreamParser().feed(corrupt)
+
+
+def test_decode_tcp_and_dns_records():
+    records = PcapStreamParser().feed(pcap(PACKETS))
+
+    syn = decode_record(records[0], LINKTYPE_ETHERNET)
+    assert (syn['src_ip'], syn['dst_ip'], syn['src_port'], syn['dst_port']) == ("10.0.0.1", "10.0.0.2", 40000, 443)
+    assert syn['protocol'] == "TCP"
+    assert syn['tcp_flags'] == ["SYN"]
+    assert syn['packet_size'] == len(PACKETS[0])
+
+    assert decode_record(records[1], LINKTYPE_ETHERNET)['tcp_flags'] == ["SYN", "ACK"]
+
+    dns = decode_record(records[2], LINKTYPE_ETHERNET)
+    assert dns['protocol'] == "UDP"
+    assert dns['dns_query'] == "example.com."
+
+
+def test_non_ip_frames_decode_to_none():
+    records = PcapStreamParser().feed(pcap([ethernet(b'\x00' * 28, ethertype=0x0806)]))
+
+    assert decode_record(records[0], LINKTYPE_ETHERNET) is None
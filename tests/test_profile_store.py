@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded, SQLite-backed network profile store
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from profile_store import ProfileStore
+
+
+def test_evicted_dirty_profile_is_reloaded_before_it_is_written(tmp_path):
+    store = ProfileStore(tmp_path, max_profiles=2)
+
+    profile = store.get("10.0.0.1", "10.0.0.2")
+    profile.avg_packet_size = 999.0
+    store.mark_dirty(profile)
+    store.get("10.0.0.3", "10.0.0.4")
+    store.get("10.0.0.5", "10.0.0.6")
+
+    assert store.peek("10.0.0.1", "10.0.0.2") is None
+    assert store.get("10.0.0.1", "10.0.0.2").avg_packet_size == 999.0
+
+    store.close()
+    reopened = ProfileStore(tmp_path, max_profiles=2)
+    assert reopened.get("10.0.0.1", "10.0.0.2", create=False).avg_packet_size == 999.0
+    reopened.close()
+
+
+def test_evicted_profiles_are_written_in_batches_and_read_back(tmp_path):
+    store = ProfileStore(tmp_path, max_profiles=4, write_batch=3)
+
+    for i in range(10):
+        profile = store.get(f"10.0.1.{i}", "10.0.0.1", protocol='TCP')
+        profile.add_port(1000 + i)
+        profile.add_hour(i)
+
+    assert len(store) == 4
+    assert store.stats['evicted'] == 6
+    assert store.stored_count() == 6
+
+    profile = store.get("10.0.1.0", "10.0.0.1", create=False)
+    assert profile.has_port(1000)
+    assert profile.has_hour(0)
+    assert store.stats['loaded'] == 1
+    store.close()
+
+
+def test_unknown_pair_without_create_returns_none(tmp_path):
+    store = ProfileStore(tmp_path)
+
+    assert store.get("10.0.0.1", "10.0.0.2", create=False) is None
+    assert store.stats['created'] == 0
+    store.close()
+
+
+def test_expire_drops_idle_profiles_from_memory_and_disk(tmp_path):
+    store = ProfileStore(tmp_path, max_profiles=2, ttl_seconds=60)
+
+    for i in range(4):
+        store.get(f"10.0.2.{i}", "10.0.0.1")
+    store.save()
+    for profile in store:
+        profile.last_seen -= 3600
+    store.connection.execute('UPDATE profiles SET last_seen = last_seen - 3600')
+    store.connection.commit()
+
+    assert store.expire() == 4
+    assert len(store) == 0
+    assert store.stored_count() == 0
+    store.close()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tests for the fusion response cache: exact and semantic tiers, coalescing and cancellation
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fusion_tools'))
+
+from utils.model_fanout import run_models_concurrently
+from utils.response_cache import ResponseCache
+
+
+class SlowCompute:
+    """Counts calls and returns a value once released"""
+
+    def __init__(self, value="answer"):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+def test_exact_hit_ignores_case_and_whitespace():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute()
+        compute.release.set()
+        first = await cache.get_or_compute("What is  DNS?", "ctx", compute)
+        second = await cache.get_or_compute("what is dns?", "ctx", compute)
+        other_context = await cache.get_or_compute("what is dns?", "other", compute)
+        return first, second, other_context, compute.calls
+
+    first, second, other_context, calls = asyncio.run(run())
+
+    assert first == ("answer", None)
+    assert second[0] == "answer" and second[1]["tier"] == "exact"
+    assert other_context == ("answer", None)
+    assert calls == 2
+
+
+def test_semantic_hit_uses_similar_prompt():
+    async def embed(prompt):
+        return [1.0, 0.0] if "dns" in prompt else [0.0, 1.0]
+
+    async def run():
+        cache = ResponseCache(embed=embed, similarity_threshold=0.9)
+        compute = SlowCompute()
+        compute.release.set()
+        await cache.get_or_compute("explain dns", "ctx", compute)
+        similar = await cache.get_or_compute("how does dns work", "ctx", compute)
+        different = await cache.get_or_compute("explain tcp", "ctx", compute)
+        return similar, different, compute.calls
+
+    similar, different, calls = asyncio.run(run())
+
+    assert similar[1]["tier"] == "semantic"
+    assert different[1] is None
+    assert calls == 2
+
+
+def test_concurrent_misses_share_one_computation():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute()
+        requests = [asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        compute.release.set()
+        return await asyncio.gather(*requests), compute.calls, cache.stats
+
+    results, calls, stats = asyncio.run(run())
+
+    assert calls == 1
+    assert results[0] == ("answer", None)
+    assert all(result == ("answer", {"tier": "in_flight", "age_seconds": 0.0}) for result in results[1:])
+    assert stats.coalesced == 4
+
+
+def test_cancelled_owner_does_not_cancel_waiters():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute()
+        owner = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        await asyncio.sleep(0.01)
+
+        owner.cancel()
+        await asyncio.sleep(0.01)
+        compute.release.set()
+        result = await waiter
+        cached = await cache.get_or_compute("prompt", "ctx", compute)
+        return owner, result, cached, compute.calls
+
+    owner, result, cached, calls = asyncio.run(run())
+
+    assert owner.cancelled()
+    assert result[0] == "answer"
+    assert cached[1]["tier"] == "exact"
+    assert calls == 1
+
+
+def test_computation_is_cancelled_when_nobody_waits():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute()
+        request = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        await asyncio.sleep(0.01)
+        task = cache.in_flight[("prompt", "ctx")].task
+
+        request.cancel()
+        await asyncio.sleep(0.01)
+        compute.release.set()
+        retry = await cache.get_or_compute("prompt", "ctx", compute)
+        return task, retry, compute.calls
+
+    task, retry, calls = asyncio.run(run())
+
+    assert task.cancelled()
+    assert retry == ("answer", None)
+    assert calls == 2
+
+
+def test_model_generations_stop_when_the_last_waiter_leaves():
+    cancelled = []
+
+    async def generate(prompt, on_token=None):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(prompt)
+            raise
+
+    async def run():
+        cache = ResponseCache()
+        runners = {"a": generate, "b": generate}
+
+        def compute():
+            return run_models_concurrently(runners, "prompt", ["a", "b"], 60)
+
+        first = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        second = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        after_first = list(cancelled)
+        second.cancel()
+        await asyncio.sleep(0.01)
+        return after_first, list(cancelled), cache.in_flight
+
+    after_first, after_last, in_flight = asyncio.run(run())
+
+    assert after_first == []
+    assert after_last == ["prompt", "prompt"]
+    assert not in_flight
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    async def run():
+        cache = ResponseCache()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("model unavailable")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("prompt", "ctx", failing) for _ in range(3)), return_exceptions=True
+        )
+        return results, len(attempts), len(cache.entries)
+
+    results, attempts, entries = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert attempts == 1
+    assert entries == 0
+
+
+def test_invalidate_discards_results_computed_before_it():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute()
+        request = asyncio.create_task(cache.get_or_compute("prompt", "ctx", compute))
+        await asyncio.sleep(0.01)
+        cache.invalidate()
+        compute.release.set()
+        await request
+        return len(cache.entries)
+
+    assert asyncio.run(run()) == 0
+
+
+def test_uncacheable_values_are_returned_but_not_stored():
+    async def run():
+        cache = ResponseCache()
+        compute = SlowCompute({"errors": ["timeout"]})
+        compute.release.set()
+        result = await cache.get_or_compute("prompt", "ctx", compute, cacheable=lambda value: not value["errors"])
+        return result, len(cache.entries)
+
+    result, entries = asyncio.run(run())
+
+    assert result[0] == {"errors": ["timeout"]}
+    assert entries == 0
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for incident persistence in the security orchestrator
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'network_security'))
+
+from netsniffer import TrafficType
+from security_orchestrator import SecurityOrchestrator, SecurityIncident, AlertSeverity, AttackType
+
+
+def orchestrator_config(tmp_path):
+    directory = str(tmp_path)
+    return {
+        'event_dir': str(tmp_path / 'events'),
+        'report_dir': directory,
+        'auto_response_enabled': False,
+        'sniffer': {'capture_dir': directory, 'log_dir': directory, 'report_dir': directory},
+        'detector': {'model_dir': directory, 'profile_dir': directory}
+    }
+
+
+def detection(incident_id: str, severity: AlertSeverity) -> SecurityIncident:
+    return SecurityIncident(
+        incident_id=incident_id, timestamp=datetime.now(), severity=severity, title=severity.value,
+        description="scan", source_ip="203.0.113.7", target_ip="10.0.0.1",
+        attack_type=AttackType.PORT_SCAN, traffic_type=TrafficType.SUSPICIOUS
+    )
+
+
+def test_active_incidents_survive_without_archiving(tmp_path):
+    orchestrator = SecurityOrchestrator(orchestrator_config(tmp_path))
+
+    async def run():
+        await orchestrator._correlate_incident(detection("first", AlertSeverity.WARNING))
+        await orchestrator._correlate_incident(detection("second", AlertSeverity.CRITICAL))
+        # Stop without archiving, as after a crash once the last batch was written
+        orchestrator.event_store.close()
+
+    asyncio.run(run())
+
+    reopened = SecurityOrchestrator(orchestrator_config(tmp_path))
+    incidents = reopened.get_recent_incidents()
+    reopened.event_store.close()
+
+    assert len(incidents) == 1
+    assert incidents[0]['incident_id'] == "first"
+    assert incidents[0]['severity'] == AlertSeverity.CRITICAL.value
+    assert incidents[0]['event_count'] == 2
+
+
+def test_archived_incident_is_stored_once(tmp_path):
+    orchestrator = SecurityOrchestrator(orchestrator_config(tmp_path))
+
+    async def run():
+        await orchestrator._correlate_incident(detection("only", AlertSeverity.ERROR))
+        await orchestrator._process_remaining_incidents()
+
+    asyncio.run(run())
+
+    assert orchestrator.event_store.count('incident') == 1
+    assert orchestrator.get_incident_summary()['incidents_by_severity'] == {AlertSeverity.ERROR.value: 1}
+    orchestrator.event_store.close()